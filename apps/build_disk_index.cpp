@@ -31,6 +31,9 @@ int main(int argc, char **argv)
     bool use_mcgi = false;
     bool use_amcgi = false;
     bool use_linear = false;
+    bool mcgi_merged_build = false;
+    bool amcgi_refine_lid = false;
+    bool write_lid = false;
     std::string lid_path;
     float lid_avg = 19.5f;
     float lid_std = 7.9f;
@@ -116,6 +119,9 @@ int main(int argc, char **argv)
                                        "MCGI: Minimum alpha (strictest pruning).");
         optional_configs.add_options()("alpha_max", po::value<float>(&alpha_max)->default_value(1.5f),
                                        "MCGI: Maximum alpha (relaxed pruning).");
+        optional_configs.add_options()("mcgi_merged_build", po::bool_switch()->default_value(false),
+                                       "MCGI: Build through the standard PQ + RAM-budgeted partition/merge pipeline, "
+                                       "so datasets larger than M can use MCGI.");
 
         optional_configs.add_options()("use_amcgi", po::bool_switch()->default_value(false),
                                        "Enable Advanced Manifold-Consistent Graph Indexing (AMCGI).");
@@ -123,6 +129,13 @@ int main(int argc, char **argv)
                                        "MCGI: Average LID value.");
         optional_configs.add_options()("lid_std", po::value<float>(&lid_std)->default_value(7.9f),
                                        "MCGI: Standard deviation of LID.");
+        optional_configs.add_options()("amcgi_refine_lid", po::bool_switch()->default_value(false),
+                                       "AMCGI: Keep refining each node's cached LID estimate with a running "
+                                       "average on every prune, instead of reusing the first estimate.");
+        optional_configs.add_options()("write_lid", po::bool_switch()->default_value(false),
+                                       "Write the per-point LID estimated while building to "
+                                       "<index_path_prefix>_lid.bin, for later MCGI builds. Not supported by the "
+                                       "in-memory --use_mcgi build.");
         // [HPDIC MOD: MCGI END]
 
         // Merge required and optional parameters
@@ -154,13 +167,22 @@ int main(int argc, char **argv)
             {
                 use_linear = true;
             }
+            mcgi_merged_build = vm["mcgi_merged_build"].as<bool>();
             std::cout << "[MCGI] Enabled. LID Path: " << lid_path << ", Alpha Range: [" << alpha_min << ", "
                       << alpha_max << "], Linear Mode: " << (use_linear ? "True" : "False") << std::endl;
         }
 
+        write_lid = vm["write_lid"].as<bool>();
+        if (write_lid && vm["use_mcgi"].as<bool>() && !mcgi_merged_build)
+        {
+            std::cerr << "Error: --write_lid requires --mcgi_merged_build when --use_mcgi is enabled." << std::endl;
+            return -1;
+        }
+
         if (vm["use_amcgi"].as<bool>())
         {
             use_amcgi = true;
+            amcgi_refine_lid = vm["amcgi_refine_lid"].as<bool>();
             std::cout << "[AMCGI] Enabled. LID Stats: avg=" << lid_avg << ", std=" << lid_std << std::endl;
         }
         // [HPDIC MOD: MCGI END]
@@ -214,7 +236,22 @@ int main(int argc, char **argv)
         auto call_build = [&](auto t, bool use_u16_label) {
             using T = decltype(t);
 
-            if (use_mcgi)
+            if (use_mcgi && mcgi_merged_build)
+            {
+                auto mcgi_context = diskann::CreateMCGIContext(lid_path, alpha_min, alpha_max, use_linear);
+                if (mcgi_context == nullptr)
+                    return -1;
+                mcgi_context->record_lid = write_lid;
+                if (use_u16_label)
+                    return diskann::build_disk_index<T, uint16_t>(
+                        data_path.c_str(), index_path_prefix.c_str(), params.c_str(), metric, use_opq, codebook_prefix,
+                        use_filters, label_file, universal_label, filter_threshold, Lf, mcgi_context);
+                else
+                    return diskann::build_disk_index<T>(data_path.c_str(), index_path_prefix.c_str(), params.c_str(),
+                                                        metric, use_opq, codebook_prefix, use_filters, label_file,
+                                                        universal_label, filter_threshold, Lf, mcgi_context);
+            }
+            else if (use_mcgi)
             {
                 if (use_u16_label)
                     return diskann::build_disk_index<T, uint16_t>(
@@ -232,24 +269,24 @@ int main(int argc, char **argv)
                     return diskann::build_disk_index<T, uint16_t>(
                         data_path.c_str(), index_path_prefix.c_str(), params.c_str(), metric, use_opq, codebook_prefix,
                         use_filters, label_file, universal_label, filter_threshold, Lf, lid_avg, lid_std, alpha_min,
-                        alpha_max);
+                        alpha_max, amcgi_refine_lid, write_lid);
                 else
                     return diskann::build_disk_index<T>(data_path.c_str(), index_path_prefix.c_str(), params.c_str(),
                                                         metric, use_opq, codebook_prefix, use_filters, label_file,
                                                         universal_label, filter_threshold, Lf, lid_avg, lid_std,
-                                                        alpha_min, alpha_max);
+                                                        alpha_min, alpha_max, amcgi_refine_lid, write_lid);
             }
             else
             {
-
+                auto mcgi_context = write_lid ? diskann::CreateLIDRecordingContext() : nullptr;
                 if (use_u16_label)
                     return diskann::build_disk_index<T, uint16_t>(
                         data_path.c_str(), index_path_prefix.c_str(), params.c_str(), metric, use_opq, codebook_prefix,
-                        use_filters, label_file, universal_label, filter_threshold, Lf);
+                        use_filters, label_file, universal_label, filter_threshold, Lf, mcgi_context);
                 else
                     return diskann::build_disk_index<T>(data_path.c_str(), index_path_prefix.c_str(), params.c_str(),
                                                         metric, use_opq, codebook_prefix, use_filters, label_file,
-                                                        universal_label, filter_threshold, Lf);
+                                                        universal_label, filter_threshold, Lf, mcgi_context);
             }
         };
 
@@ -13,6 +13,7 @@
 #include "timer.h"
 #include "percentile_stats.h"
 #include "program_options_utils.hpp"
+#include "benchmark_env.h"
 
 #ifndef _WINDOWS
 #include <sys/mman.h>
@@ -31,6 +32,16 @@
 
 namespace po = boost::program_options;
 
+// noise control of the measured searches, see benchmark_env.h
+struct BenchmarkOptions
+{
+    uint32_t warmup_queries = 0;
+    uint32_t repeats = 1;
+    bool drop_caches = false;
+    bool pin_threads = false;
+    int32_t numa_node = -1;
+};
+
 void print_stats(std::string category, std::vector<float> percentiles, std::vector<float> results)
 {
     diskann::cout << std::setw(20) << category << ": " << std::flush;
@@ -53,7 +64,8 @@ int search_disk_index(diskann::Metric &metric, const std::string &index_path_pre
                       const uint32_t num_threads, const uint32_t recall_at, const uint32_t beamwidth,
                       const uint32_t num_nodes_to_cache, const uint32_t search_io_limit,
                       const std::vector<uint32_t> &Lvec, const float fail_if_recall_below,
-                      const std::vector<std::string> &query_filters, const bool use_reorder_data = false)
+                      const std::vector<std::string> &query_filters, const bool use_reorder_data = false,
+                      const bool mmap_pq_data = false, const BenchmarkOptions &benchmark = BenchmarkOptions())
 {
     diskann::cout << "Search parameters: #threads: " << num_threads << ", ";
     if (beamwidth <= 0)
@@ -65,6 +77,10 @@ int search_disk_index(diskann::Metric &metric, const std::string &index_path_pre
     else
         diskann::cout << ", io_limit: " << search_io_limit << "." << std::endl;
 
+    std::vector<uint32_t> cpus;
+    if (benchmark.numa_node >= 0)
+        diskann::bind_numa_node((uint32_t)benchmark.numa_node, cpus);
+
     std::string warmup_query_file = index_path_prefix + "_sample_data.bin";
 
     // load query bin
@@ -112,6 +128,7 @@ int search_disk_index(diskann::Metric &metric, const std::string &index_path_pre
     std::unique_ptr<diskann::PQFlashIndex<T, LabelT>> _pFlashIndex(
         new diskann::PQFlashIndex<T, LabelT>(reader, metric));
 
+    _pFlashIndex->set_mmap_pq_data(mmap_pq_data);
     int res = _pFlashIndex->load(num_threads, index_path_prefix.c_str());
 
     if (res != 0)
@@ -130,6 +147,8 @@ int search_disk_index(diskann::Metric &metric, const std::string &index_path_pre
     node_list.shrink_to_fit();
 
     omp_set_num_threads(num_threads);
+    if (benchmark.pin_threads)
+        diskann::pin_omp_threads(num_threads, cpus);
 
     uint64_t warmup_L = 20;
     uint64_t warmup_num = 0, warmup_dim = 0, warmup_aligned_dim = 0;
@@ -218,21 +237,13 @@ int search_disk_index(diskann::Metric &metric, const std::string &index_path_pre
 
         query_result_ids[test_id].resize(recall_at * query_num);
         query_result_dists[test_id].resize(recall_at * query_num);
-
-        auto stats = new diskann::QueryStats[query_num];
-
         std::vector<uint64_t> query_result_ids_64(recall_at * query_num);
-        auto s = std::chrono::high_resolution_clock::now();
 
-#pragma omp parallel for schedule(dynamic, 1)
-        for (int64_t i = 0; i < (int64_t)query_num; i++)
-        {
+        auto search_query = [&](int64_t i, uint64_t *ids, float *dists, diskann::QueryStats *query_stats) {
             if (!filtered_search)
             {
-                _pFlashIndex->cached_beam_search(query + (i * query_aligned_dim), recall_at, L,
-                                                 query_result_ids_64.data() + (i * recall_at),
-                                                 query_result_dists[test_id].data() + (i * recall_at),
-                                                 optimized_beamwidth, use_reorder_data, stats + i);
+                _pFlashIndex->cached_beam_search(query + (i * query_aligned_dim), recall_at, L, ids, dists,
+                                                 optimized_beamwidth, use_reorder_data, query_stats);
             }
             else
             {
@@ -245,52 +256,110 @@ int search_disk_index(diskann::Metric &metric, const std::string &index_path_pre
                 { // one label for each query
                     label_for_search = _pFlashIndex->get_converted_label(query_filters[i]);
                 }
-                _pFlashIndex->cached_beam_search(
-                    query + (i * query_aligned_dim), recall_at, L, query_result_ids_64.data() + (i * recall_at),
-                    query_result_dists[test_id].data() + (i * recall_at), optimized_beamwidth, true, label_for_search,
-                    use_reorder_data, stats + i);
+                _pFlashIndex->cached_beam_search(query + (i * query_aligned_dim), recall_at, L, ids, dists,
+                                                 optimized_beamwidth, true, label_for_search, use_reorder_data,
+                                                 query_stats);
+            }
+        };
+
+        if (benchmark.warmup_queries > 0)
+        {
+            // unmeasured, cycling through the queries with the measured parameters
+            std::vector<uint64_t> warmup_ids((size_t)benchmark.warmup_queries * recall_at);
+            std::vector<float> warmup_dists((size_t)benchmark.warmup_queries * recall_at);
+#pragma omp parallel for schedule(dynamic, 1)
+            for (int64_t i = 0; i < (int64_t)benchmark.warmup_queries; i++)
+            {
+                search_query(i % (int64_t)query_num, warmup_ids.data() + (i * recall_at),
+                             warmup_dists.data() + (i * recall_at), nullptr);
             }
         }
-        auto e = std::chrono::high_resolution_clock::now();
-        std::chrono::duration<double> diff = e - s;
-        double qps = (1.0 * query_num) / (1.0 * diff.count());
 
-        diskann::convert_types<uint64_t, uint32_t>(query_result_ids_64.data(), query_result_ids[test_id].data(),
-                                                   query_num, recall_at);
+        std::vector<double> run_qps, run_mean_latency, run_latency_99;
+        for (uint32_t run = 0; run < benchmark.repeats; run++)
+        {
+            if (benchmark.drop_caches)
+                diskann::drop_page_cache();
 
-        auto mean_latency = diskann::get_mean_stats<float>(
-            stats, query_num, [](const diskann::QueryStats &stats) { return stats.total_us; });
+            auto stats = new diskann::QueryStats[query_num];
+            auto s = std::chrono::high_resolution_clock::now();
 
-        auto latency_999 = diskann::get_percentile_stats<float>(
-            stats, query_num, 0.999, [](const diskann::QueryStats &stats) { return stats.total_us; });
+#pragma omp parallel for schedule(dynamic, 1)
+            for (int64_t i = 0; i < (int64_t)query_num; i++)
+            {
+                search_query(i, query_result_ids_64.data() + (i * recall_at),
+                             query_result_dists[test_id].data() + (i * recall_at), stats + i);
+            }
+            auto e = std::chrono::high_resolution_clock::now();
+            std::chrono::duration<double> diff = e - s;
+            double qps = (1.0 * query_num) / (1.0 * diff.count());
 
-        auto mean_ios = diskann::get_mean_stats<uint32_t>(stats, query_num,
-                                                          [](const diskann::QueryStats &stats) { return stats.n_ios; });
+            diskann::convert_types<uint64_t, uint32_t>(query_result_ids_64.data(), query_result_ids[test_id].data(),
+                                                       query_num, recall_at);
 
-        auto mean_cpuus = diskann::get_mean_stats<float>(stats, query_num,
-                                                         [](const diskann::QueryStats &stats) { return stats.cpu_us; });
+            auto mean_latency = diskann::get_mean_stats<float>(
+                stats, query_num, [](const diskann::QueryStats &stats) { return stats.total_us; });
 
-        auto mean_io_us = diskann::get_mean_stats<float>(stats, query_num,
-                                                         [](const diskann::QueryStats &stats) { return stats.io_us; });
+            auto latency_99 = diskann::get_percentile_stats<float>(
+                stats, query_num, 0.99, [](const diskann::QueryStats &stats) { return stats.total_us; });
 
-        double recall = 0;
-        if (calc_recall_flag)
-        {
-            recall = diskann::calculate_recall((uint32_t)query_num, gt_ids, gt_dists, (uint32_t)gt_dim,
-                                               query_result_ids[test_id].data(), recall_at, recall_at);
-            best_recall = std::max(recall, best_recall);
+            auto latency_999 = diskann::get_percentile_stats<float>(
+                stats, query_num, 0.999, [](const diskann::QueryStats &stats) { return stats.total_us; });
+
+            auto mean_ios = diskann::get_mean_stats<uint32_t>(
+                stats, query_num, [](const diskann::QueryStats &stats) { return stats.n_ios; });
+
+            auto mean_cpuus = diskann::get_mean_stats<float>(
+                stats, query_num, [](const diskann::QueryStats &stats) { return stats.cpu_us; });
+
+            auto mean_io_us = diskann::get_mean_stats<float>(
+                stats, query_num, [](const diskann::QueryStats &stats) { return stats.io_us; });
+
+            double recall = 0;
+            if (calc_recall_flag)
+            {
+                recall = diskann::calculate_recall((uint32_t)query_num, gt_ids, gt_dists, (uint32_t)gt_dim,
+                                                   query_result_ids[test_id].data(), recall_at, recall_at);
+                best_recall = std::max(recall, best_recall);
+            }
+
+            diskann::cout << std::setw(6) << L << std::setw(12) << optimized_beamwidth << std::setw(16) << qps
+                          << std::setw(16) << mean_latency << std::setw(16) << latency_999 << std::setw(16)
+                          << mean_ios << std::setw(16) << mean_io_us << std::setw(16) << mean_cpuus;
+            if (calc_recall_flag)
+            {
+                diskann::cout << std::setw(16) << recall << std::endl;
+            }
+            else
+                diskann::cout << std::endl;
+            delete[] stats;
+
+            run_qps.push_back(qps);
+            run_mean_latency.push_back(mean_latency);
+            run_latency_99.push_back(latency_99);
         }
 
-        diskann::cout << std::setw(6) << L << std::setw(12) << optimized_beamwidth << std::setw(16) << qps
-                      << std::setw(16) << mean_latency << std::setw(16) << latency_999 << std::setw(16) << mean_ios
-                      << std::setw(16) << mean_io_us << std::setw(16) << mean_cpuus;
-        if (calc_recall_flag)
+        if (benchmark.repeats > 1)
         {
-            diskann::cout << std::setw(16) << recall << std::endl;
-        }
-        else
+            std::vector<bool> outlier_runs(benchmark.repeats, false);
+            diskann::cout << "L " << L << " over " << benchmark.repeats << " runs, median [95% CI]:";
+            const std::vector<std::pair<std::string, std::vector<double> *>> measures = {
+                {"QPS", &run_qps}, {"Mean Latency", &run_mean_latency}, {"99 Latency", &run_latency_99}};
+            for (const auto &measure : measures)
+            {
+                const diskann::RepeatSummary summary = diskann::summarize_repeats(*measure.second);
+                diskann::cout << " " << measure.first << " " << summary.median << " [" << summary.ci_low << ", "
+                              << summary.ci_high << "]";
+                for (uint32_t run = 0; run < benchmark.repeats; run++)
+                    outlier_runs[run] = outlier_runs[run] || summary.outliers[run];
+            }
             diskann::cout << std::endl;
-        delete[] stats;
+            for (uint32_t run = 0; run < benchmark.repeats; run++)
+            {
+                if (outlier_runs[run])
+                    diskann::cout << "Warning: run " << run + 1 << " of L " << L << " is an outlier" << std::endl;
+            }
+        }
     }
 
     diskann::cout << "Done searching. Now saving results " << std::endl;
@@ -320,7 +389,9 @@ int main(int argc, char **argv)
     uint32_t num_threads, K, W, num_nodes_to_cache, search_io_limit;
     std::vector<uint32_t> Lvec;
     bool use_reorder_data = false;
+    bool mmap_pq_data = false;
     float fail_if_recall_below = 0.0f;
+    BenchmarkOptions benchmark;
 
     po::options_description desc{
         program_options_utils::make_program_description("search_disk_index", "Searches on-disk DiskANN indexes")};
@@ -364,6 +435,24 @@ int main(int argc, char **argv)
         optional_configs.add_options()("use_reorder_data", po::bool_switch()->default_value(false),
                                        "Include full precision data in the index. Use only in "
                                        "conjuction with compressed data on SSD.  Default value: false");
+        optional_configs.add_options()("mmap_pq_data", po::bool_switch()->default_value(false),
+                                       "Memory-map the compressed vectors instead of reading them into memory, so "
+                                       "loading does not wait for them. Default value: false");
+        optional_configs.add_options()("warmup_queries",
+                                       po::value<uint32_t>(&benchmark.warmup_queries)->default_value(0),
+                                       "Number of unmeasured queries searched before the runs of each L, cycling "
+                                       "through the query file. Default value: 0");
+        optional_configs.add_options()("repeats", po::value<uint32_t>(&benchmark.repeats)->default_value(1),
+                                       "Number of measured runs of each L. With more than 1, the median and its 95% "
+                                       "confidence interval of QPS, mean and 99th percentile latency are reported and "
+                                       "outlier runs flagged. Default value: 1");
+        optional_configs.add_options()("drop_caches", po::bool_switch(&benchmark.drop_caches)->default_value(false),
+                                       "Drop the page cache before each run; needs root. Default value: false");
+        optional_configs.add_options()("pin_threads", po::bool_switch(&benchmark.pin_threads)->default_value(false),
+                                       "Pin each search thread to its own core. Default value: false");
+        optional_configs.add_options()("numa_node", po::value<int32_t>(&benchmark.numa_node)->default_value(-1),
+                                       "Run on the CPUs of this NUMA node and allocate from its memory. Default "
+                                       "value: -1, no binding");
         optional_configs.add_options()("filter_label",
                                        po::value<std::string>(&filter_label)->default_value(std::string("")),
                                        program_options_utils::FILTER_LABEL_DESCRIPTION);
@@ -389,6 +478,13 @@ int main(int argc, char **argv)
         po::notify(vm);
         if (vm["use_reorder_data"].as<bool>())
             use_reorder_data = true;
+        if (vm["mmap_pq_data"].as<bool>())
+            mmap_pq_data = true;
+        if (benchmark.repeats == 0)
+        {
+            std::cerr << "repeats must be at least 1" << std::endl;
+            return -1;
+        }
     }
     catch (const std::exception &ex)
     {
@@ -454,15 +550,18 @@ int main(int argc, char **argv)
             if (data_type == std::string("float"))
                 return search_disk_index<float, uint16_t>(
                     metric, index_path_prefix, result_path_prefix, query_file, gt_file, num_threads, K, W,
-                    num_nodes_to_cache, search_io_limit, Lvec, fail_if_recall_below, query_filters, use_reorder_data);
+                    num_nodes_to_cache, search_io_limit, Lvec, fail_if_recall_below, query_filters, use_reorder_data,
+                    mmap_pq_data, benchmark);
             else if (data_type == std::string("int8"))
                 return search_disk_index<int8_t, uint16_t>(
                     metric, index_path_prefix, result_path_prefix, query_file, gt_file, num_threads, K, W,
-                    num_nodes_to_cache, search_io_limit, Lvec, fail_if_recall_below, query_filters, use_reorder_data);
+                    num_nodes_to_cache, search_io_limit, Lvec, fail_if_recall_below, query_filters, use_reorder_data,
+                    mmap_pq_data, benchmark);
             else if (data_type == std::string("uint8"))
                 return search_disk_index<uint8_t, uint16_t>(
                     metric, index_path_prefix, result_path_prefix, query_file, gt_file, num_threads, K, W,
-                    num_nodes_to_cache, search_io_limit, Lvec, fail_if_recall_below, query_filters, use_reorder_data);
+                    num_nodes_to_cache, search_io_limit, Lvec, fail_if_recall_below, query_filters, use_reorder_data,
+                    mmap_pq_data, benchmark);
             else
             {
                 std::cerr << "Unsupported data type. Use float or int8 or uint8" << std::endl;
@@ -474,15 +573,18 @@ int main(int argc, char **argv)
             if (data_type == std::string("float"))
                 return search_disk_index<float>(metric, index_path_prefix, result_path_prefix, query_file, gt_file,
                                                 num_threads, K, W, num_nodes_to_cache, search_io_limit, Lvec,
-                                                fail_if_recall_below, query_filters, use_reorder_data);
+                                                fail_if_recall_below, query_filters, use_reorder_data, mmap_pq_data,
+                                                benchmark);
             else if (data_type == std::string("int8"))
                 return search_disk_index<int8_t>(metric, index_path_prefix, result_path_prefix, query_file, gt_file,
                                                  num_threads, K, W, num_nodes_to_cache, search_io_limit, Lvec,
-                                                 fail_if_recall_below, query_filters, use_reorder_data);
+                                                 fail_if_recall_below, query_filters, use_reorder_data, mmap_pq_data,
+                                                 benchmark);
             else if (data_type == std::string("uint8"))
                 return search_disk_index<uint8_t>(metric, index_path_prefix, result_path_prefix, query_file, gt_file,
                                                   num_threads, K, W, num_nodes_to_cache, search_io_limit, Lvec,
-                                                  fail_if_recall_below, query_filters, use_reorder_data);
+                                                  fail_if_recall_below, query_filters, use_reorder_data, mmap_pq_data,
+                                                  benchmark);
             else
             {
                 std::cerr << "Unsupported data type. Use float or int8 or uint8" << std::endl;
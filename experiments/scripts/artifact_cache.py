@@ -0,0 +1,94 @@
+"""
+@file: artifact_cache.py
+@brief: Shell front-end of diskannpy.ArtifactCache, so build/search scripts share LID files and PQ
+        artifacts by base-file content instead of by result directory name.
+
+Every sub-command prints a single path (or nothing on a miss) on stdout:
+
+    LID_BIN=$(python3 artifact_cache.py lid --data base.bin --dtype float --k 20)
+    CODEBOOK=$(python3 artifact_cache.py pq-lookup --data base.bin --budget 0.1)
+    CODEBOOK=$(python3 artifact_cache.py pq-store --data base.bin --index_prefix results/.../idx)
+    python3 artifact_cache.py pq-restore --data base.bin --budget 0.1 --index_prefix results/.../idx
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import diskannpy as dap
+
+# === 配置基础路径 ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.environ.get("ARTIFACT_CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+
+DTYPES = {"float": np.float32, "uint8": np.uint8, "int8": np.int8}
+
+# 与 disk_utils.h / pq_common.h 保持一致
+SPACE_FOR_CACHED_NODES_IN_GB = 0.25
+THRESHOLD_FOR_CACHING_IN_GB = 1.0
+MAX_PQ_CHUNKS = 512
+
+
+def pq_bytes_for_budget(budget_gb, num_points, dim):
+    """ build_disk_index 由 -B 推导 PQ 字节数的同一公式 (get_memory_budget + calculate_num_pq_chunks) """
+    if budget_gb - SPACE_FOR_CACHED_NODES_IN_GB > THRESHOLD_FOR_CACHING_IN_GB:
+        budget_gb -= SPACE_FOR_CACHED_NODES_IN_GB
+    chunks = int(budget_gb * 1024 * 1024 * 1024 / num_points)
+    return max(1, min(chunks, dim, MAX_PQ_CHUNKS))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cache_dir', type=str, default=DEFAULT_CACHE_DIR)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    lid = sub.add_parser('lid', help='print the cached LID file, computing it on a miss')
+    lid.add_argument('--data', type=str, required=True)
+    lid.add_argument('--dtype', type=str, default='float', choices=list(DTYPES))
+    lid.add_argument('--k', type=int, default=20)
+    lid.add_argument('--estimator', type=str, default='exact', choices=['exact', 'approximate'])
+    lid.add_argument('--sample_size', type=int, default=1000000)
+    lid.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    for name, help_text in (('pq-lookup', 'print the codebook prefix for --codebook_prefix, empty on a miss'),
+                            ('pq-store', 'add the PQ files of a built index and print the codebook prefix'),
+                            ('pq-restore', 'copy the cached PQ files to an index prefix and print it, fail on a miss')):
+        pq = sub.add_parser(name, help=help_text)
+        pq.add_argument('--data', type=str, required=True)
+        pq.add_argument('--dist_fn', type=str, default='l2', choices=['l2', 'mips', 'cosine'])
+        pq.add_argument('--seed', type=int, default=0)
+        if name != 'pq-store':
+            group = pq.add_mutually_exclusive_group(required=True)
+            group.add_argument('--pq_bytes', type=int)
+            group.add_argument('--budget', type=float, help='the -B value the index is built with')
+        if name != 'pq-lookup':
+            pq.add_argument('--index_prefix', type=str, required=True)
+
+    args = parser.parse_args()
+    cache = dap.ArtifactCache(args.cache_dir)
+
+    if args.command == 'lid':
+        print(cache.lid(args.data, DTYPES[args.dtype], k=args.k, estimator=args.estimator,
+                        sample_size=args.sample_size, num_workers=args.workers))
+    elif args.command == 'pq-store':
+        print(cache.store_pq(args.data, args.index_prefix, distance_metric=args.dist_fn, seed=args.seed))
+    else:
+        pq_bytes = args.pq_bytes
+        if pq_bytes is None:
+            num_points, dim = dap.vectors_metadata_from_file(args.data)
+            pq_bytes = pq_bytes_for_budget(args.budget, int(num_points), int(dim))
+        if args.command == 'pq-lookup':
+            prefix = cache.pq_codebook_prefix(args.data, pq_bytes, distance_metric=args.dist_fn, seed=args.seed)
+        elif cache.restore_pq(args.data, pq_bytes, args.index_prefix, distance_metric=args.dist_fn, seed=args.seed):
+            prefix = args.index_prefix
+        else:
+            prefix = None
+        if prefix is None:
+            return 1
+        print(prefix)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
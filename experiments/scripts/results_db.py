@@ -0,0 +1,76 @@
+"""
+@file: results_db.py
+@brief: Command line front-end of diskannpy.ResultsStore: ingests run_sweep.py records and run_exp_single.sh logs
+        into one SQLite database incrementally, and answers the questions aggregate_speed_scan.py and
+        find_best_params.py answered by re-parsing every log, at equal recall instead of equal L.
+
+    python3 results_db.py ingest ../fullscan ../speed_scan_85_95 ../results/records.jsonl
+    python3 results_db.py qps --recall 0.95 --dataset gist
+    python3 results_db.py frontier --dataset gist
+    python3 results_db.py speedup --recall 0.9 --dataset gist --top 10
+
+Recall is a fraction everywhere (the logs' percentages are converted on ingestion).
+"""
+
+import argparse
+import os
+import sys
+
+import diskannpy as dap
+
+# === 配置基础路径 ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.path.join(BASE_DIR, "results", "results.db")
+
+
+def describe(row):
+    alphas = "baseline" if row["alpha_min"] is None else f"min{row['alpha_min']}_max{row['alpha_max']}"
+    return f"{row['dataset']}_R{row['graph_degree']}_L{row['build_complexity']}_{alphas}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', type=str, default=DEFAULT_DB)
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help='add record files (*.jsonl) and log files or directories')
+    ingest.add_argument('paths', nargs='+')
+    for name in ('qps', 'frontier', 'speedup'):
+        command = commands.add_parser(name)
+        command.add_argument('--dataset', type=str, default=None)
+        command.add_argument('--R', type=int, default=None)
+        command.add_argument('--top', type=int, default=20)
+        if name != 'frontier':
+            command.add_argument('--recall', type=float, required=True)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    store = dap.ResultsStore(args.db)
+    if args.command == 'ingest':
+        records = [path for path in args.paths if path.endswith('.jsonl')]
+        logs = [path for path in args.paths if not path.endswith('.jsonl')]
+        added = sum(store.ingest_records(path) for path in records) + (store.ingest_logs(logs) if logs else 0)
+        print(f"Added {added} rows, {store.count()} in {args.db}")
+        return 0
+
+    where = {key: value for key, value in (('dataset', args.dataset), ('graph_degree', args.R)) if value is not None}
+    if args.command == 'frontier':
+        print(f"{'index':<40} {'L':>5} {'W':>3} {'T':>4} {'QPS':>10} {'Recall':>8} {'n':>3}")
+        for point in store.pareto_frontier(where):
+            print(f"{describe(point):<40} {point['search_complexity']:>5} {point['beam_width']:>3} "
+                  f"{point['num_threads']:>4} {point['qps']:>10.1f} {point['recall']:>8.4f} {point['n']:>3}")
+    elif args.command == 'qps':
+        print(f"{'index':<40} {'W':>3} {'T':>4} {'QPS@' + str(args.recall):>12}")
+        for result in store.qps_at_recall(args.recall, where)[:args.top]:
+            print(f"{describe(result):<40} {result['beam_width']:>3} {result['num_threads']:>4} "
+                  f"{result['qps']:>12.1f}")
+    else:
+        print(f"{'index':<40} {'QPS':>10} {'Baseline':>10} {'Speedup':>8}")
+        for result in store.speedup_at_recall(args.recall, where)[:args.top]:
+            print(f"{describe(result):<40} {result['qps']:>10.1f} {result['baseline_qps']:>10.1f} "
+                  f"{result['speedup']:>8.3f}")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -25,7 +25,6 @@ SEARCHER="${EXP_ROOT}/../build/apps/search_disk_index"
 # 数据路径
 DATA_DIR="${EXP_ROOT}/data/${DATASET}"
 BASE_BIN="${DATA_DIR}/${DATASET}_base.bin"
-LID_BIN="${DATA_DIR}/${DATASET}_lid.bin"
 QUERY_BIN="${DATA_DIR}/${DATASET}_query.bin"
 GT_BIN="${DATA_DIR}/${DATASET}_gt.bin"
 
@@ -55,7 +54,23 @@ if [ ! -f "$BASE_BIN" ]; then
 fi
 
 # ==========================================
-# 4. 智能 Baseline 构建 (复用机制)
+# 4. 产物缓存 (LID / PQ 按 base 文件内容寻址, 见 artifact_cache.py)
+# ==========================================
+# 缓存目录可由 ARTIFACT_CACHE_DIR 覆盖, 默认 experiments/cache
+ARTIFACT_CACHE="python3 ${SCRIPT_DIR}/artifact_cache.py"
+
+LID_BIN=$($ARTIFACT_CACHE lid --data "$BASE_BIN" --dtype float --k 20)
+if [ $? -ne 0 ] || [ -z "$LID_BIN" ]; then
+    echo "Error: LID computation failed."
+    exit 1
+fi
+echo "LID: $LID_BIN"
+
+# 任何 R/L 的 Baseline 都可以复用同一 base 文件上训练好的 PQ
+CODEBOOK=$($ARTIFACT_CACHE pq-lookup --data "$BASE_BIN" --dist_fn l2 --budget 0.1)
+
+# ==========================================
+# 5. 智能 Baseline 构建 (复用机制)
 # ==========================================
 BASELINE_IDX_PREFIX="$SHARED_BASELINE_DIR/idx"
 BASELINE_IDX_FILE="${BASELINE_IDX_PREFIX}_disk.index"
@@ -68,7 +83,8 @@ else
         --data_type float --dist_fn l2 \
         --data_path "$BASE_BIN" \
         --index_path_prefix "$BASELINE_IDX_PREFIX" \
-        -R $R -L $L -B 0.1 -M 1.0 -T 16 > "$SHARED_BASELINE_DIR/build.log" 2>&1
+        -R $R -L $L -B 0.1 -M 1.0 -T 16 \
+        ${CODEBOOK:+--codebook_prefix "$CODEBOOK"} > "$SHARED_BASELINE_DIR/build.log" 2>&1
 
     if [ $? -ne 0 ]; then
         echo "Error: Baseline Build Failed."
@@ -76,8 +92,11 @@ else
     fi
 fi
 
+# 第一次构建时把 Baseline 的 PQ 放进缓存; 之后的构建直接复用码本和压缩向量
+CODEBOOK=$($ARTIFACT_CACHE pq-store --data "$BASE_BIN" --dist_fn l2 --index_prefix "$BASELINE_IDX_PREFIX")
+
 # ==========================================
-# 5. 构建 MCGI (使用 Baseline 的 PQ 码本)
+# 6. 构建 MCGI (使用缓存的 PQ 码本与压缩向量)
 # ==========================================
 MCGI_IDX_PREFIX="$CURRENT_MCGI_DIR/idx"
 MCGI_IDX_FILE="${MCGI_IDX_PREFIX}_disk.index"
@@ -90,7 +109,7 @@ echo "=== Building MCGI ==="
     -R $R -L $L -B 0.1 -M 1.0 -T 16 \
     --use_mcgi --lid_path "$LID_BIN" \
     --alpha_min $ALPHA_MIN --alpha_max $ALPHA_MAX \
-    --codebook_prefix "$BASELINE_IDX_PREFIX" \
+    --codebook_prefix "$CODEBOOK" \
     > "$CURRENT_MCGI_DIR/build.log" 2>&1
 
 if [ $? -ne 0 ]; then
@@ -100,12 +119,13 @@ if [ $? -ne 0 ]; then
 fi
 
 # ==========================================
-# 6. 同步 PQ 文件 (搜索必须)
+# 6.1 放置 PQ 文件 (搜索必须)
 # ==========================================
-# 直接使用 Baseline 的 PQ 文件，无需复制几十兆的数据，软链接即可，或者让 Searcher 指向它们
-# 为简单起见，我们还是复制过去（PQ文件很小，几MB），防止 Searcher 报错
-cp "${BASELINE_IDX_PREFIX}_pq_pivots.bin" "${MCGI_IDX_PREFIX}_pq_pivots.bin"
-cp "${BASELINE_IDX_PREFIX}_pq_compressed.bin" "${MCGI_IDX_PREFIX}_pq_compressed.bin"
+# --use_mcgi 走内存构建路径, 不会在 MCGI 索引前缀下写 PQ 文件, 因此从缓存复制过去
+if ! $ARTIFACT_CACHE pq-restore --data "$BASE_BIN" --dist_fn l2 --budget 0.1 --index_prefix "$MCGI_IDX_PREFIX" > /dev/null; then
+    echo "Error: cached PQ files not found for the MCGI index."
+    exit 1
+fi
 
 # ==========================================
 # 7. 搜索对比 (智能缓存 + 清理)
@@ -0,0 +1,86 @@
+"""
+@file: run_sweep.py
+@brief: Runs a declarative benchmark sweep (experiments/sweeps/*.json) with diskannpy.SweepRunner, in place of
+        run_exp_single.sh / full_scan.sh. Each index is loaded once for its whole L sweep, and every search is
+        written as one JSON record instead of a log line that has to be parsed again.
+
+    python3 run_sweep.py --spec ../sweeps/full_scan.json
+    python3 run_sweep.py --spec ../sweeps/single.json --dry_run
+    python3 run_sweep.py --spec ../sweeps/full_scan.json --max_threads 64 --max_memory_gb 200
+    python3 run_sweep.py --spec ../sweeps/single.json --repeats 5 --warmup_queries 1000 --pin_threads --numa_node 0
+
+Records go to {results_dir}/records.jsonl; re-running the same spec skips everything already recorded.
+With --max_threads, builds run concurrently within the thread / memory / SSD limits (diskannpy.JobScheduler), each
+index's searches run alone once it is built, and jobs are tracked in {results_dir}/jobs.jsonl across restarts.
+"""
+
+import argparse
+import os
+import sys
+
+import diskannpy as dap
+
+# === 配置基础路径 ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RESULTS_DIR = os.path.join(BASE_DIR, "results")
+DEFAULT_CACHE_DIR = os.environ.get("ARTIFACT_CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--spec', type=str, required=True, help='sweep spec JSON, see diskannpy.SweepSpec')
+    parser.add_argument('--results_dir', type=str, default=DEFAULT_RESULTS_DIR)
+    parser.add_argument('--records', type=str, default=None, help='default: {results_dir}/records.jsonl')
+    parser.add_argument('--cache_dir', type=str, default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--dry_run', action='store_true', help='only list the indices and searches')
+    parser.add_argument('--max_threads', type=int, default=0, help='run builds in parallel within this many threads')
+    parser.add_argument('--max_memory_gb', type=float, default=0, help='default: total RAM')
+    parser.add_argument('--max_ssd_mbps', type=float, default=float('inf'))
+    parser.add_argument('--build_ssd_mbps', type=float, default=0, help='SSD bandwidth declared per build')
+    # 降噪测量: 覆盖 spec 中的 noise_control
+    parser.add_argument('--warmup_queries', type=int, default=None)
+    parser.add_argument('--repeats', type=int, default=None)
+    parser.add_argument('--drop_caches', action='store_true', default=None, help='needs root')
+    parser.add_argument('--pin_threads', action='store_true', default=None)
+    parser.add_argument('--numa_node', type=int, default=None)
+    args = parser.parse_args()
+
+    spec = dap.SweepSpec.from_file(args.spec)
+    overrides = {field: getattr(args, field) for field in dap.NoiseControl._fields
+                 if getattr(args, field) is not None}
+    spec.noise_control = spec.noise_control._replace(**overrides)
+    if args.dry_run:
+        searches = spec.searches()
+        for build in spec.builds():
+            print(f"{build.name}: {len(searches)} searches")
+        return 0
+
+    runner = dap.SweepRunner(spec, args.results_dir, records_file=args.records,
+                             artifact_cache=dap.ArtifactCache(args.cache_dir))
+    if args.max_threads > 0:
+        # 并行模式: 构建并发执行, 搜索独占机器
+        max_memory_gb = args.max_memory_gb or os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1 << 30)
+        scheduler = dap.JobScheduler(os.path.join(args.results_dir, "jobs.jsonl"), args.max_threads, max_memory_gb,
+                                     args.max_ssd_mbps)
+        states = runner.run_scheduled(scheduler, build_ssd_mbps=args.build_ssd_mbps)
+        failed = [job for job, state in states.items() if state == "failed"]
+        print(f"{len(states) - len(failed)}/{len(states)} jobs done, failed: {failed}")
+        print(f"Records: {runner.records_file}")
+        return 1 if failed else 0
+
+    print(f"{'index':<40} {'L':>5} {'W':>3} {'T':>4} {'cache':>8} {'QPS':>10} {'QPS 95% CI':>21} {'Lat(us)':>10} "
+          f"{'Recall':>8}")
+    for record in runner.run():
+        index_name = dap.SweepBuild(**{field: record[field] for field in dap.SweepBuild._fields}).name
+        ci_low, ci_high = record['qps_ci95']
+        outliers = f"  outlier runs: {record['outlier_runs']}" if record['outlier_runs'] else ""
+        print(f"{index_name:<40} "
+              f"{record['search_complexity']:>5} {record['beam_width']:>3} {record['num_threads']:>4} "
+              f"{record['num_nodes_to_cache']:>8} {record['qps']:>10.1f} {f'[{ci_low:.1f}, {ci_high:.1f}]':>21} "
+              f"{record['latency_us_mean']:>10.1f} {record['recall']:>8.4f}{outliers}", flush=True)
+    print(f"Records: {runner.records_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+@file: tune_mcgi.py
+@brief: Finds a near optimal (R, L, alpha_min, alpha_max) for one dataset of a sweep spec with diskannpy.SweepTuner,
+        instead of building the whole grid on the whole dataset as full_scan.sh does: every configuration is first
+        built on a small random slice, and only the best 1/eta of each round move on to a larger one.
+
+    python3 tune_mcgi.py --spec ../sweeps/full_scan.json --dataset gist --target_recall 0.95
+    python3 tune_mcgi.py --spec ../sweeps/full_scan.json --dataset sift --target_recall 0.9 --num_initial 16
+
+Slices, indices, records and observations go to {work_dir}; a re-run resumes, and the observations of earlier
+tunings pick the initial configurations when --num_initial is set.
+"""
+
+import argparse
+import os
+import sys
+
+import diskannpy as dap
+
+# === 配置基础路径 ===
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_WORK_DIR = os.path.join(BASE_DIR, "results", "tuning")
+DEFAULT_CACHE_DIR = os.environ.get("ARTIFACT_CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--spec', type=str, required=True, help='sweep spec JSON, its grid is searched')
+    parser.add_argument('--dataset', type=str, required=True)
+    parser.add_argument('--target_recall', type=float, required=True, help='k-recall@k as a fraction, e.g. 0.95')
+    parser.add_argument('--sampling_rates', type=float, nargs='+', default=[0.05, 0.25, 1.0])
+    parser.add_argument('--eta', type=int, default=3, help='1/eta of the configurations move on each round')
+    parser.add_argument('--num_initial', type=int, default=None, help='default: the whole grid')
+    parser.add_argument('--work_dir', type=str, default=DEFAULT_WORK_DIR)
+    parser.add_argument('--cache_dir', type=str, default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    spec = dap.SweepSpec.from_file(args.spec)
+    tuner = dap.SweepTuner(spec, args.work_dir, args.target_recall, sampling_rates=args.sampling_rates, eta=args.eta,
+                           num_initial=args.num_initial, seed=args.seed,
+                           artifact_cache=dap.ArtifactCache(args.cache_dir))
+    result = tuner.tune(args.dataset)
+
+    for rung in result.rungs:
+        print(f"=== rate {rung.sampling_rate:g}: {rung.num_points} points, LID mean {rung.lid_stats['mean']:.2f} "
+              f"std {rung.lid_stats['std']:.2f} ===")
+        print(f"{'index':<48} {'QPS@' + str(args.target_recall):>12} {'Recall':>8}")
+        for name, (qps, recall) in sorted(rung.scores.items(), key=lambda item: item[1], reverse=True):
+            print(f"{name:<48} {qps:>12.1f} {recall:>8.4f}")
+    print(f"Best: {result.best.name}  QPS {result.qps:.1f}  Recall {result.recall:.4f}")
+    print(f"{result.builds} builds for a grid of {result.grid_size}, "
+          f"{result.relative_cost:.1%} of the points indexed by the full grid search")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+// Copyright (c) Microsoft Corporation. All rights reserved.
+// Licensed under the MIT license.
+
+#pragma once
+
+#include <cstdint>
+#include <vector>
+
+#include "windows_customizations.h"
+
+//
+// Controls for measuring searches on a machine that is as quiet and repeatable as the OS allows: pinning the search
+// threads to cores, keeping CPUs and memory on one NUMA node, and dropping the page cache between runs, plus the
+// summary of repeated runs they are meant for. The controls are only implemented on Linux; elsewhere they log a
+// warning and return false.
+//
+namespace diskann
+{
+
+// Pins the threads of the OpenMP pool of num_threads threads, thread i to cpus[i % cpus.size()], or to the i-th CPU
+// the process may run on if cpus is empty. OpenMP reuses its threads for later parallel regions of the same size, so
+// searches with num_threads threads keep running there.
+DISKANN_DLLEXPORT bool pin_omp_threads(const uint32_t num_threads, const std::vector<uint32_t> &cpus);
+
+// Restricts the process to the CPUs of a NUMA node, which node_cpus receives, and binds the memory it allocates from
+// now on to the node. Call it before loading the index so that the index is allocated there too.
+DISKANN_DLLEXPORT bool bind_numa_node(const uint32_t node, std::vector<uint32_t> &node_cpus);
+
+// Writes dirty pages back and drops the page cache, dentries and inodes. Needs root.
+DISKANN_DLLEXPORT bool drop_page_cache();
+
+struct RepeatSummary
+{
+    double median = 0;
+    // a distribution free confidence interval of the median, from order statistics
+    double ci_low = 0;
+    double ci_high = 0;
+    // runs more than 3 scaled median absolute deviations away from the median
+    std::vector<bool> outliers;
+};
+
+// Summarizes one measurement, e.g. the QPS, over repeated runs. With fewer than 6 runs the interval is the range,
+// whose confidence is 1 - 2^(1 - runs).
+DISKANN_DLLEXPORT RepeatSummary summarize_repeats(const std::vector<double> &values);
+} // namespace diskann
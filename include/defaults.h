@@ -30,5 +30,9 @@ const uint32_t MAX_DEGREE = 64;
 const uint32_t BUILD_LIST_SIZE = 100;
 const uint32_t SATURATE_GRAPH = false;
 const uint32_t SEARCH_LIST_SIZE = 100;
+
+// MCGI alpha range, matching the build_disk_index cli defaults
+const float MCGI_ALPHA_MIN = 1.0f;
+const float MCGI_ALPHA_MAX = 1.5f;
 } // namespace defaults
 } // namespace diskann
@@ -83,7 +83,9 @@ DISKANN_DLLEXPORT int build_merged_vamana_index(const std::string &base_file, di
                                                 uint32_t num_threads, bool use_filters = false,
                                                 const std::string &label_file = std::string(""),
                                                 const std::string &labels_to_medoids_file = std::string(""),
-                                                const std::string &universal_label = "", const uint32_t Lf = 0);
+                                                const std::string &universal_label = "", const uint32_t Lf = 0,
+                                                const std::shared_ptr<const MCGIContext> mcgi_context = nullptr,
+                                                const std::string &lid_file = std::string(""));
 
 template <typename T, typename LabelT>
 DISKANN_DLLEXPORT uint32_t optimize_beamwidth(diskann::PQFlashIndex<T, LabelT> *index_ptr,
@@ -99,7 +101,9 @@ DISKANN_DLLEXPORT int build_disk_index(
     bool use_filters = false,
     const std::string &label_file = std::string(""), // default is empty string for no label_file
     const std::string &universal_label = "", const uint32_t filter_threshold = 0,
-    const uint32_t Lf = 0); // default is empty string for no universal label
+    const uint32_t Lf = 0, // default is empty string for no universal label
+    const std::shared_ptr<const MCGIContext> mcgi_context = nullptr); // nullptr builds with a fixed alpha,
+                                                                      // record_lid also writes {prefix}_lid.bin
 
 // [MCGI ADD] overloaded version with MCGI parameters
 template <typename T, typename TagT = uint32_t>
@@ -116,7 +120,8 @@ int build_disk_index(const char *dataFilePath, const char *indexFilePathPrefix,
                      const std::string &label_file, const std::string &universal_label, const uint32_t filter_threshold,
                      const uint32_t Lf,
                      // new parameters for AMCGI
-                     float lid_avg, float lid_std, float alpha_min, float alpha_max);
+                     float lid_avg, float lid_std, float alpha_min, float alpha_max, bool refine_lid = false,
+                     bool write_lid = false);
 
 template <typename T>
 DISKANN_DLLEXPORT void create_disk_layout(const std::string base_file, const std::string mem_index_file,
@@ -8,42 +8,72 @@
  */
 
 #pragma once
+#include <cstddef>
+#include <cstdint>
+#include <memory>
 #include <vector>
 #include <string>
 
 namespace diskann
 {
 
-// 1. 【搬过来】结构体定义必须在头文件里，这样 index.cpp 才能认识它
+// How per-node alpha is chosen while pruning during a Vamana build.
+enum class MCGIMode : uint32_t
+{
+    OFF = 0,     // plain Vamana, every node uses the fixed build alpha
+    STATIC = 1,  // MCGI: alpha looked up from a precomputed per-node LID table
+    ADVANCED = 2 // AMCGI: alpha estimated inline from the candidate pool, needs LID mean/std only
+};
+
+// MCGI 构建上下文。每个 Index 通过 IndexWriteParameters 持有自己的一份 (只读)，
+// 所以同一进程内多个构建 (例如并行的分片构建) 互不干扰。
 struct MCGIContext
 {
-    bool enabled = false;
-    bool advanced = false;
-    std::vector<float> alpha_table;
-    float lid_avg = 0.0f;
-    float lid_std = 1.0f;
+    // STATIC: alpha 表按 16 位量化存储 (每点 2 字节，而不是 float 的 4 字节)
+    static constexpr float MAX_ALPHA_CODE = 65535.0f;
+
+    MCGIMode mode = MCGIMode::OFF;
+    std::vector<uint16_t> alpha_codes; // STATIC: alpha per node id, alpha_min + code / MAX_ALPHA_CODE * range
+    float lid_avg = 0.0f;           // ADVANCED: dataset LID mean
+    float lid_std = 1.0f;           // ADVANCED: dataset LID std dev
     float alpha_min = 1.0f;
     float alpha_max = 1.0f;
+    bool refine_lid = false; // ADVANCED: keep refining cached per-node LID with a running average
+    bool record_lid = false; // estimate per-node LID while building (any mode), so it can be saved afterwards
+
+    // STATIC: alpha of node_id from the table, fallback if it is outside the table
+    float static_alpha(uint32_t node_id, float fallback) const;
+
+    // ADVANCED: sigmoid map of an inline LID estimate onto [alpha_min, alpha_max], fallback if lid <= 0
+    float adaptive_alpha(float lid, float fallback) const;
 };
 
-// 2. 【加这行】告诉大家有一个全局变量叫 g_mcgi_ctx，定义在别处
-extern MCGIContext g_mcgi_ctx;
+// AMCGI 在剪枝时用 candidate pool 中最近的这么多个邻居估算 LID
+const size_t AMCGI_LID_K = 32;
+// refine_lid 时新估计在滑动平均中的权重
+const float AMCGI_LID_EMA_WEIGHT = 0.25f;
 
-void RunMCGIHelloWorld();
+// MLE LID estimate from the k nearest *squared* distances, sorted ascending. Returns 0 if undefined.
+float EstimateLIDFromSquaredDistances(const float *sq_dists, size_t k);
 
-// 1. 初始化全局 MCGI 上下文 (在 disk_utils.cpp 里调用)
-void InitMCGIContext(const std::string &lid_path, float alpha_min, float alpha_max, bool use_linear);
-// void InitMCGIContext(const std::string &lid_path, float alpha_min, float alpha_max);
+void RunMCGIHelloWorld();
 
-// 2. 获取全局 Alpha (在 index.cpp 的剪枝逻辑里调用)
-// 如果没有初始化，默认返回 alpha_min (通常是 1.0 或 1.2，视你的默认策略而定)
-float GetGlobalMCGIAlpha(unsigned node_id);
+// MCGI: 从 LID 文件 (DiskANN bin 格式) 生成 alpha 表。读取失败返回 nullptr
+std::shared_ptr<MCGIContext> CreateMCGIContext(const std::string &lid_path, float alpha_min, float alpha_max,
+                                               bool use_linear);
+// 同上，但直接使用内存中的 LID 数组 (diskannpy 传入的 numpy 数组)，避免写盘再读
+std::shared_ptr<MCGIContext> CreateMCGIContext(const float *lid_values, size_t num_points, float alpha_min,
+                                               float alpha_max, bool use_linear);
 
-// 3. 清理/释放 (可选)
-void FreeMCGIContext();
+// MCGI 分片构建: 按分片的 idmap (局部 id i -> 全局 id local_to_global[i]) 把全局 alpha 表重排成分片局部的表。
+// idmap 中有超出全局表范围的 id 时返回 nullptr
+std::shared_ptr<MCGIContext> CreateShardMCGIContext(const MCGIContext &global_ctx,
+                                                    const std::vector<uint32_t> &local_to_global);
 
-bool IsMCGIEnabled();
-// void BuildMCGIIndex(const std::string& data_path, ...);
+// 只记录 LID、不改变 alpha 的上下文 (mode OFF, record_lid)，用于普通构建顺便产出 {prefix}_lid.bin
+std::shared_ptr<MCGIContext> CreateLIDRecordingContext();
 
-bool IsMCGIAdvanced();
+// AMCGI: 只需要 LID 的均值/方差，alpha 在剪枝时根据 candidate pool 实时估算
+std::shared_ptr<MCGIContext> CreateAMCGIContext(float lid_avg, float lid_std, float alpha_min, float alpha_max,
+                                                bool refine_lid = false);
 } // namespace diskann
\ No newline at end of file
@@ -74,6 +74,10 @@ template <typename T, typename TagT = uint32_t, typename LabelT = uint32_t> clas
     // Saves graph, data, metadata and associated tags.
     DISKANN_DLLEXPORT void save(const char *filename, bool compact_before_save = false);
 
+    // Saves the per-location LID estimated while building (one float per point, DiskANN bin format).
+    // Requires an MCGI context with record_lid set or in ADVANCED mode.
+    DISKANN_DLLEXPORT void save_lid(const std::string &filename);
+
     // Load functions
 #ifdef EXEC_ENV_OLS
     DISKANN_DLLEXPORT void load(AlignedFileReader &reader, uint32_t num_threads, uint32_t search_l);
@@ -396,6 +400,8 @@ template <typename T, typename TagT = uint32_t, typename LabelT = uint32_t> clas
     uint32_t _indexingMaxC;
     float _indexingAlpha;
     uint32_t _indexingThreads;
+    std::shared_ptr<const MCGIContext> _mcgi_ctx; // per-node alpha, owned per index so builds don't share state
+    std::vector<std::atomic<float>> _mcgi_lid;    // per-location LID estimate, 0 if not yet estimated
 
     // Query scratch data structures
     ConcurrentQueue<InMemQueryScratch<T> *> _query_scratch;
@@ -0,0 +1,78 @@
+// Copyright (c) Microsoft Corporation. All rights reserved.
+// Licensed under the MIT license.
+
+#pragma once
+
+#include <cstdint>
+#include <memory>
+#include <vector>
+
+#include "locking.h"
+#include "tsl/robin_map.h"
+#include "windows_customizations.h"
+
+namespace diskann
+{
+
+struct NodeCacheStats
+{
+    uint64_t hits = 0;
+    uint64_t misses = 0;
+    uint64_t insertions = 0;
+    uint64_t evictions = 0;
+    uint64_t num_entries = 0;
+    uint64_t capacity_entries = 0;
+};
+
+//
+// A concurrent cache of the sectors the disk search reads, keyed by node id and bounded by bytes. Unlike the static
+// node cache, whose contents are fixed when it is loaded, it admits every node the search reads from the SSD and
+// evicts with CLOCK: each entry keeps a small access frequency that hits increase and the clock hand decreases,
+// evicting the first entry it finds at 0. Entries are admitted at frequency 0, so nodes read only once, which most
+// nodes are, leave again at the next sweep without displacing the reused ones (the quick demotion of S3-FIFO).
+//
+// Entries are spread over independently locked shards by node id. Lookups copy the entry out under the shard lock,
+// so an entry can be evicted as soon as the lock is released.
+//
+class NodeCache
+{
+  public:
+    // entry_bytes is the size of the sectors read for one node
+    DISKANN_DLLEXPORT NodeCache(uint64_t capacity_bytes, uint64_t entry_bytes, uint32_t num_shards = 64);
+
+    // copies the cached sectors of node_id to out, returns false on a miss
+    DISKANN_DLLEXPORT bool lookup(uint32_t node_id, char *out);
+
+    // admits the sectors of node_id, evicting another entry of its shard if the shard is full
+    DISKANN_DLLEXPORT void insert(uint32_t node_id, const char *sectors);
+
+    DISKANN_DLLEXPORT NodeCacheStats get_stats(bool reset = false);
+
+    DISKANN_DLLEXPORT uint64_t get_entry_bytes() const;
+
+  private:
+    static constexpr uint8_t MAX_FREQUENCY = 3;
+
+    struct Shard
+    {
+        non_recursive_mutex lock;
+        std::unique_ptr<char[]> buf;
+        std::vector<uint32_t> ids;
+        std::vector<uint8_t> frequencies;
+        tsl::robin_map<uint32_t, uint32_t> slots;
+        uint32_t num_used = 0;
+        uint32_t hand = 0;
+        uint64_t hits = 0;
+        uint64_t misses = 0;
+        uint64_t insertions = 0;
+        uint64_t evictions = 0;
+    };
+
+    Shard &shard_of(uint32_t node_id);
+
+    uint64_t _entry_bytes;
+    uint32_t _num_shards;
+    uint32_t _slots_per_shard;
+    std::unique_ptr<Shard[]> _shards;
+};
+} // namespace diskann
@@ -2,12 +2,14 @@
 // Licensed under the MIT license.
 
 #pragma once
+#include <memory>
 #include <sstream>
 #include <typeinfo>
 #include <unordered_map>
 #include <omp.h>
 
 #include "defaults.h"
+#include "hpdic_mcgi.h"
 
 namespace diskann
 {
@@ -23,13 +25,15 @@ class IndexWriteParameters
     const float alpha;
     const uint32_t num_threads;
     const uint32_t filter_list_size; // Lf
+    const std::shared_ptr<const MCGIContext> mcgi_context; // per-node alpha, nullptr uses alpha everywhere
 
     IndexWriteParameters(const uint32_t search_list_size, const uint32_t max_degree, const bool saturate_graph,
                          const uint32_t max_occlusion_size, const float alpha, const uint32_t num_threads,
-                         const uint32_t filter_list_size)
+                         const uint32_t filter_list_size,
+                         const std::shared_ptr<const MCGIContext> mcgi_context = nullptr)
         : search_list_size(search_list_size), max_degree(max_degree), saturate_graph(saturate_graph),
           max_occlusion_size(max_occlusion_size), alpha(alpha), num_threads(num_threads),
-          filter_list_size(filter_list_size)
+          filter_list_size(filter_list_size), mcgi_context(mcgi_context)
     {
     }
 
@@ -91,16 +95,22 @@ class IndexWriteParametersBuilder
         return *this;
     }
 
+    IndexWriteParametersBuilder &with_mcgi_context(const std::shared_ptr<const MCGIContext> mcgi_context)
+    {
+        _mcgi_context = mcgi_context;
+        return *this;
+    }
+
     IndexWriteParameters build() const
     {
         return IndexWriteParameters(_search_list_size, _max_degree, _saturate_graph, _max_occlusion_size, _alpha,
-                                    _num_threads, _filter_list_size);
+                                    _num_threads, _filter_list_size, _mcgi_context);
     }
 
     IndexWriteParametersBuilder(const IndexWriteParameters &wp)
         : _search_list_size(wp.search_list_size), _max_degree(wp.max_degree),
           _max_occlusion_size(wp.max_occlusion_size), _saturate_graph(wp.saturate_graph), _alpha(wp.alpha),
-          _filter_list_size(wp.filter_list_size)
+          _filter_list_size(wp.filter_list_size), _mcgi_context(wp.mcgi_context)
     {
     }
     IndexWriteParametersBuilder(const IndexWriteParametersBuilder &) = delete;
@@ -114,6 +124,7 @@ class IndexWriteParametersBuilder
     float _alpha{defaults::ALPHA};
     uint32_t _num_threads{defaults::NUM_THREADS};
     uint32_t _filter_list_size{defaults::FILTER_LIST_SIZE};
+    std::shared_ptr<const MCGIContext> _mcgi_context{};
 };
 
 } // namespace diskann
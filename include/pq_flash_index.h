@@ -7,6 +7,7 @@
 #include "aligned_file_reader.h"
 #include "concurrent_queue.h"
 #include "neighbor.h"
+#include "node_cache.h"
 #include "parameters.h"
 #include "percentile_stats.h"
 #include "pq.h"
@@ -44,8 +45,45 @@ template <typename T, typename LabelT = uint32_t> class PQFlashIndex
                                                    const char *pivots_filepath, const char *compressed_filepath);
 #endif
 
+    // Memory-maps the compressed vectors read-only instead of reading them into the heap, so load does not wait for
+    // them and processes serving the same index share one page cache copy; pages are faulted in on first touch.
+    // prefetch asks the kernel to read the whole file in the background. Must be called before load. Not supported
+    // on Windows, where the vectors are always read into the heap.
+    DISKANN_DLLEXPORT void set_mmap_pq_data(bool mmap_pq_data, bool prefetch = false);
+
     DISKANN_DLLEXPORT void load_cache_list(std::vector<uint32_t> &node_list);
 
+    // Writes the nodes currently cached to cache_file, optionally with their coordinates and neighbor lists, so a
+    // later process can restore the same cache without recomputing the node list. num_nodes_to_cache is the budget
+    // the cache was computed for and is checked on load.
+    DISKANN_DLLEXPORT void save_cache_snapshot(const std::string &cache_file, uint64_t num_nodes_to_cache,
+                                               bool with_contents);
+
+    // Restores a cache written by save_cache_snapshot: with contents in one sequential read, otherwise by reading
+    // the listed nodes from the index. Returns false, without caching anything, if cache_file was written for
+    // another index, including this index before it was rebuilt (the size and mtime of _disk.index are checked),
+    // for another num_nodes_to_cache, or lists nodes the index does not have.
+    DISKANN_DLLEXPORT bool load_cache_snapshot(const std::string &cache_file, uint64_t num_nodes_to_cache);
+
+    // Counts the nodes visited by one in every sample_period searches, so the cache can later be rebuilt from the
+    // nodes real queries visit most. 0 stops counting; the counts collected so far are kept.
+    DISKANN_DLLEXPORT void set_visit_counting(uint64_t sample_period);
+
+    // Copies the visit count of every node, indexed by node id, optionally resetting them to 0.
+    DISKANN_DLLEXPORT void get_visit_counts(std::vector<uint32_t> &counts, bool reset = false);
+
+    // Memory one cached node takes: its coordinates and its neighbor list.
+    DISKANN_DLLEXPORT uint64_t get_cache_bytes_per_node();
+
+    // Sets up a dynamic node cache of up to capacity_bytes, which the search consults for every node outside the
+    // static cache and fills with every node it reads from the SSD. 0 removes it. Must not be called while
+    // searching.
+    DISKANN_DLLEXPORT void set_dynamic_cache(uint64_t capacity_bytes);
+
+    // Hit, miss, admission and eviction counts of the dynamic cache since it was set up or last reset; all 0 without
+    // one.
+    DISKANN_DLLEXPORT NodeCacheStats get_dynamic_cache_stats(bool reset = false);
+
 #ifdef EXEC_ENV_OLS
     DISKANN_DLLEXPORT void generate_cache_list_from_sample_queries(MemoryMappedFiles &files, std::string sample_bin,
                                                                    uint64_t l_search, uint64_t beamwidth,
@@ -75,11 +113,13 @@ template <typename T, typename LabelT = uint32_t> class PQFlashIndex
                                               const uint32_t io_limit, const bool use_reorder_data = false,
                                               QueryStats *stats = nullptr);
 
+    // visit_counts, if given, holds one count per node id; the nodes this search visits are added to it, atomically,
+    // instead of to the shared counters set_visit_counting samples into
     DISKANN_DLLEXPORT void cached_beam_search(const T *query, const uint64_t k_search, const uint64_t l_search,
                                               uint64_t *res_ids, float *res_dists, const uint64_t beam_width,
                                               const bool use_filter, const LabelT &filter_label,
                                               const uint32_t io_limit, const bool use_reorder_data = false,
-                                              QueryStats *stats = nullptr);
+                                              QueryStats *stats = nullptr, uint32_t *visit_counts = nullptr);
 
     DISKANN_DLLEXPORT LabelT get_converted_label(const std::string &filter_label);
 
@@ -122,6 +162,12 @@ template <typename T, typename LabelT = uint32_t> class PQFlashIndex
                                                    uint32_t &num_total_labels);
     DISKANN_DLLEXPORT void generate_random_labels(std::vector<LabelT> &labels, const uint32_t num_labels,
                                                   const uint32_t nthreads);
+    // maps the compressed vectors file and points data into it
+    void map_pq_data(const std::string &pq_compressed_vectors, size_t &npts, size_t &nchunks);
+    // frees the node cache, so it can be loaded again
+    void release_cache();
+    // (re)initializes _node_visit_counter to a zero count per node, in node id order
+    void reset_node_visit_counter();
     void reset_stream_for_reading(std::basic_istream<char> &infile);
 
     // sector # on disk where node_id is present with in the graph part
@@ -182,6 +228,11 @@ template <typename T, typename LabelT = uint32_t> class PQFlashIndex
     // pq_tables = float* [[2^8 * [chunk_size]] * _n_chunks]
     uint8_t *data = nullptr;
     uint64_t _n_chunks;
+    // set if data points into a read-only mapping of the compressed vectors file instead of a heap array
+    bool _mmap_pq_data = false;
+    bool _prefetch_pq_data = false;
+    char *_pq_data_mapping = nullptr;
+    uint64_t _pq_data_mapping_len = 0;
     FixedChunkPQTable _pq_table;
 
     // distance comparator
@@ -213,6 +264,16 @@ template <typename T, typename LabelT = uint32_t> class PQFlashIndex
     T *_coord_cache_buf = nullptr;
     tsl::robin_map<uint32_t, T *> _coord_cache;
 
+    // the cached nodes in the order of the cache buffers
+    std::vector<uint32_t> _cached_node_list;
+
+    // sectors read from the SSD, admitted and evicted while serving; null if not set up
+    std::unique_ptr<NodeCache> _dynamic_cache;
+
+    // sampled visit counting while serving; 0 disables it
+    std::atomic<uint64_t> _visit_sample_period{0};
+    std::atomic<uint64_t> _visit_query_seq{0};
+
     // thread-specific scratch
     ConcurrentQueue<SSDThreadData<T> *> _thread_data;
     uint64_t _max_nthreads;
@@ -7,14 +7,20 @@
 #include <string>
 
 #include "common.h"
+#include "defaults.h"
 #include "distance.h"
+#include "hpdic_mcgi.h"
 
 namespace diskannpy
 {
 template <typename DT>
 void build_disk_index(diskann::Metric metric, const std::string &data_file_path, const std::string &index_prefix_path,
                       uint32_t complexity, uint32_t graph_degree, double final_index_ram_limit,
-                      double indexing_ram_budget, uint32_t num_threads, uint32_t pq_disk_bytes);
+                      double indexing_ram_budget, uint32_t num_threads, uint32_t pq_disk_bytes,
+                      const std::string &filter_labels_file, const std::string &universal_label,
+                      uint32_t filter_complexity, diskann::MCGIMode mcgi_mode, const std::string &lid_file_path,
+                      const py::array_t<float, py::array::c_style | py::array::forcecast> &lid_values, float alpha_min,
+                      float alpha_max, bool use_linear, float lid_avg, float lid_std, bool write_lid);
 
 template <typename DT, typename TagT = DynamicIdType, typename LabelT = filterT>
 void build_memory_index(diskann::Metric metric, const std::string &vector_bin_path,
@@ -22,6 +28,11 @@ void build_memory_index(diskann::Metric metric, const std::string &vector_bin_pa
                            float alpha, uint32_t num_threads, bool use_pq_build,
                            size_t num_pq_bytes, bool use_opq, bool use_tags = false,
                            const std::string& filter_labels_file = "", const std::string& universal_label = "",
-                           uint32_t filter_complexity = 0);
+                           uint32_t filter_complexity = 0, diskann::MCGIMode mcgi_mode = diskann::MCGIMode::OFF,
+                           const std::string &lid_file_path = "",
+                           const py::array_t<float, py::array::c_style | py::array::forcecast> &lid_values = {},
+                           float alpha_min = diskann::defaults::MCGI_ALPHA_MIN,
+                           float alpha_max = diskann::defaults::MCGI_ALPHA_MAX, bool use_linear = false,
+                           float lid_avg = 0.0f, float lid_std = 1.0f, bool write_lid = false);
 
 }
@@ -3,6 +3,7 @@
 
 #pragma once
 
+#include <stdexcept>
 #include <stdint.h>
 #include <utility>
 
@@ -21,4 +22,17 @@ typedef uint32_t DynamicIdType;
 
 template <class IdType> using NeighborsAndDistances = std::pair<py::array_t<IdType>, py::array_t<float>>;
 
+// batch_search writes straight into caller provided (num_queries, knn) arrays instead of allocating its own
+template <class IdType>
+inline void check_batch_output(const py::array_t<IdType> &ids, const py::array_t<float> &dists,
+                               const uint64_t num_queries, const uint64_t knn)
+{
+    auto fits = [&](const py::array &a) {
+        return a.ndim() == 2 && (uint64_t)a.shape(0) == num_queries && (uint64_t)a.shape(1) == knn &&
+               (a.flags() & py::array::c_style);
+    };
+    if (!fits(ids) || !fits(dists))
+        throw std::runtime_error("ids and dists must be C-contiguous arrays of shape (num_queries, knn)");
+}
+
 }; // namespace diskannpy
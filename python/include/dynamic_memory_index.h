@@ -39,7 +39,8 @@ class DynamicMemoryIndex
                                       uint64_t complexity);
     NeighborsAndDistances<DynamicIdType> batch_search(py::array_t<DT, py::array::c_style | py::array::forcecast> &queries,
                                             uint64_t num_queries, uint64_t knn, uint64_t complexity,
-                                            uint32_t num_threads);
+                                            uint32_t num_threads, py::array_t<DynamicIdType> &ids,
+                                            py::array_t<float> &dists);
     void consolidate_delete();
     size_t num_points();
 
@@ -4,7 +4,9 @@
 #pragma once
 
 #include <cstdint>
+#include <shared_mutex>
 #include <string>
+#include <tuple>
 
 #include <pybind11/pybind11.h>
 #include <pybind11/numpy.h>
@@ -29,25 +31,67 @@ typedef WindowsAlignedFileReader PlatformSpecificAlignedFileReader;
 typedef LinuxAlignedFileReader PlatformSpecificAlignedFileReader;
 #endif
 
+typedef py::array_t<filterT, py::array::c_style | py::array::forcecast> FilterArray;
+
 template <typename DT> class StaticDiskIndex
 {
   public:
     StaticDiskIndex(diskann::Metric metric, const std::string &index_path_prefix, uint32_t num_threads,
-                    size_t num_nodes_to_cache, uint32_t cache_mechanism);
+                    size_t num_nodes_to_cache, uint32_t cache_mechanism, const std::string &cache_snapshot_path,
+                    bool mmap_pq_data, bool prefetch_pq_data);
 
     void cache_bfs_levels(size_t num_nodes_to_cache);
 
     void cache_sample_paths(size_t num_nodes_to_cache, const std::string &warmup_query_file, uint32_t num_threads);
 
+    void save_cache_snapshot(const std::string &cache_snapshot_path, bool with_contents);
+
+    void set_visit_counting(uint64_t sample_period);
+
+    py::array_t<uint32_t> visit_counts(bool reset);
+
+    py::array_t<uint32_t> count_visits(py::array_t<DT, py::array::c_style | py::array::forcecast> &queries,
+                                       uint64_t num_queries, uint64_t complexity, uint64_t beam_width,
+                                       uint32_t num_threads);
+
+    uint64_t cache_bytes_per_node();
+
+    uint64_t num_points();
+
+    void load_cache_list(py::array_t<uint32_t, py::array::c_style | py::array::forcecast> &node_ids);
+
+    void set_dynamic_cache(uint64_t capacity_bytes);
+
+    py::dict dynamic_cache_stats(bool reset);
+
     NeighborsAndDistances<StaticIdType> search(py::array_t<DT, py::array::c_style | py::array::forcecast> &query,
-                                               uint64_t knn, uint64_t complexity, uint64_t beam_width);
+                                               uint64_t knn, uint64_t complexity, uint64_t beam_width,
+                                               FilterArray &filters, py::array_t<diskann::QueryStats> &stats);
 
     NeighborsAndDistances<StaticIdType> batch_search(
         py::array_t<DT, py::array::c_style | py::array::forcecast> &queries, uint64_t num_queries, uint64_t knn,
-        uint64_t complexity, uint64_t beam_width, uint32_t num_threads);
+        uint64_t complexity, uint64_t beam_width, uint32_t num_threads, py::array_t<StaticIdType> &ids,
+        py::array_t<float> &dists, FilterArray &filters, py::array_t<diskann::QueryStats> &stats);
+
+    NeighborsAndDistances<StaticIdType> range_search(
+        py::array_t<DT, py::array::c_style | py::array::forcecast> &query, double radius, uint64_t min_complexity,
+        uint64_t max_complexity, uint64_t beam_width);
+
+    std::tuple<py::array_t<uint64_t>, py::array_t<StaticIdType>, py::array_t<float>> batch_range_search(
+        py::array_t<DT, py::array::c_style | py::array::forcecast> &queries, uint64_t num_queries, double radius,
+        uint64_t min_complexity, uint64_t max_complexity, uint64_t beam_width, uint32_t num_threads);
 
   private:
+    // stats is either empty, meaning they are not collected, or holds one zeroed record per query
+    static diskann::QueryStats *stats_buffer(py::array_t<diskann::QueryStats> &stats, uint64_t num_queries);
+
+    // filters is either empty, for unfiltered search, or holds one label per query
+    static const filterT *filters_buffer(const FilterArray &filters, uint64_t num_queries);
+
+    // searches share the node cache, replacing it is exclusive
+    std::shared_mutex _cache_lock;
     std::shared_ptr<AlignedFileReader> _reader;
     diskann::PQFlashIndex<DT> _index;
+    size_t _num_nodes_to_cache;
 };
 } // namespace diskannpy
@@ -32,7 +32,7 @@ template <typename DT> class StaticMemoryIndex
 
     NeighborsAndDistances<StaticIdType> batch_search(
         py::array_t<DT, py::array::c_style | py::array::forcecast> &queries, uint64_t num_queries, uint64_t knn,
-        uint64_t complexity, uint32_t num_threads);
+        uint64_t complexity, uint32_t num_threads, py::array_t<StaticIdType> &ids, py::array_t<float> &dists);
 
   private:
     diskann::Index<DT, StaticIdType, filterT> _index;
@@ -18,15 +18,21 @@ When reading the `diskannpy` code we refer to the type aliases, though `pdoc` he
 - `StaticMemoryIndex` - for indices that can fully fit in memory and won't be changed during the search operations
 - `StaticDiskIndex` - for indices that cannot fully fit in memory, thus relying on disk IO to search, and also won't be changed during search operations
 - `DynamicMemoryIndex` - for indices that can fully fit in memory and will be mutated via insert/deletion operations as well as search operations
+- `MicroBatcher` - gathers individually arriving queries into latency bounded `StaticDiskIndex.batch_search` calls
 
 ## Parameter Defaults
 - `diskannpy.defaults` - Default values exported from the C++ extension for Python users
 
 ## Parameter and Response Type Aliases
 - `DistanceMetric` - What distance metrics does `diskannpy` support?
+- `MCGIMode` - Which adaptive-alpha (MCGI) build modes does `diskannpy` support?
+- `MCGIMapping` - How is a node's LID mapped onto its pruning alpha?
 - `VectorDType` - What vector datatypes does `diskannpy` support?
 - `QueryResponse` - What can I expect as a response to my search?
 - `QueryResponseBatch` - What can I expect as a response to my batch search?
+- `QueryResponseWithStats` - What can I expect as a response to my search with `return_stats=True`?
+- `QueryResponseBatchWithStats` - What can I expect as a response to my batch search with `return_stats=True`?
+- `RangeQueryResponseBatch` - What can I expect as a response to my batch range search?
 - `VectorIdentifier` - What types do `diskannpy` support as vector identifiers?
 - `VectorIdentifierBatch` - A batch of identifiers of the exact same type. The type can change, but they must **all** change.
 - `VectorLike` - How does a vector look to `diskannpy`, to be inserted or searched with.
@@ -39,7 +45,26 @@ When reading the `diskannpy` code we refer to the type aliases, though `pdoc` he
 - `vectors_metadata_from_file` - Reads metadata stored in a DiskANN vector bin file without reading the entire file
 - `tags_to_file` - Turns a 1 dimensional `numpy.typing.NDArray[VectorIdentifier]` into a DiskANN tags bin file.
 - `tags_from_file` - Reads a DiskANN tags bin file representing stored tags into a numpy ndarray.
+- `gen_random_slice` - Writes a seeded random sample of a DiskANN vector bin file, with the ids of the sampled points.
 - `valid_dtype` - Checks if a given vector dtype is supported by `diskannpy`
+- `compute_lid` - Computes the exact per-point LID of a DiskANN vector bin file out-of-core, for MCGI builds.
+- `compute_approximate_lid` - Per-point LID against a random reference sample, for files too large for `compute_lid`.
+- `compute_lid_from_disk_index` - Per-node LID from the neighbor lists of a built disk index, in one sequential pass.
+- `lid_from_distances` - Levina-Bickel LID estimate from each point's sorted k nearest neighbor distances.
+- `ArtifactCache` - Content addressed cache of LID files and PQ artifacts shared across builds and experiments.
+- `query_stats_dtype` - The numpy record layout of per query disk search statistics.
+- `summarize_query_stats` - Means and percentiles of per query disk search statistics.
+- `SweepSpec` - A declarative benchmark sweep: the disk indices to build and the searches to run on each.
+- `SweepRunner` - Runs a `SweepSpec`, keeping each index loaded across its searches, and records one JSON line per search.
+- `ground_truth_from_file` - Reads the neighbor identifiers of a DiskANN ground truth file.
+- `knn_recall` - k-recall@k of search results against ground truth.
+- `compute_ground_truth` - Exact k nearest neighbors of a query file in a base file, written as a DiskANN ground truth file.
+- `NoiseControl` - Warmup, repeats, page cache drops, thread pinning and NUMA binding of the searches of a sweep.
+- `summarize_repeats` - Median, confidence interval and outlier runs of a measurement repeated over runs.
+- `ResultsStore` - SQLite database of search results with recall@QPS, Pareto frontier and MCGI speedup queries.
+- `JobScheduler` - Runs build and search jobs concurrently within CPU, RAM and SSD bandwidth limits, with a job ledger.
+- `SweepTuner` - Successive halving over random data slices to find a near optimal MCGI build configuration of a sweep.
+- `TuningResult` - The configuration a `SweepTuner` found, the builds it took and its `TuningRung` rounds.
 """
 
 from typing import Any, Literal, NamedTuple, Type, Union
@@ -49,6 +74,14 @@ from numpy import typing as npt
 
 DistanceMetric = Literal["l2", "mips", "cosine"]
 """ Type alias for one of {"l2", "mips", "cosine"} """
+MCGIMode = Literal["off", "mcgi", "amcgi"]
+"""
+Type alias for one of {"off", "mcgi", "amcgi"}. `off` builds a plain Vamana graph with a fixed alpha, `mcgi` derives
+each node's alpha from a precomputed per-node LID table, and `amcgi` estimates each node's LID inline from its
+candidate pool during the build
+"""
+MCGIMapping = Literal["sigmoid", "linear"]
+""" Type alias for one of {"sigmoid", "linear"} """
 VectorDType = Union[Type[np.float32], Type[np.int8], Type[np.uint8]]
 """ Type alias for one of {`numpy.float32`, `numpy.int8`, `numpy.uint8`} """
 VectorLike = npt.NDArray[VectorDType]
@@ -98,20 +131,87 @@ class QueryResponseBatch(NamedTuple):
     """
 
 
+class QueryResponseWithStats(NamedTuple):
+    """
+    `QueryResponse` plus the statistics of the query, returned by `StaticDiskIndex.search` with `return_stats=True`
+    """
+
+    identifiers: npt.NDArray[VectorIdentifier]
+    """ Same as `QueryResponse.identifiers` """
+    distances: npt.NDArray[np.float32]
+    """ Same as `QueryResponse.distances` """
+    stats: np.void
+    """ A single `query_stats_dtype` record """
+
+
+class QueryResponseBatchWithStats(NamedTuple):
+    """
+    `QueryResponseBatch` plus per query statistics, returned by `StaticDiskIndex.batch_search` with
+    `return_stats=True`
+    """
+
+    identifiers: npt.NDArray[VectorIdentifier]
+    """ Same as `QueryResponseBatch.identifiers` """
+    distances: npt.NDArray[np.float32]
+    """ Same as `QueryResponseBatch.distances` """
+    stats: npt.NDArray
+    """ A 1d array of `query_stats_dtype` records, one per query, e.g. for `summarize_query_stats` """
+
+
+class RangeQueryResponseBatch(NamedTuple):
+    """
+    Tuple with three values, offsets, identifiers and distances, holding a variable number of results per query in
+    compressed sparse row layout: the results of query `i` are `identifiers[offsets[i]:offsets[i + 1]]` and
+    `distances[offsets[i]:offsets[i + 1]]`, sorted by distance
+    """
+
+    offsets: npt.NDArray[np.uint64]
+    """ A `numpy.typing.NDArray[numpy.uint64]` of length `number_of_queries + 1`, starting at 0 """
+    identifiers: npt.NDArray[VectorIdentifier]
+    """ A `numpy.typing.NDArray[VectorIdentifier]` of the results of all queries, 1 dimensional """
+    distances: npt.NDArray[np.float32]
+    """ A `numpy.typing.NDArray[numpy.float32]` of the distances to the results of all queries, 1 dimensional """
+
+
 from . import defaults
+from ._artifact_cache import ArtifactCache
+from ._benchmark import (
+    NoiseControl,
+    SweepBuild,
+    SweepDataset,
+    SweepRunner,
+    SweepSearch,
+    SweepSpec,
+    compute_ground_truth,
+    ground_truth_from_file,
+    knn_recall,
+    summarize_repeats,
+)
 from ._builder import build_disk_index, build_memory_index
 from ._common import valid_dtype
 from ._dynamic_memory_index import DynamicMemoryIndex
 from ._files import (
     Metadata,
+    gen_random_slice,
     tags_from_file,
     tags_to_file,
     vectors_from_file,
     vectors_metadata_from_file,
     vectors_to_file,
 )
+from ._lid import (
+    compute_approximate_lid,
+    compute_lid,
+    compute_lid_from_disk_index,
+    lid_from_distances,
+)
+from ._micro_batcher import MicroBatcher
+from ._query_stats import query_stats_dtype, summarize_query_stats
+from ._results_store import ResultsStore
+from ._scheduler import JobScheduler
 from ._static_disk_index import StaticDiskIndex
 from ._static_memory_index import StaticMemoryIndex
+from ._tuner import SweepTuner, TuningResult, TuningRung
 
 __all__ = [
     "build_disk_index",
@@ -119,11 +219,17 @@ __all__ = [
     "StaticDiskIndex",
     "StaticMemoryIndex",
     "DynamicMemoryIndex",
+    "MicroBatcher",
     "defaults",
     "DistanceMetric",
+    "MCGIMode",
+    "MCGIMapping",
     "VectorDType",
     "QueryResponse",
     "QueryResponseBatch",
+    "QueryResponseWithStats",
+    "QueryResponseBatchWithStats",
+    "RangeQueryResponseBatch",
     "VectorIdentifier",
     "VectorIdentifierBatch",
     "VectorLike",
@@ -134,5 +240,28 @@ __all__ = [
     "vectors_from_file",
     "tags_to_file",
     "tags_from_file",
+    "gen_random_slice",
     "valid_dtype",
+    "compute_lid",
+    "compute_approximate_lid",
+    "compute_lid_from_disk_index",
+    "lid_from_distances",
+    "ArtifactCache",
+    "query_stats_dtype",
+    "summarize_query_stats",
+    "SweepDataset",
+    "SweepBuild",
+    "SweepSearch",
+    "SweepSpec",
+    "SweepRunner",
+    "ground_truth_from_file",
+    "knn_recall",
+    "compute_ground_truth",
+    "NoiseControl",
+    "summarize_repeats",
+    "ResultsStore",
+    "JobScheduler",
+    "SweepTuner",
+    "TuningResult",
+    "TuningRung",
 ]
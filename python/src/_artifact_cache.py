@@ -0,0 +1,283 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict, Literal, Optional
+
+from . import DistanceMetric, VectorDType
+from ._common import _assert, _assert_existing_file, _assert_is_positive_uint32, valid_dtype
+from ._files import vectors_metadata_from_file
+from ._lid import compute_approximate_lid, compute_lid
+
+__ALL__ = ["ArtifactCache"]
+
+LidEstimator = Literal["exact", "approximate"]
+
+_FINGERPRINT_WINDOWS = 64
+_FINGERPRINT_WINDOW_LEN = 1 << 20
+_PQ_SUFFIXES = ("_pq_pivots.bin", "_pq_compressed.bin")
+
+
+def _file_fingerprint(path: str) -> str:
+    # header, size and 64 evenly spaced 1 MiB windows; small files are hashed whole
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as fh:
+        if size <= _FINGERPRINT_WINDOWS * _FINGERPRINT_WINDOW_LEN:
+            for chunk in iter(lambda: fh.read(_FINGERPRINT_WINDOW_LEN), b""):
+                digest.update(chunk)
+        else:
+            stride = (size - _FINGERPRINT_WINDOW_LEN) // (_FINGERPRINT_WINDOWS - 1)
+            for window in range(_FINGERPRINT_WINDOWS):
+                fh.seek(window * stride)
+                digest.update(fh.read(_FINGERPRINT_WINDOW_LEN))
+    return digest.hexdigest()
+
+
+def _entry_name(key: Dict[str, Any]) -> str:
+    return hashlib.blake2b(json.dumps(key, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def _copy_into(source: str, destination: str):
+    # never hard link: builds rewrite these files in place, which would corrupt the cache entry
+    tmp = destination + ".partial"
+    shutil.copyfile(source, tmp)
+    os.replace(tmp, destination)
+
+
+class ArtifactCache:
+    """
+    A content addressed cache for the artifacts that only depend on a base vector file, so that baseline and MCGI
+    builds and every sweep over the same data reuse them instead of recomputing.
+
+    - LID files, keyed by (base file fingerprint, k, estimator and its parameters).
+    - PQ pivots and compressed vectors, keyed by (base file fingerprint, pq bytes, distance metric, seed).
+
+    Base files are identified by content, not path, so copies and moved files still hit. The fingerprint hashes the
+    file size and 64 evenly spaced 1 MiB windows (whole file below 64 MiB); it is memoized per path, size and
+    modification time in `fingerprints.json`.
+
+    Entries are written under a temporary name and renamed into place when complete, so an interrupted run never
+    leaves a partial entry that a later run would pick up.
+    """
+
+    def __init__(self, cache_directory: str):
+        """
+        ### Parameters
+        - **cache_directory**: Directory holding the cache. Created if it does not exist. It can be shared by any
+          number of experiments.
+        """
+        _assert(cache_directory is not None and cache_directory != "", "cache_directory cannot be None or empty")
+        self._directory = cache_directory
+        os.makedirs(os.path.join(cache_directory, "lid"), exist_ok=True)
+        os.makedirs(os.path.join(cache_directory, "pq"), exist_ok=True)
+        self._fingerprints_path = os.path.join(cache_directory, "fingerprints.json")
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def fingerprint(self, data: str) -> str:
+        """
+        The content fingerprint of a file.
+
+        ### Parameters
+        - **data**: A `str` representing a path to a file, typically a DiskANN vector bin file.
+
+        ### Returns
+        A hex digest `str`.
+        """
+        _assert_existing_file(data, "data")
+        path = os.path.abspath(data)
+        stat = os.stat(path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        known = {}
+        if os.path.exists(self._fingerprints_path):
+            with open(self._fingerprints_path) as fh:
+                known = json.load(fh)
+        if path in known and known[path]["stamp"] == stamp:
+            return known[path]["fingerprint"]
+        fingerprint = _file_fingerprint(path)
+        known[path] = {"stamp": stamp, "fingerprint": fingerprint}
+        tmp = self._fingerprints_path + f".{os.getpid()}"
+        with open(tmp, "w") as fh:
+            json.dump(known, fh, indent=1)
+        os.replace(tmp, self._fingerprints_path)
+        return fingerprint
+
+    def _lid_key(self, data: str, k: int, estimator: LidEstimator, sample_size: int, seed: int) -> Dict[str, Any]:
+        _assert(estimator in ("exact", "approximate"), "estimator must be one of 'exact' or 'approximate'")
+        key: Dict[str, Any] = {"artifact": "lid", "base": self.fingerprint(data), "k": k, "estimator": estimator}
+        if estimator == "approximate":
+            key["sample_size"] = min(sample_size, int(vectors_metadata_from_file(data)[0]))
+            key["seed"] = seed
+        return key
+
+    def lid_path(
+        self,
+        data: str,
+        k: int = 20,
+        estimator: LidEstimator = "exact",
+        sample_size: int = 1_000_000,
+        seed: int = 0,
+    ) -> Optional[str]:
+        """
+        Looks up a cached LID file without computing anything.
+
+        ### Parameters
+        Same as `ArtifactCache.lid`.
+
+        ### Returns
+        The path of the cached LID file, or `None` on a miss.
+        """
+        key = self._lid_key(data, k, estimator, sample_size, seed)
+        path = os.path.join(self._directory, "lid", _entry_name(key) + "_lid.bin")
+        return path if os.path.exists(path) else None
+
+    def lid(
+        self,
+        data: str,
+        vector_dtype: VectorDType,
+        k: int = 20,
+        estimator: LidEstimator = "exact",
+        sample_size: int = 1_000_000,
+        seed: int = 0,
+        num_workers: int = 1,
+    ) -> str:
+        """
+        Returns the LID file for a base vector file, computing it with `compute_lid` or `compute_approximate_lid`
+        only on a miss. An interrupted computation resumes on the next call.
+
+        ### Parameters
+        - **data**: A `str` representing a path to a DiskANN vector bin file.
+        - **vector_dtype**: The vector dtype of the file, one of {`numpy.float32`, `numpy.uint8`, `numpy.int8`}.
+        - **k**: The number of nearest neighbors the estimate is based on. Default is 20.
+        - **estimator**: `"exact"` for `compute_lid`, `"approximate"` for `compute_approximate_lid`. Default is
+          `"exact"`.
+        - **sample_size**: Reference sample size, only part of the key for the approximate estimator. Default is
+          1,000,000.
+        - **seed**: Sample seed, only part of the key for the approximate estimator. Default is 0.
+        - **num_workers**: Number of worker processes used on a miss. Not part of the key. Default is 1.
+
+        ### Returns
+        The path of the cached LID file, usable as `build_disk_index(..., lid=...)` or `--lid_path`.
+        """
+        vector_dtype = valid_dtype(vector_dtype)
+        key = self._lid_key(data, k, estimator, sample_size, seed)
+        name = _entry_name(key)
+        path = os.path.join(self._directory, "lid", name + "_lid.bin")
+        if os.path.exists(path):
+            return path
+        partial = path + ".partial"
+        if estimator == "exact":
+            compute_lid(data, vector_dtype, partial, k=k, num_workers=num_workers)
+        else:
+            compute_approximate_lid(
+                data, vector_dtype, partial, k=k, sample_size=sample_size, seed=seed, num_workers=num_workers
+            )
+        with open(os.path.join(self._directory, "lid", name + ".json"), "w") as fh:
+            json.dump(dict(key, source=os.path.abspath(data)), fh, indent=1)
+        os.replace(partial, path)
+        return path
+
+    def _pq_entry(self, data: str, pq_bytes: int, distance_metric: DistanceMetric, seed: int) -> str:
+        _assert_is_positive_uint32(pq_bytes, "pq_bytes")
+        _assert(distance_metric in ("l2", "mips", "cosine"), "distance_metric must be one of 'l2', 'mips', 'cosine'")
+        key = {
+            "artifact": "pq",
+            "base": self.fingerprint(data),
+            "pq_bytes": pq_bytes,
+            "distance_metric": distance_metric,
+            "seed": seed,
+        }
+        return os.path.join(self._directory, "pq", _entry_name(key))
+
+    def pq_codebook_prefix(
+        self, data: str, pq_bytes: int, distance_metric: DistanceMetric = "l2", seed: int = 0
+    ) -> Optional[str]:
+        """
+        Looks up cached PQ artifacts.
+
+        ### Parameters
+        - **data**: A `str` representing a path to the base vector bin file the PQ artifacts were trained on.
+        - **pq_bytes**: Bytes per compressed vector, i.e. the number of PQ chunks.
+        - **distance_metric**: The distance metric the index is built with. Default is "l2".
+        - **seed**: Distinguishes independently trained codebooks for the same data. PQ training itself is not
+          seeded, so this is a label, not a guarantee of reproducibility. Default is 0.
+
+        ### Returns
+        On a hit, a prefix to pass as `build_disk_index --codebook_prefix`: the build then uses the cached pivots
+        and copies the cached compressed vectors instead of training and encoding. `None` on a miss.
+        """
+        entry = self._pq_entry(data, pq_bytes, distance_metric, seed)
+        # the entry directory is created last, so its presence means the entry is complete
+        return entry if os.path.isdir(entry) else None
+
+    def store_pq(
+        self, data: str, index_prefix: str, distance_metric: DistanceMetric = "l2", seed: int = 0
+    ) -> str:
+        """
+        Adds the PQ pivots and compressed vectors of a built index to the cache, unless already present.
+
+        ### Parameters
+        - **data**: A `str` representing a path to the base vector bin file the index was built from.
+        - **index_prefix**: The index path prefix; `{index_prefix}_pq_pivots.bin` and
+          `{index_prefix}_pq_compressed.bin` must exist. The number of pq bytes is read from the compressed file.
+        - **distance_metric**: The distance metric the index was built with. Default is "l2".
+        - **seed**: See `ArtifactCache.pq_codebook_prefix`. Default is 0.
+
+        ### Returns
+        The codebook prefix of the cache entry.
+        """
+        for suffix in _PQ_SUFFIXES:
+            _assert_existing_file(index_prefix + suffix, "index_prefix")
+        num_points, pq_bytes = vectors_metadata_from_file(index_prefix + "_pq_compressed.bin")
+        _assert(
+            num_points == vectors_metadata_from_file(data)[0],
+            "the compressed vectors do not have one entry per point of data",
+        )
+        entry = self._pq_entry(data, int(pq_bytes), distance_metric, seed)
+        if os.path.isdir(entry):
+            return entry
+        for suffix in _PQ_SUFFIXES:
+            _copy_into(index_prefix + suffix, entry + suffix)
+        os.makedirs(entry, exist_ok=True)
+        with open(os.path.join(entry, "key.json"), "w") as fh:
+            json.dump(
+                {"pq_bytes": int(pq_bytes), "distance_metric": distance_metric, "seed": seed,
+                 "base": self.fingerprint(data), "source": os.path.abspath(data)},
+                fh,
+                indent=1,
+            )
+        return entry
+
+    def restore_pq(
+        self,
+        data: str,
+        pq_bytes: int,
+        index_prefix: str,
+        distance_metric: DistanceMetric = "l2",
+        seed: int = 0,
+    ) -> bool:
+        """
+        Places cached PQ pivots and compressed vectors at `{index_prefix}_pq_pivots.bin` and
+        `{index_prefix}_pq_compressed.bin`, where search expects them. The standard disk build given the codebook
+        prefix already does this itself; MCGI builds that run in memory (`--use_mcgi` without
+        `--mcgi_merged_build`) write no PQ files, and indices assembled by other means need this.
+
+        ### Parameters
+        Same as `ArtifactCache.pq_codebook_prefix`, plus
+        - **index_prefix**: The index path prefix to place the files at.
+
+        ### Returns
+        Whether the artifacts were cached.
+        """
+        entry = self.pq_codebook_prefix(data, pq_bytes, distance_metric, seed)
+        if entry is None:
+            return False
+        for suffix in _PQ_SUFFIXES:
+            _copy_into(entry + suffix, index_prefix + suffix)
+        return True
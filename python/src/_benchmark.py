@@ -0,0 +1,618 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import itertools
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from . import DistanceMetric, MCGIMode, VectorDType
+from . import _diskannpy as _native_dap
+from ._artifact_cache import ArtifactCache
+from ._builder import build_disk_index
+from ._common import _assert, _assert_existing_file, _assert_is_positive_uint32
+from ._files import vectors_from_file, vectors_metadata_from_file
+from ._query_stats import summarize_query_stats
+from ._scheduler import JobScheduler, JobState
+from ._static_disk_index import StaticDiskIndex
+
+__ALL__ = [
+    "SweepDataset",
+    "SweepBuild",
+    "SweepSearch",
+    "SweepSpec",
+    "SweepRunner",
+    "NoiseControl",
+    "compute_ground_truth",
+    "ground_truth_from_file",
+    "knn_recall",
+    "summarize_repeats",
+]
+
+_DTYPES = {"float": np.float32, "float32": np.float32, "uint8": np.uint8, "int8": np.int8}
+_GROUND_TRUTH_QUERY_BLOCK = 1024
+_GROUND_TRUTH_BASE_BLOCK = 16384
+
+
+class SweepDataset(NamedTuple):
+    """A base vector file with its queries and their ground truth."""
+
+    name: str
+    base: str
+    queries: str
+    ground_truth: str
+    vector_dtype: VectorDType = np.float32
+    distance_metric: DistanceMetric = "l2"
+
+
+class SweepBuild(NamedTuple):
+    """One disk index of a sweep. `alpha_min` and `alpha_max` are `None` for the baseline, built without MCGI."""
+
+    dataset: str
+    graph_degree: int
+    build_complexity: int
+    alpha_min: Optional[float] = None
+    alpha_max: Optional[float] = None
+
+    @property
+    def variant(self) -> str:
+        return "baseline" if self.alpha_min is None else "mcgi"
+
+    @property
+    def name(self) -> str:
+        """The index directory name, as the experiment scripts name it."""
+        prefix = f"{self.dataset}_R{self.graph_degree}_L{self.build_complexity}"
+        return f"{prefix}_baseline" if self.alpha_min is None else f"{prefix}_min{self.alpha_min}_max{self.alpha_max}"
+
+
+class SweepSearch(NamedTuple):
+    """One search of a sweep. Configs sharing `num_threads` and `num_nodes_to_cache` share one loaded index."""
+
+    search_complexity: int
+    beam_width: int
+    num_threads: int
+    num_nodes_to_cache: int
+
+
+class NoiseControl(NamedTuple):
+    """
+    How the searches of a sweep are measured. Single runs are not trustworthy on a busy machine, so with `repeats`
+    above 1 every record reports the median over the runs, with confidence intervals, and flags outlier runs.
+
+    - **warmup_queries**: Unmeasured queries searched before the runs, cycling through the queries, with the measured
+      parameters. Default is 0.
+    - **repeats**: Measured runs of every search. Default is 1.
+    - **drop_caches**: Drop the page cache before every run; needs root. Default is `False`.
+    - **pin_threads**: Pin each search thread to its own core. Default is `False`.
+    - **numa_node**: Run on the CPUs of this NUMA node and allocate the indices from its memory. Default is `None`.
+    """
+
+    warmup_queries: int = 0
+    repeats: int = 1
+    drop_caches: bool = False
+    pin_threads: bool = False
+    numa_node: Optional[int] = None
+
+
+def summarize_repeats(values: Sequence[float]) -> Dict[str, Any]:
+    """
+    Summarizes one measurement, e.g. the QPS, over repeated runs, as `search_disk_index --repeats` does.
+
+    ### Returns
+    A dict with the `median`, `ci_low` and `ci_high`, a distribution free 95% confidence interval of the median from
+    order statistics (the range below 6 runs), and `outliers`, the indices of the runs more than 3 scaled median
+    absolute deviations away from the median.
+    """
+    _assert(len(values) > 0, "values must not be empty")
+    runs = np.asarray(values, dtype=np.float64)
+    ordered = np.sort(runs)
+    n = runs.shape[0]
+    median = float(np.median(runs))
+    # the largest j with P(Binomial(n, 1/2) < j) <= 2.5%
+    j = 1
+    below = term = 0.5**n
+    for i in range(1, n // 2):
+        term *= (n - i + 1) / i
+        if below + term > 0.025:
+            break
+        below += term
+        j = i + 1
+    deviations = np.abs(runs - median)
+    scaled_mad = 1.4826 * float(np.median(deviations))
+    outliers = deviations > 3 * scaled_mad if scaled_mad > 0 else deviations > 0
+    return dict(
+        median=median,
+        ci_low=float(ordered[j - 1]),
+        ci_high=float(ordered[n - j]),
+        outliers=[int(run) for run in np.flatnonzero(outliers)],
+    )
+
+
+def ground_truth_from_file(ground_truth_file: str) -> npt.NDArray[np.uint32]:
+    """
+    Reads the neighbor identifiers of a DiskANN ground truth file, as written by `compute_groundtruth`: the number
+    of queries and neighbors per query as two int32, then the identifiers, then the distances.
+
+    ### Returns
+    A 2d `numpy.uint32` array of shape `(number_of_queries, number_of_neighbors)`.
+    """
+    _assert_existing_file(ground_truth_file, "ground_truth_file")
+    num_queries, num_neighbors = vectors_metadata_from_file(ground_truth_file)
+    ids = np.fromfile(ground_truth_file, dtype=np.uint32, offset=8, count=int(num_queries) * int(num_neighbors))
+    return ids.reshape(int(num_queries), int(num_neighbors))
+
+
+def compute_ground_truth(
+    base_file: str,
+    queries_file: str,
+    ground_truth_file: str,
+    k: int,
+    vector_dtype: VectorDType = np.float32,
+    distance_metric: DistanceMetric = "l2",
+):
+    """
+    Computes the exact `k` nearest neighbors of every query in a base vector file, like `compute_groundtruth`, and
+    writes them in its format (see `ground_truth_from_file`): squared L2 distances for "l2", negated inner products
+    for "mips". The base is streamed from a memory map, one block of queries and base vectors at a time, which suits
+    the slices of a data set; use `compute_groundtruth` for whole billion scale data sets.
+    """
+    _assert_existing_file(base_file, "base_file")
+    _assert_existing_file(queries_file, "queries_file")
+    _assert_is_positive_uint32(k, "k")
+    _assert(distance_metric in ("l2", "mips"), "distance_metric must be one of 'l2' or 'mips'")
+    base = vectors_from_file(base_file, vector_dtype, use_memmap=True)
+    queries = vectors_from_file(queries_file, vector_dtype).astype(np.float32)
+    _assert(base.shape[0] >= k, "base_file holds fewer than k vectors")
+    ids = np.empty((queries.shape[0], k), dtype=np.uint32)
+    distances = np.empty((queries.shape[0], k), dtype=np.float32)
+    for query_start in range(0, queries.shape[0], _GROUND_TRUTH_QUERY_BLOCK):
+        block_queries = queries[query_start : query_start + _GROUND_TRUTH_QUERY_BLOCK]
+        best_distances = np.full((block_queries.shape[0], k), np.inf, dtype=np.float32)
+        best_ids = np.zeros((block_queries.shape[0], k), dtype=np.uint32)
+        for base_start in range(0, base.shape[0], _GROUND_TRUTH_BASE_BLOCK):
+            block = np.asarray(base[base_start : base_start + _GROUND_TRUTH_BASE_BLOCK], dtype=np.float32)
+            block_distances = block_queries @ block.T
+            block_distances *= -1 if distance_metric == "mips" else -2
+            if distance_metric == "l2":
+                block_distances += np.einsum("ij,ij->i", block_queries, block_queries)[:, None]
+                block_distances += np.einsum("ij,ij->i", block, block)[None, :]
+            block_ids = np.arange(base_start, base_start + block.shape[0], dtype=np.uint32)
+            candidates = np.concatenate([best_distances, block_distances], axis=1)
+            candidate_ids = np.concatenate([best_ids, np.broadcast_to(block_ids, block_distances.shape)], axis=1)
+            top = np.argpartition(candidates, k - 1, axis=1)[:, :k]
+            best_distances = np.take_along_axis(candidates, top, axis=1)
+            best_ids = np.take_along_axis(candidate_ids, top, axis=1)
+        order = np.argsort(best_distances, axis=1, kind="stable")
+        ids[query_start : query_start + block_queries.shape[0]] = np.take_along_axis(best_ids, order, axis=1)
+        distances[query_start : query_start + block_queries.shape[0]] = np.take_along_axis(
+            best_distances, order, axis=1
+        )
+    if distance_metric == "l2":
+        np.maximum(distances, 0, out=distances)
+    with open(ground_truth_file, "wb") as fh:
+        fh.write(np.array(ids.shape, dtype=np.int32).tobytes())
+        fh.write(ids.tobytes())
+        fh.write(distances.tobytes())
+
+
+def knn_recall(identifiers: np.ndarray, ground_truth: np.ndarray, k: int) -> float:
+    """
+    k-recall@k: the fraction of each query's k true nearest neighbors among its first k results, over all queries.
+    """
+    _assert(identifiers.shape[0] == ground_truth.shape[0], "identifiers and ground_truth differ in number of queries")
+    _assert(identifiers.shape[1] >= k and ground_truth.shape[1] >= k, "fewer than k results or true neighbors")
+    found = sum(np.intersect1d(identifiers[i, :k], ground_truth[i, :k]).shape[0] for i in range(identifiers.shape[0]))
+    return found / (identifiers.shape[0] * k)
+
+
+def _as_list(value: Any) -> list:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+class SweepSpec:
+    """
+    A declarative benchmark sweep over disk indices: the cross product of datasets, graph degrees, build complexities
+    and MCGI alpha ranges gives the indices to build, and the cross product of search complexities, beam widths,
+    thread counts and cache sizes the searches to run on each of them.
+
+    A spec is usually read from a JSON file with `SweepSpec.from_file`, whose keys are the constructor's parameters,
+    e.g. the grid of `full_scan.sh`:
+
+        {
+          "data_directory": "../data",
+          "datasets": ["sift", "glove", "gist"],
+          "graph_degrees": [32, 48, 64],
+          "build_complexities": [100],
+          "alpha_min": [1.0, 1.1],
+          "alpha_max": [1.1, 1.2, 1.3, 1.4, 1.5, 1.6, 1.7, 2.0],
+          "search_complexities": [50, 100, 150, 200],
+          "num_threads": [32]
+        }
+    """
+
+    def __init__(
+        self,
+        datasets: Sequence[SweepDataset],
+        graph_degrees: Sequence[int],
+        build_complexities: Sequence[int],
+        alpha_min: Sequence[float] = (),
+        alpha_max: Sequence[float] = (),
+        include_baseline: bool = True,
+        search_complexities: Sequence[int] = (50, 100, 150, 200),
+        beam_widths: Sequence[int] = (2,),
+        num_threads: Sequence[int] = (32,),
+        cache_sizes: Sequence[int] = (0,),
+        k_neighbors: int = 10,
+        mcgi_mode: MCGIMode = "mcgi",
+        search_memory_maximum: float = 0.1,
+        build_memory_maximum: float = 1.0,
+        build_threads: int = 16,
+        lid_k: int = 20,
+        noise_control: NoiseControl = NoiseControl(),
+    ):
+        """
+        ### Parameters
+        - **datasets**: The datasets to build indices on.
+        - **graph_degrees**: The graph degrees (R) to build with.
+        - **build_complexities**: The build complexities (L) to build with.
+        - **alpha_min**, **alpha_max**: MCGI alpha bounds; every pair with `alpha_min < alpha_max` is built. Default
+          is none, which only builds baselines.
+        - **include_baseline**: Also build each (dataset, R, L) without MCGI. Default is `True`.
+        - **search_complexities**: The search complexities (L) searched with. Default is (50, 100, 150, 200).
+        - **beam_widths**: The beam widths (W) searched with. Default is (2,).
+        - **num_threads**: The search thread counts. Default is (32,).
+        - **cache_sizes**: The numbers of nodes cached. Default is (0,).
+        - **k_neighbors**: K of the k-recall@k reported. Default is 10.
+        - **mcgi_mode**: The MCGI mode of the non baseline builds, "mcgi" or "amcgi". Default is "mcgi".
+        - **search_memory_maximum**, **build_memory_maximum**, **build_threads**: Passed to `build_disk_index`
+          (-B, -M and -T of `build_disk_index`). Default is 0.1, 1.0 and 16.
+        - **lid_k**: The number of neighbors the LID of MCGI builds is estimated from. Default is 20.
+        - **noise_control**: How searches are measured. Default is a single run without warmup.
+        """
+        _assert(len(datasets) > 0, "datasets must not be empty")
+        _assert(len({dataset.name for dataset in datasets}) == len(datasets), "dataset names must be unique")
+        for name, values in (
+            ("graph_degrees", graph_degrees),
+            ("build_complexities", build_complexities),
+            ("search_complexities", search_complexities),
+            ("beam_widths", beam_widths),
+            ("num_threads", num_threads),
+        ):
+            _assert(len(values) > 0, f"{name} must not be empty")
+            for value in values:
+                _assert_is_positive_uint32(value, name)
+        _assert(len(cache_sizes) > 0 and all(size >= 0 for size in cache_sizes), "cache_sizes must be >= 0")
+        _assert_is_positive_uint32(k_neighbors, "k_neighbors")
+        _assert(mcgi_mode in ("mcgi", "amcgi"), "mcgi_mode must be one of 'mcgi' or 'amcgi'")
+        _assert(noise_control.warmup_queries >= 0, "warmup_queries must be >= 0")
+        _assert_is_positive_uint32(noise_control.repeats, "repeats")
+        self.datasets = list(datasets)
+        self.graph_degrees = list(graph_degrees)
+        self.build_complexities = list(build_complexities)
+        self.alpha_ranges = [(lo, hi) for lo, hi in itertools.product(alpha_min, alpha_max) if lo < hi]
+        _assert(include_baseline or len(self.alpha_ranges) > 0, "the sweep builds no index")
+        self.include_baseline = include_baseline
+        self.search_complexities = list(search_complexities)
+        self.beam_widths = list(beam_widths)
+        self.num_threads = list(num_threads)
+        self.cache_sizes = list(cache_sizes)
+        self.k_neighbors = k_neighbors
+        self.mcgi_mode = mcgi_mode
+        self.search_memory_maximum = search_memory_maximum
+        self.build_memory_maximum = build_memory_maximum
+        self.build_threads = build_threads
+        self.lid_k = lid_k
+        self.noise_control = noise_control
+
+    @classmethod
+    def from_dict(cls, spec: Dict[str, Any], base_directory: str = ".") -> "SweepSpec":
+        """
+        Builds a spec from parsed JSON. Scalars are accepted wherever a list is expected.
+
+        A dataset is either an object with the fields of `SweepDataset` or just a name, which stands for
+        `{data_directory}/{name}/{name}_base.bin`, `_query.bin` and `_gt.bin`, the layout of `get_data.py`. Relative
+        paths are relative to `base_directory`. `noise_control` is an object with the fields of `NoiseControl`.
+        """
+        spec = dict(spec)
+        data_directory = os.path.join(base_directory, spec.pop("data_directory", "data"))
+        datasets = []
+        for entry in _as_list(spec.pop("datasets")):
+            if isinstance(entry, str):
+                prefix = os.path.join(data_directory, entry, entry)
+                entry = {"name": entry, "base": prefix + "_base.bin", "queries": prefix + "_query.bin",
+                         "ground_truth": prefix + "_gt.bin"}
+            entry = dict(entry)
+            for path in ("base", "queries", "ground_truth"):
+                entry[path] = os.path.join(base_directory, entry[path])
+            dtype = entry.get("vector_dtype", "float32")
+            _assert(dtype in _DTYPES, f"vector_dtype must be one of {sorted(_DTYPES)}")
+            entry["vector_dtype"] = _DTYPES[dtype]
+            datasets.append(SweepDataset(**entry))
+        scalars = ("include_baseline", "k_neighbors", "mcgi_mode", "search_memory_maximum", "build_memory_maximum",
+                   "build_threads", "lid_k")
+        noise_control = NoiseControl(**spec.pop("noise_control", {}))
+        unknown = set(spec) - set(scalars) - {"graph_degrees", "build_complexities", "alpha_min", "alpha_max",
+                                              "search_complexities", "beam_widths", "num_threads", "cache_sizes"}
+        _assert(not unknown, f"unknown sweep spec keys: {sorted(unknown)}")
+        kwargs = {key: value if key in scalars else _as_list(value) for key, value in spec.items()}
+        return cls(datasets=datasets, noise_control=noise_control, **kwargs)
+
+    @classmethod
+    def from_file(cls, spec_file: str) -> "SweepSpec":
+        """Reads a JSON spec; relative paths in it are relative to the spec file."""
+        _assert_existing_file(spec_file, "spec_file")
+        with open(spec_file) as fh:
+            spec = json.load(fh)
+        return cls.from_dict(spec, os.path.dirname(os.path.abspath(spec_file)))
+
+    def dataset(self, name: str) -> SweepDataset:
+        return next(dataset for dataset in self.datasets if dataset.name == name)
+
+    def builds(self) -> List[SweepBuild]:
+        """Every index of the sweep; each baseline comes before the MCGI builds sharing its dataset, R and L."""
+        ranges: List[Tuple[Optional[float], Optional[float]]] = [(None, None)] if self.include_baseline else []
+        ranges += self.alpha_ranges
+        return [
+            SweepBuild(dataset.name, graph_degree, complexity, alpha_min, alpha_max)
+            for dataset in self.datasets
+            for graph_degree in self.graph_degrees
+            for complexity in self.build_complexities
+            for alpha_min, alpha_max in ranges
+        ]
+
+    def searches(self) -> List[SweepSearch]:
+        """Every search run on each index, grouped by loaded index: threads and cache size vary slowest."""
+        return [
+            SweepSearch(complexity, beam_width, num_threads, cache_size)
+            for num_threads in self.num_threads
+            for cache_size in self.cache_sizes
+            for beam_width in self.beam_widths
+            for complexity in self.search_complexities
+        ]
+
+
+def _record_key(record: Dict[str, Any]) -> Tuple:
+    return tuple(record[field] for field in SweepBuild._fields + SweepSearch._fields)
+
+
+class SweepRunner:
+    """
+    Runs a `SweepSpec` with `diskannpy`, in place of `run_exp_single.sh` and `full_scan.sh`:
+
+    - Every index is built once into `{results_directory}/{SweepBuild.name}`. An index already there is reused, so
+      baselines are shared by all alpha ranges, and an interrupted sweep resumes where it stopped.
+    - LID files come from an `ArtifactCache`.
+    - Each index is loaded once per (threads, cache size) and searched with every (L, W) while loaded, instead of
+      being reloaded for every L.
+    - Every search appends one JSON record to `records_file` as soon as it completes; searches already recorded there
+      are skipped.
+
+    A record holds the `SweepBuild` and `SweepSearch` fields, the `variant` ("baseline" or "mcgi"), `k`, `recall`,
+    `qps`, the mean and p50/p95/p99 latency in microseconds (`latency_us_*`), the mean IOs, hops and cache hits per
+    query, and the index's build and load time in seconds (`build_seconds` is `None` for a reused index). Searches are
+    measured as the spec's `NoiseControl` says: the measurements are medians over `repeats` runs, `qps_ci95`,
+    `latency_us_mean_ci95` and `latency_us_p99_ci95` their confidence intervals and `outlier_runs` the indices of
+    runs flagged as outliers.
+    """
+
+    def __init__(
+        self,
+        spec: SweepSpec,
+        results_directory: str,
+        records_file: Optional[str] = None,
+        artifact_cache: Optional[ArtifactCache] = None,
+    ):
+        """
+        ### Parameters
+        - **spec**: The sweep.
+        - **results_directory**: Directory the indices are built in. Created if it does not exist.
+        - **records_file**: The JSON Lines file records are appended to. Default is `None`, which is
+          `{results_directory}/records.jsonl`.
+        - **artifact_cache**: Cache LID files are taken from. Default is `None`, which is an `ArtifactCache` in
+          `{results_directory}/cache`.
+        """
+        self.spec = spec
+        self.results_directory = results_directory
+        os.makedirs(results_directory, exist_ok=True)
+        self.records_file = records_file or os.path.join(results_directory, "records.jsonl")
+        self.artifact_cache = artifact_cache or ArtifactCache(os.path.join(results_directory, "cache"))
+        self._numa_cpus: Optional[List[int]] = None
+
+    def index_directory(self, build: SweepBuild) -> str:
+        return os.path.join(self.results_directory, build.name)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """The records written so far."""
+        if not os.path.exists(self.records_file):
+            return []
+        with open(self.records_file) as fh:
+            return [json.loads(line) for line in fh if line.strip()]
+
+    def build(self, build: SweepBuild) -> Optional[float]:
+        """
+        Builds an index unless it already exists.
+
+        ### Returns
+        The build time in seconds, or `None` if the index existed.
+        """
+        index_directory = self.index_directory(build)
+        if os.path.exists(os.path.join(index_directory, "ann_disk.index")):
+            return None
+        # built under a temporary name and renamed when complete, so a killed build is never taken for an index
+        partial_directory = index_directory + ".partial"
+        shutil.rmtree(partial_directory, ignore_errors=True)
+        os.makedirs(partial_directory)
+        dataset = self.spec.dataset(build.dataset)
+        kwargs: Dict[str, Any] = {}
+        if build.alpha_min is not None:
+            lid = self.artifact_cache.lid(dataset.base, dataset.vector_dtype, k=self.spec.lid_k)
+            kwargs = dict(mcgi_mode=self.spec.mcgi_mode, mcgi_alpha_min=build.alpha_min,
+                          mcgi_alpha_max=build.alpha_max, lid=lid)
+        start = time.perf_counter()
+        build_disk_index(
+            data=dataset.base,
+            distance_metric=dataset.distance_metric,
+            index_directory=partial_directory,
+            complexity=build.build_complexity,
+            graph_degree=build.graph_degree,
+            search_memory_maximum=self.spec.search_memory_maximum,
+            build_memory_maximum=self.spec.build_memory_maximum,
+            num_threads=self.spec.build_threads,
+            vector_dtype=dataset.vector_dtype,
+            **kwargs,
+        )
+        build_seconds = time.perf_counter() - start
+        shutil.rmtree(index_directory, ignore_errors=True)
+        os.replace(partial_directory, index_directory)
+        return build_seconds
+
+    def search(
+        self, index: StaticDiskIndex, queries: np.ndarray, ground_truth: np.ndarray, search: SweepSearch
+    ) -> Dict[str, Any]:
+        """
+        Measures one batch search over all queries as the spec's `NoiseControl` says. Each measurement is the median
+        over the runs; QPS, mean and p99 latency also get a 95% confidence interval (`*_ci95`).
+        """
+        k = self.spec.k_neighbors
+        noise_control = self.spec.noise_control
+        kwargs = dict(
+            k_neighbors=k,
+            complexity=max(search.search_complexity, k),
+            num_threads=search.num_threads,
+            beam_width=search.beam_width,
+        )
+        if noise_control.warmup_queries > 0:
+            index.batch_search(queries[np.arange(noise_control.warmup_queries) % queries.shape[0]], **kwargs)
+        runs = []
+        for _ in range(noise_control.repeats):
+            if noise_control.drop_caches:
+                _native_dap.drop_page_cache()
+            start = time.perf_counter()
+            ids, _, stats = index.batch_search(queries, return_stats=True, **kwargs)
+            elapsed = time.perf_counter() - start
+            summary = summarize_query_stats(stats, percentiles=(50, 95, 99))
+            runs.append(
+                dict(
+                    qps=queries.shape[0] / elapsed,
+                    latency_us_mean=summary["total_us"]["mean"],
+                    latency_us_p50=summary["total_us"]["p50"],
+                    latency_us_p95=summary["total_us"]["p95"],
+                    latency_us_p99=summary["total_us"]["p99"],
+                    mean_ios=summary["n_ios"]["mean"],
+                    mean_hops=summary["n_hops"]["mean"],
+                    mean_cache_hits=summary["n_cache_hits"]["mean"],
+                )
+            )
+        record: Dict[str, Any] = dict(k=k, recall=knn_recall(ids, ground_truth, k), repeats=noise_control.repeats)
+        outlier_runs = set()
+        for measure in runs[0]:
+            repeated = summarize_repeats([run[measure] for run in runs])
+            record[measure] = repeated["median"]
+            if measure in ("qps", "latency_us_mean", "latency_us_p99"):
+                record[f"{measure}_ci95"] = [repeated["ci_low"], repeated["ci_high"]]
+                outlier_runs.update(repeated["outliers"])
+        record["outlier_runs"] = sorted(outlier_runs)
+        return record
+
+    def run_build(self, build: SweepBuild, done: Optional[set] = None) -> Iterator[Dict[str, Any]]:
+        """Builds one index if needed and runs every search of the sweep on it that is not yet recorded."""
+        done = done if done is not None else {_record_key(record) for record in self.records()}
+        pending = [search for search in self.spec.searches() if tuple(build) + tuple(search) not in done]
+        if not pending:
+            return
+        build_seconds = self.build(build)
+        noise_control = self.spec.noise_control
+        if noise_control.numa_node is not None and self._numa_cpus is None:
+            # before loading, so that the index is allocated on the node
+            self._numa_cpus = _native_dap.bind_numa_node(noise_control.numa_node).tolist()
+        dataset = self.spec.dataset(build.dataset)
+        queries = vectors_from_file(dataset.queries, dataset.vector_dtype)
+        ground_truth = ground_truth_from_file(dataset.ground_truth)
+        for (num_threads, cache_size), searches in itertools.groupby(
+            pending, key=lambda search: (search.num_threads, search.num_nodes_to_cache)
+        ):
+            start = time.perf_counter()
+            index = StaticDiskIndex(
+                index_directory=self.index_directory(build),
+                num_threads=num_threads,
+                num_nodes_to_cache=cache_size,
+                distance_metric=dataset.distance_metric,
+                vector_dtype=dataset.vector_dtype,
+            )
+            load_seconds = time.perf_counter() - start
+            if noise_control.pin_threads:
+                _native_dap.pin_threads(num_threads, np.array(self._numa_cpus or [], dtype=np.uint32))
+            for search in searches:
+                record = dict(build._asdict(), variant=build.variant, **search._asdict())
+                record.update(self.search(index, queries, ground_truth, search))
+                record.update(build_seconds=build_seconds, load_seconds=load_seconds, timestamp=time.time())
+                with open(self.records_file, "a") as fh:
+                    fh.write(json.dumps(record) + "\n")
+                yield record
+            del index
+
+    def run(self) -> Iterator[Dict[str, Any]]:
+        """Runs the whole sweep, yielding each new record as it is written."""
+        done = {_record_key(record) for record in self.records()}
+        for build in self.spec.builds():
+            yield from self.run_build(build, done)
+
+    def run_scheduled(self, scheduler: JobScheduler, build_ssd_mbps: float = 0.0) -> Dict[str, JobState]:
+        """
+        Runs the whole sweep on a `JobScheduler`: indices are built concurrently as far as its limits allow, while
+        the searches of each index run as one `search` job, alone on the machine, as soon as it is built. Records
+        are written as by `SweepRunner.run`, except that `build_seconds` is `None`: each build time is the result of
+        its build job in the scheduler's ledger. A sweep resumed on the same ledger skips the builds and LID jobs it
+        finished; search jobs always run, and like `SweepRunner.run` only run the searches not yet recorded, so
+        searches added to the spec since are run too.
+
+        Builds declare `build_threads` (all CPUs if 0) and `build_memory_maximum` of the spec, searches the most
+        search threads of the spec and `search_memory_maximum`. The LID of each dataset with MCGI builds is computed
+        by a job of its own first, declaring the size of the base file as memory.
+
+        ### Parameters
+        - **scheduler**: The scheduler to submit the jobs to and run.
+        - **build_ssd_mbps**: The SSD bandwidth in MB/s each build declares. Default is 0.
+
+        ### Returns
+        The final state of every job, as `JobScheduler.run`.
+        """
+        build_threads = self.spec.build_threads or os.cpu_count() or 1
+        search_threads = max(self.spec.num_threads)
+        for dataset in self.spec.datasets:
+            if any(build.alpha_min is not None and build.dataset == dataset.name for build in self.spec.builds()):
+                scheduler.submit(
+                    f"lid:{dataset.name}", _lid_job, self, dataset.name, threads=build_threads,
+                    memory_gb=os.path.getsize(dataset.base) / (1 << 30),
+                )
+        for build in self.spec.builds():
+            after = [f"lid:{build.dataset}"] if build.alpha_min is not None else []
+            scheduler.submit(
+                f"build:{build.name}", _build_job, self, build, threads=build_threads,
+                memory_gb=self.spec.build_memory_maximum, ssd_mbps=build_ssd_mbps, after=after,
+            )
+            scheduler.submit(
+                f"search:{build.name}", _search_job, self, build, kind="search", threads=search_threads,
+                memory_gb=self.spec.search_memory_maximum, after=[f"build:{build.name}"], rerun=True,
+            )
+        return scheduler.run()
+
+
+# jobs of SweepRunner.run_scheduled; module level so worker processes can unpickle them
+def _lid_job(runner: SweepRunner, dataset_name: str):
+    dataset = runner.spec.dataset(dataset_name)
+    runner.artifact_cache.lid(dataset.base, dataset.vector_dtype, k=runner.spec.lid_k)
+
+
+def _build_job(runner: SweepRunner, build: SweepBuild) -> Optional[float]:
+    return runner.build(build)
+
+
+def _search_job(runner: SweepRunner, build: SweepBuild):
+    for _ in runner.run_build(build):
+        pass
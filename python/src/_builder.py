@@ -8,20 +8,35 @@ from pathlib import Path
 from typing import Optional, Tuple, Union
 
 import numpy as np
-
-from . import DistanceMetric, VectorDType, VectorIdentifierBatch, VectorLikeBatch
+import numpy.typing as npt
+
+from . import (
+    DistanceMetric,
+    MCGIMapping,
+    MCGIMode,
+    VectorDType,
+    VectorIdentifierBatch,
+    VectorLikeBatch,
+)
 from . import _diskannpy as _native_dap
 from ._common import (
     _assert,
+    _assert_existing_file,
     _assert_is_nonnegative_uint32,
     _assert_is_positive_uint32,
     _castable_dtype_or_raise,
+    _valid_mcgi_mode,
     _valid_metric,
     _write_index_metadata,
     valid_dtype,
 )
 from ._diskannpy import defaults
-from ._files import tags_to_file, vectors_metadata_from_file, vectors_to_file
+from ._files import (
+    tags_to_file,
+    vectors_from_file,
+    vectors_metadata_from_file,
+    vectors_to_file,
+)
 
 
 def _valid_path_and_dtype(
@@ -49,6 +64,98 @@ def _valid_path_and_dtype(
     return vector_bin_path, vector_dtype_actual
 
 
+def _valid_mcgi_mode_and_range(
+    mcgi_mode: MCGIMode,
+    mcgi_alpha_min: float,
+    mcgi_alpha_max: float,
+    mcgi_mapping: MCGIMapping,
+) -> _native_dap.MCGIMode:
+    dap_mcgi_mode = _valid_mcgi_mode(mcgi_mode)
+    _assert(
+        mcgi_mapping in ("sigmoid", "linear"),
+        "mcgi_mapping must be one of 'sigmoid' or 'linear'",
+    )
+    if dap_mcgi_mode == _native_dap.MCGIMode.OFF:
+        return dap_mcgi_mode
+    _assert(
+        1 <= mcgi_alpha_min <= mcgi_alpha_max,
+        "mcgi_alpha_min must be >= 1 and no larger than mcgi_alpha_max",
+    )
+    _assert(
+        dap_mcgi_mode != _native_dap.MCGIMode.ADVANCED or mcgi_mapping == "sigmoid",
+        "amcgi only supports the sigmoid mcgi_mapping",
+    )
+    return dap_mcgi_mode
+
+
+def _valid_lid(
+    dap_mcgi_mode: _native_dap.MCGIMode,
+    lid: Union[str, npt.NDArray[np.float32], None],
+    lid_avg: Optional[float],
+    lid_std: Optional[float],
+    num_points: int,
+) -> Tuple[str, npt.NDArray[np.float32], float, float]:
+    lid_file_path = ""
+    lid_values = np.empty(0, dtype=np.float32)
+    if dap_mcgi_mode == _native_dap.MCGIMode.OFF:
+        return lid_file_path, lid_values, 0.0, 1.0
+
+    if isinstance(lid, str):
+        _assert_existing_file(lid, "lid")
+        lid_points, lid_dims = vectors_metadata_from_file(lid)
+        _assert(lid_dims == 1, "lid file must contain exactly one value per point")
+        _assert(
+            lid_points == num_points,
+            f"lid file must contain one value per point, {lid_points=}, {num_points=}",
+        )
+        lid_file_path = lid
+    elif lid is not None:
+        _assert(isinstance(lid, np.ndarray), "lid must be a str path or a numpy ndarray")
+        _assert(len(lid.shape) == 1, "lid must be a 1d numpy array")
+        _assert(
+            lid.shape[0] == num_points,
+            f"lid must contain one value per point, {lid.shape[0]=}, {num_points=}",
+        )
+        lid_values = np.ascontiguousarray(lid, dtype=np.float32)
+
+    if dap_mcgi_mode == _native_dap.MCGIMode.STATIC:
+        _assert(lid is not None, "lid must be provided when mcgi_mode is 'mcgi'")
+        return lid_file_path, lid_values, 0.0, 1.0
+
+    if lid_avg is None or lid_std is None:
+        _assert(
+            lid is not None,
+            "amcgi requires either lid, or both lid_avg and lid_std",
+        )
+        values = (
+            lid_values
+            if lid_file_path == ""
+            else vectors_from_file(lid_file_path, np.float32, use_memmap=True)
+        )
+        lid_avg = float(np.mean(values, dtype=np.float64)) if lid_avg is None else lid_avg
+        lid_std = float(np.std(values, dtype=np.float64)) if lid_std is None else lid_std
+    _assert(lid_std > 0, "lid_std must be larger than 0")
+    return lid_file_path, lid_values, lid_avg, lid_std
+
+
+def _write_filter_labels(index_prefix_path: str, filter_labels: Optional[list[list[str]]]) -> str:
+    if filter_labels is None:
+        return ""
+    label_counts = {}
+    filter_labels_file = f"{index_prefix_path}_pylabels.txt"
+    with open(filter_labels_file, "w") as labels_file:
+        for labels in filter_labels:
+            for label in labels:
+                label_counts[label] = 1 if label not in label_counts else label_counts[label] + 1
+            if len(labels) == 0:
+                print("default", file=labels_file)
+            else:
+                print(",".join(labels), file=labels_file)
+    with open(f"{index_prefix_path}_label_metadata.json", "w") as label_metadata_file:
+        json.dump(label_counts, label_metadata_file, indent=True)
+    return filter_labels_file
+
+
 def build_disk_index(
     data: Union[str, VectorLikeBatch],
     distance_metric: DistanceMetric,
@@ -61,6 +168,17 @@ def build_disk_index(
     pq_disk_bytes: int = defaults.PQ_DISK_BYTES,
     vector_dtype: Optional[VectorDType] = None,
     index_prefix: str = "ann",
+    filter_labels: Optional[list[list[str]]] = None,
+    universal_label: str = "",
+    filter_complexity: int = defaults.FILTER_COMPLEXITY,
+    mcgi_mode: MCGIMode = "off",
+    mcgi_alpha_min: float = defaults.MCGI_ALPHA_MIN,
+    mcgi_alpha_max: float = defaults.MCGI_ALPHA_MAX,
+    mcgi_mapping: MCGIMapping = "sigmoid",
+    lid: Union[str, npt.NDArray[np.float32], None] = None,
+    lid_avg: Optional[float] = None,
+    lid_std: Optional[float] = None,
+    write_lid: bool = False,
 ) -> None:
     """
     This function will construct a DiskANN disk index. Disk indices are ideal for very large datasets that
@@ -104,6 +222,31 @@ def build_disk_index(
       than the number of bytes used for the PQ compressed data stored in-memory. Default is `0`.
     - **vector_dtype**: Required if the provided `data` is of type `str`, else we use the `data.dtype` if np array.
     - **index_prefix**: The prefix of the index files. Defaults to "ann".
+    - **filter_labels**: An optional, but exhaustive list of categories for each vector, in the same form as for
+      `build_memory_index`, e.g. `filter_labels=[["a", "b"], ["b"], []]`. The graph is built so that a search
+      restricted to one label navigates through the points carrying it, see `StaticDiskIndex.search`. Default is
+      `None`.
+    - **universal_label**: An optional label that indicates that this vector should be included in *every* search
+      in which it also meets the knn search criteria.
+    - **filter_complexity**: Complexity to use when using filters. Default is 0. 0 is strictly invalid if you are
+      using filters.
+    - **mcgi_mode**: A `str`, strictly one of {"off", "mcgi", "amcgi"}. `off` builds with a single fixed alpha. `mcgi`
+      assigns every node its own alpha from the per-node LID values in `lid`. `amcgi` estimates every node's LID
+      from its candidate pool while building, and only needs the dataset's LID mean and standard deviation. Default
+      is `off`.
+    - **mcgi_alpha_min**: The alpha (>= 1) given to the nodes with the lowest LID. Ignored if `mcgi_mode` is `off`.
+    - **mcgi_alpha_max**: The alpha (>= `mcgi_alpha_min`) given to the nodes with the highest LID. Ignored if
+      `mcgi_mode` is `off`.
+    - **mcgi_mapping**: A `str`, strictly one of {"sigmoid", "linear"}. How a node's LID is mapped onto
+      [`mcgi_alpha_min`, `mcgi_alpha_max`]. `amcgi` only supports `sigmoid`. Default is `sigmoid`.
+    - **lid**: Either a `str` representing a path to a DiskANN bin file with one float32 LID value per point, or a 1d
+      numpy array of the same. An array is handed to the builder in memory, without being written to disk first.
+      Required if `mcgi_mode` is `mcgi`; for `amcgi` it is only used to derive `lid_avg` and `lid_std`.
+    - **lid_avg**: The mean LID of the dataset, used by `amcgi`. Computed from `lid` if not provided.
+    - **lid_std**: The standard deviation of the LID of the dataset, used by `amcgi`. Computed from `lid` if not
+      provided.
+    - **write_lid**: If True, the per-point LID estimated from the candidate pools while building is written to
+      `{index_prefix}_lid.bin` in `index_directory`, in the same format `lid` accepts. Default is False.
     """
 
     _assert(
@@ -118,7 +261,15 @@ def build_disk_index(
     _assert(build_memory_maximum > 0, "build_memory_maximum must be larger than 0")
     _assert_is_nonnegative_uint32(num_threads, "num_threads")
     _assert_is_nonnegative_uint32(pq_disk_bytes, "pq_disk_bytes")
+    _assert_is_nonnegative_uint32(filter_complexity, "filter_complexity")
     _assert(index_prefix != "", "index_prefix cannot be an empty string")
+    _assert(
+        filter_labels is None or filter_complexity > 0,
+        "if filter_labels is provided, filter_complexity must not be 0"
+    )
+    dap_mcgi_mode = _valid_mcgi_mode_and_range(
+        mcgi_mode, mcgi_alpha_min, mcgi_alpha_max, mcgi_mapping
+    )
 
     index_path = Path(index_directory)
     _assert(
@@ -137,6 +288,14 @@ def build_disk_index(
         )
 
     num_points, dimensions = vectors_metadata_from_file(vector_bin_path)
+    if filter_labels is not None:
+        _assert(
+            len(filter_labels) == num_points,
+            "filter_labels must be the same length as the number of points"
+        )
+    lid_file_path, lid_values, lid_avg, lid_std = _valid_lid(
+        dap_mcgi_mode, lid, lid_avg, lid_std, num_points
+    )
 
     if vector_dtype_actual == np.uint8:
         _builder = _native_dap.build_disk_uint8_index
@@ -146,6 +305,7 @@ def build_disk_index(
         _builder = _native_dap.build_disk_float_index
 
     index_prefix_path = os.path.join(index_directory, index_prefix)
+    filter_labels_file = _write_filter_labels(index_prefix_path, filter_labels)
 
     _builder(
         distance_metric=dap_metric,
@@ -157,6 +317,18 @@ def build_disk_index(
         indexing_ram_budget=build_memory_maximum,
         num_threads=num_threads,
         pq_disk_bytes=pq_disk_bytes,
+        filter_labels_file=filter_labels_file,
+        universal_label=universal_label,
+        filter_complexity=filter_complexity,
+        mcgi_mode=dap_mcgi_mode,
+        lid_file_path=lid_file_path,
+        lid_values=lid_values,
+        alpha_min=mcgi_alpha_min,
+        alpha_max=mcgi_alpha_max,
+        use_linear=mcgi_mapping == "linear",
+        lid_avg=lid_avg,
+        lid_std=lid_std,
+        write_lid=write_lid,
     )
     _write_index_metadata(
         index_prefix_path, vector_dtype_actual, dap_metric, num_points, dimensions
@@ -180,6 +352,14 @@ def build_memory_index(
     universal_label: str = "",
     filter_complexity: int = defaults.FILTER_COMPLEXITY,
     index_prefix: str = "ann",
+    mcgi_mode: MCGIMode = "off",
+    mcgi_alpha_min: float = defaults.MCGI_ALPHA_MIN,
+    mcgi_alpha_max: float = defaults.MCGI_ALPHA_MAX,
+    mcgi_mapping: MCGIMapping = "sigmoid",
+    lid: Union[str, npt.NDArray[np.float32], None] = None,
+    lid_avg: Optional[float] = None,
+    lid_std: Optional[float] = None,
+    write_lid: bool = False,
 ) -> None:
     """
     This function will construct a DiskANN memory index. Memory indices are ideal for smaller datasets whose
@@ -241,6 +421,24 @@ def build_memory_index(
     - **filter_complexity**: Complexity to use when using filters. Default is 0. 0 is strictly invalid if you are
       using filters.
     - **index_prefix**: The prefix of the index files. Defaults to "ann".
+    - **mcgi_mode**: A `str`, strictly one of {"off", "mcgi", "amcgi"}. `off` builds with a single fixed alpha. `mcgi`
+      assigns every node its own alpha from the per-node LID values in `lid`. `amcgi` estimates every node's LID
+      from its candidate pool while building, and only needs the dataset's LID mean and standard deviation. Default
+      is `off`.
+    - **mcgi_alpha_min**: The alpha (>= 1) given to the nodes with the lowest LID. Ignored if `mcgi_mode` is `off`,
+      in which case `alpha` is used.
+    - **mcgi_alpha_max**: The alpha (>= `mcgi_alpha_min`) given to the nodes with the highest LID. Ignored if
+      `mcgi_mode` is `off`.
+    - **mcgi_mapping**: A `str`, strictly one of {"sigmoid", "linear"}. How a node's LID is mapped onto
+      [`mcgi_alpha_min`, `mcgi_alpha_max`]. `amcgi` only supports `sigmoid`. Default is `sigmoid`.
+    - **lid**: Either a `str` representing a path to a DiskANN bin file with one float32 LID value per point, or a 1d
+      numpy array of the same. An array is handed to the builder in memory, without being written to disk first.
+      Required if `mcgi_mode` is `mcgi`; for `amcgi` it is only used to derive `lid_avg` and `lid_std`.
+    - **lid_avg**: The mean LID of the dataset, used by `amcgi`. Computed from `lid` if not provided.
+    - **lid_std**: The standard deviation of the LID of the dataset, used by `amcgi`. Computed from `lid` if not
+      provided.
+    - **write_lid**: If True, the per-point LID estimated from the candidate pools while building is written to
+      `{index_prefix}_lid.bin` in `index_directory`, in the same format `lid` accepts. Default is False.
     """
     _assert(
         (isinstance(data, str) and vector_dtype is not None)
@@ -262,6 +460,9 @@ def build_memory_index(
         filter_labels is None or filter_complexity > 0,
         "if filter_labels is provided, filter_complexity must not be 0"
     )
+    dap_mcgi_mode = _valid_mcgi_mode_and_range(
+        mcgi_mode, mcgi_alpha_min, mcgi_alpha_max, mcgi_mapping
+    )
 
     index_path = Path(index_directory)
     _assert(
@@ -284,6 +485,9 @@ def build_memory_index(
             len(filter_labels) == num_points,
             "filter_labels must be the same length as the number of points"
         )
+    lid_file_path, lid_values, lid_avg, lid_std = _valid_lid(
+        dap_mcgi_mode, lid, lid_avg, lid_std, num_points
+    )
 
     if vector_dtype_actual == np.uint8:
         _builder = _native_dap.build_memory_uint8_index
@@ -294,20 +498,7 @@ def build_memory_index(
 
     index_prefix_path = os.path.join(index_directory, index_prefix)
 
-    filter_labels_file = ""
-    if filter_labels is not None:
-        label_counts = {}
-        filter_labels_file = f"{index_prefix_path}_pylabels.txt"
-        with open(filter_labels_file, "w") as labels_file:
-            for labels in filter_labels:
-                for label in labels:
-                    label_counts[label] = 1 if label not in label_counts else label_counts[label] + 1
-                if len(labels) == 0:
-                    print("default", file=labels_file)
-                else:
-                    print(",".join(labels), file=labels_file)
-        with open(f"{index_prefix_path}_label_metadata.json", "w") as label_metadata_file:
-            json.dump(label_counts, label_metadata_file, indent=True)
+    filter_labels_file = _write_filter_labels(index_prefix_path, filter_labels)
 
     if isinstance(tags, str) and tags != "":
         use_tags = True
@@ -340,6 +531,15 @@ def build_memory_index(
         filter_labels_file=filter_labels_file,
         universal_label=universal_label,
         filter_complexity=filter_complexity,
+        mcgi_mode=dap_mcgi_mode,
+        lid_file_path=lid_file_path,
+        lid_values=lid_values,
+        alpha_min=mcgi_alpha_min,
+        alpha_max=mcgi_alpha_max,
+        use_linear=mcgi_mapping == "linear",
+        lid_avg=lid_avg,
+        lid_std=lid_std,
+        write_lid=write_lid,
     )
 
     _write_index_metadata(
@@ -1,11 +1,18 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT license.
 
-from typing import BinaryIO, Optional, overload
+from typing import BinaryIO, Optional, Union, overload
 
 import numpy as np
 
-from . import DistanceMetric, VectorDType, VectorIdentifierBatch, VectorLikeBatch
+from . import (
+    DistanceMetric,
+    MCGIMapping,
+    MCGIMode,
+    VectorDType,
+    VectorIdentifierBatch,
+    VectorLikeBatch,
+)
 
 def numpy_to_diskann_file(vectors: np.ndarray, file_handler: BinaryIO): ...
 @overload
@@ -21,6 +28,17 @@ def build_disk_index(
     pq_disk_bytes: int,
     vector_dtype: VectorDType,
     index_prefix: str,
+    filter_labels: Optional[list[list[str]]],
+    universal_label: str,
+    filter_complexity: int,
+    mcgi_mode: MCGIMode,
+    mcgi_alpha_min: float,
+    mcgi_alpha_max: float,
+    mcgi_mapping: MCGIMapping,
+    lid: Union[str, np.ndarray, None],
+    lid_avg: Optional[float],
+    lid_std: Optional[float],
+    write_lid: bool,
 ) -> None: ...
 @overload
 def build_disk_index(
@@ -34,6 +52,17 @@ def build_disk_index(
     num_threads: int,
     pq_disk_bytes: int,
     index_prefix: str,
+    filter_labels: Optional[list[list[str]]],
+    universal_label: str,
+    filter_complexity: int,
+    mcgi_mode: MCGIMode,
+    mcgi_alpha_min: float,
+    mcgi_alpha_max: float,
+    mcgi_mapping: MCGIMapping,
+    lid: Union[str, np.ndarray, None],
+    lid_avg: Optional[float],
+    lid_std: Optional[float],
+    write_lid: bool,
 ) -> None: ...
 @overload
 def build_memory_index(
@@ -51,7 +80,15 @@ def build_memory_index(
     filter_labels: Optional[list[list[str]]],
     universal_label: str,
     filter_complexity: int,
-    index_prefix: str
+    index_prefix: str,
+    mcgi_mode: MCGIMode,
+    mcgi_alpha_min: float,
+    mcgi_alpha_max: float,
+    mcgi_mapping: MCGIMapping,
+    lid: Union[str, np.ndarray, None],
+    lid_avg: Optional[float],
+    lid_std: Optional[float],
+    write_lid: bool,
 ) -> None: ...
 @overload
 def build_memory_index(
@@ -70,5 +107,13 @@ def build_memory_index(
     filter_labels_file: Optional[list[list[str]]],
     universal_label: str,
     filter_complexity: int,
-    index_prefix: str
+    index_prefix: str,
+    mcgi_mode: MCGIMode,
+    mcgi_alpha_min: float,
+    mcgi_alpha_max: float,
+    mcgi_mapping: MCGIMapping,
+    lid: Union[str, np.ndarray, None],
+    lid_avg: Optional[float],
+    lid_std: Optional[float],
+    write_lid: bool,
 ) -> None: ...
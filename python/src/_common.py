@@ -11,6 +11,7 @@ import numpy as np
 
 from . import (
     DistanceMetric,
+    MCGIMode,
     VectorDType,
     VectorIdentifierBatch,
     VectorLike,
@@ -55,6 +56,19 @@ def _valid_metric(metric: str) -> _native_dap.Metric:
         raise ValueError("distance_metric must be one of 'l2', 'mips', or 'cosine'")
 
 
+def _valid_mcgi_mode(mcgi_mode: MCGIMode) -> _native_dap.MCGIMode:
+    if not isinstance(mcgi_mode, str):
+        raise ValueError("mcgi_mode must be a string")
+    if mcgi_mode.lower() == "off":
+        return _native_dap.MCGIMode.OFF
+    elif mcgi_mode.lower() == "mcgi":
+        return _native_dap.MCGIMode.STATIC
+    elif mcgi_mode.lower() == "amcgi":
+        return _native_dap.MCGIMode.ADVANCED
+    else:
+        raise ValueError("mcgi_mode must be one of 'off', 'mcgi', or 'amcgi'")
+
+
 def _assert_dtype(dtype: Type):
     _assert(
         any(np.can_cast(dtype, _dtype) for _dtype in _VALID_DTYPES),
@@ -77,6 +91,23 @@ def _assert_2d(vectors: np.ndarray, name: str):
     _assert(len(vectors.shape) == 2, f"{name} must be 2d numpy array")
 
 
+def _valid_output_buffer(
+    buffer: Optional[np.ndarray], dtype: Type, shape: Tuple[int, int], name: str
+) -> np.ndarray:
+    """
+    Returns `buffer` if the native search can write results straight into it, a fresh array if it is `None`, and
+    raises otherwise. Anything pybind11 would have to convert first (another dtype, a non contiguous view, a read only
+    array) is rejected, because results written to the converted copy would never reach the caller.
+    """
+    if buffer is None:
+        return np.empty(shape, dtype=dtype)
+    _assert(isinstance(buffer, np.ndarray), f"{name} must be a numpy ndarray")
+    _assert(buffer.dtype == dtype, f"{name} must be of dtype {np.dtype(dtype).name}, not {buffer.dtype}")
+    _assert(buffer.shape == shape, f"{name} must have shape {shape}, not {buffer.shape}")
+    _assert(buffer.flags.c_contiguous and buffer.flags.writeable, f"{name} must be a writeable C-contiguous array")
+    return buffer
+
+
 __MAX_UINT32_VAL = 4_294_967_295
 
 
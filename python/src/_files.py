@@ -10,6 +10,8 @@ import numpy.typing as npt
 from . import VectorDType, VectorIdentifierBatch, VectorLikeBatch
 from ._common import _assert, _assert_2d, _assert_dtype, _assert_existing_file
 
+_SLICE_READ_BLOCK = 65536
+
 
 class Metadata(NamedTuple):
     """DiskANN binary vector files contain a small stanza containing some metadata about them."""
@@ -120,3 +122,34 @@ def tags_from_file(tags_file: str) -> VectorIdentifierBatch:
         tags_file
     )  # tag files contain the same metadata stanza
     return np.fromfile(file=tags_file, dtype=np.uint32, offset=8).reshape(points)
+
+
+def gen_random_slice(
+    vector_file: str, dtype: VectorDType, sampling_rate: float, output_prefix: str, seed: int = 0
+) -> Metadata:
+    """
+    Keeps each vector of a DiskANN binary vector file with probability `sampling_rate`, like the `gen_random_slice`
+    utility, but seeded so that the same slice can be drawn again. The kept vectors are written in their original
+    order to `{output_prefix}_data.bin` and their ids to the tag file `{output_prefix}_ids.bin`. The input is read a
+    block at a time from a memory map.
+
+    ### Parameters
+    - **vector_file**: The vector file to slice.
+    - **dtype**: The data type of the vectors in the file.
+    - **sampling_rate**: The probability of keeping each vector, in (0, 1].
+    - **output_prefix**: Prefix of the files written.
+    - **seed**: Seed of the random draw. Default is 0.
+
+    ### Returns
+    `diskannpy.Metadata` of the slice.
+    """
+    _assert_existing_file(vector_file, "vector_file")
+    _assert(0 < sampling_rate <= 1, "sampling_rate must be in (0, 1]")
+    vectors = vectors_from_file(vector_file, dtype, use_memmap=True)
+    ids = np.flatnonzero(np.random.default_rng(seed).random(vectors.shape[0]) < sampling_rate).astype(np.uint32)
+    with open(f"{output_prefix}_data.bin", "wb") as fh:
+        fh.write(np.array([ids.shape[0], vectors.shape[1]], dtype=np.int32).tobytes())
+        for block_start in range(0, ids.shape[0], _SLICE_READ_BLOCK):
+            fh.write(np.ascontiguousarray(vectors[ids[block_start : block_start + _SLICE_READ_BLOCK]]).tobytes())
+    tags_to_file(f"{output_prefix}_ids.bin", ids)
+    return Metadata(ids.shape[0], vectors.shape[1])
@@ -0,0 +1,555 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from . import VectorDType
+from ._common import (
+    _assert,
+    _assert_existing_file,
+    _assert_is_positive_uint32,
+    _read_index_metadata,
+    _valid_index_prefix,
+    valid_dtype,
+)
+from ._files import tags_from_file, tags_to_file, vectors_from_file, vectors_metadata_from_file
+
+__ALL__ = ["compute_approximate_lid", "compute_lid", "compute_lid_from_disk_index", "lid_from_distances"]
+
+_LID_MIN = 0.1
+_LID_MAX = 200.0
+_MIN_DISTANCE = 1e-10
+_SAMPLE_READ_BLOCK = 65536
+# must match defaults::SECTOR_LEN, the unit create_disk_layout writes and PQFlashIndex reads
+_SECTOR_LEN = 4096
+_DISTANCE_BLOCK = 1024
+
+
+def lid_from_distances(distances: npt.NDArray[np.float32]) -> npt.NDArray[np.float32]:
+    """
+    Levina-Bickel maximum likelihood LID estimate from each point's k nearest neighbor distances.
+
+    `LID(x) = (k - 1) / sum(ln(r_k / r_j))` for `j` in `[1, k)`, clipped to `[0.1, 200]`.
+
+    ### Parameters
+    - **distances**: A 2d array of shape `(number_of_points, k)` holding each point's (non squared) distances to its
+      k nearest neighbors, excluding the point itself, sorted ascending along each row. `k` must be at least 2.
+
+    ### Returns
+    A 1d `numpy.typing.NDArray[numpy.float32]` with one LID value per point.
+    """
+    _assert(len(distances.shape) == 2, "distances must be a 2d array")
+    _assert(distances.shape[1] >= 2, "distances must hold at least 2 neighbors per point")
+    distances = np.maximum(distances.astype(np.float64, copy=False), _MIN_DISTANCE)
+    log_sum = np.sum(np.log(distances[:, -1:] / distances[:, :-1]), axis=1)
+    with np.errstate(divide="ignore"):
+        lid = (distances.shape[1] - 1) / log_sum
+    return np.clip(lid, _LID_MIN, _LID_MAX).astype(np.float32)
+
+
+def _squared_norms(block: np.ndarray) -> np.ndarray:
+    return np.einsum("ij,ij->i", block, block)
+
+
+def _knn_distances_block(
+    vector_bin_path: str,
+    vector_dtype: VectorDType,
+    start: int,
+    stop: int,
+    k: int,
+    base_block_size: int,
+    reference_path: Optional[str] = None,
+) -> npt.NDArray[np.float32]:
+    """
+    Exact squared L2 distances from points `[start, stop)` to their `k + 1` nearest neighbors in the whole file, or in
+    the vector bin file at `reference_path` if given, sorted ascending. The reference is streamed from a memory map in
+    blocks, so only one query block, one reference block and their distance matrix are ever resident.
+    """
+    base = vectors_from_file(vector_bin_path, vector_dtype, use_memmap=True)
+    reference = base if reference_path is None else vectors_from_file(reference_path, vector_dtype, use_memmap=True)
+    queries = np.asarray(base[start:stop], dtype=np.float32)
+    query_norms = _squared_norms(queries)
+    kk = k + 1
+
+    best = np.full((stop - start, kk), np.inf, dtype=np.float32)
+    for base_start in range(0, reference.shape[0], base_block_size):
+        block = np.asarray(reference[base_start : base_start + base_block_size], dtype=np.float32)
+        # ||q||^2 + ||b||^2 - 2 q.b, so the heavy lifting is a single BLAS matrix multiply
+        dists = queries @ block.T
+        dists *= -2
+        dists += query_norms[:, None]
+        dists += _squared_norms(block)[None, :]
+        if dists.shape[1] > kk:
+            dists = np.partition(dists, kk - 1, axis=1)[:, :kk]
+        candidates = np.concatenate([best, dists], axis=1)
+        best = np.partition(candidates, kk - 1, axis=1)[:, :kk]
+    return np.sort(np.maximum(best, 0), axis=1)
+
+
+def _lid_block(
+    vector_bin_path: str,
+    vector_dtype: VectorDType,
+    output_path: str,
+    start: int,
+    stop: int,
+    k: int,
+    base_block_size: int,
+    reference_path: Optional[str] = None,
+    reference_ids_path: Optional[str] = None,
+) -> Tuple[int, int]:
+    sq_dists = _knn_distances_block(vector_bin_path, vector_dtype, start, stop, k, base_block_size, reference_path)
+    if reference_ids_path is None:
+        # the nearest hit is the point itself (or an exact duplicate of it), drop it
+        sq_dists = sq_dists[:, 1:]
+    else:
+        # only points that made it into the sample see themselves; everyone else keeps its k nearest
+        reference_ids = tags_from_file(reference_ids_path)
+        points = np.arange(start, stop, dtype=np.uint32)
+        slots = np.minimum(np.searchsorted(reference_ids, points), reference_ids.shape[0] - 1)
+        in_sample = reference_ids[slots] == points
+        sq_dists = np.where(in_sample[:, None], sq_dists[:, 1:], sq_dists[:, :-1])
+    lid = lid_from_distances(np.sqrt(sq_dists))
+    output = vectors_from_file(output_path, np.float32, use_memmap=True, mode="r+")
+    output[start:stop, 0] = lid
+    output.flush()
+    return start, stop
+
+
+def _call_params(data: str, **params: Any) -> Dict[str, Any]:
+    # identifies the data file by path, size and modification time, like ArtifactCache's fingerprint memo
+    stat = os.stat(data)
+    return dict(params, data=os.path.abspath(data), data_stamp=[stat.st_size, stat.st_mtime_ns])
+
+
+def _params_match(params_path: str, params: Dict[str, Any]) -> bool:
+    try:
+        with open(params_path) as fh:
+            return json.load(fh) == params
+    except (OSError, ValueError):
+        return False
+
+
+def _write_params(params_path: str, params: Dict[str, Any]):
+    with open(params_path, "w") as fh:
+        json.dump(params, fh, indent=1)
+
+
+def _open_progress(progress_path: str, num_blocks: int, resume: bool) -> np.memmap:
+    if resume and os.path.exists(progress_path) and os.path.getsize(progress_path) == num_blocks:
+        return np.memmap(progress_path, dtype=np.uint8, mode="r+", shape=(num_blocks,))
+    return np.memmap(progress_path, dtype=np.uint8, mode="w+", shape=(num_blocks,))
+
+
+def _open_output(output_path: str, num_points: int, resume: bool) -> bool:
+    if resume and os.path.exists(output_path):
+        points, dims = vectors_metadata_from_file(output_path)
+        if points == num_points and dims == 1 and os.path.getsize(output_path) == 8 + 4 * num_points:
+            return True
+    with open(output_path, "wb") as fh:
+        fh.write(np.array([num_points, 1], dtype=np.int32).tobytes())
+        fh.truncate(8 + 4 * num_points)
+    return False
+
+
+def _run_blocks(
+    data: str,
+    vector_dtype: VectorDType,
+    output_path: str,
+    num_points: int,
+    k: int,
+    num_workers: int,
+    query_block_size: int,
+    base_block_size: int,
+    resume: bool,
+    params: Dict[str, Any],
+    reference_path: Optional[str] = None,
+    reference_ids_path: Optional[str] = None,
+) -> None:
+    num_blocks = (num_points + query_block_size - 1) // query_block_size
+    progress_path = output_path + ".progress"
+    params_path = output_path + ".params"
+    # progress only means something for the output file and the call it was recorded against
+    resume = resume and _params_match(params_path, params)
+    resumed = _open_output(output_path, num_points, resume)
+    progress = _open_progress(progress_path, num_blocks, resumed)
+    _write_params(params_path, params)
+
+    pending = [
+        (data, vector_dtype, output_path, block * query_block_size,
+         min(num_points, (block + 1) * query_block_size), k, base_block_size,
+         reference_path, reference_ids_path)
+        for block in range(num_blocks)
+        if progress[block] == 0
+    ]
+
+    def _mark_done(start: int):
+        progress[start // query_block_size] = 1
+        progress.flush()
+
+    if num_workers == 1:
+        for args in pending:
+            start, _ = _lid_block(*args)
+            _mark_done(start)
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            for start, _ in executor.map(_lid_block, *zip(*pending)) if pending else []:
+                _mark_done(start)
+
+    del progress
+    os.remove(progress_path)
+    os.remove(params_path)
+
+
+def _write_reference_sample(
+    data: str,
+    vector_dtype: VectorDType,
+    num_points: int,
+    sample_size: int,
+    seed: int,
+    reference_path: str,
+    reference_ids_path: str,
+    resume: bool,
+) -> bool:
+    """
+    Draws `sample_size` distinct points uniformly at random and copies them, in id order, to `reference_path`, with
+    their ids in `reference_ids_path`. Rows are gathered from the memory map a block of ids at a time, so memory is
+    bounded by the id list plus one read block. Returns whether an existing sample was reused, which requires it to
+    have been drawn from the same data with the same `sample_size` and `seed`.
+    """
+    params_path = reference_path + ".params"
+    params = _call_params(data, sample_size=sample_size, seed=seed)
+    if (
+        resume
+        and _params_match(params_path, params)
+        and os.path.exists(reference_path)
+        and os.path.exists(reference_ids_path)
+        and vectors_metadata_from_file(reference_path)[0] == sample_size
+        and vectors_metadata_from_file(reference_ids_path) == (sample_size, 1)
+    ):
+        return True
+    rng = np.random.default_rng(seed)
+    ids = np.sort(rng.choice(num_points, size=sample_size, replace=False)).astype(np.uint32)
+    base = vectors_from_file(data, vector_dtype, use_memmap=True)
+    with open(reference_path, "wb") as fh:
+        fh.write(np.array([sample_size, base.shape[1]], dtype=np.int32).tobytes())
+        for block_start in range(0, sample_size, _SAMPLE_READ_BLOCK):
+            fh.write(np.ascontiguousarray(base[ids[block_start : block_start + _SAMPLE_READ_BLOCK]]).tobytes())
+    tags_to_file(reference_ids_path, ids)
+    _write_params(params_path, params)
+    return False
+
+
+def compute_lid(
+    data: str,
+    vector_dtype: VectorDType,
+    output_path: str,
+    k: int = 20,
+    num_workers: int = 1,
+    query_block_size: int = 4096,
+    base_block_size: int = 32768,
+    resume: bool = True,
+) -> None:
+    """
+    Computes the exact Levina-Bickel LID of every point in a DiskANN vector bin file and writes it to `output_path`
+    as a DiskANN bin file with one float32 per point, the format `build_disk_index(..., lid=...)` accepts.
+
+    The base file is memory mapped and never loaded whole. Points are processed in query blocks; every query block is
+    compared to the whole base one base block at a time with a BLAS matrix multiply, and only the running `k + 1`
+    nearest distances per query are kept. Peak memory per worker is about
+    `4 * query_block_size * base_block_size` bytes for the distance matrix.
+
+    Results are written in place as each query block finishes, and finished blocks are recorded in
+    `{output_path}.progress`; the call they belong to (the `data` file with its size and modification time, `k` and
+    `query_block_size`) is recorded in `{output_path}.params`. With `resume=True`, rerunning the same call after a crash skips every finished block;
+    a call that differs in any of those starts over. Both files are removed once all blocks are done.
+
+    ### Parameters
+    - **data**: A `str` representing a path to a DiskANN vector bin file.
+    - **vector_dtype**: The vector dtype of the file, one of {`numpy.float32`, `numpy.uint8`, `numpy.int8`}.
+    - **output_path**: Where to write the LID file.
+    - **k**: The number of nearest neighbors, excluding the point itself, the estimate is based on. Must be at least
+      2. Default is 20.
+    - **num_workers**: Number of worker processes, each handling whole query blocks. Note that numpy's BLAS backend
+      may also use several threads per worker. Default is 1, which runs in this process.
+    - **query_block_size**: Number of points per query block, which is also the unit of resumption. Default is 4096.
+    - **base_block_size**: Number of base points compared against at once. Default is 32768.
+    - **resume**: Continue from `{output_path}.progress` if it matches this call. Default is True.
+    """
+    _assert_existing_file(data, "data")
+    vector_dtype = valid_dtype(vector_dtype)
+    _assert(k >= 2, "k must be at least 2")
+    _assert_is_positive_uint32(num_workers, "num_workers")
+    _assert_is_positive_uint32(query_block_size, "query_block_size")
+    _assert_is_positive_uint32(base_block_size, "base_block_size")
+    num_points, _ = vectors_metadata_from_file(data)
+    num_points = int(num_points)
+    _assert(num_points > k, "data must contain more than k points")
+
+    params = _call_params(data, k=k, query_block_size=query_block_size)
+    _run_blocks(
+        data, vector_dtype, output_path, num_points, k, num_workers, query_block_size, base_block_size, resume, params
+    )
+
+
+def compute_approximate_lid(
+    data: str,
+    vector_dtype: VectorDType,
+    output_path: str,
+    k: int = 20,
+    sample_size: int = 1_000_000,
+    seed: int = 0,
+    num_workers: int = 1,
+    query_block_size: int = 4096,
+    base_block_size: int = 32768,
+    resume: bool = True,
+) -> None:
+    """
+    Computes an approximate Levina-Bickel LID for every point in a DiskANN vector bin file, for files too large for
+    `compute_lid`'s all pairs scan, and writes it to `output_path` in the same format.
+
+    A uniform random sample of `sample_size` points is drawn once and copied to `{output_path}.sample.bin`. Every point
+    is then streamed against that sample, rather than the whole base, using the same blocked BLAS kernel, worker pool
+    and `{output_path}.progress` resumption as `compute_lid`; the cost is `O(num_points * sample_size)` instead of
+    `O(num_points^2)`. A point that is itself in the sample does not count itself as a neighbor.
+
+    The k nearest neighbors in the sample sit roughly `num_points / sample_size` times further down the true
+    neighbor list, so each value is the point's real LID measured at a somewhat coarser scale, not a draw from a
+    fitted distribution. The estimator is invariant to scaling the distances, and the result converges to
+    `compute_lid` as `sample_size` approaches `num_points`.
+
+    ### Parameters
+    - **data**: A `str` representing a path to a DiskANN vector bin file.
+    - **vector_dtype**: The vector dtype of the file, one of {`numpy.float32`, `numpy.uint8`, `numpy.int8`}.
+    - **output_path**: Where to write the LID file.
+    - **k**: The number of nearest sampled neighbors, excluding the point itself, the estimate is based on. Must be
+      at least 2. Default is 20.
+    - **sample_size**: Number of reference points. Values at or above the number of points in `data` use every
+      point, which is exact. Default is 1,000,000.
+    - **seed**: Seed for drawing the sample. A rerun with a different seed or sample size draws a new sample and
+      starts over. Default is 0.
+    - **num_workers**: Number of worker processes, each handling whole query blocks. Default is 1.
+    - **query_block_size**: Number of points per query block, which is also the unit of resumption. Default is 4096.
+    - **base_block_size**: Number of sample points compared against at once. Default is 32768.
+    - **resume**: Continue from `{output_path}.progress` and reuse the sample if they match this call. Default is True.
+    """
+    _assert_existing_file(data, "data")
+    vector_dtype = valid_dtype(vector_dtype)
+    _assert(k >= 2, "k must be at least 2")
+    _assert_is_positive_uint32(sample_size, "sample_size")
+    _assert_is_positive_uint32(num_workers, "num_workers")
+    _assert_is_positive_uint32(query_block_size, "query_block_size")
+    _assert_is_positive_uint32(base_block_size, "base_block_size")
+    num_points, _ = vectors_metadata_from_file(data)
+    num_points = int(num_points)
+    sample_size = min(sample_size, num_points)
+    _assert(sample_size > k, "sample_size and the number of points in data must both exceed k")
+
+    reference_path = output_path + ".sample.bin"
+    reference_ids_path = output_path + ".sample_ids.bin"
+    reused = _write_reference_sample(
+        data, vector_dtype, num_points, sample_size, seed, reference_path, reference_ids_path, resume
+    )
+    # a freshly drawn sample invalidates anything computed against the previous one
+    params = _call_params(data, k=k, query_block_size=query_block_size, sample_size=sample_size, seed=seed)
+    _run_blocks(
+        data, vector_dtype, output_path, num_points, k, num_workers, query_block_size, base_block_size,
+        resume and reused, params, reference_path, reference_ids_path,
+    )
+    os.remove(reference_path)
+    os.remove(reference_ids_path)
+    os.remove(reference_path + ".params")
+
+
+class _DiskLayout(NamedTuple):
+    num_points: int
+    dimensions: int
+    max_node_len: int
+    nodes_per_unit: int
+    """ Nodes per sector, or 1 when a node spans several sectors. """
+    unit_len: int
+    """ Bytes per sector, or per run of sectors holding one node. """
+    num_units: int
+
+
+def _read_disk_layout(disk_index_path: str, vector_dtype: VectorDType) -> _DiskLayout:
+    # sector 0 holds the uint64 metadata stanza create_disk_layout writes: npts, ndims, medoid, max_node_len,
+    # nnodes_per_sector, ...
+    num_meta, _ = np.fromfile(disk_index_path, dtype=np.int32, count=2)
+    _assert(num_meta >= 5, f"{disk_index_path} does not start with a disk index metadata sector")
+    num_points, dimensions, _, max_node_len, nodes_per_sector = (
+        int(v) for v in np.fromfile(disk_index_path, dtype=np.uint64, count=5, offset=8)
+    )
+    _assert(
+        dimensions * np.dtype(vector_dtype).itemsize + 2 * 4 <= max_node_len,
+        f"{disk_index_path} does not hold {np.dtype(vector_dtype).name} vectors",
+    )
+    if nodes_per_sector > 0:
+        layout = _DiskLayout(
+            num_points, dimensions, max_node_len, nodes_per_sector, _SECTOR_LEN,
+            (num_points + nodes_per_sector - 1) // nodes_per_sector,
+        )
+    else:
+        sectors_per_node = (max_node_len + _SECTOR_LEN - 1) // _SECTOR_LEN
+        layout = _DiskLayout(num_points, dimensions, max_node_len, 1, sectors_per_node * _SECTOR_LEN, num_points)
+    _assert(
+        os.path.getsize(disk_index_path) >= _SECTOR_LEN + layout.num_units * layout.unit_len,
+        f"{disk_index_path} is shorter than its metadata says",
+    )
+    return layout
+
+
+def _node_view(disk_index_path: str, layout: _DiskLayout) -> np.ndarray:
+    """
+    A `(num_units, nodes_per_unit, max_node_len)` byte view of the node region, so that node `i` lives at
+    `[i // nodes_per_unit, i % nodes_per_unit]` and every read along the first axis is whole, aligned sectors.
+    """
+    units = np.memmap(
+        disk_index_path, dtype=np.uint8, mode="r", offset=_SECTOR_LEN, shape=(layout.num_units, layout.unit_len)
+    )
+    return units[:, : layout.nodes_per_unit * layout.max_node_len].reshape(
+        layout.num_units, layout.nodes_per_unit, layout.max_node_len
+    )
+
+
+def _gather_coords(
+    nodes: np.ndarray, layout: _DiskLayout, vector_dtype: VectorDType, ids: np.ndarray
+) -> npt.NDArray[np.float32]:
+    # ids are sorted, so every chunk reads its sectors in increasing file order
+    coord_len = layout.dimensions * np.dtype(vector_dtype).itemsize
+    coords = np.empty((ids.shape[0], layout.dimensions), dtype=np.float32)
+    for chunk_start in range(0, ids.shape[0], _SAMPLE_READ_BLOCK):
+        chunk = ids[chunk_start : chunk_start + _SAMPLE_READ_BLOCK]
+        units, inverse = np.unique(chunk // layout.nodes_per_unit, return_inverse=True)
+        sectors = np.asarray(nodes[units])
+        raw = np.ascontiguousarray(sectors[inverse, chunk % layout.nodes_per_unit, :coord_len])
+        coords[chunk_start : chunk_start + chunk.shape[0]] = raw.view(vector_dtype)
+    return coords
+
+
+def _lid_from_neighbor_sq_distances(sq_dists: np.ndarray, counts: np.ndarray) -> npt.NDArray[np.float32]:
+    """
+    `lid_from_distances` for rows with a varying number of neighbors: row `i` uses its first `counts[i]` entries,
+    which must be sorted ascending. Rows with fewer than 2 neighbors get NaN.
+    """
+    distances = np.sqrt(np.maximum(sq_dists.astype(np.float64), _MIN_DISTANCE**2))
+    rows = np.arange(sq_dists.shape[0])
+    r_k = distances[rows, np.maximum(counts, 1) - 1]
+    inner = np.arange(sq_dists.shape[1])[None, :] < (counts - 1)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_sum = np.sum(np.where(inner, np.log(r_k[:, None] / distances), 0), axis=1)
+        lid = np.clip((counts - 1) / log_sum, _LID_MIN, _LID_MAX)
+    return np.where(counts >= 2, lid, np.nan).astype(np.float32)
+
+
+def compute_lid_from_disk_index(
+    index_directory: str,
+    output_path: Optional[str] = None,
+    vector_dtype: Optional[VectorDType] = None,
+    index_prefix: str = "ann",
+    k: Optional[int] = None,
+    nodes_per_block: int = 16384,
+) -> str:
+    """
+    Computes a per-node LID for an already built disk index from the neighbor lists stored in its
+    `{index_prefix}_disk.index`, without any nearest neighbor search.
+
+    In an index built with `pq_disk_bytes=0`, every node sits next to its full precision vector, so the file is read
+    front to back in whole sectors using the same layout `PQFlashIndex` reads. Indices built with `pq_disk_bytes > 0`
+    store PQ codes there instead and are rejected. For each block of nodes, the distinct neighbor ids are
+    gathered from the same file in increasing sector order, and each node's LID is the Levina-Bickel estimate over the
+    distances to its (up to `k` nearest) stored neighbors. Nodes with fewer than 2 neighbors get the mean of the
+    others, as in `Index::save_lid`.
+
+    Graph neighbors are pruned for diversity rather than being the exact k nearest, so values differ somewhat from
+    `compute_lid`, but they come from the same graph MCGI refines and cost one linear pass over the index.
+
+    ### Parameters
+    - **index_directory**: The directory containing the index files.
+    - **output_path**: Where to write the LID file. Default is `{index_prefix}_lid.bin` in `index_directory`, the
+      file `build_disk_index(..., write_lid=True)` would write.
+    - **vector_dtype**: The vector dtype the index was built with. **This value is only used if a
+      `{index_prefix}_metadata.bin` file does not exist.** If it does not exist, you are required to provide it.
+    - **index_prefix**: The prefix of the index files. Defaults to "ann".
+    - **k**: Use at most this many of each node's nearest stored neighbors. Must be at least 2. Default is `None`,
+      which uses every stored neighbor.
+    - **nodes_per_block**: Number of nodes read and processed together. Default is 16384.
+
+    ### Returns
+    The path of the LID file written.
+    """
+    index_prefix_path = _valid_index_prefix(index_directory, index_prefix)
+    disk_index_path = index_prefix_path + "_disk.index"
+    _assert_existing_file(disk_index_path, "index_directory")
+    # the check PQFlashIndex::load makes for PQ codes in place of the vectors
+    _assert(
+        not os.path.exists(disk_index_path + "_pq_pivots.bin"),
+        "the index stores PQ codes instead of full precision vectors (pq_disk_bytes > 0), which LID cannot be "
+        "computed from",
+    )
+    metadata = _read_index_metadata(index_prefix_path)
+    if metadata is not None:
+        vector_dtype = metadata[0]
+    _assert(
+        vector_dtype is not None,
+        "vector_dtype must be provided if a corresponding metadata file has not been built for this index",
+    )
+    vector_dtype = valid_dtype(vector_dtype)
+    _assert(k is None or k >= 2, "k must be at least 2")
+    _assert_is_positive_uint32(nodes_per_block, "nodes_per_block")
+    output_path = output_path if output_path is not None else index_prefix_path + "_lid.bin"
+
+    layout = _read_disk_layout(disk_index_path, vector_dtype)
+    nodes = _node_view(disk_index_path, layout)
+    coord_len = layout.dimensions * np.dtype(vector_dtype).itemsize
+    max_degree = (layout.max_node_len - coord_len) // 4 - 1
+    _open_output(output_path, layout.num_points, False)
+    output = vectors_from_file(output_path, np.float32, use_memmap=True, mode="r+")
+
+    lid_sum, num_estimated = 0.0, 0
+    units_per_block = max(1, nodes_per_block // layout.nodes_per_unit)
+    for unit_start in range(0, layout.num_units, units_per_block):
+        start = unit_start * layout.nodes_per_unit
+        stop = min(layout.num_points, (unit_start + units_per_block) * layout.nodes_per_unit)
+        # one contiguous, sector aligned read for the whole block
+        raw = np.asarray(nodes[unit_start : unit_start + units_per_block]).reshape(-1, layout.max_node_len)
+        raw = raw[: stop - start]
+        coords = np.ascontiguousarray(raw[:, :coord_len]).view(vector_dtype).astype(np.float32)
+        links = np.ascontiguousarray(raw[:, coord_len : coord_len + 4 * (max_degree + 1)]).view(np.uint32)
+        counts = np.minimum(links[:, 0], max_degree).astype(np.int64)
+        neighbors = links[:, 1:]
+        valid = (np.arange(max_degree)[None, :] < counts[:, None]) & (neighbors < layout.num_points)
+
+        sq_dists = np.full(neighbors.shape, np.inf, dtype=np.float32)
+        needed = np.unique(neighbors[valid])
+        if needed.shape[0] > 0:
+            neighbor_coords = _gather_coords(nodes, layout, vector_dtype, needed)
+            # unused slots point at an arbitrary gathered row and are masked out below
+            slots = np.minimum(np.searchsorted(needed, neighbors), needed.shape[0] - 1)
+            for row in range(0, stop - start, _DISTANCE_BLOCK):
+                rows = slice(row, row + _DISTANCE_BLOCK)
+                diff = neighbor_coords[slots[rows]] - coords[rows, None, :]
+                sq_dists[rows] = np.where(valid[rows], np.einsum("ijk,ijk->ij", diff, diff), np.inf)
+        sq_dists = np.sort(sq_dists, axis=1)
+        counts = valid.sum(axis=1)
+        if k is not None:
+            counts = np.minimum(counts, k)
+        lid = _lid_from_neighbor_sq_distances(sq_dists, counts)
+        estimated = ~np.isnan(lid)
+        lid_sum += float(np.sum(lid[estimated], dtype=np.float64))
+        num_estimated += int(np.count_nonzero(estimated))
+        output[start:stop, 0] = lid
+
+    if num_estimated < layout.num_points:
+        # same fill as Index::save_lid
+        fill = lid_sum / num_estimated if num_estimated > 0 else 0.0
+        for start in range(0, layout.num_points, nodes_per_block):
+            block = output[start : start + nodes_per_block, 0]
+            block[np.isnan(block)] = fill
+    output.flush()
+    return output_path
@@ -0,0 +1,178 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from . import QueryResponse, VectorLike
+from ._common import _assert, _assert_is_nonnegative_uint32, _assert_is_positive_uint32
+from ._static_disk_index import StaticDiskIndex
+
+__ALL__ = ["MicroBatcher"]
+
+_Pending = Tuple[np.ndarray, Future, float]
+
+
+class MicroBatcher:
+    """
+    Gathers individually arriving queries into micro-batches for `StaticDiskIndex.batch_search`, which searches a
+    batch in parallel and is far more efficient than one `StaticDiskIndex.search` call per query.
+
+    A batch is dispatched as soon as it holds `batch_size` queries, or when its oldest query has waited `max_wait_ms`,
+    whichever comes first. Every query gets its own future.
+
+    With a `target_latency_ms`, `batch_size` adapts to the observed end to end latency (queueing plus search) of
+    each batch: it is halved whenever a batch misses the target and grows by an eighth while full batches stay
+    below 80% of it, always staying within `[1, max_batch_size]`. Without a target it stays at `max_batch_size`.
+
+    Batches are dispatched one at a time from a background thread; the next batch fills while the current one is
+    searched.
+    """
+
+    def __init__(
+        self,
+        index: StaticDiskIndex,
+        k_neighbors: int,
+        complexity: int,
+        num_threads: int = 0,
+        beam_width: int = 2,
+        max_batch_size: int = 256,
+        max_wait_ms: float = 1.0,
+        target_latency_ms: Optional[float] = None,
+    ):
+        """
+        ### Parameters
+        - **index**: The `StaticDiskIndex` to search.
+        - **k_neighbors**: Number of neighbors returned for every query. Must be > 0.
+        - **complexity**: Search complexity used for every query. Must be > 0.
+        - **num_threads**: Threads per `batch_search` call. (>= 0), 0 = num_threads in system. Default is 0.
+        - **beam_width**: The beamwidth used for every query. Default is 2.
+        - **max_batch_size**: Upper bound on the number of queries per batch. Default is 256.
+        - **max_wait_ms**: How long the oldest query of a batch waits for more queries before the batch is dispatched
+          anyway. Default is 1.0.
+        - **target_latency_ms**: Latency objective the batch size is tuned against, e.g. the p99 SLO. Default is
+          `None`, which disables tuning.
+        """
+        _assert_is_positive_uint32(k_neighbors, "k_neighbors")
+        _assert_is_positive_uint32(complexity, "complexity")
+        _assert_is_nonnegative_uint32(num_threads, "num_threads")
+        _assert_is_positive_uint32(beam_width, "beam_width")
+        _assert_is_positive_uint32(max_batch_size, "max_batch_size")
+        _assert(max_wait_ms >= 0, "max_wait_ms must be >= 0")
+        _assert(target_latency_ms is None or target_latency_ms > 0, "target_latency_ms must be > 0")
+
+        self._index = index
+        self._search_args = dict(
+            k_neighbors=k_neighbors, complexity=complexity, num_threads=num_threads, beam_width=beam_width
+        )
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait_ms / 1000
+        self._target_latency = target_latency_ms / 1000 if target_latency_ms is not None else None
+        self._batch_size = max_batch_size
+        self._dimensions: Optional[int] = None
+
+        self._queue: "queue.SimpleQueue[Optional[_Pending]]" = queue.SimpleQueue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._dispatcher = threading.Thread(target=self._run, name="diskannpy-micro-batcher", daemon=True)
+        self._dispatcher.start()
+
+    @property
+    def batch_size(self) -> int:
+        """The current batch size limit."""
+        return self._batch_size
+
+    def submit(self, query: VectorLike) -> "Future[QueryResponse]":
+        """
+        Queues a single query.
+
+        ### Parameters
+        - **query**: 1d numpy array of the same dimensionality and dtype of the index.
+
+        ### Returns
+        A `concurrent.futures.Future` resolving to the query's `QueryResponse`.
+        """
+        _assert(isinstance(query, np.ndarray) and len(query.shape) == 1, "query vector must be a 1-d numpy array")
+        with self._lock:
+            _assert(not self._closed, "MicroBatcher is closed")
+            if self._dimensions is None:
+                self._dimensions = query.shape[0]
+            _assert(query.shape[0] == self._dimensions, "all queries must have the same dimensionality")
+            future: "Future[QueryResponse]" = Future()
+            self._queue.put((query, future, time.perf_counter()))
+        return future
+
+    def search(self, query: VectorLike) -> QueryResponse:
+        """Queues a single query and blocks until its response is ready."""
+        return self.submit(query).result()
+
+    async def search_async(self, query: VectorLike) -> QueryResponse:
+        """Coroutine version of `MicroBatcher.search`."""
+        return await asyncio.wrap_future(self.submit(query))
+
+    def close(self):
+        """Dispatches whatever is still queued and stops the background thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._dispatcher.join()
+
+    def __enter__(self) -> "MicroBatcher":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _collect(self, first: _Pending) -> Tuple[List[_Pending], bool]:
+        batch = [first]
+        deadline = first[2] + self._max_wait
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _dispatch(self, batch: List[_Pending]):
+        # queries whose caller already gave up are not searched
+        batch = [pending for pending in batch if pending[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            ids, dists = self._index.batch_search(np.stack([query for query, _, _ in batch]), **self._search_args)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for i, (_, future, _) in enumerate(batch):
+            future.set_result(QueryResponse(identifiers=ids[i], distances=dists[i]))
+        self._tune(len(batch), time.perf_counter() - batch[0][2])
+
+    def _tune(self, size: int, latency: float):
+        if self._target_latency is None:
+            return
+        if latency > self._target_latency:
+            self._batch_size = max(1, self._batch_size // 2)
+        elif size == self._batch_size and latency < 0.8 * self._target_latency:
+            self._batch_size = min(self._max_batch_size, self._batch_size + max(1, self._batch_size // 8))
+
+    def _run(self):
+        closing = False
+        while not closing:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, closing = self._collect(first)
+            self._dispatch(batch)
@@ -0,0 +1,72 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+from typing import Dict, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from ._common import _assert
+
+__ALL__ = ["query_stats_dtype", "summarize_query_stats"]
+
+# field for field the layout of diskann::QueryStats (percentile_stats.h), which the native search writes into
+query_stats_dtype = np.dtype(
+    [
+        ("total_us", np.float32),
+        ("io_us", np.float32),
+        ("cpu_us", np.float32),
+        ("n_4k", np.uint32),
+        ("n_8k", np.uint32),
+        ("n_12k", np.uint32),
+        ("n_ios", np.uint32),
+        ("read_size", np.uint32),
+        ("n_cmps_saved", np.uint32),
+        ("n_cmps", np.uint32),
+        ("n_cache_hits", np.uint32),
+        ("n_hops", np.uint32),
+    ]
+)
+"""
+The numpy structured dtype of the per query statistics returned by `StaticDiskIndex.search` and
+`StaticDiskIndex.batch_search` with `return_stats=True`:
+
+- **total_us**, **io_us**, **cpu_us**: Wall time of the whole query, and the part of it spent waiting on IO and
+  computing distances, in microseconds.
+- **n_ios**: Number of sector reads issued. **n_4k**, **n_8k**, **n_12k** break them down by size, **read_size** is
+  unused by the disk search.
+- **n_cmps**: Number of full precision and PQ distance comparisons. **n_cmps_saved** is unused by the disk search.
+- **n_cache_hits**: Number of nodes served from the in memory node cache instead of the SSD.
+- **n_hops**: Number of search iterations, i.e. IO round trips.
+"""
+
+
+def summarize_query_stats(
+    stats: npt.NDArray, percentiles: Sequence[float] = (50, 90, 95, 99, 99.9)
+) -> Dict[str, Dict[str, float]]:
+    """
+    Aggregates per query statistics.
+
+    ### Parameters
+    - **stats**: A 1d array of `query_stats_dtype` records, e.g. from `StaticDiskIndex.batch_search` with
+      `return_stats=True` or several such arrays concatenated.
+    - **percentiles**: The percentiles to compute, each in [0, 100]. Default is (50, 90, 95, 99, 99.9).
+
+    ### Returns
+    A `dict` from each statistic name to a `dict` with its `"mean"` and one `"p{percentile}"` entry per percentile,
+    e.g. `summary["io_us"]["p99"]`.
+    """
+    _assert(
+        isinstance(stats, np.ndarray) and stats.dtype == query_stats_dtype and stats.ndim == 1,
+        "stats must be a 1d array of query_stats_dtype records",
+    )
+    _assert(stats.shape[0] > 0, "stats must not be empty")
+    _assert(all(0 <= p <= 100 for p in percentiles), "percentiles must be in [0, 100]")
+    summary = {}
+    for name in query_stats_dtype.names:
+        values = stats[name].astype(np.float64)
+        entry = {"mean": float(values.mean())}
+        for p, value in zip(percentiles, np.percentile(values, percentiles)):
+            entry[f"p{p:g}"] = float(value)
+        summary[name] = entry
+    return summary
@@ -0,0 +1,311 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import glob
+import json
+import os
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ._common import _assert, _assert_existing_file
+
+__ALL__ = ["ResultsStore"]
+
+_CONFIG_COLUMNS = (
+    "dataset",
+    "graph_degree",
+    "build_complexity",
+    "alpha_min",
+    "alpha_max",
+    "variant",
+    "beam_width",
+    "num_threads",
+    "num_nodes_to_cache",
+    "k",
+)
+_MEASURE_COLUMNS = (
+    "recall",
+    "qps",
+    "latency_us_mean",
+    "latency_us_p50",
+    "latency_us_p95",
+    "latency_us_p99",
+    "mean_ios",
+    "mean_hops",
+    "mean_cache_hits",
+    "build_seconds",
+    "load_seconds",
+    "timestamp",
+)
+_COLUMNS = _CONFIG_COLUMNS + ("search_complexity",) + _MEASURE_COLUMNS
+# what a baseline is matched to an MCGI build on
+_BASELINE_KEY = tuple(column for column in _CONFIG_COLUMNS if column not in ("alpha_min", "alpha_max", "variant"))
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS results (
+    {", ".join(_COLUMNS)},
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_config ON results (dataset, variant, graph_degree, build_complexity);
+CREATE INDEX IF NOT EXISTS results_by_source ON results (source);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    offset INTEGER NOT NULL
+);
+"""
+
+_LOG_NAME = re.compile(r"([a-zA-Z0-9]+)_R(\d+)(?:_L(\d+))?_min([\d.]+)_max([\d.]+)\.txt$")
+_LOG_PARAMS = re.compile(r"Params: R=(\d+), L=(\d+)")
+# what run_exp_single.sh searches with besides L
+_LOG_SEARCH = dict(beam_width=2, num_threads=32, num_nodes_to_cache=0, k=10)
+
+
+def _parse_log(path: str) -> List[Dict[str, Any]]:
+    match = _LOG_NAME.search(os.path.basename(path))
+    if match is None:
+        return []
+    dataset, graph_degree, build_complexity, alpha_min, alpha_max = match.groups()
+    build = dict(dataset=dataset, graph_degree=int(graph_degree),
+                 build_complexity=int(build_complexity) if build_complexity else None)
+    rows = []
+    variant = None
+    with open(path) as fh:
+        for line in fh:
+            line = line.strip()
+            params = _LOG_PARAMS.search(line)
+            if params is not None and build["build_complexity"] is None:
+                build["build_complexity"] = int(params.group(2))
+            if line == "--- Baseline ---":
+                variant = "baseline"
+                continue
+            if line == "--- MCGI ---":
+                variant = "mcgi"
+                continue
+            parts = line.split()
+            if variant is None or len(parts) < 4 or not parts[0].isdigit():
+                continue
+            try:
+                qps, latency, recall = float(parts[1]), float(parts[2]), float(parts[3])
+            except ValueError:
+                # FAIL lines of searches that did not run
+                continue
+            alphas = (None, None) if variant == "baseline" else (float(alpha_min), float(alpha_max))
+            rows.append(dict(build, alpha_min=alphas[0], alpha_max=alphas[1], variant=variant,
+                             search_complexity=int(parts[0]), recall=recall / 100, qps=qps,
+                             latency_us_mean=latency, **_LOG_SEARCH))
+    return rows
+
+
+def _interpolate_qps(points: List[Dict[str, Any]], recall: float) -> Optional[float]:
+    # points: one configuration's frontier, by increasing recall and decreasing QPS
+    for i, point in enumerate(points):
+        if point["recall"] >= recall:
+            if i == 0 or point["recall"] == points[i - 1]["recall"]:
+                return point["qps"]
+            below = points[i - 1]
+            fraction = (recall - below["recall"]) / (point["recall"] - below["recall"])
+            return below["qps"] + fraction * (point["qps"] - below["qps"])
+    return None
+
+
+def _frontier(points: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    frontier = []
+    best_qps = -np.inf
+    for point in sorted(points, key=lambda p: (-p["recall"], -p["qps"])):
+        if point["qps"] > best_qps:
+            frontier.append(point)
+            best_qps = point["qps"]
+    return frontier[::-1]
+
+
+class ResultsStore:
+    """
+    An SQLite database of search results, filled incrementally from `SweepRunner` record files and the logs of
+    `run_exp_single.sh` / `full_scan.sh`, and queried for the recall / QPS trade-off instead of re-parsing every log.
+
+    Each row is one measured search: the `SweepBuild` and `SweepSearch` fields, the variant, k and the measurements
+    of a `SweepRunner` record, with recall as a fraction (legacy logs report percent and are converted). Log files
+    are re-read when their size or modification time changes, record files from where the previous ingestion stopped.
+
+    Queries work on operating points: the searches of one configuration, i.e. everything but the search complexity,
+    at one search complexity, with the median of repeated measurements. A `where` argument restricts them to rows
+    whose columns equal the given values, e.g. `{"dataset": "gist", "graph_degree": 32}`.
+    """
+
+    def __init__(self, database_file: str):
+        """
+        ### Parameters
+        - **database_file**: The SQLite database. Created if it does not exist.
+        """
+        _assert(database_file is not None and database_file != "", "database_file cannot be None or empty")
+        self._db = sqlite3.connect(database_file)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _insert(self, rows: Sequence[Dict[str, Any]], source: str):
+        self._db.executemany(
+            f"INSERT INTO results ({', '.join(_COLUMNS)}, source) VALUES ({', '.join('?' * (len(_COLUMNS) + 1))})",
+            [tuple(row.get(column) for column in _COLUMNS) + (source,) for row in rows],
+        )
+
+    def _source(self, path: str) -> Optional[sqlite3.Row]:
+        return self._db.execute("SELECT * FROM sources WHERE path = ?", (path,)).fetchone()
+
+    def _set_source(self, path: str, offset: int):
+        stat = os.stat(path)
+        self._db.execute(
+            "INSERT OR REPLACE INTO sources (path, size, mtime, offset) VALUES (?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime, offset),
+        )
+
+    def ingest_records(self, records_file: str) -> int:
+        """
+        Adds the records appended to a `SweepRunner` records file since it was last ingested. A file that shrank is
+        taken to be new, and its rows are replaced.
+
+        ### Returns
+        The number of rows added.
+        """
+        _assert_existing_file(records_file, "records_file")
+        path = os.path.abspath(records_file)
+        source = self._source(path)
+        offset = source["offset"] if source is not None else 0
+        with self._db:
+            if offset > os.path.getsize(path):
+                self._db.execute("DELETE FROM results WHERE source = ?", (path,))
+                offset = 0
+            with open(path, "rb") as fh:
+                fh.seek(offset)
+                data = fh.read()
+            # a record being appended right now is left for the next ingestion
+            complete = data[: data.rfind(b"\n") + 1]
+            rows = [json.loads(line) for line in complete.splitlines() if line.strip()]
+            self._insert(rows, path)
+            self._set_source(path, offset + len(complete))
+        return len(rows)
+
+    def ingest_logs(self, paths: Sequence[str]) -> int:
+        """
+        Adds the results of `run_exp_single.sh` logs (`{dataset}_R{R}[_L{L}]_min{alpha_min}_max{alpha_max}.txt`).
+        Directories stand for the `.txt` files in them. Files unchanged since they were last ingested are skipped,
+        changed ones replace their rows.
+
+        ### Returns
+        The number of rows added.
+        """
+        files = []
+        for path in paths:
+            files += sorted(glob.glob(os.path.join(path, "*.txt"))) if os.path.isdir(path) else [path]
+        added = 0
+        with self._db:
+            for file in files:
+                path = os.path.abspath(file)
+                source = self._source(path)
+                stat = os.stat(path)
+                if source is not None and (source["size"], source["mtime"]) == (stat.st_size, stat.st_mtime):
+                    continue
+                rows = _parse_log(path)
+                self._db.execute("DELETE FROM results WHERE source = ?", (path,))
+                self._insert(rows, path)
+                self._set_source(path, stat.st_size)
+                added += len(rows)
+        return added
+
+    def _where(self, where: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        where = where or {}
+        unknown = set(where) - set(_COLUMNS)
+        _assert(not unknown, f"unknown columns: {sorted(unknown)}")
+        clauses = [f"{column} IS ?" for column in where]
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), list(where.values())
+
+    def count(self, where: Optional[Dict[str, Any]] = None) -> int:
+        """The number of measured searches."""
+        clause, values = self._where(where)
+        return self._db.execute(f"SELECT COUNT(*) FROM results{clause}", values).fetchone()[0]
+
+    def points(self, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        ### Returns
+        The operating points: the configuration columns, `search_complexity`, the median `recall`, `qps`,
+        `latency_us_mean` and `latency_us_p99` of its measurements (`None` where not measured), and their number `n`.
+        """
+        clause, values = self._where(where)
+        key_columns = _CONFIG_COLUMNS + ("search_complexity",)
+        groups: Dict[Tuple, List[sqlite3.Row]] = {}
+        for row in self._db.execute(f"SELECT * FROM results{clause}", values):
+            groups.setdefault(tuple(row[column] for column in key_columns), []).append(row)
+        points = []
+        for key, rows in groups.items():
+            point: Dict[str, Any] = dict(zip(key_columns, key))
+            for column in ("recall", "qps", "latency_us_mean", "latency_us_p99"):
+                measured = [row[column] for row in rows if row[column] is not None]
+                point[column] = float(np.median(measured)) if measured else None
+            point["n"] = len(rows)
+            points.append(point)
+        return points
+
+    def pareto_frontier(self, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        ### Returns
+        The operating points no other point beats in both recall and QPS, as `ResultsStore.points`, by increasing
+        recall (and decreasing QPS).
+        """
+        return _frontier(self.points(where))
+
+    def qps_at_recall(self, recall: float, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        The QPS of each configuration at a given recall, linearly interpolated between the two operating points of
+        its frontier around it. Below the lowest recall measured, that point's QPS is reported.
+
+        ### Parameters
+        - **recall**: The recall, as a fraction.
+        - **where**: Restricts the configurations.
+
+        ### Returns
+        The configuration columns and `qps` of every configuration reaching `recall`, by decreasing QPS.
+        """
+        _assert(0 <= recall <= 1, "recall must be a fraction in [0, 1]")
+        configurations: Dict[Tuple, List[Dict[str, Any]]] = {}
+        for point in self.points(where):
+            if point["recall"] is not None and point["qps"] is not None:
+                configurations.setdefault(tuple(point[column] for column in _CONFIG_COLUMNS), []).append(point)
+        results = []
+        for key, points in configurations.items():
+            qps = _interpolate_qps(_frontier(points), recall)
+            if qps is not None:
+                results.append(dict(zip(_CONFIG_COLUMNS, key), qps=qps))
+        return sorted(results, key=lambda result: -result["qps"])
+
+    def speedup_at_recall(self, recall: float, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        The speedup of each MCGI configuration over the baseline sharing its dataset, graph degree, build complexity
+        and search settings, comparing their `ResultsStore.qps_at_recall` instead of their QPS at equal L.
+
+        ### Parameters
+        - **recall**: The recall, as a fraction.
+        - **where**: Restricts the configurations; it must not exclude the baselines, e.g. by `variant`.
+
+        ### Returns
+        The MCGI configuration columns, its `qps`, the `baseline_qps` and `speedup`, the ratio of the two, by
+        decreasing speedup. Configurations without a baseline reaching `recall` are left out.
+        """
+        at_recall = self.qps_at_recall(recall, where)
+        baselines = {
+            tuple(result[column] for column in _BASELINE_KEY): result["qps"]
+            for result in at_recall
+            if result["variant"] == "baseline"
+        }
+        results = []
+        for result in at_recall:
+            baseline_qps = baselines.get(tuple(result[column] for column in _BASELINE_KEY))
+            if result["variant"] != "baseline" and baseline_qps:
+                results.append(dict(result, baseline_qps=baseline_qps, speedup=result["qps"] / baseline_qps))
+        return sorted(results, key=lambda result: -result["speedup"])
@@ -0,0 +1,174 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Literal, NamedTuple, Sequence
+
+from ._common import _assert
+
+__ALL__ = ["JobScheduler", "JobKind", "JobState"]
+
+JobKind = Literal["build", "search"]
+"""
+`build` jobs share the machine with each other within the scheduler's limits. A `search` job runs alone: it starts
+once every other job has finished and nothing starts while it runs, so latency and QPS are measured on a quiet machine.
+"""
+
+JobState = Literal["pending", "running", "done", "failed"]
+
+
+class _Job(NamedTuple):
+    name: str
+    kind: JobKind
+    fn: Callable
+    args: tuple
+    kwargs: dict
+    threads: int
+    memory_gb: float
+    ssd_mbps: float
+    after: tuple
+
+
+class JobScheduler:
+    """
+    Runs experiment jobs, such as index builds and benchmark searches, in worker processes, concurrently as far as
+    declared limits on CPU threads, RAM and SSD bandwidth allow.
+
+    Every job declares what it uses, e.g. a build its `-T` threads and `-M` budget. Jobs start in submission order
+    once their dependencies are done, as long as the sum of the running jobs' declarations stays within the limits.
+    A job declaring more than a limit runs on its own. `search` jobs run alone, see `JobKind`; once one is ready, no
+    new build starts until it has run.
+
+    State changes are appended to a JSON Lines ledger as they happen, with the time, the error of a failed job and
+    the return value of a done one, which must be JSON serializable. A job recorded as done there is not run again,
+    so a scheduler constructed on the same ledger after a crash or restart only runs what did not finish; jobs that
+    were running or had failed are run again.
+    """
+
+    def __init__(
+        self, ledger_file: str, max_threads: int, max_memory_gb: float, max_ssd_mbps: float = float("inf")
+    ):
+        """
+        ### Parameters
+        - **ledger_file**: The job ledger. Created if it does not exist.
+        - **max_threads**: CPU threads the running jobs may declare in total.
+        - **max_memory_gb**: RAM in GB the running jobs may declare in total.
+        - **max_ssd_mbps**: SSD bandwidth in MB/s the running jobs may declare in total. Default is unlimited.
+        """
+        _assert(max_threads > 0, "max_threads must be > 0")
+        _assert(max_memory_gb > 0, "max_memory_gb must be > 0")
+        _assert(max_ssd_mbps > 0, "max_ssd_mbps must be > 0")
+        self._ledger_file = ledger_file
+        self._limits = (max_threads, max_memory_gb, max_ssd_mbps)
+        self._jobs: Dict[str, _Job] = {}
+        self._states: Dict[str, JobState] = {}
+        if os.path.exists(ledger_file):
+            with open(ledger_file) as fh:
+                for line in fh:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._states[entry["job"]] = entry["state"]
+        # whatever did not finish before a restart is run again
+        self._states = {name: state for name, state in self._states.items() if state == "done"}
+
+    def submit(
+        self,
+        name: str,
+        fn: Callable,
+        *args: Any,
+        kind: JobKind = "build",
+        threads: int = 1,
+        memory_gb: float = 0.0,
+        ssd_mbps: float = 0.0,
+        after: Sequence[str] = (),
+        rerun: bool = False,
+        **kwargs: Any,
+    ):
+        """
+        Adds a job. It runs `fn(*args, **kwargs)` in a worker process, so `fn` and its arguments must be picklable,
+        e.g. a module level function, and what it returns is written to the ledger.
+
+        ### Parameters
+        - **name**: Identifies the job in the ledger; must be unique and stable across restarts.
+        - **fn**, **args**, **kwargs**: What the job runs.
+        - **kind**: `"build"` or `"search"`, see `JobKind`. Default is `"build"`.
+        - **threads**, **memory_gb**, **ssd_mbps**: What the job uses. Default is 1 thread and nothing else.
+        - **after**: Names of jobs that must be done first. If one fails, this job fails without running.
+        - **rerun**: Run the job even if the ledger records it as done, for jobs that skip the work they already did
+          themselves and whose work can grow between runs. Default is `False`.
+        """
+        _assert(name not in self._jobs, f"job {name} was already submitted")
+        _assert(kind in ("build", "search"), "kind must be one of 'build' or 'search'")
+        _assert(threads >= 0 and memory_gb >= 0 and ssd_mbps >= 0, "resource declarations must be >= 0")
+        for dependency in after:
+            _assert(dependency in self._jobs, f"job {name} depends on {dependency}, which was not submitted")
+        self._jobs[name] = _Job(name, kind, fn, args, kwargs, threads, memory_gb, ssd_mbps, tuple(after))
+        if rerun:
+            self._states[name] = "pending"
+        else:
+            self._states.setdefault(name, "pending")
+
+    def states(self) -> Dict[str, JobState]:
+        """The state of every submitted job."""
+        return {name: self._states[name] for name in self._jobs}
+
+    def _record(self, name: str, state: JobState, **details: Any):
+        self._states[name] = state
+        entry: Dict[str, Any] = dict(job=name, state=state, time=time.time(), **details)
+        with open(self._ledger_file, "a") as fh:
+            fh.write(json.dumps(entry) + "\n")
+
+    def _fits(self, job: _Job, running: List[_Job]) -> bool:
+        if not running:
+            return True
+        if job.kind == "search" or any(other.kind == "search" for other in running):
+            return False
+        used = [
+            sum(other.threads for other in running) + job.threads,
+            sum(other.memory_gb for other in running) + job.memory_gb,
+            sum(other.ssd_mbps for other in running) + job.ssd_mbps,
+        ]
+        return all(value <= limit for value, limit in zip(used, self._limits))
+
+    def run(self) -> Dict[str, JobState]:
+        """
+        Runs every submitted job that is not done yet and waits for all of them.
+
+        ### Returns
+        The final state of every job, as `JobScheduler.states`.
+        """
+        running: Dict[Future, _Job] = {}
+        with ProcessPoolExecutor(max_workers=self._limits[0]) as pool:
+            while True:
+                search_waiting = False
+                for job in self._jobs.values():
+                    if self._states[job.name] != "pending":
+                        continue
+                    dependencies = [self._states[dependency] for dependency in job.after]
+                    if "failed" in dependencies:
+                        self._record(job.name, "failed", error="a dependency failed")
+                        continue
+                    if any(state != "done" for state in dependencies):
+                        continue
+                    if job.kind == "build" and search_waiting:
+                        continue
+                    if not self._fits(job, list(running.values())):
+                        # a ready search drains the machine instead of waiting behind new builds
+                        search_waiting = search_waiting or job.kind == "search"
+                        continue
+                    self._record(job.name, "running")
+                    running[pool.submit(job.fn, *job.args, **job.kwargs)] = job
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        self._record(job.name, "done", result=future.result())
+                    else:
+                        self._record(job.name, "failed", error=f"{type(error).__name__}: {error}")
+        return self.states()
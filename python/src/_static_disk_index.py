@@ -1,9 +1,14 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT license.
 
+import asyncio
+import functools
+import math
+import numbers
 import os
 import warnings
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Sequence, Union
 
 import numpy as np
 
@@ -11,6 +16,9 @@ from . import (
     DistanceMetric,
     QueryResponse,
     QueryResponseBatch,
+    QueryResponseBatchWithStats,
+    QueryResponseWithStats,
+    RangeQueryResponseBatch,
     VectorDType,
     VectorLike,
     VectorLikeBatch,
@@ -25,11 +33,31 @@ from ._common import (
     _ensure_index_metadata,
     _valid_index_prefix,
     _valid_metric,
+    _valid_output_buffer,
 )
+from ._query_stats import query_stats_dtype
 
 __ALL__ = ["StaticDiskIndex"]
 
 
+def _load_labels_map(labels_map_path: str) -> Dict[str, int]:
+    labels_map = {}
+    if os.path.exists(labels_map_path):
+        with open(labels_map_path, "r") as labels_map_if:
+            for line in labels_map_if:
+                key, val = line.rstrip("\n").split("\t")
+                labels_map[key] = int(val)
+    return labels_map
+
+
+def _assert_valid_range_search_args(radius: float, min_complexity: int, max_complexity: int, beam_width: int):
+    _assert(isinstance(radius, numbers.Real) and math.isfinite(radius), "radius must be a finite number")
+    _assert_is_positive_uint32(min_complexity, "min_complexity")
+    _assert_is_positive_uint32(max_complexity, "max_complexity")
+    _assert(max_complexity >= min_complexity, "max_complexity must be >= min_complexity")
+    _assert_is_positive_uint32(beam_width, "beam_width")
+
+
 class StaticDiskIndex:
     """
     A StaticDiskIndex is a disk-backed index that is not mutable.
@@ -45,6 +73,9 @@ class StaticDiskIndex:
         vector_dtype: Optional[VectorDType] = None,
         dimensions: Optional[int] = None,
         index_prefix: str = "ann",
+        use_cache_snapshot: bool = True,
+        mmap_pq_data: bool = False,
+        prefetch_pq_data: bool = False,
     ):
         """
         ### Parameters
@@ -63,6 +94,9 @@ class StaticDiskIndex:
             - `{index_prefix}_metadata.bin`: Optional. `diskannpy` builder functions create this file to store metadata
             about the index, such as vector dtype, distance metric, number of vectors and vector dimensionality.
             If an index is built from the `diskann` cli tools, this file will not exist.
+            - `{index_prefix}_disk.index_labels.txt` and `{index_prefix}_disk.index_labels_map.txt`: Optional. Written
+              by `build_disk_index(..., filter_labels=...)`; their presence enables filtered search.
+            - `{index_prefix}_cache.bin`: Optional. A node cache snapshot, see `use_cache_snapshot`.
         - **num_threads**: Number of threads to use when searching this index. (>= 0), 0 = num_threads in system
         - **num_nodes_to_cache**: Number of nodes to cache in memory (> -1)
         - **cache_mechanism**: 1 -> use the generated sample_data.bin file for
@@ -78,6 +112,18 @@ class StaticDiskIndex:
           dimensionality. **This value is only used if a `{index_prefix}_metadata.bin` file does not exist.** If it
           does not exist, you are required to provide it.
         - **index_prefix**: The prefix of the index files. Defaults to "ann".
+        - **use_cache_snapshot**: With `cache_mechanism` 1 or 2, restore the node cache from
+          `{index_prefix}_cache.bin`, written by `StaticDiskIndex.save_cache_snapshot`, instead of computing it. The
+          snapshot is only used if it was saved for this index, as identified by the size and modification time of
+          `{index_prefix}_disk.index`, and the same `num_nodes_to_cache`; otherwise the cache is computed as usual.
+          Default is `True`.
+        - **mmap_pq_data**: Memory-map `{index_prefix}_pq_compressed.bin` read-only, with a huge page hint, instead
+          of reading it into memory. Loading no longer waits for the compressed vectors, which at a billion points
+          are tens of GB, and every process serving the index shares one page cache copy of them. Until their pages
+          are first touched, searches pay page faults instead. Not supported on Windows, where this is ignored.
+          Default is `False`.
+        - **prefetch_pq_data**: With `mmap_pq_data`, ask the kernel to read the whole file into the page cache in the
+          background instead of leaving it to page faults. Default is `False`.
         """
         index_prefix_path = _valid_index_prefix(index_directory, index_prefix)
         vector_dtype, metric, _, _ = _ensure_index_metadata(
@@ -93,6 +139,11 @@ class StaticDiskIndex:
         _assert_is_nonnegative_uint32(num_nodes_to_cache, "num_nodes_to_cache")
 
         self._vector_dtype = vector_dtype
+        self._labels_map = _load_labels_map(index_prefix_path + "_disk.index_labels_map.txt")
+        self._cache_snapshot_path = index_prefix_path + "_cache.bin"
+        # the native index holds one search scratch space per load thread; more concurrent searches just queue
+        self._num_threads = num_threads if num_threads != 0 else (os.cpu_count() or 1)
+        self._executor: Optional[ThreadPoolExecutor] = None
         if vector_dtype == np.uint8:
             _index = _native_dap.StaticDiskUInt8Index
         elif vector_dtype == np.int8:
@@ -105,11 +156,159 @@ class StaticDiskIndex:
             num_threads=num_threads,
             num_nodes_to_cache=num_nodes_to_cache,
             cache_mechanism=cache_mechanism,
+            cache_snapshot_path=self._cache_snapshot_path if use_cache_snapshot else "",
+            mmap_pq_data=mmap_pq_data,
+            prefetch_pq_data=prefetch_pq_data,
+        )
+
+    def save_cache_snapshot(self, include_contents: bool = True) -> str:
+        """
+        Saves the nodes this index currently caches to `{index_prefix}_cache.bin`, so that later instances constructed
+        with the same `num_nodes_to_cache` restore the same cache instead of recomputing it, which for
+        `cache_mechanism=1` means a beam search over every sample query.
+
+        ### Parameters
+        - **include_contents**: Also save the cached coordinates and neighbor lists, so that loading is a single
+          sequential read instead of one random read per cached node. Default is `True`.
+
+        ### Returns
+        The path of the snapshot.
+        """
+        self._index.save_cache_snapshot(
+            cache_snapshot_path=self._cache_snapshot_path, with_contents=include_contents
+        )
+        return self._cache_snapshot_path
+
+    def record_visits(self, sample_rate: float = 0.01):
+        """
+        Starts counting, per node, how often the searches this index serves visit it, so that `rebuild_cache` can
+        cache the nodes real queries need instead of those of the build time sample queries.
+
+        Only a sample of the searches counts its visits; while recording, every other search pays a single atomic
+        increment.
+
+        ### Parameters
+        - **sample_rate**: The fraction of searches to count, in [0, 1]. 0 stops recording; the counts collected so
+          far are kept. Default is 0.01.
+        """
+        _assert(
+            isinstance(sample_rate, numbers.Real) and 0 <= sample_rate <= 1, "sample_rate must be a number in [0, 1]"
+        )
+        self._index.set_visit_counting(sample_period=0 if sample_rate == 0 else max(1, round(1 / sample_rate)))
+
+    def visit_counts(self, reset: bool = False) -> np.ndarray:
+        """
+        ### Parameters
+        - **reset**: Also reset the counts to 0, e.g. to start a fresh window. Default is `False`.
+
+        ### Returns
+        A `numpy.uint32` array with the number of counted visits of every node, indexed by node id.
+        """
+        return self._index.visit_counts(reset=reset)
+
+    def count_visits(
+        self, queries: VectorLikeBatch, complexity: int, beam_width: int = 2, num_threads: int = 0
+    ) -> np.ndarray:
+        """
+        Searches a batch of queries, e.g. a recent query log, and counts the nodes every one of them visits. The
+        counts are this call's own: searches served meanwhile are not in them, and they are not added to the counts
+        `record_visits` collects.
+
+        ### Parameters
+        - **queries**: 2d numpy array of queries, as for `StaticDiskIndex.batch_search`.
+        - **complexity**: The search complexity used while serving; the visited nodes depend on it.
+        - **beam_width**: The beamwidth used while serving. Default is 2.
+        - **num_threads**: Number of threads to use. (>= 0), 0 = num_threads in system. Default is 0.
+
+        ### Returns
+        A `numpy.uint32` array with the number of visits of every node by these queries, indexed by node id. Pass it
+        as `rebuild_cache(..., visit_counts=...)`.
+        """
+        _queries = _castable_dtype_or_raise(queries, expected=self._vector_dtype)
+        _assert_2d(_queries, "queries")
+        _assert_is_positive_uint32(complexity, "complexity")
+        _assert_is_positive_uint32(beam_width, "beam_width")
+        _assert_is_nonnegative_uint32(num_threads, "num_threads")
+        return self._index.count_visits(
+            queries=_queries,
+            num_queries=_queries.shape[0],
+            complexity=complexity,
+            beam_width=beam_width,
+            num_threads=num_threads,
+        )
+
+    def rebuild_cache(self, memory_budget: float, visit_counts: Optional[np.ndarray] = None) -> int:
+        """
+        Replaces the node cache with the most visited nodes that fit a memory budget. Searches running meanwhile
+        finish first, and searches issued meanwhile wait until the new cache is loaded.
+
+        ### Parameters
+        - **memory_budget**: Memory the cache may use, in GB. Each cached node takes its full precision vector plus
+          its neighbor list.
+        - **visit_counts**: Visits per node, e.g. from `count_visits`. Default is `None`, which uses the counts
+          `record_visits` collected.
+
+        ### Returns
+        The number of nodes now cached. Nodes never visited are not cached, so this can be below the budget.
+        """
+        _assert(memory_budget >= 0, "memory_budget must be >= 0")
+        counts = self.visit_counts() if visit_counts is None else visit_counts
+        _assert(
+            isinstance(counts, np.ndarray) and counts.ndim == 1 and counts.shape[0] == self._index.num_points(),
+            "visit_counts must be a 1d numpy array with one count per node",
+        )
+        num_nodes = min(int(memory_budget * 1024**3) // self._index.cache_bytes_per_node(), np.count_nonzero(counts))
+        hottest = np.argsort(counts, kind="stable")[::-1][:num_nodes].astype(np.uint32)
+        self._index.load_cache_list(node_ids=hottest)
+        return num_nodes
+
+    def set_dynamic_cache(self, memory_budget: float):
+        """
+        Sets up a dynamic node cache next to the static one. Every node the search reads from the SSD is admitted,
+        and nodes are evicted CLOCK style: an entry survives as long as searches keep hitting it, and nodes read
+        only once leave first. This follows a shifting workload, where the static cache only serves the nodes chosen
+        when it was loaded. Replacing or removing the cache drops its contents and counters.
+
+        ### Parameters
+        - **memory_budget**: Memory the dynamic cache may use, in GB. Each entry holds the sectors of one node. 0
+          removes the dynamic cache.
+        """
+        _assert(memory_budget >= 0, "memory_budget must be >= 0")
+        self._index.set_dynamic_cache(capacity_bytes=int(memory_budget * 1024**3))
+
+    def dynamic_cache_stats(self, reset: bool = False) -> Dict[str, int]:
+        """
+        ### Parameters
+        - **reset**: Also reset the hit, miss, insertion and eviction counts to 0. Default is `False`.
+
+        ### Returns
+        A `dict` with the dynamic cache's `"hits"`, `"misses"`, `"insertions"` and `"evictions"` since it was set up
+        or last reset, and its current `"num_entries"` out of `"capacity_entries"`. All 0 without a dynamic cache.
+        Dynamic cache hits are also counted in the `n_cache_hits` query statistic.
+        """
+        return self._index.dynamic_cache_stats(reset=reset)
+
+    def _filters(self, filter_labels: Sequence[str]) -> np.ndarray:
+        _assert(
+            len(self._labels_map) > 0,
+            "filter labels were provided, but this index was not built with filter_labels",
         )
+        unknown = [label for label in filter_labels if label not in self._labels_map]
+        _assert(
+            len(unknown) == 0,
+            f"the external(str)->internal(np.uint32) labels map does not include the filter labels {unknown[:10]}",
+        )
+        return np.array([self._labels_map[label] for label in filter_labels], dtype=np.uint32)
 
     def search(
-        self, query: VectorLike, k_neighbors: int, complexity: int, beam_width: int = 2
-    ) -> QueryResponse:
+        self,
+        query: VectorLike,
+        k_neighbors: int,
+        complexity: int,
+        beam_width: int = 2,
+        return_stats: bool = False,
+        filter_label: str = "",
+    ) -> Union[QueryResponse, QueryResponseWithStats]:
         """
         Searches the index by a single query vector.
 
@@ -125,6 +324,15 @@ class StaticDiskIndex:
           throughput with a fixed SSD IOps rating, use W=1. For best latency, use W=4,8 or higher complexity search.
           Specifying 0 will optimize the beamwidth depending on the number of threads performing search, but will
           involve some tuning overhead.
+        - **return_stats**: Also return the statistics the search collects, such as its number of IOs, hops, cache
+          hits and its IO and CPU time. See `query_stats_dtype`. Default is `False`.
+        - **filter_label**: Only return points carrying this label, for indices built with
+          `build_disk_index(..., filter_labels=...)`. If fewer than `k_neighbors` such points are found, the remaining
+          identifiers are `numpy.iinfo(numpy.uint32).max` with distance `numpy.finfo(numpy.float32).max`. Default is
+          "", which does not filter.
+
+        ### Returns
+        A `QueryResponse`, or a `QueryResponseWithStats` with `return_stats=True`.
         """
         _query = _castable_dtype_or_raise(query, expected=self._vector_dtype)
         _assert(len(_query.shape) == 1, "query vector must be 1-d")
@@ -138,12 +346,18 @@ class StaticDiskIndex:
             )
             complexity = k_neighbors
 
+        filters = self._filters([filter_label]) if filter_label != "" else np.empty(0, dtype=np.uint32)
+        stats = np.zeros(1 if return_stats else 0, dtype=query_stats_dtype)
         neighbors, distances = self._index.search(
             query=_query,
             knn=k_neighbors,
             complexity=complexity,
             beam_width=beam_width,
+            filters=filters,
+            stats=stats,
         )
+        if return_stats:
+            return QueryResponseWithStats(identifiers=neighbors, distances=distances, stats=stats[0])
         return QueryResponse(identifiers=neighbors, distances=distances)
 
     def batch_search(
@@ -153,7 +367,11 @@ class StaticDiskIndex:
         complexity: int,
         num_threads: int,
         beam_width: int = 2,
-    ) -> QueryResponseBatch:
+        out_ids: Optional[np.ndarray] = None,
+        out_dists: Optional[np.ndarray] = None,
+        return_stats: bool = False,
+        filter_labels: Optional[Sequence[str]] = None,
+    ) -> Union[QueryResponseBatch, QueryResponseBatchWithStats]:
         """
         Searches the index by a batch of query vectors.
 
@@ -173,6 +391,18 @@ class StaticDiskIndex:
           throughput with a fixed SSD IOps rating, use W=1. For best latency, use W=4,8 or higher complexity search.
           Specifying 0 will optimize the beamwidth depending on the number of threads performing search, but will
           involve some tuning overhead.
+        - **out_ids**: Optional preallocated `numpy.uint32` array of shape `(number_of_queries, k_neighbors)` that the
+          identifiers are written into and returned as, so repeated calls can reuse one buffer. Must be writeable and
+          C-contiguous. Default is `None`, which allocates a new array.
+        - **out_dists**: Same as `out_ids`, for the `numpy.float32` distances.
+        - **return_stats**: Also return the statistics each query's search collects, such as its number of IOs, hops,
+          cache hits and its IO and CPU time. See `query_stats_dtype`. Default is `False`.
+        - **filter_labels**: One label per query, restricting each query to the points carrying its label. See
+          `StaticDiskIndex.search`'s `filter_label`. Default is `None`, which does not filter.
+
+        ### Returns
+        A `QueryResponseBatch`, or a `QueryResponseBatchWithStats` with one stats record per query with
+        `return_stats=True`. Aggregate them with `summarize_query_stats`.
         """
         _queries = _castable_dtype_or_raise(queries, expected=self._vector_dtype)
         _assert_2d(_queries, "queries")
@@ -188,6 +418,14 @@ class StaticDiskIndex:
             complexity = k_neighbors
 
         num_queries, dim = _queries.shape
+        out_ids = _valid_output_buffer(out_ids, np.uint32, (num_queries, k_neighbors), "out_ids")
+        out_dists = _valid_output_buffer(out_dists, np.float32, (num_queries, k_neighbors), "out_dists")
+        if filter_labels is not None:
+            _assert(len(filter_labels) == num_queries, "filter_labels must hold exactly one label per query")
+            filters = self._filters(filter_labels)
+        else:
+            filters = np.empty(0, dtype=np.uint32)
+        stats = np.zeros(num_queries if return_stats else 0, dtype=query_stats_dtype)
         neighbors, distances = self._index.batch_search(
             queries=_queries,
             num_queries=num_queries,
@@ -195,5 +433,145 @@ class StaticDiskIndex:
             complexity=complexity,
             beam_width=beam_width,
             num_threads=num_threads,
+            ids=out_ids,
+            dists=out_dists,
+            filters=filters,
+            stats=stats,
         )
+        if return_stats:
+            return QueryResponseBatchWithStats(identifiers=neighbors, distances=distances, stats=stats)
         return QueryResponseBatch(identifiers=neighbors, distances=distances)
+
+    def range_search(
+        self, query: VectorLike, radius: float, min_complexity: int, max_complexity: int, beam_width: int = 2
+    ) -> QueryResponse:
+        """
+        Searches the index for every vector within `radius` of a single query vector.
+
+        The search starts with a candidate list of `min_complexity` and doubles it while at least half of the list is
+        within the radius, up to `max_complexity`. The number of results is therefore bounded by `max_complexity`.
+
+        ### Parameters
+        - **query**: 1d numpy array of the same dimensionality and dtype of the index.
+        - **radius**: Maximum distance of a result, compared against the same distances `StaticDiskIndex.search`
+          returns, i.e. squared euclidean distances for "l2".
+        - **min_complexity**: Initial size of the candidate list. Must be > 0.
+        - **max_complexity**: Largest size the candidate list is doubled up to. Must be >= min_complexity.
+        - **beam_width**: Minimum beamwidth to be used for search. The search widens the beam to a fifth of the
+          candidate list size, up to 100. Default is 2.
+
+        ### Returns
+        A `QueryResponse` with as many identifiers and distances as were found within the radius, sorted by distance.
+        """
+        _query = _castable_dtype_or_raise(query, expected=self._vector_dtype)
+        _assert(len(_query.shape) == 1, "query vector must be 1-d")
+        _assert_valid_range_search_args(radius, min_complexity, max_complexity, beam_width)
+
+        neighbors, distances = self._index.range_search(
+            query=_query,
+            radius=radius,
+            min_complexity=min_complexity,
+            max_complexity=max_complexity,
+            beam_width=beam_width,
+        )
+        return QueryResponse(identifiers=neighbors, distances=distances)
+
+    def batch_range_search(
+        self,
+        queries: VectorLikeBatch,
+        radius: float,
+        min_complexity: int,
+        max_complexity: int,
+        num_threads: int,
+        beam_width: int = 2,
+    ) -> RangeQueryResponseBatch:
+        """
+        Searches the index for every vector within `radius` of each of a batch of query vectors, in parallel.
+
+        ### Parameters
+        - **queries**: 2d numpy array, with column dimensionality matching the index and row dimensionality being the
+          number of queries intended to search for in parallel. Dtype must match dtype of the index.
+        - **radius**, **min_complexity**, **max_complexity**, **beam_width**: See `StaticDiskIndex.range_search`.
+        - **num_threads**: Number of threads to use when searching this index. (>= 0), 0 = num_threads in system
+
+        ### Returns
+        A `RangeQueryResponseBatch` holding the results of all queries in compressed sparse row layout.
+        """
+        _queries = _castable_dtype_or_raise(queries, expected=self._vector_dtype)
+        _assert_2d(_queries, "queries")
+        _assert_valid_range_search_args(radius, min_complexity, max_complexity, beam_width)
+        _assert_is_nonnegative_uint32(num_threads, "num_threads")
+
+        num_queries, dim = _queries.shape
+        offsets, neighbors, distances = self._index.batch_range_search(
+            queries=_queries,
+            num_queries=num_queries,
+            radius=radius,
+            min_complexity=min_complexity,
+            max_complexity=max_complexity,
+            beam_width=beam_width,
+            num_threads=num_threads,
+        )
+        return RangeQueryResponseBatch(offsets=offsets, identifiers=neighbors, distances=distances)
+
+    def _search_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._num_threads, thread_name_prefix="diskannpy-search"
+            )
+        return self._executor
+
+    async def search_async(
+        self,
+        query: VectorLike,
+        k_neighbors: int,
+        complexity: int,
+        beam_width: int = 2,
+        return_stats: bool = False,
+        filter_label: str = "",
+    ) -> Union[QueryResponse, QueryResponseWithStats]:
+        """
+        Coroutine version of `StaticDiskIndex.search`, with the same parameters and response.
+
+        The search runs on a pool of `num_threads` worker threads owned by this index, and the native search releases
+        the GIL while it waits on the SSD, so a single event loop can keep many disk queries in flight. Searches
+        beyond `num_threads` concurrent ones wait for a free worker.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._search_executor(),
+            functools.partial(self.search, query, k_neighbors, complexity, beam_width, return_stats, filter_label),
+        )
+
+    async def batch_search_async(
+        self,
+        queries: VectorLikeBatch,
+        k_neighbors: int,
+        complexity: int,
+        num_threads: int,
+        beam_width: int = 2,
+        out_ids: Optional[np.ndarray] = None,
+        out_dists: Optional[np.ndarray] = None,
+        return_stats: bool = False,
+        filter_labels: Optional[Sequence[str]] = None,
+    ) -> Union[QueryResponseBatch, QueryResponseBatchWithStats]:
+        """
+        Coroutine version of `StaticDiskIndex.batch_search`, with the same parameters and response. Runs on the same
+        worker pool as `StaticDiskIndex.search_async`.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._search_executor(),
+            functools.partial(
+                self.batch_search,
+                queries,
+                k_neighbors,
+                complexity,
+                num_threads,
+                beam_width,
+                out_ids,
+                out_dists,
+                return_stats,
+                filter_labels,
+            ),
+        )
@@ -25,6 +25,7 @@ from ._common import (
     _ensure_index_metadata,
     _valid_index_prefix,
     _valid_metric,
+    _valid_output_buffer,
 )
 
 __ALL__ = ["StaticMemoryIndex"]
@@ -184,6 +185,8 @@ class StaticMemoryIndex:
         k_neighbors: int,
         complexity: int,
         num_threads: int,
+        out_ids: Optional[np.ndarray] = None,
+        out_dists: Optional[np.ndarray] = None,
     ) -> QueryResponseBatch:
         """
         Searches the index by a batch of query vectors.
@@ -198,6 +201,10 @@ class StaticMemoryIndex:
         - **complexity**: Size of distance ordered list of candidate neighbors to use while searching. List size
           increases accuracy at the cost of latency. Must be at least k_neighbors in size.
         - **num_threads**: Number of threads to use when searching this index. (>= 0), 0 = num_threads in system
+        - **out_ids**: Optional preallocated `numpy.uint32` array of shape `(number_of_queries, k_neighbors)` that the
+          identifiers are written into and returned as, so repeated calls can reuse one buffer. Must be writeable and
+          C-contiguous. Default is `None`, which allocates a new array.
+        - **out_dists**: Same as `out_ids`, for the `numpy.float32` distances.
         """
 
         _queries = _castable_dtype_or_raise(queries, expected=self._vector_dtype)
@@ -218,11 +225,15 @@ class StaticMemoryIndex:
             complexity = k_neighbors
 
         num_queries, dim = _queries.shape
+        out_ids = _valid_output_buffer(out_ids, np.uint32, (num_queries, k_neighbors), "out_ids")
+        out_dists = _valid_output_buffer(out_dists, np.float32, (num_queries, k_neighbors), "out_dists")
         neighbors, distances = self._index.batch_search(
             queries=_queries,
             num_queries=num_queries,
             knn=k_neighbors,
             complexity=complexity,
             num_threads=num_threads,
+            ids=out_ids,
+            dists=out_dists,
         )
         return QueryResponseBatch(identifiers=neighbors, distances=distances)
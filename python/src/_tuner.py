@@ -0,0 +1,297 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import copy
+import json
+import math
+import os
+import shutil
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import defaults
+from ._artifact_cache import ArtifactCache
+from ._benchmark import SweepBuild, SweepDataset, SweepRunner, SweepSpec, compute_ground_truth
+from ._common import _assert
+from ._files import gen_random_slice, vectors_from_file, vectors_metadata_from_file
+from ._results_store import _frontier, _interpolate_qps
+
+__ALL__ = ["SweepTuner", "TuningRung", "TuningResult"]
+
+# exploration share of the initial candidates when a model picks the rest
+_EXPLORE = 0.25
+_RIDGE = 1.0
+
+
+class TuningRung(NamedTuple):
+    """One round of successive halving: the configurations evaluated on one slice of the data set."""
+
+    sampling_rate: float
+    num_points: int
+    lid_stats: Dict[str, float]
+    """ `mean`, `median` and `std` of the LID of the slice. """
+    scores: Dict[str, Tuple[float, float]]
+    """ `SweepBuild.name` of each configuration to its QPS at the target recall (0 if not reached) and best recall. """
+
+
+class TuningResult(NamedTuple):
+    best: SweepBuild
+    qps: float
+    """ QPS of `best` at the target recall on the last rung, 0 if no configuration reached it. """
+    recall: float
+    """ The best recall `best` reached on the last rung. """
+    builds: int
+    relative_cost: float
+    """ The points indexed by all builds, relative to building the whole grid on the whole data set. """
+    grid_size: int
+    rungs: List[TuningRung]
+
+
+def _lid_stats(lid_file: str) -> Dict[str, float]:
+    lid = vectors_from_file(lid_file, np.float32)[:, 0]
+    return dict(mean=float(lid.mean()), median=float(np.median(lid)), std=float(lid.std()))
+
+
+def _features(build: SweepBuild, num_points: int, lid_stats: Dict[str, float]) -> np.ndarray:
+    # a baseline is a build with alpha fixed at the default
+    mcgi = build.alpha_min is not None
+    alpha_min = build.alpha_min if mcgi else defaults.ALPHA
+    alpha_max = build.alpha_max if mcgi else defaults.ALPHA
+    return np.array(
+        [
+            build.graph_degree,
+            build.build_complexity,
+            alpha_min,
+            alpha_max,
+            float(mcgi),
+            math.log10(num_points),
+            lid_stats["mean"],
+            lid_stats["std"],
+            (alpha_max - alpha_min) * lid_stats["mean"],
+            build.graph_degree * lid_stats["mean"],
+        ],
+        dtype=np.float64,
+    )
+
+
+class _Surrogate:
+    """Ridge regression of log(1 + QPS at the target recall) on `_features`."""
+
+    def __init__(self, features: np.ndarray, scores: np.ndarray):
+        self._mean = features.mean(axis=0)
+        self._std = features.std(axis=0)
+        self._std[self._std == 0] = 1
+        x = self._design(features)
+        ridge = _RIDGE * np.eye(x.shape[1])
+        ridge[0, 0] = 0
+        self._weights = np.linalg.solve(x.T @ x + ridge, x.T @ np.log1p(scores))
+
+    def _design(self, features: np.ndarray) -> np.ndarray:
+        return np.hstack([np.ones((features.shape[0], 1)), (features - self._mean) / self._std])
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return np.expm1(self._design(features) @ self._weights)
+
+
+def _score(records: List[Dict[str, Any]], recall: float) -> Tuple[float, float]:
+    # the best over the search settings (W, T, cache) of the spec
+    settings: Dict[Tuple, List[Dict[str, Any]]] = {}
+    for record in records:
+        key = (record["beam_width"], record["num_threads"], record["num_nodes_to_cache"])
+        settings.setdefault(key, []).append(record)
+    qps = max(_interpolate_qps(_frontier(points), recall) or 0.0 for points in settings.values())
+    return qps, max(record["recall"] for record in records)
+
+
+class SweepTuner:
+    """
+    Finds a near optimal build configuration, among the grid of a `SweepSpec`, in a fraction of the builds of the
+    grid search, by successive halving over random slices of the data set:
+
+    - The candidates are built and searched on a small random slice (`gen_random_slice`) with its own ground truth,
+      and ranked by their QPS at the target recall, interpolated over the spec's search complexities, or by recall
+      if they do not reach it.
+    - The best `1 / eta` of them are promoted to the next, larger slice, up to the whole data set.
+
+    Every evaluation is also kept as an observation: the configuration, slice size and LID statistics of the slice,
+    and the score. Once there are enough observations for the target recall, from earlier tunings of any data set,
+    a ridge regression of the score on them picks most of the initial candidates, and random picks the rest.
+
+    Indices, records (see `SweepRunner`), slices and observations live in `work_directory`, so an interrupted tuning
+    resumes where it stopped and later tunings learn from earlier ones.
+    """
+
+    def __init__(
+        self,
+        spec: SweepSpec,
+        work_directory: str,
+        target_recall: float,
+        sampling_rates: Sequence[float] = (0.05, 0.25, 1.0),
+        eta: int = 3,
+        num_initial: Optional[int] = None,
+        keep_indices: bool = False,
+        seed: int = 0,
+        artifact_cache: Optional[ArtifactCache] = None,
+    ):
+        """
+        ### Parameters
+        - **spec**: Its builds are the grid searched, its searches how each configuration is scored.
+        - **work_directory**: Directory of the indices, records, slices and observations. Created if it does not
+          exist.
+        - **target_recall**: The k-recall@k, as a fraction, at which configurations are compared.
+        - **sampling_rates**: The fraction of the data set indexed in each round, increasing. Default is
+          (0.05, 0.25, 1.0).
+        - **eta**: One in `eta` configurations is promoted to the next round. Default is 3.
+        - **num_initial**: The number of configurations evaluated in the first round. Default is `None`, which is the
+          whole grid.
+        - **keep_indices**: Keep the indices of configurations that were not promoted. Default is `False`.
+        - **seed**: Seed of the slices and of the random picks. Default is 0.
+        - **artifact_cache**: Cache LID files are taken from. Default is `None`, which is an `ArtifactCache` in
+          `{work_directory}/cache`.
+        """
+        _assert(0 < target_recall <= 1, "target_recall must be a fraction in (0, 1]")
+        _assert(len(sampling_rates) > 0, "sampling_rates must not be empty")
+        _assert(
+            all(0 < rate <= 1 for rate in sampling_rates) and list(sampling_rates) == sorted(set(sampling_rates)),
+            "sampling_rates must be increasing and in (0, 1]",
+        )
+        _assert(eta >= 2, "eta must be >= 2")
+        _assert(num_initial is None or num_initial > 0, "num_initial must be > 0")
+        self.spec = spec
+        self.work_directory = work_directory
+        os.makedirs(os.path.join(work_directory, "slices"), exist_ok=True)
+        self.target_recall = target_recall
+        self.sampling_rates = list(sampling_rates)
+        self.eta = eta
+        self.num_initial = num_initial
+        self.keep_indices = keep_indices
+        self.seed = seed
+        self.artifact_cache = artifact_cache or ArtifactCache(os.path.join(work_directory, "cache"))
+        self.observations_file = os.path.join(work_directory, "observations.jsonl")
+
+    def observations(self) -> List[Dict[str, Any]]:
+        """Every evaluation so far, of any data set and target recall; a resumed evaluation counts once."""
+        if not os.path.exists(self.observations_file):
+            return []
+        observations = {}
+        with open(self.observations_file) as fh:
+            for line in filter(str.strip, fh):
+                observation = json.loads(line)
+                key = tuple(observation[field] for field in SweepBuild._fields + ("num_points", "target_recall"))
+                observations[key] = observation
+        return list(observations.values())
+
+    def _surrogate(self) -> Optional[_Surrogate]:
+        observations = [o for o in self.observations() if o["target_recall"] == self.target_recall]
+        features = [
+            _features(SweepBuild(*(o[field] for field in SweepBuild._fields)), o["num_points"], o["lid_stats"])
+            for o in observations
+        ]
+        # too few observations to fit the model on
+        if not features or len(features) < 2 * len(features[0]):
+            return None
+        return _Surrogate(np.stack(features), np.array([o["qps"] for o in observations]))
+
+    def _slice(self, dataset: SweepDataset, sampling_rate: float) -> SweepDataset:
+        if sampling_rate == 1:
+            return dataset
+        # the seed is part of the name, which keys the indices, records and observations of the slice
+        name = f"{dataset.name}_p{sampling_rate:g}_s{self.seed}"
+        prefix = os.path.join(self.work_directory, "slices", name)
+        ground_truth = prefix + "_gt.bin"
+        if not os.path.exists(ground_truth):
+            # the ground truth is written last, so it marks a complete slice
+            gen_random_slice(dataset.base, dataset.vector_dtype, sampling_rate, prefix, seed=self.seed)
+            compute_ground_truth(
+                prefix + "_data.bin", dataset.queries, ground_truth + ".partial", self.spec.k_neighbors,
+                dataset.vector_dtype, dataset.distance_metric,
+            )
+            os.replace(ground_truth + ".partial", ground_truth)
+        return dataset._replace(name=name, base=prefix + "_data.bin", ground_truth=ground_truth)
+
+    def _initial(self, grid: List[SweepBuild], num_points: int, lid_stats: Dict[str, float]) -> List[SweepBuild]:
+        num_initial = min(self.num_initial or len(grid), len(grid))
+        if num_initial == len(grid):
+            return grid
+        rng = np.random.default_rng(self.seed)
+        surrogate = self._surrogate()
+        if surrogate is None:
+            picks = rng.choice(len(grid), size=num_initial, replace=False)
+            return [grid[i] for i in sorted(picks)]
+        predicted = surrogate.predict(np.stack([_features(build, num_points, lid_stats) for build in grid]))
+        num_exploit = num_initial - int(round(num_initial * _EXPLORE))
+        exploit = list(np.argsort(-predicted, kind="stable")[:num_exploit])
+        rest = [i for i in range(len(grid)) if i not in exploit]
+        explore = list(rng.choice(rest, size=num_initial - num_exploit, replace=False)) if rest else []
+        return [grid[i] for i in sorted(exploit + explore)]
+
+    def _evaluate(
+        self, dataset: SweepDataset, candidates: List[SweepBuild], lid_stats: Dict[str, float], num_points: int
+    ) -> Dict[SweepBuild, Tuple[float, float]]:
+        rung_spec = copy.copy(self.spec)
+        rung_spec.datasets = [dataset]
+        runner = SweepRunner(rung_spec, self.work_directory, artifact_cache=self.artifact_cache)
+        scores = {}
+        for candidate in candidates:
+            build = candidate._replace(dataset=dataset.name)
+            for _ in runner.run_build(build):
+                pass
+            records = [r for r in runner.records() if tuple(r[f] for f in SweepBuild._fields) == tuple(build)]
+            scores[candidate] = _score(records, self.target_recall)
+            observation = dict(
+                build._asdict(),
+                num_points=num_points,
+                lid_stats=lid_stats,
+                target_recall=self.target_recall,
+                qps=scores[candidate][0],
+                recall=scores[candidate][1],
+            )
+            with open(self.observations_file, "a") as fh:
+                fh.write(json.dumps(observation) + "\n")
+        return scores
+
+    def tune(self, dataset_name: str) -> TuningResult:
+        """
+        Tunes the build configuration of one data set of the spec.
+
+        ### Returns
+        The best configuration of the last round and what finding it took, see `TuningResult`.
+        """
+        dataset = self.spec.dataset(dataset_name)
+        grid = [build for build in self.spec.builds() if build.dataset == dataset_name]
+        full_points = int(vectors_metadata_from_file(dataset.base).num_vectors)
+        candidates: List[SweepBuild] = []
+        rungs: List[TuningRung] = []
+        builds = 0
+        cost = 0.0
+        for round_index, sampling_rate in enumerate(self.sampling_rates):
+            rung_dataset = self._slice(dataset, sampling_rate)
+            num_points = int(vectors_metadata_from_file(rung_dataset.base).num_vectors)
+            _assert(num_points >= self.spec.k_neighbors, f"the {sampling_rate:g} slice is smaller than k")
+            lid = self.artifact_cache.lid(rung_dataset.base, rung_dataset.vector_dtype, k=self.spec.lid_k)
+            lid_stats = _lid_stats(lid)
+            if round_index == 0:
+                candidates = self._initial(grid, num_points, lid_stats)
+            scores = self._evaluate(rung_dataset, candidates, lid_stats, num_points)
+            builds += len(candidates)
+            cost += len(candidates) * num_points / full_points
+            rungs.append(
+                TuningRung(
+                    sampling_rate,
+                    num_points,
+                    lid_stats,
+                    {candidate._replace(dataset=rung_dataset.name).name: score for candidate, score in scores.items()},
+                )
+            )
+            ranked = sorted(candidates, key=lambda candidate: scores[candidate], reverse=True)
+            last = round_index == len(self.sampling_rates) - 1
+            survivors = ranked if last else ranked[: math.ceil(len(ranked) / self.eta)]
+            if not self.keep_indices:
+                for candidate in ranked[len(survivors) :]:
+                    index_directory = candidate._replace(dataset=rung_dataset.name).name
+                    shutil.rmtree(os.path.join(self.work_directory, index_directory), ignore_errors=True)
+            candidates = survivors
+        best = candidates[0]
+        qps, recall = scores[best]
+        return TuningResult(best, qps, recall, builds, cost / len(grid), len(grid), rungs)
@@ -9,27 +9,82 @@
 
 namespace diskannpy
 {
+typedef py::array_t<float, py::array::c_style | py::array::forcecast> LidArray;
+
+// Builds the MCGI context owned by a single build; nullptr when mcgi_mode is OFF and no LID is to be written
+std::shared_ptr<const diskann::MCGIContext> make_mcgi_context(const diskann::MCGIMode mcgi_mode,
+                                                              const std::string &lid_file_path,
+                                                              const LidArray &lid_values, const float alpha_min,
+                                                              const float alpha_max, const bool use_linear,
+                                                              const float lid_avg, const float lid_std,
+                                                              const bool write_lid)
+{
+    std::shared_ptr<diskann::MCGIContext> mcgi_context = nullptr;
+    if (mcgi_mode == diskann::MCGIMode::ADVANCED)
+    {
+        mcgi_context = diskann::CreateAMCGIContext(lid_avg, lid_std, alpha_min, alpha_max);
+    }
+    else if (mcgi_mode == diskann::MCGIMode::STATIC)
+    {
+        // an in-memory LID array takes precedence, so numpy callers never round-trip through a file
+        if (lid_values.size() > 0)
+            mcgi_context = diskann::CreateMCGIContext(lid_values.data(), (size_t)lid_values.size(), alpha_min,
+                                                      alpha_max, use_linear);
+        else
+            mcgi_context = diskann::CreateMCGIContext(lid_file_path, alpha_min, alpha_max, use_linear);
+        if (mcgi_context == nullptr)
+            throw std::runtime_error("MCGI context could not be initialized from the provided LID values");
+    }
+    else if (write_lid)
+    {
+        mcgi_context = diskann::CreateLIDRecordingContext();
+    }
+
+    if (mcgi_context != nullptr)
+        mcgi_context->record_lid = write_lid;
+    return mcgi_context;
+}
+
 template <typename DT>
 void build_disk_index(const diskann::Metric metric, const std::string &data_file_path,
                       const std::string &index_prefix_path, const uint32_t complexity, const uint32_t graph_degree,
                       const double final_index_ram_limit, const double indexing_ram_budget, const uint32_t num_threads,
-                      const uint32_t pq_disk_bytes)
+                      const uint32_t pq_disk_bytes, const std::string &filter_labels_file,
+                      const std::string &universal_label, const uint32_t filter_complexity,
+                      const diskann::MCGIMode mcgi_mode, const std::string &lid_file_path, const LidArray &lid_values,
+                      const float alpha_min, const float alpha_max, const bool use_linear, const float lid_avg,
+                      const float lid_std, const bool write_lid)
 {
     std::string params = std::to_string(graph_degree) + " " + std::to_string(complexity) + " " +
                          std::to_string(final_index_ram_limit) + " " + std::to_string(indexing_ram_budget) + " " +
                          std::to_string(num_threads);
     if (pq_disk_bytes > 0)
         params = params + " " + std::to_string(pq_disk_bytes);
-    diskann::build_disk_index<DT>(data_file_path.c_str(), index_prefix_path.c_str(), params.c_str(), metric);
+    // made while the GIL is held: it copies lid_values out of the numpy array
+    auto mcgi_context =
+        make_mcgi_context(mcgi_mode, lid_file_path, lid_values, alpha_min, alpha_max, use_linear, lid_avg, lid_std,
+                          write_lid);
+    // builds started from several Python threads run in parallel
+    py::gil_scoped_release release;
+    // no filter threshold: points keep all their labels instead of being split into dummy points
+    diskann::build_disk_index<DT>(data_file_path.c_str(), index_prefix_path.c_str(), params.c_str(), metric, false,
+                                  "", !filter_labels_file.empty(), filter_labels_file, universal_label, 0,
+                                  filter_complexity, mcgi_context);
 }
 
 template void build_disk_index<float>(diskann::Metric, const std::string &, const std::string &, uint32_t, uint32_t,
-                                      double, double, uint32_t, uint32_t);
+                                      double, double, uint32_t, uint32_t, const std::string &, const std::string &,
+                                      uint32_t, diskann::MCGIMode, const std::string &, const LidArray &, float, float,
+                                      bool, float, float, bool);
 
 template void build_disk_index<uint8_t>(diskann::Metric, const std::string &, const std::string &, uint32_t, uint32_t,
-                                        double, double, uint32_t, uint32_t);
+                                        double, double, uint32_t, uint32_t, const std::string &, const std::string &,
+                                        uint32_t, diskann::MCGIMode, const std::string &, const LidArray &, float,
+                                        float, bool, float, float, bool);
 template void build_disk_index<int8_t>(diskann::Metric, const std::string &, const std::string &, uint32_t, uint32_t,
-                                       double, double, uint32_t, uint32_t);
+                                       double, double, uint32_t, uint32_t, const std::string &, const std::string &,
+                                       uint32_t, diskann::MCGIMode, const std::string &, const LidArray &, float, float,
+                                       bool, float, float, bool);
 
 template <typename T, typename TagT, typename LabelT>
 std::string prepare_filtered_label_map(diskann::Index<T, TagT, LabelT> &index, const std::string &index_output_path,
@@ -61,13 +116,22 @@ void build_memory_index(const diskann::Metric metric, const std::string &vector_
                         const float alpha, const uint32_t num_threads, const bool use_pq_build,
                         const size_t num_pq_bytes, const bool use_opq, const bool use_tags,
                         const std::string &filter_labels_file, const std::string &universal_label,
-                        const uint32_t filter_complexity)
+                        const uint32_t filter_complexity, const diskann::MCGIMode mcgi_mode,
+                        const std::string &lid_file_path, const LidArray &lid_values, const float alpha_min,
+                        const float alpha_max, const bool use_linear, const float lid_avg, const float lid_std,
+                        const bool write_lid)
 {
+    // made while the GIL is held: it copies lid_values out of the numpy array
+    auto mcgi_context = make_mcgi_context(mcgi_mode, lid_file_path, lid_values, alpha_min, alpha_max, use_linear,
+                                          lid_avg, lid_std, write_lid);
+    // builds started from several Python threads run in parallel
+    py::gil_scoped_release release;
     diskann::IndexWriteParameters index_build_params = diskann::IndexWriteParametersBuilder(complexity, graph_degree)
                                                            .with_filter_list_size(filter_complexity)
                                                            .with_alpha(alpha)
                                                            .with_saturate_graph(false)
                                                            .with_num_threads(num_threads)
+                                                           .with_mcgi_context(mcgi_context)
                                                            .build();
     diskann::IndexSearchParams index_search_params =
         diskann::IndexSearchParams(index_build_params.search_list_size, num_threads);
@@ -116,18 +180,23 @@ void build_memory_index(const diskann::Metric metric, const std::string &vector_
     }
 
     index.save(index_output_path.c_str());
+    if (write_lid)
+        index.save_lid(index_output_path + "_lid.bin");
 }
 
 template void build_memory_index<float>(diskann::Metric, const std::string &, const std::string &, uint32_t, uint32_t,
                                         float, uint32_t, bool, size_t, bool, bool, const std::string &,
-                                        const std::string &, uint32_t);
+                                        const std::string &, uint32_t, diskann::MCGIMode, const std::string &,
+                                        const LidArray &, float, float, bool, float, float, bool);
 
 template void build_memory_index<int8_t>(diskann::Metric, const std::string &, const std::string &, uint32_t, uint32_t,
                                          float, uint32_t, bool, size_t, bool, bool, const std::string &,
-                                         const std::string &, uint32_t);
+                                         const std::string &, uint32_t, diskann::MCGIMode, const std::string &,
+                                         const LidArray &, float, float, bool, float, float, bool);
 
 template void build_memory_index<uint8_t>(diskann::Metric, const std::string &, const std::string &, uint32_t, uint32_t,
                                           float, uint32_t, bool, size_t, bool, bool, const std::string &,
-                                          const std::string &, uint32_t);
+                                          const std::string &, uint32_t, diskann::MCGIMode, const std::string &,
+                                          const LidArray &, float, float, bool, float, float, bool);
 
 } // namespace diskannpy
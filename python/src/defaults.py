@@ -69,3 +69,13 @@ like to result in better approximations.
 """
 USE_OPQ = _defaults.USE_OPQ
 """ Whether to use Optimized Product Quantization or not. """
+MCGI_ALPHA_MIN = _defaults.MCGI_ALPHA_MIN
+"""
+The alpha assigned to the nodes with the lowest local intrinsic dimensionality (LID) when building with MCGI. Lower
+values prune more strictly. The actual value is 1.0f.
+"""
+MCGI_ALPHA_MAX = _defaults.MCGI_ALPHA_MAX
+"""
+The alpha assigned to the nodes with the highest local intrinsic dimensionality (LID) when building with MCGI. Higher
+values keep more long-range edges around hard-to-navigate nodes. The actual value is 1.5f.
+"""
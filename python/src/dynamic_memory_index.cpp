@@ -128,10 +128,10 @@ NeighborsAndDistances<DynamicIdType> DynamicMemoryIndex<DT>::search(
 template <class DT>
 NeighborsAndDistances<DynamicIdType> DynamicMemoryIndex<DT>::batch_search(
     py::array_t<DT, py::array::c_style | py::array::forcecast> &queries, const uint64_t num_queries, const uint64_t knn,
-    const uint64_t complexity, const uint32_t num_threads)
+    const uint64_t complexity, const uint32_t num_threads, py::array_t<DynamicIdType> &ids,
+    py::array_t<float> &dists)
 {
-    py::array_t<DynamicIdType> ids({num_queries, knn});
-    py::array_t<float> dists({num_queries, knn});
+    check_batch_output(ids, dists, num_queries, knn);
     std::vector<DT *> empty_vector;
 
     if (num_threads == 0)
@@ -9,6 +9,7 @@
 #include "defaults.h"
 #include "distance.h"
 
+#include "benchmark_env.h"
 #include "builder.h"
 #include "dynamic_memory_index.h"
 #include "static_disk_index.h"
@@ -44,12 +45,17 @@ template <typename T> inline void add_variant(py::module_ &m, const Variant &var
 {
     m.def(variant.disk_builder_name.c_str(), &diskannpy::build_disk_index<T>, "distance_metric"_a, "data_file_path"_a,
           "index_prefix_path"_a, "complexity"_a, "graph_degree"_a, "final_index_ram_limit"_a, "indexing_ram_budget"_a,
-          "num_threads"_a, "pq_disk_bytes"_a);
+          "num_threads"_a, "pq_disk_bytes"_a, "filter_labels_file"_a, "universal_label"_a, "filter_complexity"_a,
+          "mcgi_mode"_a, "lid_file_path"_a, "lid_values"_a, "alpha_min"_a, "alpha_max"_a, "use_linear"_a, "lid_avg"_a,
+          "lid_std"_a, "write_lid"_a);
 
     m.def(variant.memory_builder_name.c_str(), &diskannpy::build_memory_index<T>, "distance_metric"_a,
           "data_file_path"_a, "index_output_path"_a, "graph_degree"_a, "complexity"_a, "alpha"_a, "num_threads"_a,
           "use_pq_build"_a, "num_pq_bytes"_a, "use_opq"_a, "use_tags"_a = false, "filter_labels_file"_a = "",
-          "universal_label"_a = "", "filter_complexity"_a = 0);
+          "universal_label"_a = "", "filter_complexity"_a = 0, "mcgi_mode"_a = diskann::MCGIMode::OFF,
+          "lid_file_path"_a = "", "lid_values"_a = py::array_t<float>(),
+          "alpha_min"_a = diskann::defaults::MCGI_ALPHA_MIN, "alpha_max"_a = diskann::defaults::MCGI_ALPHA_MAX,
+          "use_linear"_a = false, "lid_avg"_a = 0.0f, "lid_std"_a = 1.0f, "write_lid"_a = false);
 
     py::class_<diskannpy::StaticMemoryIndex<T>>(m, variant.static_memory_index_name.c_str())
         .def(py::init<const diskann::Metric, const std::string &, const size_t, const size_t, const uint32_t,
@@ -60,7 +66,7 @@ template <typename T> inline void add_variant(py::module_ &m, const Variant &var
         .def("search_with_filter", &diskannpy::StaticMemoryIndex<T>::search_with_filter, "query"_a, "knn"_a,
              "complexity"_a, "filter"_a)
         .def("batch_search", &diskannpy::StaticMemoryIndex<T>::batch_search, "queries"_a, "num_queries"_a, "knn"_a,
-             "complexity"_a, "num_threads"_a);
+             "complexity"_a, "num_threads"_a, "ids"_a, "dists"_a);
 
     py::class_<diskannpy::DynamicMemoryIndex<T>>(m, variant.dynamic_memory_index_name.c_str())
         .def(py::init<const diskann::Metric, const size_t, const size_t, const uint32_t, const uint32_t, const bool,
@@ -76,7 +82,7 @@ template <typename T> inline void add_variant(py::module_ &m, const Variant &var
         .def("search", &diskannpy::DynamicMemoryIndex<T>::search, "query"_a, "knn"_a, "complexity"_a)
         .def("load", &diskannpy::DynamicMemoryIndex<T>::load, "index_path"_a)
         .def("batch_search", &diskannpy::DynamicMemoryIndex<T>::batch_search, "queries"_a, "num_queries"_a, "knn"_a,
-             "complexity"_a, "num_threads"_a)
+             "complexity"_a, "num_threads"_a, "ids"_a, "dists"_a)
         .def("batch_insert", &diskannpy::DynamicMemoryIndex<T>::batch_insert, "vectors"_a, "ids"_a, "num_inserts"_a,
              "num_threads"_a)
         .def("save", &diskannpy::DynamicMemoryIndex<T>::save, "save_path"_a = "", "compact_before_save"_a = false)
@@ -86,13 +92,32 @@ template <typename T> inline void add_variant(py::module_ &m, const Variant &var
         .def("num_points", &diskannpy::DynamicMemoryIndex<T>::num_points);
 
     py::class_<diskannpy::StaticDiskIndex<T>>(m, variant.static_disk_index_name.c_str())
-        .def(py::init<const diskann::Metric, const std::string &, const uint32_t, const size_t, const uint32_t>(),
+        .def(py::init<const diskann::Metric, const std::string &, const uint32_t, const size_t, const uint32_t,
+                      const std::string &, const bool, const bool>(),
              "distance_metric"_a, "index_path_prefix"_a, "num_threads"_a, "num_nodes_to_cache"_a,
-             "cache_mechanism"_a = 1)
+             "cache_mechanism"_a = 1, "cache_snapshot_path"_a = "", "mmap_pq_data"_a = false,
+             "prefetch_pq_data"_a = false)
         .def("cache_bfs_levels", &diskannpy::StaticDiskIndex<T>::cache_bfs_levels, "num_nodes_to_cache"_a)
-        .def("search", &diskannpy::StaticDiskIndex<T>::search, "query"_a, "knn"_a, "complexity"_a, "beam_width"_a)
+        .def("save_cache_snapshot", &diskannpy::StaticDiskIndex<T>::save_cache_snapshot, "cache_snapshot_path"_a,
+             "with_contents"_a)
+        .def("set_visit_counting", &diskannpy::StaticDiskIndex<T>::set_visit_counting, "sample_period"_a)
+        .def("visit_counts", &diskannpy::StaticDiskIndex<T>::visit_counts, "reset"_a)
+        .def("count_visits", &diskannpy::StaticDiskIndex<T>::count_visits, "queries"_a, "num_queries"_a,
+             "complexity"_a, "beam_width"_a, "num_threads"_a)
+        .def("cache_bytes_per_node", &diskannpy::StaticDiskIndex<T>::cache_bytes_per_node)
+        .def("num_points", &diskannpy::StaticDiskIndex<T>::num_points)
+        .def("load_cache_list", &diskannpy::StaticDiskIndex<T>::load_cache_list, "node_ids"_a)
+        .def("set_dynamic_cache", &diskannpy::StaticDiskIndex<T>::set_dynamic_cache, "capacity_bytes"_a)
+        .def("dynamic_cache_stats", &diskannpy::StaticDiskIndex<T>::dynamic_cache_stats, "reset"_a)
+        .def("search", &diskannpy::StaticDiskIndex<T>::search, "query"_a, "knn"_a, "complexity"_a, "beam_width"_a,
+             "filters"_a, "stats"_a)
         .def("batch_search", &diskannpy::StaticDiskIndex<T>::batch_search, "queries"_a, "num_queries"_a, "knn"_a,
-             "complexity"_a, "beam_width"_a, "num_threads"_a);
+             "complexity"_a, "beam_width"_a, "num_threads"_a, "ids"_a, "dists"_a, "filters"_a,
+             "stats"_a)
+        .def("range_search", &diskannpy::StaticDiskIndex<T>::range_search, "query"_a, "radius"_a, "min_complexity"_a,
+             "max_complexity"_a, "beam_width"_a)
+        .def("batch_range_search", &diskannpy::StaticDiskIndex<T>::batch_range_search, "queries"_a, "num_queries"_a,
+             "radius"_a, "min_complexity"_a, "max_complexity"_a, "beam_width"_a, "num_threads"_a);
 }
 
 PYBIND11_MODULE(_diskannpy, m)
@@ -124,6 +149,41 @@ PYBIND11_MODULE(_diskannpy, m)
     default_values.attr("USE_PQ_BUILD") = false;
     default_values.attr("NUM_PQ_BYTES") = (uint32_t)0;
     default_values.attr("USE_OPQ") = false;
+    default_values.attr("MCGI_ALPHA_MIN") = diskann::defaults::MCGI_ALPHA_MIN;
+    default_values.attr("MCGI_ALPHA_MAX") = diskann::defaults::MCGI_ALPHA_MAX;
+
+    // per query search statistics are returned as numpy record arrays, see diskannpy.query_stats_dtype
+    PYBIND11_NUMPY_DTYPE(diskann::QueryStats, total_us, io_us, cpu_us, n_4k, n_8k, n_12k, n_ios, read_size,
+                         n_cmps_saved, n_cmps, n_cache_hits, n_hops);
+    m.attr("query_stats_dtype") = py::dtype::of<diskann::QueryStats>();
+
+    // noise control of benchmark searches, see diskannpy.NoiseControl
+    // std::vector<uint32_t> is opaque in this module, so CPU lists cross as numpy arrays
+    m.def(
+        "pin_threads",
+        [](const uint32_t num_threads, py::array_t<uint32_t, py::array::c_style | py::array::forcecast> &cpus) {
+            const std::vector<uint32_t> cpu_list(cpus.data(), cpus.data() + cpus.size());
+            return diskann::pin_omp_threads(num_threads, cpu_list);
+        },
+        "num_threads"_a, "cpus"_a);
+    m.def(
+        "bind_numa_node",
+        [](const uint32_t node) {
+            std::vector<uint32_t> node_cpus;
+            if (!diskann::bind_numa_node(node, node_cpus))
+                node_cpus.clear();
+            py::array_t<uint32_t> result(node_cpus.size());
+            std::copy(node_cpus.begin(), node_cpus.end(), result.mutable_data());
+            return result;
+        },
+        "node"_a);
+    m.def("drop_page_cache", &diskann::drop_page_cache);
+
+    // registered ahead of the variants, which use it as a default argument
+    py::enum_<diskann::MCGIMode>(m, "MCGIMode")
+        .value("OFF", diskann::MCGIMode::OFF)
+        .value("STATIC", diskann::MCGIMode::STATIC)
+        .value("ADVANCED", diskann::MCGIMode::ADVANCED);
 
     add_variant<float>(m, FloatVariant);
     add_variant<uint8_t>(m, UInt8Variant);
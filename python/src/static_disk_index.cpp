@@ -11,15 +11,24 @@ namespace diskannpy
 template <typename DT>
 StaticDiskIndex<DT>::StaticDiskIndex(const diskann::Metric metric, const std::string &index_path_prefix,
                                      const uint32_t num_threads, const size_t num_nodes_to_cache,
-                                     const uint32_t cache_mechanism)
-    : _reader(std::make_shared<PlatformSpecificAlignedFileReader>()), _index(_reader, metric)
+                                     const uint32_t cache_mechanism, const std::string &cache_snapshot_path,
+                                     const bool mmap_pq_data, const bool prefetch_pq_data)
+    : _reader(std::make_shared<PlatformSpecificAlignedFileReader>()), _index(_reader, metric),
+      _num_nodes_to_cache(num_nodes_to_cache)
 {
     const uint32_t _num_threads = num_threads != 0 ? num_threads : omp_get_num_procs();
+    _index.set_mmap_pq_data(mmap_pq_data, prefetch_pq_data);
     int load_success = _index.load(_num_threads, index_path_prefix.c_str());
     if (load_success != 0)
     {
         throw std::runtime_error("index load failed.");
     }
+    // a snapshot saved for the same cache budget replaces computing the cache list
+    if ((cache_mechanism == 1 || cache_mechanism == 2) && !cache_snapshot_path.empty() &&
+        file_exists(cache_snapshot_path) && _index.load_cache_snapshot(cache_snapshot_path, num_nodes_to_cache))
+    {
+        return;
+    }
     if (cache_mechanism == 1)
     {
         std::string sample_file = index_path_prefix + std::string("_sample_data.bin");
@@ -35,6 +44,7 @@ template <typename DT> void StaticDiskIndex<DT>::cache_bfs_levels(const size_t n
 {
     std::vector<uint32_t> node_list;
     _index.cache_bfs_levels(num_nodes_to_cache, node_list);
+    std::unique_lock<std::shared_mutex> lock(_cache_lock);
     _index.load_cache_list(node_list);
 }
 
@@ -50,23 +60,147 @@ void StaticDiskIndex<DT>::cache_sample_paths(const size_t num_nodes_to_cache, co
     std::vector<uint32_t> node_list;
     _index.generate_cache_list_from_sample_queries(warmup_query_file, 15, 4, num_nodes_to_cache, num_threads,
                                                    node_list);
+    std::unique_lock<std::shared_mutex> lock(_cache_lock);
+    _index.load_cache_list(node_list);
+}
+
+template <typename DT>
+diskann::QueryStats *StaticDiskIndex<DT>::stats_buffer(py::array_t<diskann::QueryStats> &stats,
+                                                      const uint64_t num_queries)
+{
+    if (stats.size() == 0)
+        return nullptr;
+    if (stats.ndim() != 1 || (uint64_t)stats.shape(0) != num_queries || !(stats.flags() & py::array::c_style))
+        throw std::runtime_error("stats must be a C-contiguous array with one record per query");
+    return stats.mutable_data();
+}
+
+template <typename DT>
+void StaticDiskIndex<DT>::save_cache_snapshot(const std::string &cache_snapshot_path, const bool with_contents)
+{
+    std::shared_lock<std::shared_mutex> lock(_cache_lock);
+    _index.save_cache_snapshot(cache_snapshot_path, _num_nodes_to_cache, with_contents);
+}
+
+template <typename DT> void StaticDiskIndex<DT>::set_visit_counting(const uint64_t sample_period)
+{
+    _index.set_visit_counting(sample_period);
+}
+
+template <typename DT> py::array_t<uint32_t> StaticDiskIndex<DT>::visit_counts(const bool reset)
+{
+    std::vector<uint32_t> counts;
+    _index.get_visit_counts(counts, reset);
+    py::array_t<uint32_t> result(counts.size());
+    std::copy(counts.begin(), counts.end(), result.mutable_data());
+    return result;
+}
+
+template <typename DT>
+py::array_t<uint32_t> StaticDiskIndex<DT>::count_visits(
+    py::array_t<DT, py::array::c_style | py::array::forcecast> &queries, const uint64_t num_queries,
+    const uint64_t complexity, const uint64_t beam_width, const uint32_t num_threads)
+{
+    const DT *query_data = queries.data();
+    uint64_t dim = queries.shape(1);
+    py::array_t<uint32_t> counts(_index.get_num_points());
+    uint32_t *counts_data = counts.mutable_data();
+    std::fill(counts_data, counts_data + counts.size(), 0);
+    {
+        py::gil_scoped_release release;
+        std::shared_lock<std::shared_mutex> lock(_cache_lock);
+        omp_set_num_threads(num_threads);
+
+        // counted into this call's own array, so searches served meanwhile and resets of the shared counters do not
+        // show up in it
+#pragma omp parallel for schedule(dynamic, 1) default(none)                                                            \
+    shared(num_queries, query_data, dim, complexity, beam_width, counts_data)
+        for (int64_t i = 0; i < (int64_t)num_queries; i++)
+        {
+            uint64_t id;
+            float dist;
+            _index.cached_beam_search(query_data + i * dim, 1, complexity, &id, &dist, beam_width, false, 0,
+                                      std::numeric_limits<uint32_t>::max(), false, nullptr, counts_data);
+        }
+    }
+    return counts;
+}
+
+template <typename DT> uint64_t StaticDiskIndex<DT>::cache_bytes_per_node()
+{
+    return _index.get_cache_bytes_per_node();
+}
+
+template <typename DT> uint64_t StaticDiskIndex<DT>::num_points()
+{
+    return _index.get_num_points();
+}
+
+template <typename DT>
+void StaticDiskIndex<DT>::load_cache_list(py::array_t<uint32_t, py::array::c_style | py::array::forcecast> &node_ids)
+{
+    std::vector<uint32_t> node_list(node_ids.data(), node_ids.data() + node_ids.size());
+    py::gil_scoped_release release;
+    // waits for in flight searches to finish, and holds new ones until the new cache is in place
+    std::unique_lock<std::shared_mutex> lock(_cache_lock);
     _index.load_cache_list(node_list);
 }
 
+template <typename DT> void StaticDiskIndex<DT>::set_dynamic_cache(const uint64_t capacity_bytes)
+{
+    py::gil_scoped_release release;
+    std::unique_lock<std::shared_mutex> lock(_cache_lock);
+    _index.set_dynamic_cache(capacity_bytes);
+}
+
+template <typename DT> py::dict StaticDiskIndex<DT>::dynamic_cache_stats(const bool reset)
+{
+    diskann::NodeCacheStats stats = _index.get_dynamic_cache_stats(reset);
+    py::dict result;
+    result["hits"] = stats.hits;
+    result["misses"] = stats.misses;
+    result["insertions"] = stats.insertions;
+    result["evictions"] = stats.evictions;
+    result["num_entries"] = stats.num_entries;
+    result["capacity_entries"] = stats.capacity_entries;
+    return result;
+}
+
+template <typename DT>
+const filterT *StaticDiskIndex<DT>::filters_buffer(const FilterArray &filters, const uint64_t num_queries)
+{
+    if (filters.size() == 0)
+        return nullptr;
+    if (filters.ndim() != 1 || (uint64_t)filters.shape(0) != num_queries)
+        throw std::runtime_error("filters must hold one label per query");
+    return filters.data();
+}
+
 template <typename DT>
 NeighborsAndDistances<StaticIdType> StaticDiskIndex<DT>::search(
     py::array_t<DT, py::array::c_style | py::array::forcecast> &query, const uint64_t knn, const uint64_t complexity,
-    const uint64_t beam_width)
+    const uint64_t beam_width, FilterArray &filters, py::array_t<diskann::QueryStats> &stats)
 {
     py::array_t<StaticIdType> ids(knn);
     py::array_t<float> dists(knn);
 
-    std::vector<uint32_t> u32_ids(knn);
     std::vector<uint64_t> u64_ids(knn);
-    diskann::QueryStats stats;
 
-    _index.cached_beam_search(query.data(), knn, complexity, u64_ids.data(), dists.mutable_data(), beam_width, false,
-                              &stats);
+    // search mostly waits on SSD reads, let other Python threads run meanwhile
+    const DT *query_data = query.data();
+    float *dists_data = dists.mutable_data();
+    const filterT *filters_data = filters_buffer(filters, 1);
+    diskann::QueryStats *stats_data = stats_buffer(stats, 1);
+    {
+        py::gil_scoped_release release;
+        std::shared_lock<std::shared_mutex> lock(_cache_lock);
+        if (filters_data != nullptr)
+            _index.cached_beam_search(query_data, knn, complexity, u64_ids.data(), dists_data, beam_width, true,
+                                      filters_data[0], false, stats_data);
+        else
+            _index.cached_beam_search(query_data, knn, complexity, u64_ids.data(), dists_data, beam_width, false,
+                                      stats_data);
+    }
 
     auto r = ids.mutable_unchecked<1>();
     for (uint64_t i = 0; i < knn; ++i)
@@ -78,31 +212,116 @@ NeighborsAndDistances<StaticIdType> StaticDiskIndex<DT>::search(
 template <typename DT>
 NeighborsAndDistances<StaticIdType> StaticDiskIndex<DT>::batch_search(
     py::array_t<DT, py::array::c_style | py::array::forcecast> &queries, const uint64_t num_queries, const uint64_t knn,
-    const uint64_t complexity, const uint64_t beam_width, const uint32_t num_threads)
+    const uint64_t complexity, const uint64_t beam_width, const uint32_t num_threads, py::array_t<StaticIdType> &ids,
+    py::array_t<float> &dists, FilterArray &filters, py::array_t<diskann::QueryStats> &stats)
 {
-    py::array_t<StaticIdType> ids({num_queries, knn});
-    py::array_t<float> dists({num_queries, knn});
+    check_batch_output(ids, dists, num_queries, knn);
+    const filterT *filters_data = filters_buffer(filters, num_queries);
+    diskann::QueryStats *stats_data = stats_buffer(stats, num_queries);
 
-    omp_set_num_threads(num_threads);
-
-    std::vector<uint64_t> u64_ids(knn * num_queries);
+    // numpy buffers are resolved up front, nothing below touches a Python object
+    const DT *query_data = queries.data();
+    uint64_t dim = queries.shape(1);
+    StaticIdType *ids_data = ids.mutable_data();
+    float *dists_data = dists.mutable_data();
+    {
+        py::gil_scoped_release release;
+        std::shared_lock<std::shared_mutex> lock(_cache_lock);
+        omp_set_num_threads(num_threads);
 
 #pragma omp parallel for schedule(dynamic, 1) default(none)                                                            \
-    shared(num_queries, queries, knn, complexity, u64_ids, dists, beam_width)
-    for (int64_t i = 0; i < (int64_t)num_queries; i++)
+    shared(num_queries, query_data, dim, knn, complexity, ids_data, dists_data, filters_data, stats_data, beam_width)
+        for (int64_t i = 0; i < (int64_t)num_queries; i++)
+        {
+            // cached_beam_search reports 64 bit ids; narrow them per query through a buffer each thread keeps
+            thread_local std::vector<uint64_t> u64_ids;
+            u64_ids.resize(knn);
+            diskann::QueryStats *query_stats = stats_data != nullptr ? stats_data + i : nullptr;
+            if (filters_data != nullptr)
+                _index.cached_beam_search(query_data + i * dim, knn, complexity, u64_ids.data(),
+                                          dists_data + i * knn, beam_width, true, filters_data[i], false,
+                                          query_stats);
+            else
+                _index.cached_beam_search(query_data + i * dim, knn, complexity, u64_ids.data(),
+                                          dists_data + i * knn, beam_width, false, query_stats);
+            for (uint64_t j = 0; j < knn; ++j)
+                ids_data[i * knn + j] = (StaticIdType)u64_ids[j];
+        }
+    }
+
+    return std::make_pair(ids, dists);
+}
+
+template <typename DT>
+NeighborsAndDistances<StaticIdType> StaticDiskIndex<DT>::range_search(
+    py::array_t<DT, py::array::c_style | py::array::forcecast> &query, const double radius,
+    const uint64_t min_complexity, const uint64_t max_complexity, const uint64_t beam_width)
+{
+    std::vector<uint64_t> u64_ids;
+    std::vector<float> distances;
+
+    const DT *query_data = query.data();
     {
-        _index.cached_beam_search(queries.data(i), knn, complexity, u64_ids.data() + i * knn, dists.mutable_data(i),
-                                  beam_width);
+        py::gil_scoped_release release;
+        std::shared_lock<std::shared_mutex> lock(_cache_lock);
+        _index.range_search(query_data, radius, min_complexity, max_complexity, u64_ids, distances, beam_width);
     }
 
-    auto r = ids.mutable_unchecked();
-    for (uint64_t i = 0; i < num_queries; ++i)
-        for (uint64_t j = 0; j < knn; ++j)
-            r(i, j) = (uint32_t)u64_ids[i * knn + j];
+    py::array_t<StaticIdType> ids(u64_ids.size());
+    py::array_t<float> dists(distances.size());
+    std::copy(u64_ids.begin(), u64_ids.end(), ids.mutable_data());
+    std::copy(distances.begin(), distances.end(), dists.mutable_data());
 
     return std::make_pair(ids, dists);
 }
 
+template <typename DT>
+std::tuple<py::array_t<uint64_t>, py::array_t<StaticIdType>, py::array_t<float>> StaticDiskIndex<
+    DT>::batch_range_search(
+    py::array_t<DT, py::array::c_style | py::array::forcecast> &queries, const uint64_t num_queries,
+    const double radius, const uint64_t min_complexity, const uint64_t max_complexity, const uint64_t beam_width,
+    const uint32_t num_threads)
+{
+    // the number of results per query is only known after searching, so they are gathered per query first and then
+    // packed into CSR arrays: query i's results are [offsets[i], offsets[i + 1])
+    std::vector<std::vector<uint64_t>> query_ids(num_queries);
+    std::vector<std::vector<float>> query_dists(num_queries);
+
+    const DT *query_data = queries.data();
+    uint64_t dim = queries.shape(1);
+    {
+        py::gil_scoped_release release;
+        std::shared_lock<std::shared_mutex> lock(_cache_lock);
+        omp_set_num_threads(num_threads);
+
+#pragma omp parallel for schedule(dynamic, 1) default(none)                                                            \
+    shared(num_queries, query_data, dim, radius, min_complexity, max_complexity, beam_width, query_ids, query_dists)
+        for (int64_t i = 0; i < (int64_t)num_queries; i++)
+        {
+            _index.range_search(query_data + i * dim, radius, min_complexity, max_complexity, query_ids[i],
+                                query_dists[i], beam_width);
+        }
+    }
+
+    py::array_t<uint64_t> offsets(num_queries + 1);
+    uint64_t *offsets_data = offsets.mutable_data();
+    offsets_data[0] = 0;
+    for (uint64_t i = 0; i < num_queries; i++)
+        offsets_data[i + 1] = offsets_data[i] + query_ids[i].size();
+
+    py::array_t<StaticIdType> ids(offsets_data[num_queries]);
+    py::array_t<float> dists(offsets_data[num_queries]);
+    StaticIdType *ids_data = ids.mutable_data();
+    float *dists_data = dists.mutable_data();
+    for (uint64_t i = 0; i < num_queries; i++)
+    {
+        std::copy(query_ids[i].begin(), query_ids[i].end(), ids_data + offsets_data[i]);
+        std::copy(query_dists[i].begin(), query_dists[i].end(), dists_data + offsets_data[i]);
+    }
+
+    return std::make_tuple(offsets, ids, dists);
+}
+
 template class StaticDiskIndex<float>;
 template class StaticDiskIndex<uint8_t>;
 template class StaticDiskIndex<int8_t>;
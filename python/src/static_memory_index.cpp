@@ -66,12 +66,10 @@ NeighborsAndDistances<StaticIdType> StaticMemoryIndex<DT>::search_with_filter(
 template <typename DT>
 NeighborsAndDistances<StaticIdType> StaticMemoryIndex<DT>::batch_search(
     py::array_t<DT, py::array::c_style | py::array::forcecast> &queries, const uint64_t num_queries, const uint64_t knn,
-    const uint64_t complexity, const uint32_t num_threads)
+    const uint64_t complexity, const uint32_t num_threads, py::array_t<StaticIdType> &ids, py::array_t<float> &dists)
 {
     const uint32_t _num_threads = num_threads != 0 ? num_threads : omp_get_num_procs();
-    py::array_t<StaticIdType> ids({num_queries, knn});
-    py::array_t<float> dists({num_queries, knn});
-    std::vector<DT *> empty_vector;
+    check_batch_output(ids, dists, num_queries, knn);
 
     omp_set_num_threads(static_cast<int32_t>(_num_threads));
 
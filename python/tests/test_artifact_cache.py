@@ -0,0 +1,83 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import diskannpy as dap
+import numpy as np
+
+
+class TestArtifactCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(12345)
+        cls._vectors = rng.random((500, 8), dtype=np.float32)
+        cls._vector_path = os.path.join(cls._test_dir, "vectors.bin")
+        dap.vectors_to_file(cls._vector_path, cls._vectors)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls._test_dir, ignore_errors=True)
+
+    def setUp(self) -> None:
+        self._cache = dap.ArtifactCache(tempfile.mkdtemp(dir=self._test_dir))
+
+    def test_fingerprint_follows_content(self):
+        copy_path = os.path.join(self._test_dir, "copy.bin")
+        shutil.copyfile(self._vector_path, copy_path)
+        self.assertEqual(self._cache.fingerprint(self._vector_path), self._cache.fingerprint(copy_path))
+
+        changed = self._vectors.copy()
+        changed[-1, -1] += 1
+        changed_path = os.path.join(self._test_dir, "changed.bin")
+        dap.vectors_to_file(changed_path, changed)
+        self.assertNotEqual(self._cache.fingerprint(self._vector_path), self._cache.fingerprint(changed_path))
+
+    def test_lid(self):
+        self.assertIsNone(self._cache.lid_path(self._vector_path, k=10))
+        path = self._cache.lid(self._vector_path, np.float32, k=10)
+        self.assertEqual(self._cache.lid_path(self._vector_path, k=10), path)
+        lid = dap.vectors_from_file(path, np.float32)
+        self.assertEqual(lid.shape, (500, 1))
+
+        # a hit is served without recomputing, also for a copy of the base file under another name
+        mtime = os.stat(path).st_mtime_ns
+        copy_path = os.path.join(self._test_dir, "lid_copy.bin")
+        shutil.copyfile(self._vector_path, copy_path)
+        self.assertEqual(self._cache.lid(copy_path, np.float32, k=10), path)
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+
+        # anything that changes the estimate is part of the key
+        self.assertNotEqual(self._cache.lid(self._vector_path, np.float32, k=5), path)
+        approximate = self._cache.lid(self._vector_path, np.float32, k=10, estimator="approximate", sample_size=100)
+        self.assertNotEqual(approximate, path)
+        self.assertIsNone(
+            self._cache.lid_path(self._vector_path, k=10, estimator="approximate", sample_size=100, seed=1)
+        )
+        with self.assertRaises(ValueError):
+            self._cache.lid(self._vector_path, np.float32, estimator="graph")
+
+    def test_pq(self):
+        index_prefix = os.path.join(self._test_dir, "baseline")
+        dap.vectors_to_file(index_prefix + "_pq_pivots.bin", np.ones((256, 8), dtype=np.float32))
+        compressed = np.arange(500 * 4, dtype=np.uint8).reshape(500, 4)
+        dap.vectors_to_file(index_prefix + "_pq_compressed.bin", compressed)
+
+        self.assertIsNone(self._cache.pq_codebook_prefix(self._vector_path, 4))
+        codebook_prefix = self._cache.store_pq(self._vector_path, index_prefix)
+        self.assertEqual(self._cache.pq_codebook_prefix(self._vector_path, 4), codebook_prefix)
+        self.assertTrue(os.path.isdir(codebook_prefix))
+        self.assertIsNone(self._cache.pq_codebook_prefix(self._vector_path, 8))
+        self.assertIsNone(self._cache.pq_codebook_prefix(self._vector_path, 4, distance_metric="cosine"))
+
+        mcgi_prefix = os.path.join(self._test_dir, "mcgi")
+        self.assertTrue(self._cache.restore_pq(self._vector_path, 4, mcgi_prefix))
+        np.testing.assert_array_equal(dap.vectors_from_file(mcgi_prefix + "_pq_compressed.bin", np.uint8), compressed)
+        self.assertFalse(self._cache.restore_pq(self._vector_path, 8, mcgi_prefix))
+
+        with self.assertRaises(ValueError):
+            self._cache.store_pq(self._vector_path, os.path.join(self._test_dir, "missing"))
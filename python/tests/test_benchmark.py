@@ -0,0 +1,176 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import diskannpy as dap
+import numpy as np
+from fixtures import random_vectors
+from sklearn.neighbors import NearestNeighbors
+
+
+class TestSweep(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_dir = tempfile.mkdtemp()
+        data_dir = os.path.join(cls._test_dir, "data", "rand")
+        os.makedirs(data_dir)
+        base = random_vectors(2000, 10, dtype=np.float32)
+        queries = random_vectors(100, 10, dtype=np.float32, seed=54321)
+        dap.vectors_to_file(os.path.join(data_dir, "rand_base.bin"), base)
+        dap.vectors_to_file(os.path.join(data_dir, "rand_query.bin"), queries)
+        distances, ids = NearestNeighbors(n_neighbors=10).fit(base).kneighbors(queries)
+        with open(os.path.join(data_dir, "rand_gt.bin"), "wb") as fh:
+            fh.write(np.array(ids.shape, dtype=np.int32).tobytes())
+            fh.write(ids.astype(np.uint32).tobytes())
+            fh.write(distances.astype(np.float32).tobytes())
+        cls._spec = {
+            "data_directory": "data",
+            "datasets": ["rand"],
+            "graph_degrees": [16],
+            "build_complexities": 32,
+            "alpha_min": [1.0, 1.2],
+            "alpha_max": [1.2],
+            "search_complexities": [10, 40],
+            "num_threads": [4],
+            "cache_sizes": [0, 100],
+            "search_memory_maximum": 0.00003,
+            "build_threads": 0,
+            "lid_k": 10,
+            "noise_control": {"warmup_queries": 50, "repeats": 3},
+        }
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls._test_dir, ignore_errors=True)
+
+    def test_spec(self):
+        spec_file = os.path.join(self._test_dir, "spec.json")
+        with open(spec_file, "w") as fh:
+            json.dump(self._spec, fh)
+        spec = dap.SweepSpec.from_file(spec_file)
+        self.assertEqual(spec.datasets[0].base, os.path.join(self._test_dir, "data", "rand", "rand_base.bin"))
+        # the (1.2, 1.2) alpha range is empty and skipped
+        self.assertEqual(
+            [build.name for build in spec.builds()], ["rand_R16_L32_baseline", "rand_R16_L32_min1.0_max1.2"]
+        )
+        self.assertEqual(len(spec.searches()), 4)
+        # searches sharing a loaded index are adjacent
+        self.assertEqual([search.num_nodes_to_cache for search in spec.searches()], [0, 0, 100, 100])
+
+        with self.assertRaises(ValueError):
+            dap.SweepSpec.from_dict(dict(self._spec, search_L=[10]), self._test_dir)
+        with self.assertRaises(ValueError):
+            dap.SweepSpec.from_dict(dict(self._spec, graph_degrees=[]), self._test_dir)
+        self.assertEqual(spec.noise_control, dap.NoiseControl(warmup_queries=50, repeats=3))
+        with self.assertRaises(ValueError):
+            dap.SweepSpec.from_dict(dict(self._spec, noise_control={"repeats": 0}), self._test_dir)
+
+    def test_run(self):
+        spec = dap.SweepSpec.from_dict(self._spec, self._test_dir)
+        results_dir = os.path.join(self._test_dir, "results")
+        runner = dap.SweepRunner(spec, results_dir)
+        records = list(runner.run())
+        self.assertEqual(len(records), 8)
+        self.assertEqual(runner.records(), json.loads(json.dumps(records)))
+        for record in records:
+            self.assertGreaterEqual(record["recall"], 0)
+            self.assertLessEqual(record["recall"], 1)
+            self.assertGreater(record["qps"], 0)
+            self.assertIn(record["variant"], ("baseline", "mcgi"))
+            self.assertEqual(record["repeats"], 3)
+            self.assertLessEqual(record["qps_ci95"][0], record["qps"])
+            self.assertGreaterEqual(record["qps_ci95"][1], record["qps"])
+        by_complexity = {r["search_complexity"]: r["recall"] for r in records if r["variant"] == "baseline"}
+        self.assertGreaterEqual(by_complexity[40], by_complexity[10])
+        self.assertEqual({r["variant"]: r["alpha_max"] for r in records}, {"baseline": None, "mcgi": 1.2})
+
+        # a second run finds everything recorded and neither builds nor searches
+        self.assertEqual(list(dap.SweepRunner(spec, results_dir).run()), [])
+        os.remove(runner.records_file)
+        rerun = list(dap.SweepRunner(spec, results_dir).run())
+        self.assertEqual(len(rerun), 8)
+        self.assertTrue(all(record["build_seconds"] is None for record in rerun))
+
+    def test_run_scheduled(self):
+        spec = dap.SweepSpec.from_dict(self._spec, self._test_dir)
+        results_dir = os.path.join(self._test_dir, "scheduled")
+        runner = dap.SweepRunner(spec, results_dir)
+        scheduler = dap.JobScheduler(os.path.join(results_dir, "jobs.jsonl"), max_threads=8, max_memory_gb=4)
+        states = runner.run_scheduled(scheduler)
+        self.assertEqual(states, {
+            "lid:rand": "done",
+            "build:rand_R16_L32_baseline": "done",
+            "search:rand_R16_L32_baseline": "done",
+            "build:rand_R16_L32_min1.0_max1.2": "done",
+            "search:rand_R16_L32_min1.0_max1.2": "done",
+        })
+        self.assertEqual(len(runner.records()), 8)
+        self.assertFalse(any(name.endswith(".partial") for name in os.listdir(results_dir)))
+
+        # a restarted sweep skips the builds done in the ledger, and runs the searches added to the spec since
+        spec = dap.SweepSpec.from_dict(dict(self._spec, search_complexities=[10, 40, 60]), self._test_dir)
+        runner = dap.SweepRunner(spec, results_dir)
+        scheduler = dap.JobScheduler(os.path.join(results_dir, "jobs.jsonl"), max_threads=8, max_memory_gb=4)
+        self.assertEqual(set(runner.run_scheduled(scheduler).values()), {"done"})
+        self.assertEqual(len(runner.records()), 12)
+        with open(os.path.join(results_dir, "jobs.jsonl")) as fh:
+            runs = [entry["job"] for entry in map(json.loads, fh) if entry["state"] == "running"]
+        self.assertEqual({job: runs.count(job) for job in states}, {
+            job: 2 if job.startswith("search:") else 1 for job in states
+        })
+
+    def test_summarize_repeats(self):
+        # the noisy gist R32 L50 baseline of speed_scan_summary.csv
+        summary = dap.summarize_repeats([1306.43, 1313.42, 1320.52, 210.91])
+        self.assertAlmostEqual(summary["median"], (1306.43 + 1313.42) / 2)
+        self.assertEqual((summary["ci_low"], summary["ci_high"]), (210.91, 1320.52))
+        self.assertEqual(summary["outliers"], [3])
+
+        # order statistics 6 and 15 of 20 runs bound the median with 95% confidence
+        summary = dap.summarize_repeats(list(range(20, 0, -1)))
+        self.assertEqual((summary["median"], summary["ci_low"], summary["ci_high"]), (10.5, 6, 15))
+        self.assertEqual(summary["outliers"], [])
+        self.assertEqual(dap.summarize_repeats([5.0])["outliers"], [])
+        with self.assertRaises(ValueError):
+            dap.summarize_repeats([])
+
+    @unittest.skipUnless(hasattr(os, "sched_getaffinity"), "thread pinning is only supported on Linux")
+    def test_noise_control_bindings(self):
+        from diskannpy import _diskannpy
+
+        allowed = os.sched_getaffinity(0)
+        try:
+            self.assertIsInstance(_diskannpy.pin_threads(2, np.array(sorted(allowed), dtype=np.uint32)), bool)
+            self.assertIsInstance(_diskannpy.pin_threads(2, np.array([], dtype=np.uint32)), bool)
+            # a node that does not exist binds nothing
+            node_cpus = _diskannpy.bind_numa_node(1 << 20)
+            self.assertEqual((node_cpus.dtype, node_cpus.shape), (np.uint32, (0,)))
+        finally:
+            os.sched_setaffinity(0, allowed)
+
+    def test_compute_ground_truth(self):
+        data_dir = os.path.join(self._test_dir, "data", "rand")
+        ground_truth_file = os.path.join(self._test_dir, "computed_gt.bin")
+        dap.compute_ground_truth(
+            os.path.join(data_dir, "rand_base.bin"), os.path.join(data_dir, "rand_query.bin"), ground_truth_file, 10
+        )
+        computed = dap.ground_truth_from_file(ground_truth_file)
+        self.assertEqual(computed.shape, (100, 10))
+        expected = dap.ground_truth_from_file(os.path.join(data_dir, "rand_gt.bin"))
+        self.assertEqual(dap.knn_recall(computed, expected, 10), 1.0)
+        with self.assertRaises(ValueError):
+            dap.compute_ground_truth(
+                os.path.join(data_dir, "rand_base.bin"), os.path.join(data_dir, "rand_query.bin"), ground_truth_file,
+                10, distance_metric="cosine",
+            )
+
+    def test_knn_recall(self):
+        truth = np.array([[0, 1, 2], [3, 4, 5]], dtype=np.uint32)
+        self.assertEqual(dap.knn_recall(truth, truth, 3), 1.0)
+        self.assertEqual(dap.knn_recall(np.array([[2, 9, 9], [5, 4, 3]]), truth, 3), 4 / 6)
+        self.assertEqual(dap.knn_recall(np.array([[0, 9], [9, 3]]), truth, 1), 0.5)
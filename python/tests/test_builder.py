@@ -1,10 +1,15 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT license.
 
+import shutil
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 import diskannpy as dap
 import numpy as np
+from fixtures import calculate_recall, random_vectors
+from sklearn.neighbors import NearestNeighbors
 
 
 class TestBuildDiskIndex(unittest.TestCase):
@@ -135,3 +140,185 @@ class TestBuildMemoryIndex(unittest.TestCase):
                         use_opq=False,
                         **kwargs,
                     )
+
+    def test_mcgi_parameters(self):
+        good_ranges = {
+            "vector_dtype": np.single,
+            "distance_metric": "l2",
+            "graph_degree": 5,
+            "complexity": 5,
+            "alpha": 1.2,
+            "num_threads": 1,
+            "num_pq_bytes": 0,
+            "mcgi_mode": "mcgi",
+            "mcgi_alpha_min": 1.0,
+            "mcgi_alpha_max": 1.5,
+            "mcgi_mapping": "sigmoid",
+        }
+        bad_ranges = {
+            "mcgi_mode": "always",
+            "mcgi_alpha_min": 0.5,
+            "mcgi_alpha_max": 0.9,
+            "mcgi_mapping": "cubic",
+        }
+        for bad_value_key in bad_ranges.keys():
+            kwargs = good_ranges.copy()
+            kwargs[bad_value_key] = bad_ranges[bad_value_key]
+            with self.subTest(
+                f"testing bad value key: {bad_value_key} with bad value: {bad_ranges[bad_value_key]}"
+            ):
+                with self.assertRaises(ValueError):
+                    dap.build_memory_index(
+                        data="test",
+                        index_directory="test",
+                        use_pq_build=True,
+                        use_opq=False,
+                        **kwargs,
+                    )
+
+        with self.subTest("amcgi only supports the sigmoid mapping"):
+            kwargs = good_ranges.copy()
+            kwargs["mcgi_mode"] = "amcgi"
+            kwargs["mcgi_mapping"] = "linear"
+            with self.assertRaises(ValueError):
+                dap.build_memory_index(
+                    data="test",
+                    index_directory="test",
+                    use_pq_build=True,
+                    use_opq=False,
+                    **kwargs,
+                )
+
+    def test_mcgi_lid_shape(self):
+        rng = np.random.default_rng(12345)
+        rando = rng.random((1000, 10), dtype=np.single)
+        for lid in (None, rng.random(999, dtype=np.single), rng.random((1000, 2), dtype=np.single)):
+            with self.subTest(f"testing lid: {None if lid is None else lid.shape}"):
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    with self.assertRaises(ValueError):
+                        dap.build_memory_index(
+                            data=rando,
+                            distance_metric="l2",
+                            index_directory=tmpdir,
+                            complexity=5,
+                            graph_degree=5,
+                            alpha=1.2,
+                            num_threads=1,
+                            use_pq_build=False,
+                            num_pq_bytes=0,
+                            use_opq=False,
+                            mcgi_mode="mcgi",
+                            lid=lid,
+                        )
+
+
+class TestMCGIBuilds(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._index_vectors = random_vectors(2000, 10, dtype=np.float32)
+        cls._query_vectors = random_vectors(100, 10, dtype=np.float32, seed=54321)
+        _, cls._ground_truth = NearestNeighbors(n_neighbors=5).fit(cls._index_vectors).kneighbors(cls._query_vectors)
+        cls._lid = np.random.default_rng(12345).uniform(4, 16, 2000).astype(np.float32)
+
+    def setUp(self) -> None:
+        self._test_dir = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self._test_dir, ignore_errors=True)
+
+    def _build_disk(self, index_prefix: str, **kwargs):
+        dap.build_disk_index(
+            data=self._index_vectors,
+            distance_metric="l2",
+            index_directory=self._test_dir,
+            graph_degree=16,
+            complexity=32,
+            search_memory_maximum=0.00003,
+            build_memory_maximum=1,
+            num_threads=2,
+            pq_disk_bytes=0,
+            index_prefix=index_prefix,
+            **kwargs,
+        )
+
+    def _assert_disk_index_searches(self, index_prefix: str):
+        index = dap.StaticDiskIndex(
+            index_directory=self._test_dir,
+            num_threads=4,
+            num_nodes_to_cache=10,
+            index_prefix=index_prefix,
+        )
+        ids, _ = index.batch_search(self._query_vectors, k_neighbors=5, complexity=32, num_threads=4)
+        self.assertGreater(calculate_recall(ids, self._ground_truth, 5), 0.8)
+
+    def _build_memory(self, index_prefix: str, **kwargs):
+        dap.build_memory_index(
+            data=self._index_vectors,
+            distance_metric="l2",
+            index_directory=self._test_dir,
+            graph_degree=16,
+            complexity=32,
+            num_threads=2,
+            use_pq_build=False,
+            num_pq_bytes=0,
+            use_opq=False,
+            index_prefix=index_prefix,
+            **kwargs,
+        )
+
+    def _assert_memory_index_searches(self, index_prefix: str):
+        index = dap.StaticMemoryIndex(
+            index_directory=self._test_dir,
+            num_threads=4,
+            initial_search_complexity=32,
+            index_prefix=index_prefix,
+        )
+        ids, _ = index.batch_search(self._query_vectors, k_neighbors=5, complexity=32, num_threads=4)
+        self.assertGreater(calculate_recall(ids, self._ground_truth, 5), 0.8)
+
+    def test_mcgi_builds(self):
+        lid_file = f"{self._test_dir}/lid.bin"
+        dap.vectors_to_file(lid_file, self._lid.reshape(-1, 1))
+        builds = {
+            "mcgi_array": dict(mcgi_mode="mcgi", lid=self._lid, mcgi_alpha_min=1.0, mcgi_alpha_max=1.5),
+            "mcgi_file_linear": dict(mcgi_mode="mcgi", lid=lid_file, mcgi_mapping="linear"),
+            "amcgi_file": dict(mcgi_mode="amcgi", lid=lid_file),
+            "amcgi_stats": dict(mcgi_mode="amcgi", lid_avg=float(self._lid.mean()), lid_std=float(self._lid.std())),
+        }
+        for name, kwargs in builds.items():
+            with self.subTest(index="memory", build=name):
+                self._build_memory(f"memory_{name}", **kwargs)
+                self._assert_memory_index_searches(f"memory_{name}")
+            with self.subTest(index="disk", build=name):
+                self._build_disk(f"disk_{name}", **kwargs)
+                self._assert_disk_index_searches(f"disk_{name}")
+
+    def test_write_lid(self):
+        builds = {
+            "amcgi": dict(mcgi_mode="amcgi", lid_avg=float(self._lid.mean()), lid_std=float(self._lid.std())),
+            # a fixed alpha build only records the LID
+            "off": dict(mcgi_mode="off"),
+        }
+        for name, kwargs in builds.items():
+            for index, build in (("memory", self._build_memory), ("disk", self._build_disk)):
+                with self.subTest(index=index, build=name):
+                    prefix = f"{index}_{name}"
+                    build(prefix, write_lid=True, **kwargs)
+                    lid = dap.vectors_from_file(f"{self._test_dir}/{prefix}_lid.bin", np.float32)
+                    self.assertEqual(lid.shape, (self._index_vectors.shape[0], 1))
+                    self.assertTrue(np.isfinite(lid).all())
+
+    def test_parallel_disk_builds(self):
+        # builds release the GIL, so builds started from Python threads run side by side
+        prefixes = ["shard0", "shard1"]
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            builds = [
+                pool.submit(self._build_disk, prefix, mcgi_mode="mcgi", lid=self._lid, mcgi_alpha_max=1.2 + 0.1 * i)
+                for i, prefix in enumerate(prefixes)
+            ]
+            for build in builds:
+                build.result()
+        for prefix in prefixes:
+            with self.subTest(index_prefix=prefix):
+                self._assert_disk_index_searches(prefix)
+
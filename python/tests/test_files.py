@@ -47,5 +47,24 @@ class TestVectorsFromFile(unittest.TestCase):
             self.assertTrue((expected == actual).all(), f"{expected == actual}\n{expected}\n{actual}")
 
 
+class TestGenRandomSlice(unittest.TestCase):
+    def test_slice(self):
+        vectors = random_vectors(10_000, 10, dtype=np.float32)
+        with vectors_as_temp_file(vectors) as vecs_file:
+            prefix = tempfile.mkdtemp()
+            atexit.register(shutil.rmtree, prefix, True)
+            metadata = dap.gen_random_slice(vecs_file, np.float32, 0.1, f"{prefix}/slice", seed=7)
+            ids = dap.tags_from_file(f"{prefix}/slice_ids.bin")
+            self.assertEqual(metadata, dap.Metadata(ids.shape[0], 10))
+            self.assertTrue(800 < ids.shape[0] < 1200)
+            self.assertTrue((np.diff(ids.astype(np.int64)) > 0).all())
+            self.assertTrue((dap.vectors_from_file(f"{prefix}/slice_data.bin", np.float32) == vectors[ids]).all())
+            # the same seed draws the same slice
+            dap.gen_random_slice(vecs_file, np.float32, 0.1, f"{prefix}/again", seed=7)
+            self.assertTrue((dap.tags_from_file(f"{prefix}/again_ids.bin") == ids).all())
+            with self.assertRaises(ValueError):
+                dap.gen_random_slice(vecs_file, np.float32, 0, f"{prefix}/empty")
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,211 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import diskannpy as dap
+import numpy as np
+from diskannpy import _lid
+
+
+def _brute_force_lid(vectors: np.ndarray, k: int) -> np.ndarray:
+    sq_dists = ((vectors[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=-1)
+    return dap.lid_from_distances(np.sqrt(np.sort(sq_dists, axis=1)[:, 1 : k + 1]))
+
+
+def _write_disk_index(path: str, vectors: np.ndarray, neighbors: np.ndarray, width: int):
+    # the layout create_disk_layout writes: a metadata sector, then [coords | nnbrs | nbrs] padded to max_node_len
+    sector_len = 4096
+    npts, ndims = vectors.shape
+    max_node_len = (width + 1) * 4 + vectors.nbytes // npts
+    per_sector = sector_len // max_node_len
+    node_stride = max_node_len if per_sector > 0 else -(-max_node_len // sector_len) * sector_len
+    nodes = np.zeros((npts, node_stride), dtype=np.uint8)
+    nodes[:, : vectors.nbytes // npts] = vectors.view(np.uint8).reshape(npts, -1)
+    links = np.zeros((npts, width + 1), dtype=np.uint32)
+    links[:, 0] = neighbors.shape[1]
+    links[:, 1 : neighbors.shape[1] + 1] = neighbors
+    nodes[:, vectors.nbytes // npts : max_node_len] = links.view(np.uint8)
+    if per_sector > 0:
+        padded = np.zeros((-(-npts // per_sector) * per_sector, max_node_len), dtype=np.uint8)
+        padded[:npts] = nodes
+        sectors = np.zeros((padded.shape[0] // per_sector, sector_len), dtype=np.uint8)
+        sectors[:, : per_sector * max_node_len] = padded.reshape(sectors.shape[0], -1)
+        nodes = sectors
+    meta = np.array([npts, ndims, 0, max_node_len, per_sector, 0, 0, 0, 0], dtype=np.uint64)
+    header = np.zeros(sector_len, dtype=np.uint8)
+    header[:8] = np.array([meta.shape[0], 1], dtype=np.int32).view(np.uint8)
+    header[8 : 8 + meta.nbytes] = meta.view(np.uint8)
+    with open(path, "wb") as fh:
+        fh.write(header.tobytes())
+        fh.write(nodes.tobytes())
+
+
+class TestLid(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(12345)
+        cls._vectors = rng.random((1000, 8), dtype=np.float32)
+        cls._vector_path = os.path.join(cls._test_dir, "vectors.bin")
+        dap.vectors_to_file(cls._vector_path, cls._vectors)
+        cls._expected = _brute_force_lid(cls._vectors, 10)
+        sq_dists = ((cls._vectors[:, None, :] - cls._vectors[None, :, :]) ** 2).sum(axis=-1)
+        cls._knn = np.argsort(sq_dists, axis=1)[:, 1:11].astype(np.uint32)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls._test_dir, ignore_errors=True)
+
+    def test_lid_from_distances(self):
+        # distances growing as r_j = j^(1/d) give an LID close to d
+        k = 1000
+        distances = (np.arange(1, k + 1, dtype=np.float64) ** (1 / 4))[None, :]
+        self.assertAlmostEqual(float(dap.lid_from_distances(distances)[0]), 4.0, delta=0.1)
+        with self.assertRaises(ValueError):
+            dap.lid_from_distances(np.ones((5, 1), dtype=np.float32))
+
+    def test_compute_lid(self):
+        output_path = os.path.join(self._test_dir, "lid.bin")
+        dap.compute_lid(
+            self._vector_path, np.float32, output_path, k=10, query_block_size=300, base_block_size=256
+        )
+        lid = dap.vectors_from_file(output_path, np.float32)
+        self.assertEqual(lid.shape, (1000, 1))
+        np.testing.assert_allclose(lid[:, 0], self._expected, rtol=1e-2)
+        self.assertFalse(os.path.exists(output_path + ".progress"))
+
+    def _crash_after_first_block(self, output_path: str, compute=dap.compute_lid, **kwargs):
+        first_block = _lid._lid_block
+
+        def _first_only(*args):
+            if args[3] > 0:
+                raise RuntimeError("crash")
+            return first_block(*args)
+
+        with mock.patch.object(_lid, "_lid_block", _first_only), self.assertRaises(RuntimeError):
+            compute(self._vector_path, np.float32, output_path, query_block_size=300, **kwargs)
+        # mark the finished block so we can tell whether a rerun keeps it
+        lid = dap.vectors_from_file(output_path, np.float32, use_memmap=True, mode="r+")
+        lid[:300] = -1
+        lid.flush()
+
+    def test_resume(self):
+        # after a crash the finished block must be kept and the rest computed
+        output_path = os.path.join(self._test_dir, "lid_resumed.bin")
+        self._crash_after_first_block(output_path, k=10)
+        dap.compute_lid(self._vector_path, np.float32, output_path, k=10, query_block_size=300)
+        lid = dap.vectors_from_file(output_path, np.float32)[:, 0]
+        self.assertTrue(np.all(lid[:300] == -1))
+        np.testing.assert_allclose(lid[300:], self._expected[300:], rtol=1e-2)
+        for suffix in (".progress", ".params"):
+            self.assertFalse(os.path.exists(output_path + suffix))
+
+    def test_resume_with_other_parameters(self):
+        # a rerun with another k must not keep blocks computed with the old one
+        output_path = os.path.join(self._test_dir, "lid_resumed_other_k.bin")
+        self._crash_after_first_block(output_path, k=5)
+        dap.compute_lid(self._vector_path, np.float32, output_path, k=10, query_block_size=300)
+        lid = dap.vectors_from_file(output_path, np.float32)[:, 0]
+        np.testing.assert_allclose(lid, self._expected, rtol=1e-2)
+
+        # and neither does one whose blocks are cut differently
+        self._crash_after_first_block(output_path, k=10)
+        dap.compute_lid(self._vector_path, np.float32, output_path, k=10, query_block_size=250)
+        lid = dap.vectors_from_file(output_path, np.float32)[:, 0]
+        np.testing.assert_allclose(lid, self._expected, rtol=1e-2)
+
+    def test_approximate_lid_full_sample_is_exact(self):
+        output_path = os.path.join(self._test_dir, "lid_approx_full.bin")
+        dap.compute_approximate_lid(
+            self._vector_path, np.float32, output_path, k=10, sample_size=5000, query_block_size=300
+        )
+        lid = dap.vectors_from_file(output_path, np.float32)[:, 0]
+        np.testing.assert_allclose(lid, self._expected, rtol=1e-2)
+        for suffix in (".progress", ".params", ".sample.bin", ".sample_ids.bin", ".sample.bin.params"):
+            self.assertFalse(os.path.exists(output_path + suffix))
+
+    def test_approximate_lid(self):
+        output_path = os.path.join(self._test_dir, "lid_approx.bin")
+        dap.compute_approximate_lid(
+            self._vector_path, np.float32, output_path, k=10, sample_size=400, query_block_size=300, num_workers=2
+        )
+        lid = dap.vectors_from_file(output_path, np.float32)[:, 0]
+        self.assertEqual(lid.shape, (1000,))
+        # a real per-point estimate: same ballpark as the exact one and correlated with it point by point
+        self.assertAlmostEqual(float(np.median(lid)), float(np.median(self._expected)), delta=2.0)
+        self.assertGreater(np.corrcoef(lid, self._expected)[0, 1], 0.3)
+
+        # the same seed draws the same sample, so a rerun is reproducible
+        repeat_path = os.path.join(self._test_dir, "lid_approx_repeat.bin")
+        dap.compute_approximate_lid(
+            self._vector_path, np.float32, repeat_path, k=10, sample_size=400, query_block_size=300
+        )
+        np.testing.assert_allclose(dap.vectors_from_file(repeat_path, np.float32)[:, 0], lid, rtol=1e-5)
+
+        # a rerun with another seed after a crash draws its own sample rather than reusing the crashed one's
+        resumed_path = os.path.join(self._test_dir, "lid_approx_other_seed.bin")
+        self._crash_after_first_block(resumed_path, dap.compute_approximate_lid, k=10, sample_size=400, seed=1)
+        dap.compute_approximate_lid(
+            self._vector_path, np.float32, resumed_path, k=10, sample_size=400, query_block_size=300
+        )
+        np.testing.assert_allclose(dap.vectors_from_file(resumed_path, np.float32)[:, 0], lid, rtol=1e-5)
+
+    def test_lid_from_disk_index(self):
+        # with each node's exact 10-NN as its stored neighbor list, the result is the exact LID
+        for width, prefix in ((16, "packed"), (1100, "multisector")):
+            _write_disk_index(
+                os.path.join(self._test_dir, f"{prefix}_disk.index"), self._vectors, self._knn[:, ::-1], width
+            )
+            output_path = dap.compute_lid_from_disk_index(
+                self._test_dir, vector_dtype=np.float32, index_prefix=prefix, nodes_per_block=100
+            )
+            self.assertEqual(output_path, os.path.join(self._test_dir, f"{prefix}_lid.bin"))
+            lid = dap.vectors_from_file(output_path, np.float32)[:, 0]
+            np.testing.assert_allclose(lid, self._expected, rtol=1e-2)
+
+        # using only the 5 nearest stored neighbors matches a k=5 estimate, and the node without neighbors gets the
+        # mean of the others
+        neighbors = self._knn.copy()
+        _write_disk_index(os.path.join(self._test_dir, "short_disk.index"), self._vectors, neighbors, 10)
+        with open(os.path.join(self._test_dir, "short_disk.index"), "r+b") as fh:
+            fh.seek(4096 + 8 * 4)
+            fh.write(np.uint32(0).tobytes())
+        output_path = os.path.join(self._test_dir, "short_lid.bin")
+        dap.compute_lid_from_disk_index(
+            self._test_dir, output_path, vector_dtype=np.float32, index_prefix="short", k=5
+        )
+        lid = dap.vectors_from_file(output_path, np.float32)[:, 0]
+        expected = _brute_force_lid(self._vectors, 5)
+        np.testing.assert_allclose(lid[1:], expected[1:], rtol=1e-2)
+        self.assertAlmostEqual(float(lid[0]), float(np.mean(lid[1:])), places=3)
+
+        with self.assertRaises(ValueError):
+            dap.compute_lid_from_disk_index(self._test_dir, index_prefix="packed")
+        # an index whose nodes hold PQ codes instead of their vectors
+        with open(os.path.join(self._test_dir, "packed_disk.index_pq_pivots.bin"), "wb") as fh:
+            fh.write(np.zeros(2, dtype=np.int32).tobytes())
+        with self.assertRaises(ValueError):
+            dap.compute_lid_from_disk_index(self._test_dir, vector_dtype=np.float32, index_prefix="packed")
+        os.remove(os.path.join(self._test_dir, "packed_disk.index_pq_pivots.bin"))
+        with self.assertRaises(ValueError):
+            dap.compute_lid_from_disk_index(self._test_dir, vector_dtype=np.float32, index_prefix="missing")
+
+    def test_value_ranges(self):
+        output_path = os.path.join(self._test_dir, "lid_bad.bin")
+        with self.assertRaises(ValueError):
+            dap.compute_lid(self._vector_path, np.float64, output_path)
+        with self.assertRaises(ValueError):
+            dap.compute_lid(self._vector_path, np.float32, output_path, k=1)
+        with self.assertRaises(ValueError):
+            dap.compute_lid(self._vector_path, np.float32, output_path, query_block_size=0)
+        with self.assertRaises(ValueError):
+            dap.compute_lid("does_not_exist.bin", np.float32, output_path)
+        with self.assertRaises(ValueError):
+            dap.compute_approximate_lid(self._vector_path, np.float32, output_path, k=10, sample_size=10)
+        with self.assertRaises(ValueError):
+            dap.compute_approximate_lid(self._vector_path, np.float32, output_path, sample_size=0)
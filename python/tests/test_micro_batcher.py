@@ -0,0 +1,90 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import asyncio
+import threading
+import time
+import unittest
+
+import diskannpy as dap
+import numpy as np
+
+
+class _RecordingIndex:
+    """Stands in for a StaticDiskIndex: answers each query with its own first component, and records batch sizes."""
+
+    def __init__(self, delay: float = 0.0):
+        self.batch_sizes = []
+        self._delay = delay
+
+    def batch_search(self, queries, k_neighbors, complexity, num_threads, beam_width):
+        self.batch_sizes.append(queries.shape[0])
+        time.sleep(self._delay)
+        ids = np.repeat(queries[:, :1].astype(np.uint32), k_neighbors, axis=1)
+        return dap.QueryResponseBatch(identifiers=ids, distances=np.zeros(ids.shape, dtype=np.float32))
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_batches_and_routes_results(self):
+        index = _RecordingIndex()
+        with dap.MicroBatcher(index, k_neighbors=3, complexity=10, max_batch_size=16, max_wait_ms=50) as batcher:
+            futures = [batcher.submit(np.full(4, i, dtype=np.float32)) for i in range(40)]
+            responses = [future.result() for future in futures]
+        for i, response in enumerate(responses):
+            self.assertIsInstance(response, dap.QueryResponse)
+            np.testing.assert_array_equal(response.identifiers, [i, i, i])
+        self.assertEqual(sum(index.batch_sizes), 40)
+        self.assertLessEqual(max(index.batch_sizes), 16)
+        self.assertLess(len(index.batch_sizes), 40)
+
+    def test_max_wait(self):
+        index = _RecordingIndex()
+        with dap.MicroBatcher(index, k_neighbors=1, complexity=10, max_batch_size=64, max_wait_ms=5) as batcher:
+            start = time.perf_counter()
+            batcher.search(np.zeros(4, dtype=np.float32))
+            self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(index.batch_sizes, [1])
+
+    def test_async(self):
+        index = _RecordingIndex()
+
+        async def _search_all(batcher):
+            return await asyncio.gather(
+                *(batcher.search_async(np.full(4, i, dtype=np.float32)) for i in range(10))
+            )
+
+        with dap.MicroBatcher(index, k_neighbors=2, complexity=10, max_wait_ms=20) as batcher:
+            responses = asyncio.run(_search_all(batcher))
+        self.assertEqual([int(r.identifiers[0]) for r in responses], list(range(10)))
+
+    def test_adapts_to_target_latency(self):
+        # every batch takes 20ms against a 10ms target, so the batch size must back off to 1
+        index = _RecordingIndex(delay=0.02)
+        with dap.MicroBatcher(
+            index, k_neighbors=1, complexity=10, max_batch_size=32, max_wait_ms=1, target_latency_ms=10
+        ) as batcher:
+            threads = [
+                threading.Thread(target=batcher.search, args=(np.zeros(4, dtype=np.float32),)) for _ in range(64)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(batcher.batch_size, 1)
+
+    def test_errors(self):
+        class _FailingIndex:
+            def batch_search(self, *args, **kwargs):
+                raise RuntimeError("search failed")
+
+        with dap.MicroBatcher(_FailingIndex(), k_neighbors=1, complexity=10) as batcher:
+            with self.assertRaises(RuntimeError):
+                batcher.search(np.zeros(4, dtype=np.float32))
+            with self.assertRaises(ValueError):
+                batcher.submit(np.zeros((2, 4), dtype=np.float32))
+            with self.assertRaises(ValueError):
+                batcher.submit(np.zeros(5, dtype=np.float32))
+        with self.assertRaises(ValueError):
+            batcher.submit(np.zeros(4, dtype=np.float32))
+        with self.assertRaises(ValueError):
+            dap.MicroBatcher(_FailingIndex(), k_neighbors=0, complexity=10)
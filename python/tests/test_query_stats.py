@@ -0,0 +1,32 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import unittest
+
+import diskannpy as dap
+import numpy as np
+
+
+class TestSummarizeQueryStats(unittest.TestCase):
+    def test_summary(self):
+        stats = np.zeros(100, dtype=dap.query_stats_dtype)
+        stats["n_ios"] = np.arange(1, 101)
+        stats["io_us"] = 10.0
+        summary = dap.summarize_query_stats(stats, percentiles=(50, 99.9))
+        self.assertEqual(set(summary), set(dap.query_stats_dtype.names))
+        self.assertEqual(set(summary["n_ios"]), {"mean", "p50", "p99.9"})
+        self.assertAlmostEqual(summary["n_ios"]["mean"], 50.5)
+        self.assertAlmostEqual(summary["n_ios"]["p50"], 50.5)
+        self.assertAlmostEqual(summary["io_us"]["p99.9"], 10.0)
+        self.assertEqual(summary["n_hops"]["mean"], 0.0)
+
+    def test_value_ranges(self):
+        stats = np.zeros(10, dtype=dap.query_stats_dtype)
+        with self.assertRaises(ValueError):
+            dap.summarize_query_stats(stats[:0])
+        with self.assertRaises(ValueError):
+            dap.summarize_query_stats(stats.reshape(2, 5))
+        with self.assertRaises(ValueError):
+            dap.summarize_query_stats(np.zeros(10, dtype=np.float32))
+        with self.assertRaises(ValueError):
+            dap.summarize_query_stats(stats, percentiles=(101,))
@@ -0,0 +1,117 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import diskannpy as dap
+
+_LOG = """==========================================================
+Grid Search Task: gist
+Params: R=32, L=100, Alpha=[1.0, 1.2]
+==========================================================
+=== Benchmarking ===
+--- Baseline ---
+L     QPS        Lat(us)    Recall
+50    1300.00    20000.00   70.00
+100   700.00     40000.00   80.00
+150   100.00     270000.00  90.00
+
+--- MCGI ---
+L     QPS        Lat(us)    Recall
+50    1400.00    20000.00   72.00
+100   900.00     40000.00   84.00
+150   FAIL       FAIL       FAIL
+"""
+
+
+def _record(alpha_min, alpha_max, search_complexity, recall, qps):
+    return dict(dataset="rand", graph_degree=16, build_complexity=32, alpha_min=alpha_min, alpha_max=alpha_max,
+                variant="baseline" if alpha_min is None else "mcgi", search_complexity=search_complexity,
+                beam_width=2, num_threads=4, num_nodes_to_cache=0, k=10, recall=recall, qps=qps,
+                latency_us_mean=1e6 / qps)
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self._test_dir = tempfile.mkdtemp()
+        self._store = dap.ResultsStore(os.path.join(self._test_dir, "results.db"))
+
+    def tearDown(self) -> None:
+        self._store.close()
+        shutil.rmtree(self._test_dir, ignore_errors=True)
+
+    def test_ingest_logs(self):
+        logs = os.path.join(self._test_dir, "fullscan")
+        os.makedirs(logs)
+        with open(os.path.join(logs, "gist_R32_min1.0_max1.2.txt"), "w") as fh:
+            fh.write(_LOG)
+        with open(os.path.join(logs, "notes.txt"), "w") as fh:
+            fh.write("not a log\n")
+        self.assertEqual(self._store.ingest_logs([logs]), 5)
+        # unchanged files are skipped
+        self.assertEqual(self._store.ingest_logs([logs]), 0)
+        self.assertEqual(self._store.count(), 5)
+        self.assertEqual(self._store.count({"variant": "baseline", "alpha_min": None}), 3)
+        self.assertEqual(self._store.count({"build_complexity": 100, "alpha_max": 1.2}), 2)
+
+        at_75 = {result["variant"]: result["qps"] for result in self._store.qps_at_recall(0.75)}
+        self.assertAlmostEqual(at_75["baseline"], 1000.0)
+        self.assertAlmostEqual(at_75["mcgi"], 1400 - 3 / 12 * 500)
+        # only the baseline reaches 0.9
+        self.assertEqual([result["variant"] for result in self._store.qps_at_recall(0.9)], ["baseline"])
+
+        speedup = self._store.speedup_at_recall(0.8)
+        self.assertEqual(len(speedup), 1)
+        self.assertAlmostEqual(speedup[0]["speedup"], (1400 - 8 / 12 * 500) / 700)
+        self.assertEqual((speedup[0]["alpha_min"], speedup[0]["alpha_max"]), (1.0, 1.2))
+
+    def test_ingest_records(self):
+        records_file = os.path.join(self._test_dir, "records.jsonl")
+        with open(records_file, "w") as fh:
+            for record in (_record(None, None, 10, 0.5, 1000), _record(None, None, 20, 0.8, 500)):
+                fh.write(json.dumps(record) + "\n")
+            fh.write(json.dumps(_record(1.0, 1.2, 10, 0.6, 1100))[:20])
+        self.assertEqual(self._store.ingest_records(records_file), 2)
+
+        # the partial line is read once complete, earlier lines are not read again
+        with open(records_file, "a") as fh:
+            fh.write(json.dumps(_record(1.0, 1.2, 10, 0.6, 1100))[20:] + "\n")
+            for record in (_record(1.0, 1.2, 20, 0.9, 400), _record(1.0, 1.2, 20, 0.9, 100),
+                           _record(1.0, 1.2, 20, 0.9, 600), _record(1.0, 1.2, 30, 0.85, 300)):
+                fh.write(json.dumps(record) + "\n")
+        with open(records_file, "r+") as fh:
+            content = fh.read()
+            fh.seek(0)
+            fh.write(content.replace('"dataset": "rand"', '"dataset": "rnd0"', 1))
+        self.assertEqual(self._store.ingest_records(records_file), 5)
+        self.assertEqual(self._store.count(), 7)
+        self.assertEqual(self._store.count({"dataset": "rnd0"}), 0)
+
+        points = {(p["variant"], p["search_complexity"]): p for p in self._store.points()}
+        # repeated measurements are summarized by their median
+        self.assertEqual(points[("mcgi", 20)]["qps"], 400)
+        self.assertEqual(points[("mcgi", 20)]["n"], 3)
+
+        # (mcgi, L30) is beaten by (mcgi, L20), (baseline, L10) by (mcgi, L10)
+        frontier = [(p["variant"], p["search_complexity"]) for p in self._store.pareto_frontier()]
+        self.assertEqual(frontier, [("mcgi", 10), ("baseline", 20), ("mcgi", 20)])
+        self.assertEqual(
+            [(p["variant"], p["search_complexity"]) for p in self._store.pareto_frontier({"variant": "baseline"})],
+            [("baseline", 10), ("baseline", 20)],
+        )
+        self.assertAlmostEqual(self._store.speedup_at_recall(0.8)[0]["speedup"], (1100 - 2 / 3 * 700) / 500)
+
+        # a rewritten, shorter file replaces its rows
+        with open(records_file, "w") as fh:
+            fh.write(json.dumps(_record(None, None, 10, 0.5, 1000)) + "\n")
+        self.assertEqual(self._store.ingest_records(records_file), 1)
+        self.assertEqual(self._store.count(), 1)
+
+        with self.assertRaises(ValueError):
+            self._store.points({"L": 10})
+        with self.assertRaises(ValueError):
+            self._store.qps_at_recall(95)
@@ -0,0 +1,114 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import diskannpy as dap
+
+
+def _timed_job(log_directory: str, name: str, seconds: float, fail: bool = False) -> float:
+    start = time.time()
+    time.sleep(seconds)
+    with open(os.path.join(log_directory, name + ".json"), "w") as fh:
+        json.dump([start, time.time()], fh)
+    if fail:
+        raise RuntimeError(f"{name} failed")
+    return seconds
+
+
+class TestJobScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self._test_dir = tempfile.mkdtemp()
+        self._ledger = os.path.join(self._test_dir, "ledger.jsonl")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self._test_dir, ignore_errors=True)
+
+    def _intervals(self):
+        intervals = {}
+        for file in os.listdir(self._test_dir):
+            if file.endswith(".json"):
+                with open(os.path.join(self._test_dir, file)) as fh:
+                    intervals[file[: -len(".json")]] = json.load(fh)
+        return intervals
+
+    @staticmethod
+    def _overlap(a, b) -> bool:
+        return a[0] < b[1] and b[0] < a[1]
+
+    def test_limits(self):
+        scheduler = dap.JobScheduler(self._ledger, max_threads=4, max_memory_gb=10)
+        for i in range(4):
+            scheduler.submit(f"b{i}", _timed_job, self._test_dir, f"b{i}", 0.3, threads=2, memory_gb=1)
+        scheduler.submit("big", _timed_job, self._test_dir, "big", 0.3, threads=1, memory_gb=20)
+        states = scheduler.run()
+        self.assertEqual(set(states.values()), {"done"})
+
+        intervals = self._intervals()
+        # two builds of 2 threads fit at a time
+        self.assertTrue(self._overlap(intervals["b0"], intervals["b1"]))
+        for start, _ in intervals.values():
+            self.assertLessEqual(sum(begin <= start < end for begin, end in intervals.values()), 2)
+        # a job declaring more than a limit runs alone
+        for name in ("b0", "b1", "b2", "b3"):
+            self.assertFalse(self._overlap(intervals["big"], intervals[name]))
+
+    def test_search_runs_alone(self):
+        scheduler = dap.JobScheduler(self._ledger, max_threads=8, max_memory_gb=10)
+        scheduler.submit("build0", _timed_job, self._test_dir, "build0", 0.1)
+        scheduler.submit("build1", _timed_job, self._test_dir, "build1", 0.6)
+        scheduler.submit("search0", _timed_job, self._test_dir, "search0", 0.2, kind="search", after=["build0"])
+        scheduler.submit("build2", _timed_job, self._test_dir, "build2", 0.1, after=["build0"])
+        self.assertEqual(set(scheduler.run().values()), {"done"})
+
+        intervals = self._intervals()
+        for name in ("build0", "build1", "build2"):
+            self.assertFalse(self._overlap(intervals["search0"], intervals[name]))
+        # once the search is ready, it waits for build1 and goes before build2
+        self.assertLess(intervals["search0"][1], intervals["build2"][0])
+
+    def test_ledger(self):
+        scheduler = dap.JobScheduler(self._ledger, max_threads=2, max_memory_gb=1)
+        scheduler.submit("ok", _timed_job, self._test_dir, "ok", 0.0)
+        scheduler.submit("bad", _timed_job, self._test_dir, "bad", 0.0, fail=True)
+        scheduler.submit("after_bad", _timed_job, self._test_dir, "after_bad", 0.0, after=["bad"])
+        self.assertEqual(scheduler.run(), {"ok": "done", "bad": "failed", "after_bad": "failed"})
+        self.assertNotIn("after_bad", self._intervals())
+        with open(self._ledger) as fh:
+            entries = [json.loads(line) for line in fh]
+        self.assertIn({"job": "ok", "state": "done", "result": 0.0}, [
+            {key: entry[key] for key in ("job", "state", "result") if key in entry} for entry in entries
+        ])
+        self.assertEqual([entry["error"] for entry in entries if entry["job"] == "bad" and "error" in entry],
+                         ["RuntimeError: bad failed"])
+
+        # a restarted scheduler only runs what did not finish
+        for file in ("ok.json", "bad.json"):
+            os.remove(os.path.join(self._test_dir, file))
+        scheduler = dap.JobScheduler(self._ledger, max_threads=2, max_memory_gb=1)
+        scheduler.submit("ok", _timed_job, self._test_dir, "ok", 0.0)
+        scheduler.submit("bad", _timed_job, self._test_dir, "bad", 0.0)
+        scheduler.submit("after_bad", _timed_job, self._test_dir, "after_bad", 0.0, after=["bad"])
+        self.assertEqual(scheduler.states(), {"ok": "done", "bad": "pending", "after_bad": "pending"})
+        self.assertEqual(set(scheduler.run().values()), {"done"})
+        self.assertEqual(set(self._intervals()), {"bad", "after_bad"})
+
+        # unless it is submitted to be run again
+        scheduler = dap.JobScheduler(self._ledger, max_threads=2, max_memory_gb=1)
+        scheduler.submit("ok", _timed_job, self._test_dir, "ok", 0.0, rerun=True)
+        scheduler.submit("bad", _timed_job, self._test_dir, "bad", 0.0)
+        self.assertEqual(scheduler.states(), {"ok": "pending", "bad": "done"})
+        self.assertEqual(scheduler.run(), {"ok": "done", "bad": "done"})
+        self.assertIn("ok", self._intervals())
+
+        with self.assertRaises(ValueError):
+            scheduler.submit("ok", _timed_job, self._test_dir, "ok", 0.0)
+        with self.assertRaises(ValueError):
+            scheduler.submit("orphan", _timed_job, self._test_dir, "orphan", 0.0, after=["missing"])
+        with self.assertRaises(ValueError):
+            dap.JobScheduler(self._ledger, max_threads=0, max_memory_gb=1)
@@ -1,8 +1,11 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT license.
 
+import asyncio
+import os
 import shutil
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from tempfile import mkdtemp
 
@@ -106,6 +109,305 @@ class TestStaticDiskIndex(unittest.TestCase):
                 self.assertEqual(ids.shape[0], k)
                 self.assertEqual(dists.shape[0], k)
 
+    def test_async(self):
+        metric, dtype, query_vectors, index_vectors, ann_dir = self._test_matrix[0]
+        index = dap.StaticDiskIndex(
+            distance_metric="l2",
+            vector_dtype=dtype,
+            index_directory=ann_dir,
+            num_threads=4,
+            num_nodes_to_cache=10,
+        )
+        k = 5
+
+        async def _search_all():
+            singles = await asyncio.gather(
+                *(index.search_async(query, k_neighbors=k, complexity=5) for query in query_vectors[:64])
+            )
+            batch = await index.batch_search_async(query_vectors[:64], k_neighbors=k, complexity=5, num_threads=4)
+            return singles, batch
+
+        singles, batch = asyncio.run(_search_all())
+        self.assertEqual(len(singles), 64)
+        self.assertIsInstance(singles[0], dap.QueryResponse)
+        self.assertIsInstance(batch, dap.QueryResponseBatch)
+        for i, (ids, dists) in enumerate(singles):
+            np.testing.assert_array_equal(ids, index.search(query_vectors[i], k_neighbors=k, complexity=5).identifiers)
+        with self.assertRaises(ValueError):
+            asyncio.run(index.search_async(query_vectors[0], k_neighbors=0, complexity=5))
+
+    def test_batch_output_buffers(self):
+        metric, dtype, query_vectors, index_vectors, ann_dir = self._test_matrix[0]
+        index = dap.StaticDiskIndex(
+            distance_metric="l2",
+            vector_dtype=dtype,
+            index_directory=ann_dir,
+            num_threads=16,
+            num_nodes_to_cache=10,
+        )
+        k = 5
+        expected_ids, _ = index.batch_search(query_vectors, k_neighbors=k, complexity=32, num_threads=16)
+
+        out_ids = np.empty((query_vectors.shape[0], k), dtype=np.uint32)
+        out_dists = np.empty((query_vectors.shape[0], k), dtype=np.float32)
+        ids, dists = index.batch_search(
+            query_vectors, k_neighbors=k, complexity=32, num_threads=16, out_ids=out_ids, out_dists=out_dists
+        )
+        self.assertIs(ids, out_ids)
+        self.assertIs(dists, out_dists)
+        np.testing.assert_array_equal(out_ids, expected_ids)
+        with self.assertRaises(ValueError):
+            index.batch_search(
+                query_vectors, k_neighbors=k, complexity=32, num_threads=16, out_dists=out_dists.astype(np.float64)
+            )
+
+    def test_return_stats(self):
+        metric, dtype, query_vectors, index_vectors, ann_dir = self._test_matrix[0]
+        index = dap.StaticDiskIndex(
+            distance_metric="l2",
+            vector_dtype=dtype,
+            index_directory=ann_dir,
+            num_threads=16,
+            num_nodes_to_cache=10,
+        )
+        k = 5
+        ids, dists, stats = index.batch_search(
+            query_vectors, k_neighbors=k, complexity=32, num_threads=16, return_stats=True
+        )
+        self.assertEqual(stats.dtype, dap.query_stats_dtype)
+        self.assertEqual(stats.shape, (query_vectors.shape[0],))
+        self.assertTrue((stats["n_hops"] > 0).all())
+        self.assertTrue((stats["n_ios"] + stats["n_cache_hits"] > 0).all())
+        self.assertTrue((stats["total_us"] >= stats["io_us"]).all())
+        np.testing.assert_array_equal(
+            ids, index.batch_search(query_vectors, k_neighbors=k, complexity=32, num_threads=16).identifiers
+        )
+
+        response = index.search(query_vectors[0], k_neighbors=k, complexity=32, return_stats=True)
+        self.assertIsInstance(response, dap.QueryResponseWithStats)
+        self.assertGreater(response.stats["n_hops"], 0)
+        self.assertIn("p99", dap.summarize_query_stats(stats)["n_ios"])
+
+    def test_range_search(self):
+        metric, dtype, query_vectors, index_vectors, ann_dir = self._test_matrix[0]
+        index = dap.StaticDiskIndex(
+            distance_metric="l2",
+            vector_dtype=dtype,
+            index_directory=ann_dir,
+            num_threads=16,
+            num_nodes_to_cache=10,
+        )
+        queries = query_vectors[:50]
+        # the disk index reports squared l2 distances; take the 10th nearest neighbor's as the radius
+        knn = NearestNeighbors(n_neighbors=10, algorithm="auto", metric="l2").fit(index_vectors)
+        radius = float(knn.kneighbors(queries[:1])[0][0, -1] ** 2) * 1.0001
+
+        ids, dists = index.range_search(queries[0], radius=radius, min_complexity=16, max_complexity=128)
+        self.assertLessEqual(len(ids), 128)
+        self.assertTrue((dists <= radius).all())
+        self.assertTrue((np.diff(dists) >= 0).all())
+        self.assertGreater(len(ids), 0)
+
+        offsets, batch_ids, batch_dists = index.batch_range_search(
+            queries, radius=radius, min_complexity=16, max_complexity=128, num_threads=16
+        )
+        self.assertEqual(offsets.shape, (queries.shape[0] + 1,))
+        self.assertEqual(offsets[0], 0)
+        self.assertEqual(offsets[-1], batch_ids.shape[0])
+        self.assertEqual(batch_ids.shape, batch_dists.shape)
+        self.assertTrue((batch_dists <= radius).all())
+        np.testing.assert_array_equal(batch_ids[offsets[0] : offsets[1]], ids)
+
+        with self.assertRaises(ValueError):
+            index.range_search(queries[0], radius=radius, min_complexity=64, max_complexity=16)
+        with self.assertRaises(ValueError):
+            index.range_search(queries[0], radius=float("nan"), min_complexity=16, max_complexity=64)
+        with self.assertRaises(ValueError):
+            index.batch_range_search(queries, radius=radius, min_complexity=0, max_complexity=64, num_threads=16)
+
+    def test_mmap_pq_data(self):
+        for metric, dtype, query_vectors, index_vectors, ann_dir in self._test_matrix:
+            with self.subTest(metric=metric, dtype=dtype):
+                results = []
+                for mmap_pq_data, prefetch_pq_data in ((False, False), (True, False), (True, True)):
+                    index = dap.StaticDiskIndex(
+                        distance_metric=metric,
+                        vector_dtype=dtype,
+                        index_directory=ann_dir,
+                        num_threads=16,
+                        num_nodes_to_cache=10,
+                        mmap_pq_data=mmap_pq_data,
+                        prefetch_pq_data=prefetch_pq_data,
+                    )
+                    results.append(index.batch_search(query_vectors, k_neighbors=5, complexity=32, num_threads=16))
+                for ids, dists in results[1:]:
+                    np.testing.assert_array_equal(ids, results[0].identifiers)
+                    np.testing.assert_allclose(dists, results[0].distances)
+
+    def test_cache_snapshot(self):
+        metric, dtype, query_vectors, index_vectors, ann_dir = self._test_matrix[1]
+        snapshot = Path(ann_dir) / "ann_cache.bin"
+        k = 5
+        index = dap.StaticDiskIndex(
+            distance_metric="l2",
+            vector_dtype=dtype,
+            index_directory=ann_dir,
+            num_threads=16,
+            num_nodes_to_cache=100,
+        )
+        expected_ids, expected_dists = index.batch_search(query_vectors, k_neighbors=k, complexity=32, num_threads=16)
+        try:
+            for include_contents in (True, False):
+                with self.subTest(include_contents=include_contents):
+                    self.assertEqual(index.save_cache_snapshot(include_contents=include_contents), str(snapshot))
+                    self.assertTrue(snapshot.exists())
+                    restored = dap.StaticDiskIndex(
+                        distance_metric="l2",
+                        vector_dtype=dtype,
+                        index_directory=ann_dir,
+                        num_threads=16,
+                        num_nodes_to_cache=100,
+                    )
+                    ids, dists, stats = restored.batch_search(
+                        query_vectors, k_neighbors=k, complexity=32, num_threads=16, return_stats=True
+                    )
+                    np.testing.assert_array_equal(ids, expected_ids)
+                    np.testing.assert_allclose(dists, expected_dists)
+                    self.assertGreater(stats["n_cache_hits"].sum(), 0)
+
+            # a snapshot saved for another cache budget is ignored
+            dap.StaticDiskIndex(
+                distance_metric="l2",
+                vector_dtype=dtype,
+                index_directory=ann_dir,
+                num_threads=16,
+                num_nodes_to_cache=10,
+            )
+
+            # a snapshot of the index before it was rebuilt in place, here one with stale coordinates, is ignored
+            index.save_cache_snapshot(include_contents=True)
+            header_len = 9 * 8
+            num_cached = int(np.frombuffer(snapshot.read_bytes(), dtype=np.uint64, count=9)[8])
+            stale = bytearray(snapshot.read_bytes())
+            stale[header_len + 4 * num_cached :] = bytes(len(stale) - header_len - 4 * num_cached)
+            snapshot.write_bytes(stale)
+            disk_index = Path(ann_dir) / "ann_disk.index"
+            stat = disk_index.stat()
+            os.utime(disk_index, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            self._assert_restored_results(ann_dir, dtype, query_vectors, expected_ids, expected_dists)
+
+            # so is a snapshot listing a node the index does not have
+            index.save_cache_snapshot(include_contents=False)
+            corrupt = bytearray(snapshot.read_bytes())
+            corrupt[header_len : header_len + 4] = np.uint32(len(index_vectors)).tobytes()
+            snapshot.write_bytes(corrupt)
+            self._assert_restored_results(ann_dir, dtype, query_vectors, expected_ids, expected_dists)
+        finally:
+            snapshot.unlink(missing_ok=True)
+
+    def _assert_restored_results(self, ann_dir, dtype, query_vectors, expected_ids, expected_dists):
+        restored = dap.StaticDiskIndex(
+            distance_metric="l2",
+            vector_dtype=dtype,
+            index_directory=ann_dir,
+            num_threads=16,
+            num_nodes_to_cache=100,
+        )
+        ids, dists = restored.batch_search(query_vectors, k_neighbors=5, complexity=32, num_threads=16)
+        np.testing.assert_array_equal(ids, expected_ids)
+        np.testing.assert_allclose(dists, expected_dists)
+
+    def test_rebuild_cache_from_visits(self):
+        metric, dtype, query_vectors, index_vectors, ann_dir = self._test_matrix[0]
+        index = dap.StaticDiskIndex(
+            distance_metric="l2",
+            vector_dtype=dtype,
+            index_directory=ann_dir,
+            num_threads=16,
+            num_nodes_to_cache=0,
+            use_cache_snapshot=False,
+        )
+        self.assertEqual(index.visit_counts().sum(), 0)
+
+        index.record_visits(sample_rate=1)
+        _, _, stats = index.batch_search(query_vectors, k_neighbors=5, complexity=32, num_threads=16, return_stats=True)
+        self.assertEqual(stats["n_cache_hits"].sum(), 0)
+        counts = index.visit_counts()
+        self.assertEqual(counts.shape, (index_vectors.shape[0],))
+        self.assertGreater(counts.sum(), 0)
+
+        index.record_visits(sample_rate=0)
+        np.testing.assert_array_equal(index.count_visits(query_vectors, complexity=32), counts)
+        # count_visits keeps its own counts, apart from the recorded ones
+        np.testing.assert_array_equal(index.visit_counts(reset=True), counts)
+        self.assertEqual(index.visit_counts().sum(), 0)
+
+        # searches served and counters reset meanwhile do not leak into them
+        index.record_visits(sample_rate=1)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            serving = [
+                executor.submit(index.batch_search, query_vectors, k_neighbors=5, complexity=32, num_threads=4)
+                for _ in range(4)
+            ]
+            counted = executor.submit(index.count_visits, query_vectors, complexity=32, num_threads=4)
+            resets = executor.submit(lambda: [index.visit_counts(reset=True) for _ in range(20)])
+            np.testing.assert_array_equal(counted.result(), counts)
+            for future in serving + [resets]:
+                future.result()
+        index.record_visits(sample_rate=0)
+        index.visit_counts(reset=True)
+
+        cached = index.rebuild_cache(memory_budget=0.01, visit_counts=counts)
+        self.assertEqual(cached, np.count_nonzero(counts))
+        _, _, stats = index.batch_search(query_vectors, k_neighbors=5, complexity=32, num_threads=16, return_stats=True)
+        self.assertGreater(stats["n_cache_hits"].sum(), 0)
+        with self.assertRaises(ValueError):
+            index.record_visits(sample_rate=2)
+        # counts of another index, with more points, would cache nodes this index does not have
+        with self.assertRaises(ValueError):
+            index.rebuild_cache(memory_budget=0.01, visit_counts=np.append(counts, 1))
+
+    def test_dynamic_cache(self):
+        metric, dtype, query_vectors, index_vectors, ann_dir = self._test_matrix[0]
+        k = 5
+        index = dap.StaticDiskIndex(
+            distance_metric="l2",
+            vector_dtype=dtype,
+            index_directory=ann_dir,
+            num_threads=16,
+            num_nodes_to_cache=0,
+            use_cache_snapshot=False,
+        )
+        expected_ids, expected_dists = index.batch_search(query_vectors, k_neighbors=k, complexity=32, num_threads=16)
+        self.assertEqual(index.dynamic_cache_stats()["hits"], 0)
+
+        index.set_dynamic_cache(memory_budget=0.1)
+        for second_pass in (False, True):
+            ids, dists, stats = index.batch_search(
+                query_vectors, k_neighbors=k, complexity=32, num_threads=16, return_stats=True
+            )
+            np.testing.assert_array_equal(ids, expected_ids)
+            np.testing.assert_allclose(dists, expected_dists)
+            cache_stats = index.dynamic_cache_stats(reset=True)
+            self.assertEqual(cache_stats["hits"], stats["n_cache_hits"].sum())
+            self.assertEqual(cache_stats["evictions"], 0)
+        # the second pass reads the nodes the first one admitted from memory
+        self.assertEqual(stats["n_ios"].sum(), 0)
+        self.assertEqual(cache_stats["insertions"], 0)
+        self.assertGreater(cache_stats["num_entries"], 0)
+        self.assertEqual(index.dynamic_cache_stats()["hits"], 0)
+
+        # a cache far smaller than the working set keeps evicting, without changing the results
+        index.set_dynamic_cache(memory_budget=64 * 4096 / 1024**3)
+        ids, _ = index.batch_search(query_vectors, k_neighbors=k, complexity=32, num_threads=16)
+        np.testing.assert_array_equal(ids, expected_ids)
+        cache_stats = index.dynamic_cache_stats()
+        self.assertLessEqual(cache_stats["num_entries"], 64)
+        self.assertGreater(cache_stats["evictions"], 0)
+
+        index.set_dynamic_cache(memory_budget=0)
+        self.assertEqual(index.dynamic_cache_stats()["capacity_entries"], 0)
+
     def test_value_ranges_search(self):
         good_ranges = {"complexity": 5, "k_neighbors": 10, "beam_width": 2}
         bad_ranges = {"complexity": -1, "k_neighbors": 0, "beam_width": 0}
@@ -196,3 +498,58 @@ class TestStaticDiskIndex(unittest.TestCase):
 
         finally:
             shutil.rmtree(rel_dir, ignore_errors=True)
+
+
+class TestFilteredStaticDiskIndex(unittest.TestCase):
+    def test_simple_scenario(self):
+        vectors: np.ndarray = random_vectors(10000, 10, dtype=np.float32, seed=54321)
+        query_vectors: np.ndarray = random_vectors(10, 10, dtype=np.float32)
+        temp = mkdtemp()
+        labels = []
+        for idx in range(0, vectors.shape[0]):
+            label_list = []
+            if idx % 3 == 0:
+                label_list.append("even_by_3")
+            if idx % 5 == 0:
+                label_list.append("even_by_5")
+            if len(label_list) == 0:
+                label_list = ["neither"]
+            labels.append(label_list)
+        try:
+            dap.build_disk_index(
+                data=vectors,
+                distance_metric="l2",
+                index_directory=temp,
+                graph_degree=32,
+                complexity=64,
+                search_memory_maximum=0.0003,
+                build_memory_maximum=1,
+                num_threads=16,
+                filter_labels=labels,
+                filter_complexity=128,
+            )
+            index = dap.StaticDiskIndex(index_directory=temp, num_threads=16, num_nodes_to_cache=10)
+
+            k = 20
+            ids_1, _ = index.search(query_vectors[0], k_neighbors=k, complexity=64, filter_label="even_by_3")
+            self.assertTrue(all(id % 3 == 0 for id in ids_1))
+            ids_2, _ = index.search(query_vectors[0], k_neighbors=k, complexity=64, filter_label="even_by_5")
+            self.assertTrue(all(id % 5 == 0 for id in ids_2))
+
+            filter_labels = ["even_by_3", "even_by_5"] * (query_vectors.shape[0] // 2)
+            batch_ids, _ = index.batch_search(
+                query_vectors, k_neighbors=k, complexity=64, num_threads=16, filter_labels=filter_labels
+            )
+            for ids, label in zip(batch_ids, filter_labels):
+                divisor = 3 if label == "even_by_3" else 5
+                self.assertTrue(all(id % divisor == 0 for id in ids))
+            np.testing.assert_array_equal(batch_ids[0], ids_1)
+
+            with self.assertRaises(ValueError):
+                index.search(query_vectors[0], k_neighbors=k, complexity=64, filter_label="missing")
+            with self.assertRaises(ValueError):
+                index.batch_search(
+                    query_vectors, k_neighbors=k, complexity=64, num_threads=16, filter_labels=["even_by_3"]
+                )
+        finally:
+            shutil.rmtree(temp, ignore_errors=True)
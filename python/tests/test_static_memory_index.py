@@ -101,6 +101,37 @@ class TestStaticMemoryIndex(unittest.TestCase):
                 self.assertEqual(ids.shape[0], k)
                 self.assertEqual(dists.shape[0], k)
 
+    def test_batch_output_buffers(self):
+        metric, dtype, query_vectors, index_vectors, ann_dir, vector_bin_file, _ = self._test_matrix[0]
+        index = dap.StaticMemoryIndex(
+            index_directory=ann_dir,
+            num_threads=16,
+            initial_search_complexity=32,
+        )
+        k = 5
+        expected_ids, expected_dists = index.batch_search(query_vectors, k_neighbors=k, complexity=32, num_threads=16)
+
+        out_ids = np.empty((query_vectors.shape[0], k), dtype=np.uint32)
+        out_dists = np.empty((query_vectors.shape[0], k), dtype=np.float32)
+        for _ in range(2):
+            ids, dists = index.batch_search(
+                query_vectors, k_neighbors=k, complexity=32, num_threads=16, out_ids=out_ids, out_dists=out_dists
+            )
+            self.assertIs(ids, out_ids)
+            self.assertIs(dists, out_dists)
+            np.testing.assert_array_equal(out_ids, expected_ids)
+            np.testing.assert_allclose(out_dists, expected_dists)
+
+        bad_buffers = [
+            np.empty((query_vectors.shape[0], k), dtype=np.int64),
+            np.empty((query_vectors.shape[0], k + 1), dtype=np.uint32),
+            np.empty((k, query_vectors.shape[0]), dtype=np.uint32).T,
+        ]
+        for bad in bad_buffers:
+            with self.subTest(msg=f"{bad.dtype} {bad.shape}"):
+                with self.assertRaises(ValueError):
+                    index.batch_search(query_vectors, k_neighbors=k, complexity=32, num_threads=16, out_ids=bad)
+
     def test_value_ranges_ctor(self):
         (
             metric,
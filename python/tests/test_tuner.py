@@ -0,0 +1,91 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import diskannpy as dap
+import numpy as np
+from fixtures import random_vectors
+
+
+class TestSweepTuner(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._test_dir = tempfile.mkdtemp()
+        data_dir = os.path.join(cls._test_dir, "data", "rand")
+        os.makedirs(data_dir)
+        dap.vectors_to_file(os.path.join(data_dir, "rand_base.bin"), random_vectors(2000, 10, dtype=np.float32))
+        dap.vectors_to_file(
+            os.path.join(data_dir, "rand_query.bin"), random_vectors(100, 10, dtype=np.float32, seed=54321)
+        )
+        dap.compute_ground_truth(
+            os.path.join(data_dir, "rand_base.bin"),
+            os.path.join(data_dir, "rand_query.bin"),
+            os.path.join(data_dir, "rand_gt.bin"),
+            10,
+        )
+        cls._spec = dap.SweepSpec.from_dict(
+            {
+                "data_directory": "data",
+                "datasets": ["rand"],
+                "graph_degrees": [16],
+                "build_complexities": 32,
+                "alpha_min": [1.0, 1.1],
+                "alpha_max": [1.2, 1.4],
+                "search_complexities": [10, 20, 40],
+                "num_threads": [4],
+                "search_memory_maximum": 0.00003,
+                "build_threads": 0,
+                "lid_k": 10,
+            },
+            cls._test_dir,
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls._test_dir, ignore_errors=True)
+
+    def test_tune(self):
+        work_dir = os.path.join(self._test_dir, "tuning")
+        tuner = dap.SweepTuner(self._spec, work_dir, target_recall=0.8, sampling_rates=(0.25, 1.0), eta=3)
+        result = tuner.tune("rand")
+        self.assertIn(result.best, self._spec.builds())
+        self.assertEqual(result.grid_size, 5)
+        # all 5 on the slice, the best 2 on the whole data set
+        self.assertEqual(result.builds, 7)
+        self.assertEqual([len(rung.scores) for rung in result.rungs], [5, 2])
+        self.assertEqual(result.rungs[1].num_points, 2000)
+        self.assertLess(result.relative_cost, 0.7)
+        self.assertEqual(result.rungs[1].scores[result.best.name], (result.qps, result.recall))
+        self.assertTrue(all(name.startswith("rand_p0.25_s0_") for name in result.rungs[0].scores))
+        self.assertGreater(result.rungs[0].lid_stats["mean"], 0)
+        # only the promoted indices are kept
+        indices = [name for name in os.listdir(work_dir) if name.startswith("rand_")]
+        self.assertEqual(len(indices), 4)
+        self.assertEqual(len(tuner.observations()), 7)
+
+        # a rerun finds every search recorded and gives the same answer
+        rerun = dap.SweepTuner(self._spec, work_dir, target_recall=0.8, sampling_rates=(0.25, 1.0), eta=3)
+        self.assertEqual(rerun.tune("rand")[:3], result[:3])
+        self.assertEqual(len(rerun.observations()), 7)
+
+        # another seed draws another slice, whose indices and records are not shared with the first
+        subset = dap.SweepTuner(
+            self._spec, work_dir, target_recall=0.8, sampling_rates=(0.25, 1.0), eta=3, num_initial=2, seed=1
+        ).tune("rand")
+        self.assertEqual((subset.builds, len(subset.rungs[0].scores)), (3, 2))
+        self.assertTrue(all(name.startswith("rand_p0.25_s1_") for name in subset.rungs[0].scores))
+        seeded = [o for o in rerun.observations() if o["dataset"].startswith("rand_p0.25_s1")]
+        self.assertEqual(len(seeded), 2)
+
+    def test_validation(self):
+        work_dir = os.path.join(self._test_dir, "invalid")
+        with self.assertRaises(ValueError):
+            dap.SweepTuner(self._spec, work_dir, target_recall=95)
+        with self.assertRaises(ValueError):
+            dap.SweepTuner(self._spec, work_dir, target_recall=0.9, sampling_rates=(1.0, 0.1))
+        with self.assertRaises(ValueError):
+            dap.SweepTuner(self._spec, work_dir, target_recall=0.9, eta=1)
@@ -0,0 +1,181 @@
+// Copyright (c) Microsoft Corporation. All rights reserved.
+// Licensed under the MIT license.
+
+#include <algorithm>
+#include <atomic>
+#include <cmath>
+#include <fstream>
+#include <sstream>
+#include <string>
+
+#include <omp.h>
+
+#ifndef _WINDOWS
+#include <linux/mempolicy.h>
+#include <sched.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+#endif
+
+#include "benchmark_env.h"
+#include "logger.h"
+
+namespace diskann
+{
+
+#ifndef _WINDOWS
+namespace
+{
+bool read_node_cpus(const uint32_t node, std::vector<uint32_t> &cpus)
+{
+    // e.g. "0-15,32-47"
+    std::ifstream in("/sys/devices/system/node/node" + std::to_string(node) + "/cpulist");
+    std::string list;
+    if (!(in >> list))
+        return false;
+    std::stringstream ranges(list);
+    std::string range;
+    while (std::getline(ranges, range, ','))
+    {
+        const size_t dash = range.find('-');
+        const uint32_t first = (uint32_t)std::stoul(range.substr(0, dash));
+        const uint32_t last = dash == std::string::npos ? first : (uint32_t)std::stoul(range.substr(dash + 1));
+        for (uint32_t cpu = first; cpu <= last; cpu++)
+            cpus.push_back(cpu);
+    }
+    return !cpus.empty();
+}
+
+bool set_thread_cpus(const std::vector<uint32_t> &cpus)
+{
+    cpu_set_t set;
+    CPU_ZERO(&set);
+    for (const uint32_t cpu : cpus)
+        CPU_SET(cpu, &set);
+    // 0 is the calling thread, not the process
+    return sched_setaffinity(0, sizeof(set), &set) == 0;
+}
+
+bool bind_thread_memory(const uint32_t node)
+{
+    const size_t bits = 8 * sizeof(unsigned long);
+    std::vector<unsigned long> mask(node / bits + 1, 0);
+    mask[node / bits] |= 1UL << (node % bits);
+    return syscall(SYS_set_mempolicy, MPOL_BIND, mask.data(), mask.size() * bits + 1) == 0;
+}
+} // namespace
+
+bool pin_omp_threads(const uint32_t num_threads, const std::vector<uint32_t> &cpus)
+{
+    std::vector<uint32_t> targets(cpus);
+    cpu_set_t allowed;
+    if (targets.empty() && sched_getaffinity(0, sizeof(allowed), &allowed) == 0)
+    {
+        for (uint32_t cpu = 0; cpu < CPU_SETSIZE; cpu++)
+            if (CPU_ISSET(cpu, &allowed))
+                targets.push_back(cpu);
+    }
+    if (targets.empty())
+        return false;
+    std::atomic<bool> pinned{true};
+#pragma omp parallel num_threads(num_threads)
+    {
+        if (!set_thread_cpus({targets[omp_get_thread_num() % targets.size()]}))
+            pinned = false;
+    }
+    if (!pinned)
+        diskann::cerr << "Warning: could not pin the search threads to cores" << std::endl;
+    return pinned;
+}
+
+bool bind_numa_node(const uint32_t node, std::vector<uint32_t> &node_cpus)
+{
+    node_cpus.clear();
+    if (!read_node_cpus(node, node_cpus))
+    {
+        diskann::cerr << "Warning: NUMA node " << node << " not found" << std::endl;
+        return false;
+    }
+    // affinity and memory policy are per thread and inherited by new threads, so apply them to the calling thread
+    // and to the threads OpenMP already started
+    std::atomic<bool> bound{set_thread_cpus(node_cpus) && bind_thread_memory(node)};
+#pragma omp parallel
+    {
+        if (!set_thread_cpus(node_cpus) || !bind_thread_memory(node))
+            bound = false;
+    }
+    if (!bound)
+        diskann::cerr << "Warning: could not bind to NUMA node " << node << std::endl;
+    return bound;
+}
+
+bool drop_page_cache()
+{
+    sync();
+    std::ofstream drop_caches("/proc/sys/vm/drop_caches");
+    if (drop_caches << "3" << std::flush)
+        return true;
+    diskann::cerr << "Warning: could not drop the page cache, which needs root" << std::endl;
+    return false;
+}
+#else
+bool pin_omp_threads(const uint32_t, const std::vector<uint32_t> &)
+{
+    diskann::cerr << "Warning: pinning threads is only supported on Linux" << std::endl;
+    return false;
+}
+
+bool bind_numa_node(const uint32_t, std::vector<uint32_t> &)
+{
+    diskann::cerr << "Warning: binding to a NUMA node is only supported on Linux" << std::endl;
+    return false;
+}
+
+bool drop_page_cache()
+{
+    diskann::cerr << "Warning: dropping the page cache is only supported on Linux" << std::endl;
+    return false;
+}
+#endif
+
+RepeatSummary summarize_repeats(const std::vector<double> &values)
+{
+    RepeatSummary summary;
+    if (values.empty())
+        return summary;
+    std::vector<double> sorted(values);
+    std::sort(sorted.begin(), sorted.end());
+    const size_t n = sorted.size();
+    auto median_of = [](const std::vector<double> &v) {
+        return v.size() % 2 ? v[v.size() / 2] : (v[v.size() / 2 - 1] + v[v.size() / 2]) / 2;
+    };
+    summary.median = median_of(sorted);
+
+    // the median lies below the j-th smallest run with probability P(Binomial(n, 1/2) < j); take the largest j
+    // leaving at most 2.5% on either side
+    size_t j = 1;
+    double below = std::pow(0.5, (double)n); // P(X <= 0)
+    double term = below;
+    for (size_t i = 1; i < n / 2; i++)
+    {
+        term *= (double)(n - i + 1) / (double)i;
+        if (below + term > 0.025)
+            break;
+        below += term;
+        j = i + 1;
+    }
+    summary.ci_low = sorted[j - 1];
+    summary.ci_high = sorted[n - j];
+
+    std::vector<double> deviations(n);
+    for (size_t i = 0; i < n; i++)
+        deviations[i] = std::abs(values[i] - summary.median);
+    std::vector<double> sorted_deviations(deviations);
+    std::sort(sorted_deviations.begin(), sorted_deviations.end());
+    const double scaled_mad = 1.4826 * median_of(sorted_deviations);
+    summary.outliers.resize(n);
+    for (size_t i = 0; i < n; i++)
+        summary.outliers[i] = scaled_mad > 0 ? deviations[i] > 3 * scaled_mad : deviations[i] > 0;
+    return summary;
+}
+} // namespace diskann
@@ -632,11 +632,21 @@ int build_merged_vamana_index(const std::string &base_file, diskann::Metric comp
                               const std::string &medoids_file, const std::string &centroids_file, size_t build_pq_bytes, bool use_opq,
                               uint32_t num_threads, bool use_filters, const std::string &label_file,
                               const std::string &labels_to_medoids_file, const std::string &universal_label,
-                              const uint32_t Lf)
+                              const uint32_t Lf, std::shared_ptr<const MCGIContext> mcgi_context,
+                              const std::string &lid_file)
 {
     size_t base_num, base_dim;
     diskann::get_bin_metadata(base_file, base_num, base_dim);
 
+    // the LID estimated while pruning is only kept by indices whose context records it
+    if (!lid_file.empty() && (mcgi_context == nullptr || !mcgi_context->record_lid))
+    {
+        auto recording_context =
+            mcgi_context == nullptr ? CreateLIDRecordingContext() : std::make_shared<MCGIContext>(*mcgi_context);
+        recording_context->record_lid = true;
+        mcgi_context = recording_context;
+    }
+
     double full_index_ram = estimate_ram_usage(base_num, (uint32_t)base_dim, sizeof(T), R);
 
     // TODO: Make this honest when there is filter support
@@ -649,6 +659,7 @@ int build_merged_vamana_index(const std::string &base_file, diskann::Metric comp
                                                   .with_filter_list_size(Lf)
                                                   .with_saturate_graph(!use_filters)
                                                   .with_num_threads(num_threads)
+                                                  .with_mcgi_context(mcgi_context)
                                                   .build();
         using TagT = uint32_t;
         diskann::Index<T, TagT, LabelT> _index(compareMetric, base_dim, base_num,
@@ -667,6 +678,8 @@ int build_merged_vamana_index(const std::string &base_file, diskann::Metric comp
             _index.build_filtered_index(base_file.c_str(), label_file, base_num);
         }
         _index.save(mem_index_path.c_str());
+        if (!lid_file.empty())
+            _index.save_lid(lid_file);
 
         if (use_filters)
         {
@@ -713,10 +726,27 @@ int build_merged_vamana_index(const std::string &base_file, diskann::Metric comp
 
         std::string shard_index_file = merged_index_prefix + "_subshard-" + std::to_string(p) + "_mem.index";
 
+        // AMCGI only needs the candidate pool, so it applies to shards as is. An MCGI alpha table is indexed by
+        // global point id, so remap it through the shard idmap to the shard-local locations the Index prunes by.
+        std::shared_ptr<const MCGIContext> shard_mcgi_context = mcgi_context;
+        if (mcgi_context != nullptr && mcgi_context->mode == MCGIMode::STATIC)
+        {
+            std::vector<uint32_t> shard_ids;
+            read_idmap(shard_ids_file, shard_ids);
+            shard_mcgi_context = CreateShardMCGIContext(*mcgi_context, shard_ids);
+            if (shard_mcgi_context == nullptr)
+            {
+                std::stringstream stream;
+                stream << "MCGI alpha table does not cover all points of shard " << p << std::endl;
+                throw diskann::ANNException(stream.str(), -1, __FUNCSIG__, __FILE__, __LINE__);
+            }
+        }
+
         diskann::IndexWriteParameters low_degree_params = diskann::IndexWriteParametersBuilder(L, 2 * R / 3)
                                                               .with_filter_list_size(Lf)
                                                               .with_saturate_graph(false)
                                                               .with_num_threads(num_threads)
+                                                              .with_mcgi_context(shard_mcgi_context)
                                                               .build();
 
         uint64_t shard_base_dim, shard_base_pts;
@@ -741,6 +771,8 @@ int build_merged_vamana_index(const std::string &base_file, diskann::Metric comp
             _index.build_filtered_index(shard_base_file.c_str(), shard_labels_file, shard_base_pts);
         }
         _index.save(shard_index_file.c_str());
+        if (!lid_file.empty())
+            _index.save_lid(merged_index_prefix + "_subshard-" + std::to_string(p) + "_lid.bin");
         // copy universal label file from first shard to the final destination
         // index, since all shards anyway share the universal label
         if (p == 0)
@@ -762,6 +794,31 @@ int build_merged_vamana_index(const std::string &base_file, diskann::Metric comp
                           labels_to_medoids_file);
     diskann::cout << timer.elapsed_seconds_for_step("merging indices") << std::endl;
 
+    if (!lid_file.empty())
+    {
+        // a point can land in several shards, keep the estimate of the first shard that has it
+        std::vector<float> lid(base_num, 0.0f);
+        for (int p = 0; p < num_parts; p++)
+        {
+            std::string shard_lid_file = merged_index_prefix + "_subshard-" + std::to_string(p) + "_lid.bin";
+            std::string shard_id_file = merged_index_prefix + "_subshard-" + std::to_string(p) + "_ids_uint32.bin";
+            std::vector<uint32_t> shard_ids;
+            read_idmap(shard_id_file, shard_ids);
+
+            float *shard_lid = nullptr;
+            size_t shard_lid_pts, shard_lid_dim;
+            diskann::load_bin<float>(shard_lid_file, shard_lid, shard_lid_pts, shard_lid_dim);
+            for (size_t i = 0; i < shard_lid_pts && i < shard_ids.size(); i++)
+            {
+                if (lid[shard_ids[i]] <= 0.0f)
+                    lid[shard_ids[i]] = shard_lid[i];
+            }
+            delete[] shard_lid;
+            std::remove(shard_lid_file.c_str());
+        }
+        diskann::save_bin<float>(lid_file, lid.data(), lid.size(), 1);
+    }
+
     // delete tempFiles
     for (int p = 0; p < num_parts; p++)
     {
@@ -1103,7 +1160,7 @@ template <typename T, typename LabelT>
 int build_disk_index(const char *dataFilePath, const char *indexFilePath, const char *indexBuildParameters,
                      diskann::Metric compareMetric, bool use_opq, const std::string &codebook_prefix, bool use_filters,
                      const std::string &label_file, const std::string &universal_label, const uint32_t filter_threshold,
-                     const uint32_t Lf)
+                     const uint32_t Lf, const std::shared_ptr<const MCGIContext> mcgi_context)
 {
     std::stringstream parser;
     parser << std::string(indexBuildParameters);
@@ -1311,8 +1368,25 @@ int build_disk_index(const char *dataFilePath, const char *indexFilePath, const
     diskann::cout << "Compressing " << dim << "-dimensional data into " << num_pq_chunks << " bytes per vector."
                   << std::endl;
 
-    generate_quantized_data<T>(data_file_to_use, pq_pivots_path, pq_compressed_vectors_path, compareMetric, p_val,
-                               num_pq_chunks, use_opq, codebook_prefix);
+    // [HPDIC] a codebook prefix from diskannpy.ArtifactCache also carries the compressed vectors of the same base
+    // file; reuse them instead of re-encoding every point when they match this build.
+    std::string cached_compressed_path = codebook_prefix + "_pq_compressed.bin";
+    size_t cached_points = 0, cached_chunks = 0;
+    if (file_exists(codebook_prefix) && file_exists(cached_compressed_path))
+        diskann::get_bin_metadata(cached_compressed_path, cached_points, cached_chunks);
+    if (cached_points == points_num && cached_chunks == num_pq_chunks)
+    {
+        diskann::cout << "Reusing compressed vectors from: " << cached_compressed_path << std::endl;
+        copy_file(cached_compressed_path, pq_compressed_vectors_path);
+    }
+    else
+    {
+        generate_quantized_data<T>(data_file_to_use, pq_pivots_path, pq_compressed_vectors_path, compareMetric, p_val,
+                                   num_pq_chunks, use_opq, codebook_prefix);
+    }
+    // search loads the pivots from the index prefix, so keep a copy there when they came from a codebook
+    if (pq_pivots_path != index_prefix_path + "_pq_pivots.bin")
+        copy_file(pq_pivots_path, index_prefix_path + "_pq_pivots.bin");
     diskann::cout << timer.elapsed_seconds_for_step("generating quantized data") << std::endl;
 
 // Gopal. Splitting diskann_dll into separate DLLs for search and build.
@@ -1325,7 +1399,10 @@ int build_disk_index(const char *dataFilePath, const char *indexFilePath, const
     diskann::build_merged_vamana_index<T, LabelT>(data_file_to_use, diskann::Metric::L2, L, R, p_val,
                                                   indexing_ram_budget, mem_index_path, medoids_path, centroids_path,
                                                   build_pq_bytes, use_opq, num_threads, use_filters, labels_file_to_use,
-                                                  labels_to_medoids_path, universal_label, Lf);
+                                                  labels_to_medoids_path, universal_label, Lf, mcgi_context,
+                                                  mcgi_context != nullptr && mcgi_context->record_lid
+                                                      ? index_prefix_path + "_lid.bin"
+                                                      : std::string(""));
     diskann::cout << timer.elapsed_seconds_for_step("building merged vamana index") << std::endl;
 
     timer.reset();
@@ -1387,7 +1464,8 @@ int build_disk_index(const char *dataFilePath, const char *indexFilePathPrefix,
                      const std::string &label_file, const std::string &universal_label, const uint32_t filter_threshold,
                      const uint32_t Lf,
                      // AMCGI 参数 (保持不变)
-                     float lid_avg, float lid_std, float alpha_min, float alpha_max)
+                     float lid_avg, float lid_std, float alpha_min, float alpha_max, bool refine_lid,
+                     bool write_lid)
 {
     std::cout << "[HPDIC DEBUG] Starting Scalable Build... " << std::endl;
 
@@ -1416,21 +1494,14 @@ int build_disk_index(const char *dataFilePath, const char *indexFilePathPrefix,
 
     // 2. [MCGI] 注入 MCGI 参数 (你的逻辑)
     // ---------------------------------------------------------
-    // 即使在分块构建中，g_mcgi_ctx 作为全局变量，
-    // 对所有线程和切片都是可见的，所以这里初始化一次即可生效。
+    // AMCGI 上下文只属于这一次构建，经由 IndexWriteParameters 传给每个切片的 Index，
+    // 所以同一进程里的其它构建不受影响。
     // ---------------------------------------------------------
+    std::shared_ptr<const MCGIContext> mcgi_context = nullptr;
     if (lid_avg > 0.0f || alpha_min > 0.0f) // 只要有参数就尝试初始化
     {
         // 如果你的逻辑不再依赖 lid_avg，传 0 也没关系，关键是 alpha_min/max
-        g_mcgi_ctx.lid_avg = lid_avg;
-        g_mcgi_ctx.lid_std = lid_std;
-        g_mcgi_ctx.alpha_min = alpha_min;
-        g_mcgi_ctx.alpha_max = alpha_max;
-        g_mcgi_ctx.advanced = true;
-        // g_mcgi_ctx.enabled = true; // 如果你的 struct 有这个字段，请取消注释
-
-        std::cout << "[AMCGI] Context Initialized. Avg=" << lid_avg << " Std=" << lid_std << " Alpha=[" << alpha_min
-                  << "," << alpha_max << "]" << std::endl;
+        mcgi_context = diskann::CreateAMCGIContext(lid_avg, lid_std, alpha_min, alpha_max, refine_lid);
     }
 
     // 3. 准备路径
@@ -1454,7 +1525,8 @@ int build_disk_index(const char *dataFilePath, const char *indexFilePathPrefix,
                                                             : 0, // 如果需要构建时压缩 (通常传0，只在最后打包PQ)
                                                 use_opq, num_threads, use_filters, label_file,
                                                 "", // labels_to_medoids_path
-                                                universal_label, Lf);
+                                                universal_label, Lf, mcgi_context,
+                                                write_lid ? std::string(indexFilePathPrefix) + "_lid.bin" : "");
 
     // 5. [HPDIC] 生成 Disk Layout (复用现有的 PQ 文件)
     // ---------------------------------------------------------
@@ -1494,12 +1566,6 @@ int build_disk_index(const char *dataFilePath, const char *indexFilePathPrefix,
         diskann::create_disk_layout<T>(dataFilePath, mem_index_path, disk_index_path);
     }
 
-    // 6. 清理上下文
-    if (lid_avg > 0.0f)
-    {
-        diskann::FreeMCGIContext();
-    }
-
     std::cout << "[HPDIC] Build Complete. Index saved to: " << disk_index_path << std::endl;
     return 0;
 }
@@ -1689,6 +1755,12 @@ int build_disk_index(const char *dataFilePath, const char *indexFilePathPrefix,
     diskann::IndexWriteParametersBuilder param_builder(L, R);
     param_builder.with_num_threads(num_threads);
 
+    // [MCGI] 注入 MCGI 参数，alpha 表只属于这个 Index
+    if (!lid_file_path.empty())
+    {
+        param_builder.with_mcgi_context(diskann::CreateMCGIContext(lid_file_path, alpha_min, alpha_max, use_linear));
+    }
+
     if (use_filters)
     {
         param_builder.with_filter_list_size(Lf);
@@ -1706,13 +1778,7 @@ int build_disk_index(const char *dataFilePath, const char *indexFilePathPrefix,
                                   nullptr, 0, false, !label_file.empty(), false, build_PQ > 0,
                                   build_PQ > 0 ? build_PQ : 0, use_opq, use_filters);
 
-    // 5. [MCGI] 注入 MCGI 参数
-    if (!lid_file_path.empty())
-    {
-        diskann::InitMCGIContext(lid_file_path, alpha_min, alpha_max, use_linear);
-    }
-
-    // 6. 执行构建
+    // 5. 执行构建
     auto start = std::chrono::high_resolution_clock::now();
 
     if (use_filters && !label_file.empty())
@@ -1727,9 +1793,7 @@ int build_disk_index(const char *dataFilePath, const char *indexFilePathPrefix,
             index.build(dataFilePath, points_num);
     }
 
-    // 7. 清理与保存
-    diskann::FreeMCGIContext();
-
+    // 6. 保存
     std::chrono::duration<double> diff = std::chrono::high_resolution_clock::now() - start;
     std::cout << "Indexing time: " << diff.count() << "\n";
 
@@ -1820,30 +1884,30 @@ template int build_disk_index<uint8_t, uint16_t>(const char *, const char *, con
 
 template int build_disk_index<float>(const char *, const char *, const char *, diskann::Metric, bool,
                                      const std::string &, bool, const std::string &, const std::string &,
-                                     const uint32_t, const uint32_t, float, float, float,
-                                     float); // lid_avg, lid_std, alpha_min, alpha_max
+                                     const uint32_t, const uint32_t, float, float, float, float, bool,
+                                     bool); // lid_avg, lid_std, alpha_min, alpha_max, refine_lid, write_lid
 
 template int build_disk_index<int8_t>(const char *, const char *, const char *, diskann::Metric, bool,
                                       const std::string &, bool, const std::string &, const std::string &,
-                                      const uint32_t, const uint32_t, float, float, float, float);
+                                      const uint32_t, const uint32_t, float, float, float, float, bool, bool);
 
 template int build_disk_index<uint8_t>(const char *, const char *, const char *, diskann::Metric, bool,
                                        const std::string &, bool, const std::string &, const std::string &,
-                                       const uint32_t, const uint32_t, float, float, float, float);
+                                       const uint32_t, const uint32_t, float, float, float, float, bool, bool);
 
 // ========================= T, uint16_t Tag =========================
 
 template int build_disk_index<float, uint16_t>(const char *, const char *, const char *, diskann::Metric, bool,
                                                const std::string &, bool, const std::string &, const std::string &,
-                                               const uint32_t, const uint32_t, float, float, float, float);
+                                               const uint32_t, const uint32_t, float, float, float, float, bool, bool);
 
 template int build_disk_index<int8_t, uint16_t>(const char *, const char *, const char *, diskann::Metric, bool,
                                                 const std::string &, bool, const std::string &, const std::string &,
-                                                const uint32_t, const uint32_t, float, float, float, float);
+                                                const uint32_t, const uint32_t, float, float, float, float, bool, bool);
 
 template int build_disk_index<uint8_t, uint16_t>(const char *, const char *, const char *, diskann::Metric, bool,
                                                  const std::string &, bool, const std::string &, const std::string &,
-                                                 const uint32_t, const uint32_t, float, float, float, float);
+                                                 const uint32_t, const uint32_t, float, float, float, float, bool, bool);
 
 template DISKANN_DLLEXPORT void create_disk_layout<int8_t>(const std::string base_file,
                                                            const std::string mem_index_file,
@@ -1902,21 +1966,24 @@ template DISKANN_DLLEXPORT int build_disk_index<int8_t, uint32_t>(const char *da
                                                                   const std::string &codebook_prefix, bool use_filters,
                                                                   const std::string &label_file,
                                                                   const std::string &universal_label,
-                                                                  const uint32_t filter_threshold, const uint32_t Lf);
+                                                                  const uint32_t filter_threshold, const uint32_t Lf,
+                                                                  const std::shared_ptr<const MCGIContext> mcgi_context);
 template DISKANN_DLLEXPORT int build_disk_index<uint8_t, uint32_t>(const char *dataFilePath, const char *indexFilePath,
                                                                    const char *indexBuildParameters,
                                                                    diskann::Metric compareMetric, bool use_opq,
                                                                    const std::string &codebook_prefix, bool use_filters,
                                                                    const std::string &label_file,
                                                                    const std::string &universal_label,
-                                                                   const uint32_t filter_threshold, const uint32_t Lf);
+                                                                   const uint32_t filter_threshold, const uint32_t Lf,
+                                                                   const std::shared_ptr<const MCGIContext> mcgi_context);
 template DISKANN_DLLEXPORT int build_disk_index<float, uint32_t>(const char *dataFilePath, const char *indexFilePath,
                                                                  const char *indexBuildParameters,
                                                                  diskann::Metric compareMetric, bool use_opq,
                                                                  const std::string &codebook_prefix, bool use_filters,
                                                                  const std::string &label_file,
                                                                  const std::string &universal_label,
-                                                                 const uint32_t filter_threshold, const uint32_t Lf);
+                                                                 const uint32_t filter_threshold, const uint32_t Lf,
+                                                                 const std::shared_ptr<const MCGIContext> mcgi_context);
 // LabelT = uint16
 template DISKANN_DLLEXPORT int build_disk_index<int8_t, uint16_t>(const char *dataFilePath, const char *indexFilePath,
                                                                   const char *indexBuildParameters,
@@ -1924,51 +1991,60 @@ template DISKANN_DLLEXPORT int build_disk_index<int8_t, uint16_t>(const char *da
                                                                   const std::string &codebook_prefix, bool use_filters,
                                                                   const std::string &label_file,
                                                                   const std::string &universal_label,
-                                                                  const uint32_t filter_threshold, const uint32_t Lf);
+                                                                  const uint32_t filter_threshold, const uint32_t Lf,
+                                                                  const std::shared_ptr<const MCGIContext> mcgi_context);
 template DISKANN_DLLEXPORT int build_disk_index<uint8_t, uint16_t>(const char *dataFilePath, const char *indexFilePath,
                                                                    const char *indexBuildParameters,
                                                                    diskann::Metric compareMetric, bool use_opq,
                                                                    const std::string &codebook_prefix, bool use_filters,
                                                                    const std::string &label_file,
                                                                    const std::string &universal_label,
-                                                                   const uint32_t filter_threshold, const uint32_t Lf);
+                                                                   const uint32_t filter_threshold, const uint32_t Lf,
+                                                                   const std::shared_ptr<const MCGIContext> mcgi_context);
 template DISKANN_DLLEXPORT int build_disk_index<float, uint16_t>(const char *dataFilePath, const char *indexFilePath,
                                                                  const char *indexBuildParameters,
                                                                  diskann::Metric compareMetric, bool use_opq,
                                                                  const std::string &codebook_prefix, bool use_filters,
                                                                  const std::string &label_file,
                                                                  const std::string &universal_label,
-                                                                 const uint32_t filter_threshold, const uint32_t Lf);
+                                                                 const uint32_t filter_threshold, const uint32_t Lf,
+                                                                 const std::shared_ptr<const MCGIContext> mcgi_context);
 
 template DISKANN_DLLEXPORT int build_merged_vamana_index<int8_t, uint32_t>(
     const std::string &base_file, diskann::Metric compareMetric, uint32_t L, uint32_t R, double sampling_rate,
     double ram_budget, const std::string &mem_index_path, const std::string &medoids_path, const std::string &centroids_file,
     size_t build_pq_bytes, bool use_opq, uint32_t num_threads, bool use_filters, const std::string &label_file,
-    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf);
+    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf,
+    const std::shared_ptr<const MCGIContext> mcgi_context, const std::string &lid_file);
 template DISKANN_DLLEXPORT int build_merged_vamana_index<float, uint32_t>(
     const std::string &base_file, diskann::Metric compareMetric, uint32_t L, uint32_t R, double sampling_rate,
     double ram_budget, const std::string &mem_index_path, const std::string &medoids_path, const std::string &centroids_file,
     size_t build_pq_bytes, bool use_opq, uint32_t num_threads, bool use_filters, const std::string &label_file,
-    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf);
+    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf,
+    const std::shared_ptr<const MCGIContext> mcgi_context, const std::string &lid_file);
 template DISKANN_DLLEXPORT int build_merged_vamana_index<uint8_t, uint32_t>(
     const std::string &base_file, diskann::Metric compareMetric, uint32_t L, uint32_t R, double sampling_rate,
     double ram_budget, const std::string &mem_index_path, const std::string &medoids_path, const std::string &centroids_file,
     size_t build_pq_bytes, bool use_opq, uint32_t num_threads, bool use_filters, const std::string &label_file,
-    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf);
+    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf,
+    const std::shared_ptr<const MCGIContext> mcgi_context, const std::string &lid_file);
 // Label=16_t
 template DISKANN_DLLEXPORT int build_merged_vamana_index<int8_t, uint16_t>(
     const std::string &base_file, diskann::Metric compareMetric, uint32_t L, uint32_t R, double sampling_rate,
     double ram_budget, const std::string &mem_index_path, const std::string &medoids_path, const std::string &centroids_file,
     size_t build_pq_bytes, bool use_opq, uint32_t num_threads, bool use_filters, const std::string &label_file,
-    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf);
+    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf,
+    const std::shared_ptr<const MCGIContext> mcgi_context, const std::string &lid_file);
 template DISKANN_DLLEXPORT int build_merged_vamana_index<float, uint16_t>(
     const std::string &base_file, diskann::Metric compareMetric, uint32_t L, uint32_t R, double sampling_rate,
     double ram_budget, const std::string &mem_index_path, const std::string &medoids_path, const std::string &centroids_file,
     size_t build_pq_bytes, bool use_opq, uint32_t num_threads, bool use_filters, const std::string &label_file,
-    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf);
+    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf,
+    const std::shared_ptr<const MCGIContext> mcgi_context, const std::string &lid_file);
 template DISKANN_DLLEXPORT int build_merged_vamana_index<uint8_t, uint16_t>(
     const std::string &base_file, diskann::Metric compareMetric, uint32_t L, uint32_t R, double sampling_rate,
     double ram_budget, const std::string &mem_index_path, const std::string &medoids_path, const std::string &centroids_file,
     size_t build_pq_bytes, bool use_opq, uint32_t num_threads, bool use_filters, const std::string &label_file,
-    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf);
+    const std::string &labels_to_medoids_file, const std::string &universal_label, const uint32_t Lf,
+    const std::shared_ptr<const MCGIContext> mcgi_context, const std::string &lid_file);
 }; // namespace diskann
\ No newline at end of file
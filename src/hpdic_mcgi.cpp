@@ -14,108 +14,245 @@
 
 namespace diskann {
 
-MCGIContext g_mcgi_ctx;
-
 void RunMCGIHelloWorld() {
     std::cout << ">>> [MCGI] Module Loaded Successfully." << std::endl;
 }
 
-// --- 辅助函数：读取 DiskANN 二进制文件 ---
-// 格式: int32(num_points) | int32(dim) | data...
-bool LoadLIDBinary(const std::string& path, std::vector<float>& lid_values) {
-    std::ifstream in(path, std::ios::binary);
-    if (!in.is_open()) {
-        std::cerr << "[MCGI Error] Cannot open LID file: " << path << std::endl;
-        return false;
+// --- 辅助函数：按块读取 LID ---
+// LID 可以来自 DiskANN 二进制文件 (格式: int32(num_points) | int32(dim) | data...) 或内存数组。
+// 两种来源都按块流式遍历，整份 LID 从不驻留内存，十亿点时也只占一个块的缓冲区。
+namespace
+{
+const size_t LID_BLOCK_SIZE = (size_t)1 << 20; // 每块 1M 个点 (4 MB)
+
+class LIDReader
+{
+  public:
+    LIDReader(const float *values, size_t num_points) : _values(values), _num_points(num_points)
+    {
+    }
+
+    explicit LIDReader(const std::string &path) : _path(path)
+    {
+        std::ifstream in(path, std::ios::binary);
+        if (!in.is_open())
+        {
+            std::cerr << "[MCGI Error] Cannot open LID file: " << path << std::endl;
+            return;
+        }
+        int32_t npts_i32 = 0, ndim_i32 = 0;
+        in.read((char *)&npts_i32, sizeof(int32_t));
+        in.read((char *)&ndim_i32, sizeof(int32_t));
+        if (npts_i32 > 0)
+            _num_points = (size_t)npts_i32;
+    }
+
+    size_t size() const
+    {
+        return _num_points;
+    }
+
+    // fn(block, count, offset) 依次处理每一块；文件读取出错返回 false
+    template <typename F> bool for_each_block(F fn) const
+    {
+        if (_values != nullptr)
+        {
+            for (size_t offset = 0; offset < _num_points; offset += LID_BLOCK_SIZE)
+                fn(_values + offset, std::min(LID_BLOCK_SIZE, _num_points - offset), offset);
+            return true;
+        }
+
+        std::ifstream in(_path, std::ios::binary);
+        in.seekg(2 * sizeof(int32_t));
+        std::vector<float> block(std::min(LID_BLOCK_SIZE, _num_points));
+        for (size_t offset = 0; offset < _num_points; offset += LID_BLOCK_SIZE)
+        {
+            size_t count = std::min(LID_BLOCK_SIZE, _num_points - offset);
+            if (!in.read((char *)block.data(), count * sizeof(float)))
+            {
+                std::cerr << "[MCGI Error] LID file is truncated: " << _path << std::endl;
+                return false;
+            }
+            fn(block.data(), count, offset);
+        }
+        return true;
     }
 
-    int32_t npts_i32, ndim_i32;
-    in.read((char*)&npts_i32, sizeof(int32_t));
-    in.read((char*)&ndim_i32, sizeof(int32_t));
+  private:
+    const float *_values = nullptr;
+    std::string _path;
+    size_t _num_points = 0;
+};
 
-    if (npts_i32 <= 0) return false;
+// 第一遍：流式统计 min/max 与均值/方差 (Welford，避免大 N 时的数值误差)
+struct LIDStats
+{
+    double min = 0.0, max = 0.0, mean = 0.0, std_dev = 0.0;
+};
 
-    size_t num_points = (size_t)npts_i32;
-    lid_values.resize(num_points);
-    
-    // 读取 float 数组
-    in.read((char*)lid_values.data(), num_points * sizeof(float));
-    
-    std::cout << "[MCGI] Loaded " << num_points << " LID values." << std::endl;
+bool ComputeLIDStats(const LIDReader &reader, LIDStats &stats)
+{
+    double lid_min = INFINITY, lid_max = -INFINITY, mean = 0.0, m2 = 0.0;
+    size_t n = 0;
+    bool ok = reader.for_each_block([&](const float *block, size_t count, size_t) {
+        for (size_t i = 0; i < count; ++i)
+        {
+            double v = block[i];
+            lid_min = std::min(lid_min, v);
+            lid_max = std::max(lid_max, v);
+            double delta = v - mean;
+            mean += delta / (double)(++n);
+            m2 += delta * (v - mean);
+        }
+    });
+    if (!ok)
+        return false;
+    stats.min = lid_min;
+    stats.max = lid_max;
+    stats.mean = mean;
+    stats.std_dev = std::sqrt(m2 / n);
     return true;
 }
 
-// --- 实现全局接口 ---
-
-void InitMCGIContext(const std::string &lid_path, float alpha_min, float alpha_max, bool use_linear)
+std::shared_ptr<MCGIContext> CreateMCGIContext(const LIDReader &reader, float alpha_min, float alpha_max,
+                                               bool use_linear)
 {
-    if (lid_path.empty())
-        return;
+    size_t num_points = reader.size();
+    if (num_points == 0)
+        return nullptr;
+
+    auto ctx = std::make_shared<MCGIContext>();
+    ctx->alpha_min = alpha_min;
+    ctx->alpha_max = alpha_max;
 
-    std::cout << "[MCGI] Initializing Global Context..." << std::endl;
+    std::cout << "[MCGI] Initializing Context..." << std::endl;
     std::cout << "[MCGI] Param Alpha Range: [" << alpha_min << ", " << alpha_max << "]" << std::endl;
 
-    std::vector<float> lid_values;
-    if (!LoadLIDBinary(lid_path, lid_values))
-    {
-        std::cerr << "[MCGI Error] Failed to load LID file. MCGI disabled." << std::endl;
-        return;
-    }
+    LIDStats stats;
+    if (!ComputeLIDStats(reader, stats))
+        return nullptr;
 
-    g_mcgi_ctx.alpha_table.resize(lid_values.size());
+    // 第二遍：把 [0, 1] 内的映射比例量化成 16 位编码，alpha = min + code / 65535 * (max - min)
+    ctx->alpha_codes.resize(num_points);
+    auto quantize = [](double ratio) {
+        return (uint16_t)std::lround(std::min(std::max(ratio, 0.0), 1.0) * MCGIContext::MAX_ALPHA_CODE);
+    };
 
+    bool ok;
     if (use_linear) {
         std::cout << "[MCGI ALGO] Using Ablation Mode: LINEAR Mapping" << std::endl;
-        
-        double lid_min = *std::min_element(lid_values.begin(), lid_values.end());
-        double lid_max = *std::max_element(lid_values.begin(), lid_values.end());
-        double lid_range = lid_max - lid_min;
 
+        double lid_range = stats.max - stats.min;
         if (lid_range < 1e-6)
             lid_range = 1.0;
 
-        std::cout << "[MCGI] LID Stats -> Min: " << lid_min << ", Max: " << lid_max << std::endl;
+        std::cout << "[MCGI] LID Stats -> Min: " << stats.min << ", Max: " << stats.max << std::endl;
 
-        for (size_t i = 0; i < lid_values.size(); ++i) {
-            double ratio = (lid_values[i] - lid_min) / lid_range;
-            g_mcgi_ctx.alpha_table[i] = alpha_min + (float)(ratio * (alpha_max - alpha_min));
-        }
+        ok = reader.for_each_block([&](const float *block, size_t count, size_t offset) {
+            for (size_t i = 0; i < count; ++i)
+                ctx->alpha_codes[offset + i] = quantize((block[i] - stats.min) / lid_range);
+        });
     } else {
         std::cout << "[MCGI ALGO] Using Full Mode: SIGMOID Mapping" << std::endl;
-        
-        double sum = 0.0;
-        for (float v : lid_values)
-            sum += v;
-        double mean = sum / lid_values.size();
 
-        double sq_sum = 0.0;
-        for (float v : lid_values)
-            sq_sum += (v - mean) * (v - mean);
-        double std_dev = std::sqrt(sq_sum / lid_values.size());
+        double std_dev = stats.std_dev < 1e-6 ? 1.0 : stats.std_dev;
 
-        if (std_dev < 1e-6)
-            std_dev = 1.0;
-
-        std::cout << "[MCGI] LID Stats -> Mean: " << mean << ", StdDev: " << std_dev << std::endl;
+        std::cout << "[MCGI] LID Stats -> Mean: " << stats.mean << ", StdDev: " << std_dev << std::endl;
 
         const double k = 1.0;
-        for (size_t i = 0; i < lid_values.size(); ++i) {
-            double z_score = (lid_values[i] - mean) / std_dev;
-            double sigmoid_val = 1.0 / (1.0 + std::exp(-k * z_score));
-            g_mcgi_ctx.alpha_table[i] = alpha_min + (float)(sigmoid_val * (alpha_max - alpha_min));
-        }
+        ok = reader.for_each_block([&](const float *block, size_t count, size_t offset) {
+            for (size_t i = 0; i < count; ++i)
+            {
+                double z_score = (block[i] - stats.mean) / std_dev;
+                ctx->alpha_codes[offset + i] = quantize(1.0 / (1.0 + std::exp(-k * z_score)));
+            }
+        });
     }
+    if (!ok)
+        return nullptr;
 
-    g_mcgi_ctx.enabled = true;
-    std::cout << "[MCGI] Global Context Ready. Table Size: " << g_mcgi_ctx.alpha_table.size() << std::endl;
+    ctx->mode = MCGIMode::STATIC;
+    std::cout << "[MCGI] Context Ready. Table Size: " << ctx->alpha_codes.size() << " ("
+              << ctx->alpha_codes.size() * sizeof(uint16_t) / (1024 * 1024) << " MB)" << std::endl;
 
-    if (lid_values.size() > 5)
+    if (num_points > 5)
     {
         std::cout << "[MCGI Debug] Sample Alphas (First 5): ";
-        for (int i = 0; i < 5; ++i)
-            std::cout << g_mcgi_ctx.alpha_table[i] << " ";
+        for (uint32_t i = 0; i < 5; ++i)
+            std::cout << ctx->static_alpha(i, 0.0f) << " ";
         std::cout << std::endl;
     }
+    return ctx;
+}
+} // namespace
+
+// --- 构建上下文 ---
+
+std::shared_ptr<MCGIContext> CreateMCGIContext(const std::string &lid_path, float alpha_min, float alpha_max,
+                                               bool use_linear)
+{
+    if (lid_path.empty())
+        return nullptr;
+
+    LIDReader reader(lid_path);
+    std::cout << "[MCGI] Streaming " << reader.size() << " LID values from " << lid_path << std::endl;
+    auto ctx = CreateMCGIContext(reader, alpha_min, alpha_max, use_linear);
+    if (ctx == nullptr)
+        std::cerr << "[MCGI Error] Failed to load LID file. MCGI disabled." << std::endl;
+    return ctx;
+}
+
+std::shared_ptr<MCGIContext> CreateMCGIContext(const float *lid_values, size_t num_points, float alpha_min,
+                                               float alpha_max, bool use_linear)
+{
+    if (lid_values == nullptr || num_points == 0)
+        return nullptr;
+
+    return CreateMCGIContext(LIDReader(lid_values, num_points), alpha_min, alpha_max, use_linear);
+}
+
+std::shared_ptr<MCGIContext> CreateShardMCGIContext(const MCGIContext &global_ctx,
+                                                    const std::vector<uint32_t> &local_to_global)
+{
+    auto ctx = std::make_shared<MCGIContext>(global_ctx);
+    if (global_ctx.mode != MCGIMode::STATIC)
+        return ctx;
+
+    ctx->alpha_codes.resize(local_to_global.size());
+    for (size_t i = 0; i < local_to_global.size(); ++i)
+    {
+        if (local_to_global[i] >= global_ctx.alpha_codes.size())
+        {
+            std::cerr << "[MCGI Error] Shard point " << i << " maps to id " << local_to_global[i]
+                      << ", outside the alpha table of size " << global_ctx.alpha_codes.size() << std::endl;
+            return nullptr;
+        }
+        ctx->alpha_codes[i] = global_ctx.alpha_codes[local_to_global[i]];
+    }
+    return ctx;
+}
+
+std::shared_ptr<MCGIContext> CreateLIDRecordingContext()
+{
+    auto ctx = std::make_shared<MCGIContext>();
+    ctx->record_lid = true;
+    return ctx;
+}
+
+std::shared_ptr<MCGIContext> CreateAMCGIContext(float lid_avg, float lid_std, float alpha_min, float alpha_max,
+                                                bool refine_lid)
+{
+    auto ctx = std::make_shared<MCGIContext>();
+    ctx->lid_avg = lid_avg;
+    ctx->lid_std = lid_std > 1e-6f ? lid_std : 1.0f;
+    ctx->alpha_min = alpha_min;
+    ctx->alpha_max = alpha_max;
+    ctx->refine_lid = refine_lid;
+    ctx->mode = MCGIMode::ADVANCED;
+
+    std::cout << "[AMCGI] Context Initialized. Avg=" << lid_avg << " Std=" << lid_std << " Alpha=[" << alpha_min
+              << "," << alpha_max << "]" << std::endl;
+    return ctx;
 }
 
 // void InitMCGIContext(const std::string &lid_path, float alpha_min, float alpha_max)
@@ -189,31 +326,56 @@ void InitMCGIContext(const std::string &lid_path, float alpha_min, float alpha_m
 //     }
 // }
 
-float GetGlobalMCGIAlpha(unsigned node_id)
+float MCGIContext::static_alpha(uint32_t node_id, float fallback) const
 {
-    if (!g_mcgi_ctx.enabled) return 1.2f; // 默认 fallback
+    if (node_id >= alpha_codes.size())
+        return fallback;
 
-    if (node_id >= g_mcgi_ctx.alpha_table.size()) return 1.2f;
-
-    return g_mcgi_ctx.alpha_table[node_id];
+    return alpha_min + alpha_codes[node_id] * ((alpha_max - alpha_min) / MAX_ALPHA_CODE);
 }
 
-// [FIX] 这就是你缺失的那个函数，导致编译报错的原因
-bool IsMCGIEnabled()
+float MCGIContext::adaptive_alpha(float lid, float fallback) const
 {
-    return g_mcgi_ctx.enabled;
-}
+    if (lid <= 0.0f)
+        return fallback;
 
-bool IsMCGIAdvanced()
-{
-    return g_mcgi_ctx.advanced;
+    // alpha = min + (max - min) * Sigmoid( (lid - avg) / std )
+    double z_score = (lid - lid_avg) / lid_std;
+    double sigmoid = 1.0 / (1.0 + std::exp(-1.0 * z_score)); // k=1.0 平滑度
+    return alpha_min + (float)(sigmoid * (alpha_max - alpha_min));
 }
 
-void FreeMCGIContext()
+float EstimateLIDFromSquaredDistances(const float *sq_dists, size_t k)
 {
-    std::cout << "[MCGI] Cleaning up context." << std::endl;
-    std::vector<float>().swap(g_mcgi_ctx.alpha_table); // 强制释放内存
-    g_mcgi_ctx.enabled = false;
+    // 参照半径 (R_max) 取第 k 个邻居；DiskANN 的距离通常是“平方欧氏距离”
+    float max_dist_sq = sq_dists[k - 1];
+
+    // 防御性编程：避免距离极小导致除零
+    if (max_dist_sq <= 1e-9f)
+        return 0.0f;
+
+    // 公式推导：log(sqrt(d_max)/sqrt(d_i)) = 0.5 * log(d_max/d_i)
+    // sum(log(d_max/d_i)) = log(prod(d_max/d_i))：先连乘比值，只在最后取一次 log，而不是每个邻居一次。
+    // 每 8 项用 frexp 把指数拆出来，避免连乘溢出 (单个比值最多约 1e15)
+    double prod = 1.0;
+    int exponent = 0;
+    for (size_t i = 0; i < k; ++i)
+    {
+        prod *= (double)max_dist_sq / std::max(sq_dists[i], 1e-9f); // 避免 log(0)
+        if ((i & 7) == 7)
+        {
+            int e;
+            prod = std::frexp(prod, &e);
+            exponent += e;
+        }
+    }
+    double sum_log_ratios = std::log(prod) + exponent * 0.69314718055994530942; // ln(2)
+
+    // 标准 MLE 公式: LID = k / sum(log(r_max/r_i))
+    // 代入平方项系数 0.5，最终公式为: LID = 2 * k / sum_log_dist_ratios
+    if (sum_log_ratios <= 1e-6)
+        return 0.0f;
+    return (float)((2.0 * k) / sum_log_ratios);
 }
 
-} // namespace diskann
\ No newline at end of file
+} // namespace diskann
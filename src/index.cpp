@@ -3,6 +3,7 @@
 
 #include <omp.h>
 
+#include <array>
 #include <type_traits>
 
 #include "boost/dynamic_bitset.hpp"
@@ -103,6 +104,9 @@ Index<T, TagT, LabelT>::Index(const IndexConfig &index_config, std::shared_ptr<A
         _filterIndexingQueueSize = index_config.index_write_params->filter_list_size;
         _indexingThreads = index_config.index_write_params->num_threads;
         _saturate_graph = index_config.index_write_params->saturate_graph;
+        _mcgi_ctx = index_config.index_write_params->mcgi_context;
+        if (_mcgi_ctx != nullptr && (_mcgi_ctx->mode == MCGIMode::ADVANCED || _mcgi_ctx->record_lid))
+            _mcgi_lid = std::vector<std::atomic<float>>(total_internal_points);
 
         if (index_config.index_search_params != nullptr)
         {
@@ -396,6 +400,39 @@ void Index<T, TagT, LabelT>::save(const char *filename, bool compact_before_save
     diskann::cout << "Time taken for save: " << timer.elapsed() / 1000000.0 << "s." << std::endl;
 }
 
+template <typename T, typename TagT, typename LabelT> void Index<T, TagT, LabelT>::save_lid(const std::string &filename)
+{
+    if (_mcgi_lid.empty())
+    {
+        throw ANNException("Cannot save LID, the index was not built with LID recording enabled", -1, __FUNCSIG__,
+                           __FILE__, __LINE__);
+    }
+
+    // nodes whose candidate pool was too small to estimate from get the mean of the estimated ones
+    std::vector<float> lid(_nd);
+    double sum = 0;
+    size_t num_estimated = 0;
+    for (size_t i = 0; i < _nd; i++)
+    {
+        lid[i] = _mcgi_lid[i].load(std::memory_order_relaxed);
+        if (lid[i] > 0.0f)
+        {
+            sum += lid[i];
+            num_estimated++;
+        }
+    }
+    float fill = num_estimated > 0 ? (float)(sum / num_estimated) : 0.0f;
+    for (auto &v : lid)
+    {
+        if (v <= 0.0f)
+            v = fill;
+    }
+
+    save_bin<float>(filename, lid.data(), lid.size(), 1);
+    diskann::cout << "Saved LID estimates of " << num_estimated << " of " << _nd << " points to " << filename
+                  << std::endl;
+}
+
 #ifdef EXEC_ENV_OLS
 template <typename T, typename TagT, typename LabelT>
 size_t Index<T, TagT, LabelT>::load_tags(AlignedFileReader &reader)
@@ -1190,79 +1227,40 @@ void Index<T, TagT, LabelT>::prune_neighbors(const uint32_t location, std::vecto
     
     // [MCGI MOD] Dynamic Alpha Injection
     float current_alpha = _indexingAlpha;
-    if (diskann::IsMCGIAdvanced()) {
-        float alpha = 1.2f; // 默认值
-
-        // [MCGI 核心修改]
-        // 只有当开启了 MCGI 且 pool 里有数据时才计算
-        if (g_mcgi_ctx.enabled && !pool.empty())
-        {
-            // 1. 这里的 alpha 原本可能是传入的参数或者写死的 1.2
-            float alpha = 1.2f; // 或者使用函数参数 alpha_param
-
-            // ================= [AMCGI INLINE START] =================
-            // 利用当前 Candidate Pool 实时估算 LID 并动态调整 Alpha
-            if (g_mcgi_ctx.enabled && pool.size() > 5)
+    if (_mcgi_ctx != nullptr && (_mcgi_ctx->mode == MCGIMode::ADVANCED || _mcgi_ctx->record_lid))
+    {
+        // ================= [AMCGI INLINE START] =================
+        // 利用 Candidate Pool 估算 LID 并动态调整 Alpha。每个节点的估计只算一次并缓存在 _mcgi_lid 中，
+        // inter_insert 反向边处理会反复剪同一个节点，直接复用缓存；refine_lid 时用滑动平均继续修正。
+        // record_lid 时即使不是 AMCGI 也做同样的估计，构建结束后由 save_lid 写出
+        float current_lid = location < _mcgi_lid.size() ? _mcgi_lid[location].load(std::memory_order_relaxed) : 0.0f;
+        if ((current_lid <= 0.0f || _mcgi_ctx->refine_lid) && pool.size() > 5)
+        {
+            // pool 此时尚未排序，先取出最近的 k 个邻居 (取前 32 个，或者池子大小，以较小者为准)
+            std::array<Neighbor, AMCGI_LID_K> nearest;
+            auto last = std::partial_sort_copy(pool.begin(), pool.end(), nearest.begin(), nearest.end());
+            size_t lid_k = last - nearest.begin();
+
+            std::array<float, AMCGI_LID_K> sq_dists;
+            for (size_t i = 0; i < lid_k; ++i)
+                sq_dists[i] = nearest[i].distance;
+
+            float estimate = EstimateLIDFromSquaredDistances(sq_dists.data(), lid_k);
+            if (estimate > 0.0f)
             {
-                // A. 确定计算 LID 用的邻居数量 k
-                // 取前 32 个，或者池子大小，以较小者为准
-                size_t lid_k = std::min((size_t)32, pool.size());
-
-                // B. 获取第 k 个邻居的距离作为参照半径 (R_max)
-                // 注意：DiskANN pool 里的 distance 通常是“平方欧氏距离”
-                float max_dist_sq = pool[lid_k - 1].distance;
-
-                // 防御性编程：避免距离极小导致除零
-                if (max_dist_sq > 1e-9f)
-                {
-                    double sum_log_ratios = 0.0;
-
-                    // C. 累加 log(R_max / R_i)
-                    // 公式推导：log(sqrt(d_max)/sqrt(d_i)) = 0.5 * log(d_max/d_i)
-                    for (size_t i = 0; i < lid_k; ++i)
-                    {
-                        float dist_sq = pool[i].distance;
-                        if (dist_sq < 1e-9f)
-                            dist_sq = 1e-9f; // 避免 log(0)
-
-                        // 只需要累加 log(d_max / d_i)
-                        sum_log_ratios += std::log(max_dist_sq / dist_sq);
-                    }
-
-                    // D. 计算 LID
-                    // 标准 MLE 公式: LID = k / sum(log(r_max/r_i))
-                    // 代入平方项系数 0.5，最终公式为: LID = 2 * k / sum_log_dist_ratios
-                    float current_lid = 0.0f;
-                    if (sum_log_ratios > 1e-6)
-                    {
-                        current_lid = (float)((2.0 * lid_k) / sum_log_ratios);
-                    }
-
-                    // E. Sigmoid 映射 -> Alpha
-                    // alpha = min + (max - min) * Sigmoid( (lid - avg) / std )
-                    if (current_lid > 0.0f)
-                    {
-                        double z_score = (current_lid - g_mcgi_ctx.lid_avg) / g_mcgi_ctx.lid_std;
-                        double sigmoid = 1.0 / (1.0 + std::exp(-1.0 * z_score)); // k=1.0 平滑度
-
-                        alpha = g_mcgi_ctx.alpha_min + (float)(sigmoid * (g_mcgi_ctx.alpha_max - g_mcgi_ctx.alpha_min));
-                        // static int debug_print_count = 0;
-                        // if (debug_print_count < 5)
-                        // {
-                        //     std::cout << "[AMCGI Debug] PoolSize=" << pool.size() << " EstLID=" << current_lid
-                        //               << " -> Alpha=" << alpha << std::endl;
-                        //     debug_print_count++;
-                        // }
-                    }
-                }
+                current_lid =
+                    current_lid <= 0.0f ? estimate : current_lid + AMCGI_LID_EMA_WEIGHT * (estimate - current_lid);
+                if (location < _mcgi_lid.size())
+                    _mcgi_lid[location].store(current_lid, std::memory_order_relaxed);
             }
         }
-        current_alpha = alpha;
+        if (_mcgi_ctx->mode == MCGIMode::ADVANCED)
+            current_alpha = _mcgi_ctx->adaptive_alpha(current_lid, _indexingAlpha);
         // ================= [AMCGI INLINE END] =================
     }
-    else if (diskann::IsMCGIEnabled())
+    if (_mcgi_ctx != nullptr && _mcgi_ctx->mode == MCGIMode::STATIC)
     {
-        current_alpha = diskann::GetGlobalMCGIAlpha(location);
+        current_alpha = _mcgi_ctx->static_alpha(location, _indexingAlpha);
     }
     prune_neighbors(location, pool, _indexingRange, _indexingMaxC, current_alpha, pruned_list, scratch);
 }
@@ -2696,6 +2694,10 @@ template <typename T, typename TagT, typename LabelT> void Index<T, TagT, LabelT
                     _location_to_labels[new_location[old]].swap(_location_to_labels[old]);
                 }
 
+                if (old < _mcgi_lid.size())
+                    _mcgi_lid[new_location[old]].store(_mcgi_lid[old].load(std::memory_order_relaxed),
+                                                       std::memory_order_relaxed);
+
                 _data_store->copy_vectors(old, new_location[old], 1);
             }
         }
@@ -2766,6 +2768,9 @@ template <typename T, typename TagT, typename LabelT> int Index<T, TagT, LabelT>
         location = _empty_slots.pop_any();
         _delete_set->erase(location);
     }
+    // a reused location must not inherit the LID estimate of the point that was deleted from it
+    if (location < _mcgi_lid.size())
+        _mcgi_lid[location].store(0.0f, std::memory_order_relaxed);
     ++_nd;
     return location;
 }
@@ -0,0 +1,116 @@
+// Copyright (c) Microsoft Corporation. All rights reserved.
+// Licensed under the MIT license.
+
+#include <algorithm>
+#include <cstring>
+
+#include "node_cache.h"
+
+namespace diskann
+{
+
+NodeCache::NodeCache(const uint64_t capacity_bytes, const uint64_t entry_bytes, const uint32_t num_shards)
+    : _entry_bytes(entry_bytes)
+{
+    const uint64_t num_slots = capacity_bytes / entry_bytes;
+    _num_shards = (uint32_t)std::max<uint64_t>(1, std::min<uint64_t>(num_shards, num_slots));
+    _slots_per_shard = (uint32_t)(num_slots / _num_shards);
+    _shards.reset(new Shard[_num_shards]);
+    for (uint32_t s = 0; s < _num_shards; s++)
+    {
+        Shard &shard = _shards[s];
+        shard.buf.reset(new char[_slots_per_shard * _entry_bytes]);
+        shard.ids.resize(_slots_per_shard);
+        shard.frequencies.resize(_slots_per_shard, 0);
+        shard.slots.reserve(_slots_per_shard);
+    }
+}
+
+NodeCache::Shard &NodeCache::shard_of(const uint32_t node_id)
+{
+    // consecutive ids often share a sector, spread them anyway
+    return _shards[(node_id * 2654435761U) % _num_shards];
+}
+
+bool NodeCache::lookup(const uint32_t node_id, char *out)
+{
+    Shard &shard = shard_of(node_id);
+    LockGuard guard(shard.lock);
+    auto iter = shard.slots.find(node_id);
+    if (iter == shard.slots.end())
+    {
+        shard.misses++;
+        return false;
+    }
+    const uint32_t slot = iter->second;
+    if (shard.frequencies[slot] < MAX_FREQUENCY)
+        shard.frequencies[slot]++;
+    std::memcpy(out, shard.buf.get() + slot * _entry_bytes, _entry_bytes);
+    shard.hits++;
+    return true;
+}
+
+void NodeCache::insert(const uint32_t node_id, const char *sectors)
+{
+    if (_slots_per_shard == 0)
+        return;
+    Shard &shard = shard_of(node_id);
+    LockGuard guard(shard.lock);
+    // another search may have read and admitted the same node meanwhile
+    if (shard.slots.find(node_id) != shard.slots.end())
+        return;
+
+    uint32_t slot;
+    if (shard.num_used < _slots_per_shard)
+    {
+        slot = shard.num_used++;
+    }
+    else
+    {
+        // every pass of the hand decreases the frequencies it passes, so this ends within MAX_FREQUENCY + 1 turns
+        while (shard.frequencies[shard.hand] > 0)
+        {
+            shard.frequencies[shard.hand]--;
+            shard.hand = (shard.hand + 1) % _slots_per_shard;
+        }
+        slot = shard.hand;
+        shard.hand = (shard.hand + 1) % _slots_per_shard;
+        shard.slots.erase(shard.ids[slot]);
+        shard.evictions++;
+    }
+    std::memcpy(shard.buf.get() + slot * _entry_bytes, sectors, _entry_bytes);
+    shard.ids[slot] = node_id;
+    shard.frequencies[slot] = 0;
+    shard.slots.insert(std::make_pair(node_id, slot));
+    shard.insertions++;
+}
+
+NodeCacheStats NodeCache::get_stats(const bool reset)
+{
+    NodeCacheStats stats;
+    stats.capacity_entries = (uint64_t)_num_shards * _slots_per_shard;
+    for (uint32_t s = 0; s < _num_shards; s++)
+    {
+        Shard &shard = _shards[s];
+        LockGuard guard(shard.lock);
+        stats.hits += shard.hits;
+        stats.misses += shard.misses;
+        stats.insertions += shard.insertions;
+        stats.evictions += shard.evictions;
+        stats.num_entries += shard.num_used;
+        if (reset)
+        {
+            shard.hits = 0;
+            shard.misses = 0;
+            shard.insertions = 0;
+            shard.evictions = 0;
+        }
+    }
+    return stats;
+}
+
+uint64_t NodeCache::get_entry_bytes() const
+{
+    return _entry_bytes;
+}
+} // namespace diskann
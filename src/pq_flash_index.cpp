@@ -8,12 +8,17 @@
 #include "pq_scratch.h"
 #include "pq_flash_index.h"
 #include "cosine_similarity.h"
+#include <filesystem>
 #include <iostream>
 
 #ifdef _WINDOWS
 #include "windows_aligned_file_reader.h"
 #else
 #include "linux_aligned_file_reader.h"
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 #endif
 
 #define READ_U64(stream, val) stream.read((char *)&val, sizeof(uint64_t))
@@ -59,7 +64,14 @@ PQFlashIndex<T, LabelT>::PQFlashIndex(std::shared_ptr<AlignedFileReader> &fileRe
 template <typename T, typename LabelT> PQFlashIndex<T, LabelT>::~PQFlashIndex()
 {
 #ifndef EXEC_ENV_OLS
-    if (data != nullptr)
+#ifndef _WINDOWS
+    if (_pq_data_mapping != nullptr)
+    {
+        munmap(_pq_data_mapping, _pq_data_mapping_len);
+    }
+    else
+#endif
+        if (data != nullptr)
     {
         delete[] data;
     }
@@ -205,9 +217,81 @@ std::vector<bool> PQFlashIndex<T, LabelT>::read_nodes(const std::vector<uint32_t
     return retval;
 }
 
+template <typename T, typename LabelT>
+void PQFlashIndex<T, LabelT>::set_mmap_pq_data(const bool mmap_pq_data, const bool prefetch)
+{
+#ifdef _WINDOWS
+    if (mmap_pq_data)
+        diskann::cerr << "Memory-mapped PQ data is not supported on Windows, reading it into memory." << std::endl;
+    _mmap_pq_data = false;
+#else
+    _mmap_pq_data = mmap_pq_data;
+#endif
+    _prefetch_pq_data = prefetch;
+}
+
+template <typename T, typename LabelT>
+void PQFlashIndex<T, LabelT>::map_pq_data(const std::string &pq_compressed_vectors, size_t &npts, size_t &nchunks)
+{
+#ifndef _WINDOWS
+    int fd = open(pq_compressed_vectors.c_str(), O_RDONLY);
+    struct stat sb;
+    // MAP_SHARED of a read-only file: all processes mapping it are served from the same page cache pages
+    void *mapping = fd >= 0 && fstat(fd, &sb) == 0
+                        ? mmap(nullptr, (size_t)sb.st_size, PROT_READ, MAP_SHARED, fd, 0)
+                        : MAP_FAILED;
+    std::system_error error(errno, std::system_category());
+    if (fd >= 0)
+        close(fd);
+    if (mapping == MAP_FAILED)
+        throw FileException(pq_compressed_vectors, error, __FUNCSIG__, __FILE__, __LINE__);
+    _pq_data_mapping = (char *)mapping;
+    _pq_data_mapping_len = (uint64_t)sb.st_size;
+
+    int32_t npts_i32, nchunks_i32;
+    std::memcpy(&npts_i32, _pq_data_mapping, sizeof(int32_t));
+    std::memcpy(&nchunks_i32, _pq_data_mapping + sizeof(int32_t), sizeof(int32_t));
+    npts = (size_t)npts_i32;
+    nchunks = (size_t)nchunks_i32;
+    const uint64_t expected_len = 2 * sizeof(int32_t) + (uint64_t)npts * nchunks;
+    if (_pq_data_mapping_len != expected_len)
+    {
+        std::stringstream stream;
+        stream << "Error mapping " << pq_compressed_vectors << ": file size " << _pq_data_mapping_len
+               << " does not match the " << expected_len << " bytes of its header" << std::endl;
+        throw diskann::ANNException(stream.str(), -1, __FUNCSIG__, __FILE__, __LINE__);
+    }
+
+    // the PQ distance lookups touch the codes at random; huge pages, where the kernel backs file mappings with them,
+    // cut the TLB misses that causes, and prefetching trades IO at startup for no page faults while searching
+#ifdef MADV_HUGEPAGE
+    madvise(_pq_data_mapping, _pq_data_mapping_len, MADV_HUGEPAGE);
+#endif
+    madvise(_pq_data_mapping, _pq_data_mapping_len, _prefetch_pq_data ? MADV_WILLNEED : MADV_RANDOM);
+    this->data = (uint8_t *)(_pq_data_mapping + 2 * sizeof(int32_t));
+    diskann::cout << "Memory-mapped compressed vectors from " << pq_compressed_vectors << std::endl;
+#endif
+}
+
+template <typename T, typename LabelT> void PQFlashIndex<T, LabelT>::release_cache()
+{
+    _nhood_cache.clear();
+    _coord_cache.clear();
+    _cached_node_list.clear();
+    if (_nhood_cache_buf != nullptr)
+    {
+        delete[] _nhood_cache_buf;
+        diskann::aligned_free(_coord_cache_buf);
+        _nhood_cache_buf = nullptr;
+        _coord_cache_buf = nullptr;
+    }
+}
+
 template <typename T, typename LabelT> void PQFlashIndex<T, LabelT>::load_cache_list(std::vector<uint32_t> &node_list)
 {
     diskann::cout << "Loading the cache list into memory.." << std::flush;
+    // loading replaces any previous cache; callers must not search concurrently
+    release_cache();
     size_t num_cached_nodes = node_list.size();
 
     // Allocate space for neighborhood cache
@@ -247,12 +331,133 @@ template <typename T, typename LabelT> void PQFlashIndex<T, LabelT>::load_cache_
             {
                 _coord_cache.insert(std::make_pair(nodes_to_read[i], coord_buffers[i]));
                 _nhood_cache.insert(std::make_pair(nodes_to_read[i], nbr_buffers[i]));
+                _cached_node_list.push_back(nodes_to_read[i]);
             }
         }
     }
     diskann::cout << "..done." << std::endl;
 }
 
+// cache snapshot layout: a header of CACHE_SNAPSHOT_HEADER_LEN uint64_t values
+//   {num_points, aligned_dim, max_degree, sizeof(T), disk_index_size, disk_index_mtime, num_nodes_to_cache,
+//    with_contents, num_cached_nodes}
+// followed by the uint32_t ids of the cached nodes and, with contents, their T[aligned_dim] coordinates, uint32_t
+// neighbor counts and uint32_t[max_degree + 1] neighbor slots, each in the order of the ids
+static constexpr size_t CACHE_SNAPSHOT_HEADER_LEN = 9;
+
+// the size and modification time of the disk index file, so that a snapshot of an index rebuilt in place with the
+// same shape is not mistaken for one of the current index
+static std::pair<uint64_t, uint64_t> disk_index_identity(const std::string &disk_index_file)
+{
+    std::error_code size_error, time_error;
+    const uint64_t size = std::filesystem::file_size(disk_index_file, size_error);
+    const auto mtime = std::filesystem::last_write_time(disk_index_file, time_error);
+    if (size_error || time_error)
+        return {0, 0};
+    return {size, (uint64_t)mtime.time_since_epoch().count()};
+}
+
+template <typename T, typename LabelT>
+void PQFlashIndex<T, LabelT>::save_cache_snapshot(const std::string &cache_file, const uint64_t num_nodes_to_cache,
+                                                  const bool with_contents)
+{
+    const uint64_t num_cached_nodes = _cached_node_list.size();
+    const auto identity = disk_index_identity(_disk_index_file);
+    const uint64_t header[CACHE_SNAPSHOT_HEADER_LEN] = {_num_points,
+                                                         _aligned_dim,
+                                                         _max_degree,
+                                                         sizeof(T),
+                                                         identity.first,
+                                                         identity.second,
+                                                         num_nodes_to_cache,
+                                                         (uint64_t)with_contents,
+                                                         num_cached_nodes};
+
+    // written under a temporary name, so a crash never leaves a truncated snapshot behind
+    const std::string tmp_file = cache_file + ".tmp";
+    std::ofstream writer(tmp_file, std::ios::binary | std::ios::trunc);
+    if (!writer.is_open())
+        throw diskann::ANNException("Failed to open " + tmp_file, -1, __FUNCSIG__, __FILE__, __LINE__);
+    writer.write((const char *)header, sizeof(header));
+    writer.write((const char *)_cached_node_list.data(), num_cached_nodes * sizeof(uint32_t));
+    if (with_contents)
+    {
+        for (const auto node : _cached_node_list)
+            writer.write((const char *)_coord_cache[node], _aligned_dim * sizeof(T));
+        for (const auto node : _cached_node_list)
+            writer.write((const char *)&_nhood_cache[node].first, sizeof(uint32_t));
+        for (const auto node : _cached_node_list)
+            writer.write((const char *)_nhood_cache[node].second, (_max_degree + 1) * sizeof(uint32_t));
+    }
+    writer.close();
+    if (writer.fail())
+        throw diskann::ANNException("Failed to write " + tmp_file, -1, __FUNCSIG__, __FILE__, __LINE__);
+    std::rename(tmp_file.c_str(), cache_file.c_str());
+}
+
+template <typename T, typename LabelT>
+bool PQFlashIndex<T, LabelT>::load_cache_snapshot(const std::string &cache_file, const uint64_t num_nodes_to_cache)
+{
+    std::ifstream reader(cache_file, std::ios::binary);
+    if (!reader.is_open())
+        return false;
+    uint64_t header[CACHE_SNAPSHOT_HEADER_LEN];
+    reader.read((char *)header, sizeof(header));
+    const auto identity = disk_index_identity(_disk_index_file);
+    if (reader.fail() || header[0] != _num_points || header[1] != _aligned_dim || header[2] != _max_degree ||
+        header[3] != sizeof(T) || identity.first == 0 || header[4] != identity.first ||
+        header[5] != identity.second || header[6] != num_nodes_to_cache || header[8] > _num_points)
+    {
+        diskann::cout << "Cache snapshot " << cache_file << " does not match this index, ignoring it." << std::endl;
+        return false;
+    }
+    const bool with_contents = header[7] != 0;
+    const uint64_t num_cached_nodes = header[8];
+
+    std::vector<uint32_t> node_list(num_cached_nodes);
+    reader.read((char *)node_list.data(), num_cached_nodes * sizeof(uint32_t));
+    if (reader.fail() || std::any_of(node_list.begin(), node_list.end(),
+                                     [this](const uint32_t node) { return node >= _num_points; }))
+    {
+        diskann::cout << "Cache snapshot " << cache_file << " is corrupt, ignoring it." << std::endl;
+        return false;
+    }
+    if (!with_contents)
+    {
+        load_cache_list(node_list);
+        return true;
+    }
+
+    diskann::cout << "Loading the cache snapshot into memory.." << std::flush;
+    uint32_t *nhood_cache_buf = new uint32_t[num_cached_nodes * (_max_degree + 1)];
+    T *coord_cache_buf = nullptr;
+    diskann::alloc_aligned((void **)&coord_cache_buf, num_cached_nodes * _aligned_dim * sizeof(T), 8 * sizeof(T));
+    std::vector<uint32_t> nbr_counts(num_cached_nodes);
+    reader.read((char *)coord_cache_buf, num_cached_nodes * _aligned_dim * sizeof(T));
+    reader.read((char *)nbr_counts.data(), num_cached_nodes * sizeof(uint32_t));
+    reader.read((char *)nhood_cache_buf, num_cached_nodes * (_max_degree + 1) * sizeof(uint32_t));
+    if (reader.fail())
+    {
+        delete[] nhood_cache_buf;
+        diskann::aligned_free(coord_cache_buf);
+        diskann::cout << "..truncated, ignoring it." << std::endl;
+        return false;
+    }
+
+    release_cache();
+    _nhood_cache_buf = nhood_cache_buf;
+    _coord_cache_buf = coord_cache_buf;
+    for (uint64_t i = 0; i < num_cached_nodes; i++)
+    {
+        _coord_cache.insert(std::make_pair(node_list[i], _coord_cache_buf + i * _aligned_dim));
+        _nhood_cache.insert(
+            std::make_pair(node_list[i], std::make_pair(nbr_counts[i], _nhood_cache_buf + i * (_max_degree + 1))));
+    }
+    _cached_node_list = std::move(node_list);
+    diskann::cout << "..done." << std::endl;
+    return true;
+}
+
 #ifdef EXEC_ENV_OLS
 template <typename T, typename LabelT>
 void PQFlashIndex<T, LabelT>::generate_cache_list_from_sample_queries(MemoryMappedFiles &files, std::string sample_bin,
@@ -280,13 +485,7 @@ void PQFlashIndex<T, LabelT>::generate_cache_list_from_sample_queries(std::strin
     }
 
     this->_count_visited_nodes = true;
-    this->_node_visit_counter.clear();
-    this->_node_visit_counter.resize(this->_num_points);
-    for (uint32_t i = 0; i < _node_visit_counter.size(); i++)
-    {
-        this->_node_visit_counter[i].first = i;
-        this->_node_visit_counter[i].second = 0;
-    }
+    reset_node_visit_counter();
 
     uint64_t sample_num, sample_dim, sample_aligned_dim;
     T *samples;
@@ -305,6 +504,7 @@ void PQFlashIndex<T, LabelT>::generate_cache_list_from_sample_queries(std::strin
     else
     {
         diskann::cerr << "Sample bin file not found. Not generating cache." << std::endl;
+        this->_count_visited_nodes = false;
         return;
     }
 
@@ -343,10 +543,63 @@ void PQFlashIndex<T, LabelT>::generate_cache_list_from_sample_queries(std::strin
         node_list.push_back(this->_node_visit_counter[i].first);
     }
     this->_count_visited_nodes = false;
+    // the counter is sorted now; leave it usable for visit counting while serving
+    reset_node_visit_counter();
 
     diskann::aligned_free(samples);
 }
 
+template <typename T, typename LabelT> void PQFlashIndex<T, LabelT>::reset_node_visit_counter()
+{
+    this->_node_visit_counter.resize(this->_num_points);
+    for (uint32_t i = 0; i < _node_visit_counter.size(); i++)
+    {
+        this->_node_visit_counter[i].first = i;
+        this->_node_visit_counter[i].second = 0;
+    }
+}
+
+template <typename T, typename LabelT>
+void PQFlashIndex<T, LabelT>::set_visit_counting(const uint64_t sample_period)
+{
+    if (sample_period > 0 && this->_node_visit_counter.size() != this->_num_points)
+        reset_node_visit_counter();
+    _visit_sample_period.store(sample_period);
+}
+
+template <typename T, typename LabelT>
+void PQFlashIndex<T, LabelT>::get_visit_counts(std::vector<uint32_t> &counts, const bool reset)
+{
+    counts.assign(this->_num_points, 0);
+    for (size_t i = 0; i < _node_visit_counter.size(); i++)
+    {
+        auto &count = reinterpret_cast<std::atomic<uint32_t> &>(this->_node_visit_counter[i].second);
+        counts[this->_node_visit_counter[i].first] = reset ? count.exchange(0) : count.load();
+    }
+}
+
+template <typename T, typename LabelT> uint64_t PQFlashIndex<T, LabelT>::get_cache_bytes_per_node()
+{
+    return _aligned_dim * sizeof(T) + (_max_degree + 1) * sizeof(uint32_t);
+}
+
+template <typename T, typename LabelT>
+void PQFlashIndex<T, LabelT>::set_dynamic_cache(const uint64_t capacity_bytes)
+{
+    const uint64_t num_sectors_per_node =
+        _nnodes_per_sector > 0 ? 1 : DIV_ROUND_UP(_max_node_len, defaults::SECTOR_LEN);
+    if (capacity_bytes == 0)
+        _dynamic_cache.reset();
+    else
+        _dynamic_cache.reset(new NodeCache(capacity_bytes, num_sectors_per_node * defaults::SECTOR_LEN));
+}
+
+template <typename T, typename LabelT>
+NodeCacheStats PQFlashIndex<T, LabelT>::get_dynamic_cache_stats(const bool reset)
+{
+    return _dynamic_cache != nullptr ? _dynamic_cache->get_stats(reset) : NodeCacheStats();
+}
+
 template <typename T, typename LabelT>
 void PQFlashIndex<T, LabelT>::cache_bfs_levels(uint64_t num_nodes_to_cache, std::vector<uint32_t> &node_list,
                                                const bool shuffle)
@@ -831,7 +1084,10 @@ int PQFlashIndex<T, LabelT>::load_from_separate_paths(uint32_t num_threads, cons
 #ifdef EXEC_ENV_OLS
     diskann::load_bin<uint8_t>(files, pq_compressed_vectors, this->data, npts_u64, nchunks_u64);
 #else
-    diskann::load_bin<uint8_t>(pq_compressed_vectors, this->data, npts_u64, nchunks_u64);
+    if (_mmap_pq_data)
+        map_pq_data(pq_compressed_vectors, npts_u64, nchunks_u64);
+    else
+        diskann::load_bin<uint8_t>(pq_compressed_vectors, this->data, npts_u64, nchunks_u64);
 #endif
 
     this->_num_points = npts_u64;
@@ -1278,7 +1534,7 @@ void PQFlashIndex<T, LabelT>::cached_beam_search(const T *query1, const uint64_t
                                                  uint64_t *indices, float *distances, const uint64_t beam_width,
                                                  const bool use_filter, const LabelT &filter_label,
                                                  const uint32_t io_limit, const bool use_reorder_data,
-                                                 QueryStats *stats)
+                                                 QueryStats *stats, uint32_t *visit_counts)
 {
 
     uint64_t num_sector_per_nodes = DIV_ROUND_UP(_max_node_len, defaults::SECTOR_LEN);
@@ -1361,6 +1617,14 @@ void PQFlashIndex<T, LabelT>::cached_beam_search(const T *query1, const uint64_t
     };
     Timer query_timer, io_timer, cpu_timer;
 
+    // while sampling is on, every query pays one atomic increment; only sampled queries count their visits. A search
+    // counting into the caller's visit_counts is not sampled.
+    const uint64_t visit_period = _visit_sample_period.load(std::memory_order_relaxed);
+    const bool count_visits =
+        visit_counts == nullptr &&
+        (this->_count_visited_nodes ||
+         (visit_period > 0 && _visit_query_seq.fetch_add(1, std::memory_order_relaxed) % visit_period == 0));
+
     tsl::robin_set<uint64_t> &visited = query_scratch->visited;
     NeighborPriorityQueue &retset = query_scratch->retset;
     retset.reserve(l_search);
@@ -1422,6 +1686,9 @@ void PQFlashIndex<T, LabelT>::cached_beam_search(const T *query1, const uint64_t
     frontier_read_reqs.reserve(2 * beam_width);
     std::vector<std::pair<uint32_t, std::pair<uint32_t, uint32_t *>>> cached_nhoods;
     cached_nhoods.reserve(2 * beam_width);
+    // the frontier nodes read from the SSD, admitted to the dynamic cache once read
+    std::vector<std::pair<uint32_t, char *>> read_nhoods;
+    read_nhoods.reserve(2 * beam_width);
 
     while (retset.has_unexpanded_node() && num_ios < io_limit)
     {
@@ -1430,6 +1697,7 @@ void PQFlashIndex<T, LabelT>::cached_beam_search(const T *query1, const uint64_t
         frontier_nhoods.clear();
         frontier_read_reqs.clear();
         cached_nhoods.clear();
+        read_nhoods.clear();
         sector_scratch_idx = 0;
         // find new beam
         uint32_t num_seen = 0;
@@ -1450,7 +1718,11 @@ void PQFlashIndex<T, LabelT>::cached_beam_search(const T *query1, const uint64_t
             {
                 frontier.push_back(nbr.id);
             }
-            if (this->_count_visited_nodes)
+            if (visit_counts != nullptr)
+            {
+                reinterpret_cast<std::atomic<uint32_t> &>(visit_counts[nbr.id]).fetch_add(1);
+            }
+            else if (count_visits)
             {
                 reinterpret_cast<std::atomic<uint32_t> &>(this->_node_visit_counter[nbr.id].second).fetch_add(1);
             }
@@ -1469,6 +1741,19 @@ void PQFlashIndex<T, LabelT>::cached_beam_search(const T *query1, const uint64_t
                 fnhood.second = sector_scratch + num_sectors_per_node * sector_scratch_idx * defaults::SECTOR_LEN;
                 sector_scratch_idx++;
                 frontier_nhoods.push_back(fnhood);
+#ifndef USE_BING_INFRA
+                // the asynchronous reader for Bing processes completed reads by request index, so it always reads
+                if (_dynamic_cache != nullptr)
+                {
+                    if (_dynamic_cache->lookup(id, fnhood.second))
+                    {
+                        if (stats != nullptr)
+                            stats->n_cache_hits++;
+                        continue;
+                    }
+                    read_nhoods.push_back(fnhood);
+                }
+#endif
                 frontier_read_reqs.emplace_back(get_node_sector((size_t)id) * defaults::SECTOR_LEN,
                                                 num_sectors_per_node * defaults::SECTOR_LEN, fnhood.second);
                 if (stats != nullptr)
@@ -1478,17 +1763,22 @@ void PQFlashIndex<T, LabelT>::cached_beam_search(const T *query1, const uint64_t
                 }
                 num_ios++;
             }
-            io_timer.reset();
+            if (!frontier_read_reqs.empty())
+            {
+                io_timer.reset();
 #ifdef USE_BING_INFRA
-            reader->read(frontier_read_reqs, ctx,
-                         true); // asynhronous reader for Bing.
+                reader->read(frontier_read_reqs, ctx,
+                             true); // asynhronous reader for Bing.
 #else
-            reader->read(frontier_read_reqs, ctx); // synchronous IO linux
+                reader->read(frontier_read_reqs, ctx); // synchronous IO linux
 #endif
-            if (stats != nullptr)
-            {
-                stats->io_us += (float)io_timer.elapsed();
+                if (stats != nullptr)
+                {
+                    stats->io_us += (float)io_timer.elapsed();
+                }
             }
+            for (auto &read_nhood : read_nhoods)
+                _dynamic_cache->insert(read_nhood.first, read_nhood.second);
         }
 
         // process cached nhoods
@@ -1672,9 +1962,16 @@ void PQFlashIndex<T, LabelT>::cached_beam_search(const T *query1, const uint64_t
         std::sort(full_retset.begin(), full_retset.end());
     }
 
-    // copy k_search values
+    // copy k_search values; a selective filter can leave fewer candidates than that, pad those slots
     for (uint64_t i = 0; i < k_search; i++)
     {
+        if (i >= full_retset.size())
+        {
+            indices[i] = std::numeric_limits<uint32_t>::max();
+            if (distances != nullptr)
+                distances[i] = std::numeric_limits<float>::max();
+            continue;
+        }
         indices[i] = full_retset[i].id;
         auto key = (uint32_t)indices[i];
         if (_dummy_pts.find(key) != _dummy_pts.end())
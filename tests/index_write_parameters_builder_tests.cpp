@@ -55,4 +55,22 @@ BOOST_AUTO_TEST_CASE(test_build)
     }
 }
 
+BOOST_AUTO_TEST_CASE(test_mcgi_context)
+{
+    diskann::IndexWriteParametersBuilder builder(rand(), rand());
+
+    BOOST_TEST(builder.build().mcgi_context == nullptr);
+
+    auto mcgi_context = std::make_shared<diskann::MCGIContext>();
+    mcgi_context->mode = diskann::MCGIMode::ADVANCED;
+    builder.with_mcgi_context(mcgi_context);
+
+    auto parameters = builder.build();
+    BOOST_TEST(parameters.mcgi_context == mcgi_context);
+
+    // copies share the same read-only context rather than each owning one
+    auto copied = diskann::IndexWriteParametersBuilder(parameters).build();
+    BOOST_TEST(copied.mcgi_context == mcgi_context);
+}
+
 BOOST_AUTO_TEST_SUITE_END()